@@ -0,0 +1,311 @@
+# Copyright (c) Max-Planck-Gesellschaft zur Förderung der Wissenschaften e.V.
+# Developed at the Max Planck Institute for Informatics, Network and Cloud Systems Group
+#
+# Author: Yiming Lei (ylei@mpi-inf.mpg.de)
+#
+# This software is licensed for non-commercial scientific research purposes only.
+#
+# License text: Creative Commons NC BY SA 4.0
+# https://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
+
+"""
+Long-running controller service.
+
+:meth:`BaseNetwork.start_service` keeps a deployed network alive and applies
+topology, routing and calendar queue updates submitted while it runs, from
+Python or over the dashboard's HTTP API (``POST /api/control/updates``; set
+``OPENOPTICS_DASHBOARD_UDS`` to serve it on a Unix socket instead of TCP).
+
+Updates are not applied one by one. The first update of a burst opens a short
+window; everything submitted until the window closes, or while the previous
+batch is being deployed, is coalesced into one deployment: the last topology,
+the last routing and the last queue action win. A topology change without a
+new routing re-runs the routing in use on the new topology.
+
+An update is a dict with any of the keys::
+
+    {
+        "circuits": [[time_slice, node1, node2, port1, port2], ...],
+        # or a named topology, e.g. "round_robin", with its keyword arguments
+        "topo": "opera", "topo_args": {"nb_node": 8, "nb_link": 1},
+        # a named routing function of OpticalRouting, called with the topology
+        "routing": "routing_direct", "routing_args": {}, "routing_mode": "Per-hop",
+        # or, from Python only, a list of TimeFlowTable.Path
+        "paths": [...],
+        # calendar queues: "activate" (optionally for "time_slice") or "pause"
+        "queue": "activate",
+    }
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+
+from openoptics import OpticalRouting, OpticalTopo, utils
+from openoptics.Tracer import tracer
+
+# Topology generators an update may name; each returns a list of circuits.
+TOPOLOGIES = {
+    "static_topo": OpticalTopo.static_topo,
+    "round_robin": OpticalTopo.round_robin,
+    "opera": OpticalTopo.opera,
+    "shale": OpticalTopo.shale,
+    "bipartite_matching": OpticalTopo.bipartite_matching,
+    "bvn_matching": OpticalTopo.bvn_matching,
+}
+
+# Routing functions an update may name; each takes the topology first.
+ROUTINGS = {
+    name: getattr(OpticalRouting, name)
+    for name in dir(OpticalRouting)
+    if name.startswith("routing_") and callable(getattr(OpticalRouting, name))
+}
+
+_UPDATE_KEYS = {
+    "circuits", "topo", "topo_args", "routing", "routing_args",
+    "routing_mode", "paths", "queue", "time_slice",
+}
+
+
+def validate_update(update: dict) -> dict:
+    """
+    Check an update and resolve the topology and routing it names.
+
+    Args:
+        update (dict): The update, see the module docstring.
+
+    Returns:
+        A normalized update with ``circuits`` (or None), ``routing`` (a callable
+        of the topology, or None), ``routing_mode`` and ``queue`` (or None).
+
+    Raises:
+        ValueError: The update is malformed or names an unknown function.
+    """
+    if not isinstance(update, dict):
+        raise ValueError(f"An update must be a dict, got {type(update).__name__}.")
+    unknown = set(update) - _UPDATE_KEYS
+    if unknown:
+        raise ValueError(f"Unknown update keys: {sorted(unknown)}.")
+
+    circuits = update.get("circuits")
+    if "topo" in update:
+        if circuits is not None:
+            raise ValueError("Specify only one of circuits or topo.")
+        if update["topo"] not in TOPOLOGIES:
+            raise ValueError(f"Unknown topology {update['topo']!r}; one of {sorted(TOPOLOGIES)}.")
+        try:
+            circuits = TOPOLOGIES[update["topo"]](**update.get("topo_args", {}))
+        except TypeError as e:
+            raise ValueError(f"Bad topo_args for {update['topo']}: {e}") from e
+    if circuits is not None:
+        if not circuits or any(len(circuit) != 5 for circuit in circuits):
+            raise ValueError("circuits must be a non-empty list of [time_slice, node1, node2, port1, port2].")
+        circuits = [list(circuit) for circuit in circuits]
+
+    routing = None
+    if "routing" in update:
+        if "paths" in update:
+            raise ValueError("Specify only one of routing or paths.")
+        if update["routing"] not in ROUTINGS:
+            raise ValueError(f"Unknown routing {update['routing']!r}; one of {sorted(ROUTINGS)}.")
+        func, args = ROUTINGS[update["routing"]], dict(update.get("routing_args", {}))
+        routing = lambda slice_to_topo: func(slice_to_topo, **args)  # noqa: E731
+    elif "paths" in update:
+        paths = list(update["paths"])
+        routing = lambda slice_to_topo: paths  # noqa: E731
+
+    routing_mode = update.get("routing_mode", "Per-hop")
+    if routing_mode not in ("Per-hop", "Source"):
+        raise ValueError(f"routing_mode must be Per-hop or Source, got {routing_mode!r}.")
+
+    queue = update.get("queue")
+    if queue not in (None, "activate", "pause"):
+        raise ValueError(f"queue must be activate or pause, got {queue!r}.")
+
+    if circuits is None and routing is None and queue is None:
+        raise ValueError("The update changes nothing.")
+    return {
+        "circuits": circuits,
+        "routing": routing,
+        "routing_mode": routing_mode,
+        "queue": queue,
+        "time_slice": update.get("time_slice"),
+    }
+
+
+class ControllerService:
+    """
+    Applies updates to a running network, coalescing bursts into one deployment.
+
+    One worker thread deploys; :meth:`submit` may be called from any thread.
+    """
+
+    def __init__(self, net, window_s=0.05, routing_func=None, routing_mode="Per-hop"):
+        """
+        Args:
+            net (BaseNetwork): The network to update.
+            window_s (float): How long to collect updates after the first one
+                of a burst before deploying them together.
+            routing_func (callable, optional): Routing of the deployed network,
+                called with the topology. Re-run when a topology update comes
+                without a routing. Defaults to keeping the installed routing.
+            routing_mode (str): The routing mode of routing_func, "Per-hop" or "Source".
+        """
+        self.net = net
+        self.window_s = window_s
+        # Routing re-run when a topology update comes without one.
+        self._routing = routing_func
+        self._routing_mode = routing_mode
+        self._pending = []  # [(normalized update, Future), ...]
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self.nb_batches = 0
+        self.nb_updates = 0
+
+    def submit(self, update: dict) -> Future:
+        """
+        Queue an update for the next deployment.
+
+        Args:
+            update (dict): The update, see the module docstring.
+
+        Returns:
+            A Future resolving to ``{"ok": bool, "coalesced": n}`` once the batch
+            holding the update is deployed, n being the number of updates in it.
+
+        Raises:
+            ValueError: The update is malformed.
+        """
+        normalized = validate_update(update)
+        if normalized["queue"] is not None and getattr(self.net, "device_manager", None) is None:
+            raise ValueError("Calendar queue updates need a DeviceManager.")
+        future = Future()
+        with self._cond:
+            if self._stopping:
+                raise RuntimeError("The controller service is stopped.")
+            self._pending.append((normalized, future))
+            self._cond.notify()
+        return future
+
+    def start(self) -> None:
+        """Start the worker thread."""
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="openoptics-controller", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Deploy what is pending and stop the worker thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def status(self) -> dict:
+        """Counters and the state of the network, as served on ``GET /api/control/status``."""
+        with self._cond:
+            pending = len(self._pending)
+        return {
+            "nb_node": self.net.nb_node,
+            "nb_time_slices": self.net.nb_time_slices,
+            "pending": pending,
+            "batches": self.nb_batches,
+            "updates": self.nb_updates,
+        }
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                if not self._stopping:
+                    # Collect the rest of the burst.
+                    deadline = time.monotonic() + self.window_s
+                    while not self._stopping and (remaining := deadline - time.monotonic()) > 0:
+                        self._cond.wait(timeout=remaining)
+                batch, self._pending = self._pending, []
+
+            try:
+                ok = self._apply([update for update, _ in batch])
+            except Exception as e:
+                ok, error = False, e
+            else:
+                error = None
+            self.nb_batches += 1
+            self.nb_updates += len(batch)
+            for _, future in batch:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result({"ok": ok, "coalesced": len(batch)})
+
+    def _apply(self, updates) -> bool:
+        """Deploy the coalesced updates: topology, routing, then calendar queues."""
+        circuits = routing = queue = None
+        routing_mode = self._routing_mode
+        for update in updates:
+            if update["circuits"] is not None:
+                circuits = update["circuits"]
+            if update["routing"] is not None:
+                routing, routing_mode = update["routing"], update["routing_mode"]
+            if update["queue"] is not None:
+                queue = (update["queue"], update["time_slice"])
+        if circuits is not None and routing is None:
+            routing = self._routing
+
+        net = self.net
+        ok = True
+        with tracer.span("ControllerService.apply", updates=len(updates)):
+            if circuits is not None:
+                nb_time_slices = OpticalTopo.get_nb_time_slice_from_circuits(circuits)
+                if (
+                    net._backend.supports_versioned_tables
+                    and net.nodes_created
+                    and nb_time_slices == net.nb_time_slices <= utils.VERSION_SLICE_OFFSET
+                ):
+                    # Stage the new schedule and routing next to the running
+                    # one and switch all switches to it at once.
+                    paths = None
+                    if routing is not None:
+                        paths = routing(self._slice_to_topo(circuits))
+                    ok = net.stage_update(
+                        circuits, paths, routing_mode=routing_mode, arch_mode=net.arch_mode
+                    ) and net.commit_update()
+                else:
+                    ok = net.deploy_topo(circuits, start_fresh=True)
+                    if ok and routing is not None:
+                        ok = net.deploy_routing(
+                            routing(net.get_topo()), routing_mode=routing_mode,
+                            arch_mode=net.arch_mode, start_fresh=True,
+                        )
+            elif routing is not None:
+                if not net.nodes_created:
+                    raise ValueError("Deploy a topology before a routing.")
+                ok = net.deploy_routing(
+                    routing(net.get_topo()), routing_mode=routing_mode,
+                    arch_mode=net.arch_mode, start_fresh=True,
+                )
+            if routing is not None and ok:
+                self._routing, self._routing_mode = routing, routing_mode
+
+            if queue is not None and ok:
+                action, time_slice = queue
+                if action == "pause":
+                    net.pause_calendar_queue()
+                else:
+                    net.activate_calendar_queue(time_slice=time_slice)
+        return ok
+
+    def _slice_to_topo(self, circuits) -> dict:
+        """The topology of circuits, without deploying it.
+
+        Built in its own dict: the dashboard and collectors read the network's
+        slice_to_topo from other threads.
+        """
+        slice_to_topo = {}
+        self.net._connect_circuits(circuits, slice_to_topo)
+        return slice_to_topo
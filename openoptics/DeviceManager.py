@@ -9,6 +9,8 @@
 # https://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
 
 import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 
 from openoptics.backends.base import BackendBase
 
@@ -18,10 +20,17 @@ class DeviceManager:
     OpenOptics DeviceManager. Monitor and configure the network at runtime.
     """
 
-    def __init__(self, backend: BackendBase, tor_ocs_ports, nb_queue, event_publisher=None):
+    # Seconds get_device_metric() waits for the switches; see there.
+    poll_timeout_s = 0.5
+
+    def __init__(
+        self, backend: BackendBase, tor_ocs_ports, nb_queue, event_publisher=None, poll_timeout_s=None
+    ):
         sys.path.insert(1, "../behavioral-model/targets/tor_switch")
+        sys.path.insert(1, "../behavioral-model/targets/optical_switch")
         sys.path.insert(1, "../behavioral-model/tools")
         from tswitch_CLI import TorSwitchAPI
+        from oswitch_CLI import OpticalSwitchAPI
         import runtime_CLI
 
         self.switches = backend.get_tor_switches()
@@ -36,18 +45,21 @@ class DeviceManager:
             )[0]
             self.switch_clients[sw.name] = switch_client
 
-        # OCS switches: we only need the standard BMv2 runtime client for
-        # `bm_counter_read` — hits/misses are scraped from P4 counters.
+        # OCS switches: get_ocs_counters() on the optical_switch service reads
+        # all hit/miss P4 counters at once; the standard client's
+        # `bm_counter_read` is the fallback for older optical_switch binaries.
         self.ocs_standard_clients = {}  # OCS switch name -> Standard client
-        std_services = runtime_CLI.RuntimeAPI.get_thrift_services(
+        self.ocs_clients = {}  # OCS switch name -> optical_switch client
+        ocs_services = runtime_CLI.RuntimeAPI.get_thrift_services(
             runtime_CLI.PreType.SimplePreLAG
-        )
+        ) + OpticalSwitchAPI.get_thrift_services()
         for sw in self.optical_switches:
             try:
-                standard_client = runtime_CLI.thrift_connect(
-                    "localhost", sw.thrift_port, std_services
-                )[0]
+                standard_client, _, ocs_client = runtime_CLI.thrift_connect(
+                    "localhost", sw.thrift_port, ocs_services
+                )
                 self.ocs_standard_clients[sw.name] = standard_client
+                self.ocs_clients[sw.name] = ocs_client
             except Exception:
                 # OCS absent / not reachable: skip, get_ocs_metric() returns {} for it.
                 pass
@@ -56,11 +68,41 @@ class DeviceManager:
         self.nb_queue = nb_queue
         self._event_publisher = event_publisher
         self._ocs_counters_warned = False
+        self._ocs_bulk_unsupported = set()  # OCS switch names without get_ocs_counters
+        if poll_timeout_s is not None:
+            self.poll_timeout_s = poll_timeout_s
+        # The metric collector and the traffic-aware planner both poll; this
+        # guards the two dicts below.
+        self._poll_lock = threading.Lock()
+        self._polls = {}  # switch name -> Future of its get_device_metric() call
+        self._last_metric = {}  # switch name -> last metric read from it
+        # A Thrift client carries one call at a time: polls and queue changes
+        # take the lock of the switch they talk to.
+        self._client_locks = {name: threading.Lock() for name in self.switch_clients}
+        # Programs the switches in set_active_queues(), one worker per switch:
+        # each has its own Thrift client. Kept for the whole run, as TA
+        # rotation changes queues at every time slice.
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, len(self.switch_clients)),
+            thread_name_prefix="DeviceManager",
+        )
+
+    def close(self):
+        """Stop the workers of set_active_queues(); called when the network stops."""
+        # A hung switch must not hold up stopping the network.
+        self._executor.shutdown(wait=False)
 
     def get_device_metric(self) -> dict:
         """
         Get device metric (queue depth, loss rate, latency, ...)
 
+        All switches are polled concurrently, and the call returns after at
+        most ``poll_timeout_s``. A switch that did not answer in time, or
+        failed, is reported with its last metric marked stale, so one slow
+        switch does not hold up the others. It is polled again only once its
+        pending call has returned, as a Thrift client carries one call at a
+        time.
+
         Return:
             A dict per switch with keys:
               - ``pq_depth``: ``{(port, queue): depth_in_packets}``
@@ -68,33 +110,67 @@ class DeviceManager:
                 present for (port, queue) pairs that had at least one sample
                 in the current window.
               - ``drop_ctr``: aggregate drop counter
+              - ``stale``: True if the switch did not answer this poll; the
+                values are then those of its last answer, or empty.
         """
+        with self._poll_lock:
+            for sw_name in self.switch_clients:
+                if sw_name not in self._polls:
+                    self._polls[sw_name] = self._start_poll(sw_name)
+            polls = dict(self._polls)
+        wait(polls.values(), timeout=self.poll_timeout_s)
+
         dict_device_metric = {}
-        for sw_name, switch_client in self.switch_clients.items():
+        with self._poll_lock:
+            for sw_name, future in polls.items():
+                # A concurrent caller may have collected this poll already.
+                current = self._polls.get(sw_name) is future
+                if future.done():
+                    if current:
+                        del self._polls[sw_name]
+                    if future.exception() is None:
+                        metric = self._parse_device_metric(future.result())
+                        if current:
+                            self._last_metric[sw_name] = metric
+                        dict_device_metric[sw_name] = dict(metric, stale=False)
+                        continue
+                last = self._last_metric.get(
+                    sw_name, {"pq_depth": {}, "pq_latency": {}, "drop_ctr": 0}
+                )
+                dict_device_metric[sw_name] = dict(last, stale=True)
+
+        return dict_device_metric
+
+    def _start_poll(self, sw_name) -> Future:
+        """Call get_device_metric() on a daemon thread, which a hung switch cannot keep alive."""
+        future = Future()
+        switch_client = self.switch_clients[sw_name]
+        client_lock = self._client_locks[sw_name]
+
+        def poll():
             try:
-                device_metric = switch_client.get_device_metric()
-                dict_device_metric[sw_name] = {
-                    "pq_depth": {},
-                    "pq_latency": {},
-                    "drop_ctr": device_metric.drop_ctr,
-                }
+                with client_lock:
+                    future.set_result(switch_client.get_device_metric())
+            except Exception as e:
+                future.set_exception(e)
 
-                for pq_metric in device_metric.port_queue_metrics:
-                    key = (pq_metric.port, pq_metric.queue)
-                    dict_device_metric[sw_name]["pq_depth"][key] = pq_metric.depth
-                    mean = getattr(pq_metric, "latency_us_mean", None)
-                    mx = getattr(pq_metric, "latency_us_max", None)
-                    # Drop any negative value — the latency fields are i32 and
-                    # a negative reading means a pre-fix BMv2 wrote UINT32_MAX
-                    # from a PHV-truncated timestamp. Not a real latency.
-                    if mean is not None and mx is not None and mean >= 0 and mx >= 0:
-                        dict_device_metric[sw_name]["pq_latency"][key] = (int(mean), int(mx))
-            except Exception:
-                dict_device_metric[sw_name] = {
-                    "pq_depth": {}, "pq_latency": {}, "drop_ctr": 0,
-                }
+        threading.Thread(target=poll, daemon=True).start()
+        return future
 
-        return dict_device_metric
+    @staticmethod
+    def _parse_device_metric(device_metric) -> dict:
+        metric = {"pq_depth": {}, "pq_latency": {}, "drop_ctr": device_metric.drop_ctr}
+        for pq_metric in device_metric.port_queue_metrics:
+            key = (pq_metric.port, pq_metric.queue)
+            metric["pq_depth"][key] = pq_metric.depth
+            mean = getattr(pq_metric, "latency_us_mean", None)
+            mx = getattr(pq_metric, "latency_us_max", None)
+            # Drop any negative value — the latency fields are i32 and
+            # a negative reading means a pre-fix BMv2 wrote UINT32_MAX
+            # from a PHV-truncated timestamp. Not a real latency.
+            if mean is not None and mx is not None and mean >= 0 and mx >= 0:
+                metric["pq_latency"][key] = (int(mean), int(mx))
+        return metric
 
     # Must match the counter names declared in
     # openoptics/backends/mininet/p4src/ocs/ocs.p4; if you rename them there,
@@ -102,6 +178,61 @@ class DeviceManager:
     _OCS_HIT_COUNTER = "MyIngress.ocs_hit_counter"
     _OCS_MISS_COUNTER = "MyIngress.ocs_miss_counter"
 
+    def get_ocs_counters(self) -> dict:
+        """
+        Read the schedule counters of every optical switch, one Thrift call each.
+
+        Returns:
+            ``{sw_name: {"ports": {port: (hits, misses)}, "slice_forwards": [n, ...]}}``.
+            ``ports`` covers every wired OCS ingress port, see get_ocs_metric().
+            ``slice_forwards`` holds the packets forwarded in each time slice
+            since the switch started; it is empty on optical_switch binaries
+            without the get_ocs_counters RPC, whose ports are read counter by
+            counter instead. An OCS whose read fails is left out.
+        """
+        result: dict = {}
+        nb_ports = len(self.tor_ocs_ports) * max(1, len(self.switches))
+        for sw_name, std_client in self.ocs_standard_clients.items():
+            counters = None
+            if sw_name in self.ocs_clients and sw_name not in self._ocs_bulk_unsupported:
+                try:
+                    counters = self._read_ocs_counters_bulk(sw_name, nb_ports)
+                except Exception:
+                    continue  # Unreachable: skip it, the other OCSes still report
+            if counters is None:
+                counters = {
+                    "ports": self._read_ocs_port_counters(sw_name, std_client, nb_ports),
+                    "slice_forwards": [],
+                }
+            result[sw_name] = counters
+        return result
+
+    def _read_ocs_counters_bulk(self, sw_name, nb_ports):
+        """Read all counters with get_ocs_counters(); None if the binary lacks the RPC."""
+        try:
+            counters = self.ocs_clients[sw_name].get_ocs_counters(
+                self._OCS_HIT_COUNTER, self._OCS_MISS_COUNTER, nb_ports
+            )
+        except Exception as e:
+            from thrift.Thrift import TApplicationException
+
+            if not (
+                isinstance(e, TApplicationException)
+                and e.type == TApplicationException.UNKNOWN_METHOD
+            ):
+                raise
+            self._ocs_bulk_unsupported.add(sw_name)
+            return None
+        if not counters.hits:
+            self._warn_missing_ocs_counters(sw_name)
+        return {
+            "ports": {
+                port: (int(hit), int(miss))
+                for port, (hit, miss) in enumerate(zip(counters.hits, counters.misses))
+            },
+            "slice_forwards": [int(n) for n in counters.slice_forwards],
+        }
+
     def get_ocs_metric(self) -> dict:
         """
         Scrape OCS schedule hit/miss counters from every optical switch.
@@ -114,39 +245,94 @@ class DeviceManager:
             the counters (old binary / stale ``ocs.json``); this is logged
             once per process so users know to rebuild.
         """
-        result: dict = {}
-        nb_ports = len(self.tor_ocs_ports) * max(1, len(self.switches))
-        for sw_name, std_client in self.ocs_standard_clients.items():
-            per_port: dict = {}
-            for port in range(nb_ports):
-                try:
-                    hit = std_client.bm_counter_read(0, self._OCS_HIT_COUNTER, port)
-                    miss = std_client.bm_counter_read(0, self._OCS_MISS_COUNTER, port)
-                except Exception:
-                    if not self._ocs_counters_warned:
-                        print(
-                            f"[OpenOptics] OCS '{sw_name}' does not expose "
-                            f"{self._OCS_HIT_COUNTER!r} / {self._OCS_MISS_COUNTER!r}. "
-                            f"Rebuild ocs.json with the current ocs.p4 to enable "
-                            f"schedule hit/miss metrics."
-                        )
-                        self._ocs_counters_warned = True
-                    break  # whole switch lacks the counters; stop scanning it
-                per_port[port] = (int(hit.packets), int(miss.packets))
-            result[sw_name] = per_port
-        return result
+        return {sw_name: counters["ports"] for sw_name, counters in self.get_ocs_counters().items()}
+
+    def _read_ocs_port_counters(self, sw_name, std_client, nb_ports) -> dict:
+        """Read the hit/miss counters with two bm_counter_read calls per port."""
+        per_port: dict = {}
+        for port in range(nb_ports):
+            try:
+                hit = std_client.bm_counter_read(0, self._OCS_HIT_COUNTER, port)
+                miss = std_client.bm_counter_read(0, self._OCS_MISS_COUNTER, port)
+            except Exception:
+                self._warn_missing_ocs_counters(sw_name)
+                break  # whole switch lacks the counters; stop scanning it
+            per_port[port] = (int(hit.packets), int(miss.packets))
+        return per_port
+
+    def _warn_missing_ocs_counters(self, sw_name) -> None:
+        if not self._ocs_counters_warned:
+            print(
+                f"[OpenOptics] OCS '{sw_name}' does not expose "
+                f"{self._OCS_HIT_COUNTER!r} / {self._OCS_MISS_COUNTER!r}. "
+                f"Rebuild ocs.json with the current ocs.p4 to enable "
+                f"schedule hit/miss metrics."
+            )
+            self._ocs_counters_warned = True
 
-    def set_active_queue(self, sw_name, active_qid):
+    def set_active_queue(self, sw_name, active_qid, port=None):
         """
         Set the active queue for a specific switch.
 
         Args:
             sw_name: The name of the switch to configure
             active_qid: The ID of the queue to set as active
+            port: The uplink port that serves the queue. Defaults to None,
+                which sets the queue for all ports.
         """
         try:
-            self.switch_clients[sw_name].set_active_queue(active_qid)
+            with self._client_locks[sw_name]:
+                if port is None:
+                    self.switch_clients[sw_name].set_active_queue(active_qid)
+                else:
+                    self.switch_clients[sw_name].set_port_active_queue(port, active_qid)
         except Exception:
             return
         if self._event_publisher is not None:
-            self._event_publisher.emit(sw_name, active_qid)
+            self._event_publisher.emit(sw_name, active_qid, port=port)
+
+    def set_active_queues(self, changes, at_us=None):
+        """
+        Set the active queues of several switches at once.
+
+        Switches are programmed concurrently. With at_us, every switch applies
+        its changes at that time instead of on arrival, so all ToRs switch
+        queues together.
+
+        Args:
+            changes: List of (sw_name, active_qid, port) tuples. port None sets
+                the queue for all ports.
+            at_us: When to apply the changes, in microseconds since the epoch
+                of the switches' clock. Defaults to None, which applies them
+                right away.
+        """
+        by_switch = {}
+        for sw_name, active_qid, port in changes:
+            by_switch.setdefault(sw_name, []).append((active_qid, port))
+
+        def program(sw_name):
+            client = self.switch_clients[sw_name]
+            applied = []
+            with self._client_locks[sw_name]:
+                for active_qid, port in by_switch[sw_name]:
+                    try:
+                        if at_us is not None:
+                            client.schedule_active_queue(
+                                -1 if port is None else port, active_qid, at_us
+                            )
+                        elif port is None:
+                            client.set_active_queue(active_qid)
+                        else:
+                            client.set_port_active_queue(port, active_qid)
+                    except Exception:
+                        continue
+                    applied.append((active_qid, port))
+            return applied
+
+        if not by_switch:
+            return
+        results = list(zip(by_switch, self._executor.map(program, by_switch)))
+        if self._event_publisher is not None:
+            for sw_name, applied in results:
+                for active_qid, port in applied:
+                    self._event_publisher.emit(sw_name, active_qid, port=port)
@@ -0,0 +1,255 @@
+# Copyright (c) Max-Planck-Gesellschaft zur Förderung der Wissenschaften e.V.
+# Developed at the Max Planck Institute for Informatics, Network and Cloud Systems Group
+#
+# Author: Yiming Lei (ylei@mpi-inf.mpg.de)
+#
+# This software is licensed for non-commercial scientific research purposes only.
+#
+# License text: Creative Commons NC BY SA 4.0
+# https://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
+
+"""
+Log of control-plane operations, and their offline replay.
+
+Once recording is on (:meth:`BaseNetwork.record_operations`, or
+``OPENOPTICS_OPLOG=<file>`` to save the log of a run on stop), every state
+changing ``BaseNetwork`` call is logged with its wall-clock time and
+arguments: topology and routing deployments, time flow entries, staged and
+committed updates and calendar queue changes.
+
+:func:`replay_ns3` plays a log back into the ns-3 backend, with each call made
+at the simulated time matching its offset in the recording. A traffic-aware
+session that ran for minutes on Mininet can then be analyzed in a simulation
+that runs as fast as ns-3 can.
+"""
+
+import contextlib
+import functools
+import gzip
+import pickle
+import threading
+import time
+import warnings
+from dataclasses import dataclass, field
+
+# Calendar queue calls go through the DeviceManager, which the ns-3 backend
+# does not have; its calendar queues are always time-based.
+_QUEUE_OPS = ("pause_calendar_queue", "activate_calendar_queue")
+
+
+@dataclass
+class Operation:
+    """
+    One recorded BaseNetwork call.
+
+    Attributes:
+        t_s: Wall-clock time of the call, in seconds since the epoch.
+        method: Name of the BaseNetwork method, e.g. ``"deploy_topo"``.
+        args: Positional arguments.
+        kwargs: Keyword arguments.
+    """
+    t_s: float
+    method: str
+    args: tuple = ()
+    kwargs: dict = field(default_factory=dict)
+
+
+class OperationLog:
+    """
+    The recorded operations of one network, with its configuration.
+
+    Arguments are kept by reference, not copied.
+    """
+
+    def __init__(self, network=None):
+        """
+        Args:
+            network (dict, optional): BaseNetwork constructor arguments needed
+                to rebuild the network, e.g. ``nb_node`` and ``arch_mode``.
+        """
+        self.network = dict(network or {})
+        self.ops = []
+        self._local = threading.local()
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    @property
+    def start_s(self) -> float:
+        """Wall-clock time of the first operation, the origin of a replay."""
+        return self.ops[0].t_s if self.ops else 0.0
+
+    @property
+    def duration_s(self) -> float:
+        """Time from the first to the last operation."""
+        return self.ops[-1].t_s - self.start_s if self.ops else 0.0
+
+    def record(self, method, args=(), kwargs=None, t_s=None) -> None:
+        """Append one operation, timestamped now unless t_s is given."""
+        self.ops.append(
+            Operation(time.time() if t_s is None else t_s, method, tuple(args), dict(kwargs or {}))
+        )
+
+    def save(self, path) -> None:
+        """
+        Write the log to a gzip-compressed pickle.
+
+        Args:
+            path (str): Output file.
+        """
+        with gzip.open(path, "wb") as f:
+            pickle.dump({"network": self.network, "ops": self.ops}, f, pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path) -> "OperationLog":
+        """
+        Read a log written by save().
+
+        Args:
+            path (str): Log file.
+
+        Returns:
+            The OperationLog.
+        """
+        with gzip.open(path, "rb") as f:
+            data = pickle.load(f)
+        log = cls(data["network"])
+        log.ops = data["ops"]
+        return log
+
+    def replay(self, net, advance=None, skip=()) -> int:
+        """
+        Make the recorded calls on another network, in order.
+
+        Wall-clock ``at_us`` arguments are moved to the replay's clock, on
+        which the first operation happens at 0.
+
+        Args:
+            net (BaseNetwork): The network to replay into.
+            advance (callable, optional): Called with each operation's offset
+                in seconds from the first before it is made, e.g. to advance
+                a simulator to that time. Defaults to making the calls back
+                to back.
+            skip (iterable, optional): Method names not to replay.
+
+        Returns:
+            int: Number of operations replayed.
+        """
+        origin_us = int(self.start_s * 1e6)
+        replayed = 0
+        for op in self.ops:
+            if op.method in skip:
+                continue
+            if advance is not None:
+                advance(op.t_s - self.start_s)
+            kwargs = dict(op.kwargs)
+            if kwargs.get("at_us") is not None:
+                kwargs["at_us"] = max(0, kwargs["at_us"] - origin_us)
+            getattr(net, op.method)(*op.args, **kwargs)
+            replayed += 1
+        return replayed
+
+
+def recorded(func):
+    """
+    Decorator logging each call of a BaseNetwork method to ``self.op_log``.
+
+    Calls made from inside another recorded call are not logged separately.
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        log = self.op_log
+        if log is None or getattr(log._local, "active", False):
+            return func(self, *args, **kwargs)
+        log.record(func.__name__, args, kwargs)
+        log._local.active = True
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            log._local.active = False
+
+    return wrapper
+
+
+@contextlib.contextmanager
+def unrecorded(net):
+    """
+    Context in which the recorded calls this thread makes on net are not logged.
+
+    For calls the network makes on its own, e.g. the calendar queue activation
+    at every time slice of a multi-slice traffic-aware run.
+    """
+    log = net.op_log
+    if log is None or getattr(log._local, "active", False):
+        yield
+        return
+    log._local.active = True
+    try:
+        yield
+    finally:
+        log._local.active = False
+
+
+def replay_ns3(log, on_start=None, simulation_stop_s=None, **backend_kwargs):
+    """
+    Replay an operation log in an ns-3 simulation.
+
+    The network is rebuilt from the log's configuration on the ns-3 backend,
+    each operation is made at the simulated time of its offset in the
+    recording, and the simulation then runs to simulation_stop_s. Calendar
+    queue operations are skipped: ns-3 calendar queues are time-based only.
+
+    Args:
+        log (OperationLog or str): The log, or a file written by OperationLog.save().
+        on_start (callable, optional): Called with the network once the first
+            operation created its nodes, e.g. to install traffic.
+        simulation_stop_s (float, optional): Simulated seconds to run.
+            Defaults to the duration of the recording plus one second.
+        **backend_kwargs: Further ns-3 backend parameters, e.g. ``link_delay_us``.
+
+    Returns:
+        The BaseNetwork after the simulation ran. Call its stop_network() when done.
+    """
+    from openoptics.Toolbox import BaseNetwork
+
+    if not isinstance(log, OperationLog):
+        log = OperationLog.load(log)
+    if simulation_stop_s is None:
+        simulation_stop_s = log.duration_s + 1.0
+
+    network = dict(log.network)
+    if network.get("arch_mode", "TO") != "TO":
+        warnings.warn(
+            f"Replaying a {network['arch_mode']} session with time-based calendar queues; "
+            f"the ns-3 backend has no control-based queues.",
+            RuntimeWarning,
+            stacklevel=2,
+        )
+        network["arch_mode"] = "TO"
+    network.setdefault("name", "replay")
+    net = BaseNetwork(
+        backend="ns3",
+        use_webserver=False,
+        simulation_stop_s=simulation_stop_s,
+        **network,
+        **backend_kwargs,
+    )
+
+    started = False
+
+    def advance(offset_s):
+        nonlocal started
+        if net.nodes_created and not started:
+            started = True
+            if on_start is not None:
+                on_start(net)
+        net._backend.run_until(offset_s)
+
+    skipped = sum(op.method in _QUEUE_OPS for op in log.ops)
+    if skipped:
+        print(f"[replay] Skipping {skipped} calendar queue operations.")
+    log.replay(net, advance=advance, skip=_QUEUE_OPS)
+    advance(log.duration_s)
+    net._backend.run()
+    return net
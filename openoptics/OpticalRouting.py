@@ -18,6 +18,7 @@ import logging
 import warnings
 
 from openoptics.TimeFlowTable import Path, Step
+from openoptics.Tracer import traced
 
 # Tool funcs
 
@@ -334,6 +335,7 @@ def extend_paths_to_all_time_slice(paths: List[Path], nb_ts: int):
     return extended_paths
 
 
+@traced(entries=len)
 def routing_direct(slice_to_topo: Dict[int, nx.Graph]) -> List[Path]:
     """
     Direct routing.
@@ -574,6 +576,7 @@ def _reconstruct_full_path_2d(parent, start_state):
     return None
 
 
+@traced(entries=len)
 def routing_hoho(
     slice_to_topo: Dict[int, nx.Graph],
     max_hop: Optional[int] = None,
@@ -640,7 +643,7 @@ def routing_hoho(
         "Use routing_mode=\"Source\" if a hop bound is required, or pass "
         "max_hop=None (the default) for the unbounded 2D-state Dijkstra "
         "that preserves substructure by construction.",
-        stacklevel=2,
+        stacklevel=3,  # past the tracing wrapper, to the caller
     )
     for dst in nodes:
         parent, _dist = _dijkstra_to_dst(slice_to_topo, dst, max_hop)
@@ -662,6 +665,7 @@ def routing_hoho(
                 )
     return paths
 
+@traced(entries=len)
 def routing_vlb(slice_to_topo: Dict[int, nx.Graph], tor_to_ocs_port: List[int],
                 random: bool = False) -> List[Path]:
     """
@@ -730,6 +734,7 @@ def routing_vlb(slice_to_topo: Dict[int, nx.Graph], tor_to_ocs_port: List[int],
     return paths
 
 
+@traced(entries=len)
 def routing_vlb_all_random(slice_to_topo: Dict[int, nx.Graph], tor_to_ocs_port) -> List[Path]:
     """
     VLB routing.
@@ -769,6 +774,7 @@ def routing_vlb_all_random(slice_to_topo: Dict[int, nx.Graph], tor_to_ocs_port)
     return paths
 
 
+@traced(entries=len)
 def routing_ksp(slice_to_topo: Dict[int, nx.Graph]) -> List[Path]:
     """
     Opera routing by searching the shortest path for each time slice.
@@ -808,41 +814,39 @@ def routing_ksp(slice_to_topo: Dict[int, nx.Graph]) -> List[Path]:
     return paths
 
 
+@traced(entries=len)
 def routing_direct_ta(slice_to_topo: Dict[int, nx.Graph]) -> List[Path]:
     """
     Direct routing for traffic-aware.
 
+    Packets are buffered in the calendar queue of their destination, so the
+    same direct path is installed for every time slice they may arrive in.
+
     Args:
         slice_to_topo: Topology for each time slice
 
     Returns:
         A list of paths for direct routing
-
-    Raises:
-        AssertionError: If more than one time slice is provided
     """
     paths = []
 
-    assert len(slice_to_topo.keys()) == 1, (
-        "Only supports TA architecture with single time slice."
-    )
-
-    nodes = slice_to_topo[0].nodes()
-    for node1 in nodes:
-        for node2 in nodes:
-            if node1 == node2:
-                continue
-            # There could be direct path between any nodes.
-            # We send pkts to the default port 0.
-            # They will be buffered in corresbonding queues.
-            paths.append(
-                Path(
-                    src=node1,
-                    arrival_ts=0,
-                    dst=node2,
-                    steps=[Step(cur_node=node1, send_port=0)],
+    nodes = next(iter(slice_to_topo.values())).nodes()
+    for ts in slice_to_topo.keys():
+        for node1 in nodes:
+            for node2 in nodes:
+                if node1 == node2:
+                    continue
+                # There could be direct path between any nodes.
+                # We send pkts to the default port 0.
+                # They will be buffered in corresbonding queues.
+                paths.append(
+                    Path(
+                        src=node1,
+                        arrival_ts=ts,
+                        dst=node2,
+                        steps=[Step(cur_node=node1, send_port=0)],
+                    )
                 )
-            )
 
     return paths
 
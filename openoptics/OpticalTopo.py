@@ -10,9 +10,12 @@
 
 import networkx as nx
 import math
-import numpy as np
 import itertools
 import random
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from functools import partial
 
 """
 Circuit:
@@ -80,7 +83,7 @@ def round_robin(nb_node=None, nodes=None, port1=0, port2=0,
         nodes = list(range(nb_node))
     else:
         nb_node = len(nodes)
-        if isinstance(nodes, np.ndarray):
+        if hasattr(nodes, "tolist"):  # numpy array
             nodes = nodes.tolist()
 
     # assert nb_node % 2 == 0, "Round-robin needs number of nodes to be even."
@@ -109,7 +112,8 @@ def round_robin(nb_node=None, nodes=None, port1=0, port2=0,
     return circuits
 
 
-def opera(nb_node, nb_link, nodes=None, disable_last_ts=False, guardband=False):
+def opera(nb_node, nb_link, nodes=None, disable_last_ts=False, guardband=False,
+          optimize_time_budget_s=None):
     """
     Opera topology support multiple upper links per node.
     In (nb_node / nb_link) time slices, each link of every node connects (nb_node / nb_link) number of nodes
@@ -121,6 +125,9 @@ def opera(nb_node, nb_link, nodes=None, disable_last_ts=False, guardband=False):
         nodes: List of nodes (optional)
         disable_last_ts: Remove the last active time slice per port
         guardband: Insert guardband time slices where ports change connection.
+        optimize_time_budget_s: If set, search round-robin slice orders for this many
+            seconds with :func:`optimize_slice_order` and keep the one with the lowest
+            worst-case time-expanded latency. None by default (no search).
 
     Returns:
         List of circuits for the opera topology
@@ -136,6 +143,26 @@ def opera(nb_node, nb_link, nodes=None, disable_last_ts=False, guardband=False):
     # Randomize topo by shuffling topologies to different time slices
     topo_randomize_ts(base_circuits)
 
+    merge = partial(_opera_merge, nb_link=nb_link, disable_last_ts=disable_last_ts)
+    if optimize_time_budget_s is None:
+        offset_circuits = merge(base_circuits)
+    else:
+        # Score the merged and offset schedule, since that is what gets deployed.
+        offset_circuits = optimize_slice_order(
+            base_circuits, transform=merge, time_budget_s=optimize_time_budget_s
+        )
+
+    if guardband:
+        offset_circuits = add_guardband(offset_circuits)
+
+    return offset_circuits
+
+
+def _opera_merge(base_circuits, nb_link, disable_last_ts=False):
+    """
+    Merge a round-robin schedule into an opera schedule with nb_link links.
+    Module-level so that optimize_slice_order can ship it to worker processes.
+    """
     # To connect all nodes in nb_node / nb_link time slice, we merge time slices, as well as connections,
     # with the ratio of nb_link. The connections in (nb_link) time slices are achieved by nb_link links at one time slice.
     # With two upper links, we map old_ts to new_ts by (2n -> n), (2n+1 -> n)
@@ -149,13 +176,7 @@ def opera(nb_node, nb_link, nodes=None, disable_last_ts=False, guardband=False):
     # slice0: 0(p0) <-> 3(p0), 0(p1) <-> 2(p1), 1(p0) <-> 2(p0), 1(p1) <-> 3(p1)
     # slice1: 0(p0) <-> 1(p0), 0&1 (p1)   loop, 2(p0) <-> 3(p0), 2&3 (p1)   loop
 
-    offset_circuits = port_offset(merged_circuit, disable_last_ts)
-    # offset_circuits = merged_circuit
-
-    if guardband:
-        offset_circuits = add_guardband(offset_circuits)
-
-    return offset_circuits
+    return port_offset(merged_circuit, disable_last_ts)
 
 
 def shale(nb_node, h, nodes=None, guardband=False):
@@ -180,6 +201,8 @@ def shale(nb_node, h, nodes=None, guardband=False):
     root = int(math.pow(nb_node, 1 / h))
     assert root**h == nb_node, "number of nodes need to be the power of h"
 
+    import numpy as np
+
     # Reshape nodes into an h-dimensional cube
     nodes = np.array(nodes).reshape([root] * h)
 
@@ -203,6 +226,10 @@ def bipartite_matching(
     """
     Create a bipartite matching topology based on traffic matrix.
 
+    With several links per node this is a greedy b-matching: one max-weight
+    matching per port, each over the node pairs not yet connected, so every
+    node gets up to nb_link circuits to distinct peers.
+
     Args:
         nb_node: Number of nodes
         nb_link: Number of links
@@ -210,11 +237,7 @@ def bipartite_matching(
 
     Returns:
         List of circuits for the bipartite matching topology
-
-    Raises:
-        AssertionError: If nb_link is not 1 (only supports one link)
     """
-    assert nb_link == 1, "bipartite_matching supports one link only"
     # print(f"metric: {traffic_matrix}", flush=True)
 
     # If no traffic, keep the previous topology
@@ -234,16 +257,93 @@ def bipartite_matching(
     g = nx.Graph()
     g.add_weighted_edges_from(edges)
 
-    matching = nx.max_weight_matching(g, maxcardinality=True)
-
     circuits = []
-    for src, dst in matching:
-        circuits.append([0, src, dst, 0, 0])
+    for port in range(nb_link):
+        matching = nx.max_weight_matching(g, maxcardinality=True)
+        for src, dst in matching:
+            circuits.append([0, src, dst, port, port])
+        g.remove_edges_from(matching)
 
     # print(f"new circuits: {circuits}")
     return circuits
 
 
+def bvn_matching(
+    nb_node, nb_link, traffic_matrix: dict, prev_circuits=None,
+    nb_time_slices=None, reconfig_cost=0,
+) -> list:
+    """
+    Create a multi-slice traffic-aware topology by decomposing the traffic matrix
+    into a weighted sequence of matchings (Birkhoff–von Neumann style).
+
+    Follows the greedy Solstice decomposition: repeatedly take the maximum weight
+    matching of the remaining demand, weight it by its smallest matched demand and
+    subtract. Each matching gets a number of consecutive time slices proportional
+    to its weight, so heavier demand is served longer and identical slices stay
+    adjacent (no reconfiguration between them).
+
+    Args:
+        nb_node: Number of nodes
+        nb_link: Number of links
+        traffic_matrix: Dictionary with traffic information between nodes
+        prev_circuits: Circuits currently deployed. Returned unchanged if there is no traffic.
+        nb_time_slices: Number of time slices to emit. Defaults to the number of time
+            slices in prev_circuits, or nb_node - 1 without previous circuits.
+            Must match the number of slices the OCS was started with.
+        reconfig_cost: Demand a matching must serve to be worth a reconfiguration.
+            Matchings serving less are dropped (Eclipse style). 0 by default.
+
+    Returns:
+        List of circuits with nb_time_slices time slices.
+
+    Raises:
+        AssertionError: If nb_link is not 1 (only supports one link)
+    """
+    assert nb_link == 1, "bvn_matching supports one link only"
+
+    if all(v == 0 for v in traffic_matrix.values()):
+        return prev_circuits
+
+    if nb_time_slices is None:
+        if prev_circuits:
+            nb_time_slices = get_nb_time_slice_from_circuits(prev_circuits)
+        else:
+            nb_time_slices = max(1, nb_node - 1)
+
+    # Circuits are bidirectional, so aggregate demand of both directions.
+    demand = {}
+    for (node1, node2), traffic in traffic_matrix.items():
+        if node1 == node2 or traffic <= 0:
+            continue
+        edge = (min(node1, node2), max(node1, node2))
+        demand[edge] = demand.get(edge, 0) + traffic
+
+    matchings = []  # [(weight, [(node1, node2), ...]), ...]
+    while demand and len(matchings) < nb_time_slices:
+        g = nx.Graph()
+        g.add_weighted_edges_from((n1, n2, w) for (n1, n2), w in demand.items())
+        matching = [(min(e), max(e)) for e in nx.max_weight_matching(g)]
+        weight = min(demand[e] for e in matching)
+        if matchings and weight * len(matching) <= reconfig_cost:
+            break
+        matchings.append((weight, sorted(matching)))
+        for e in matching:
+            demand[e] -= weight
+            if demand[e] <= 0:
+                del demand[e]
+
+    slots = _split_time_slices([w for w, _ in matchings], nb_time_slices)
+
+    circuits = []
+    ts = 0
+    for (_, matching), nb_slots in zip(matchings, slots):
+        for _ in range(nb_slots):
+            for node1, node2 in matching:
+                circuits.append([ts, node1, node2, 0, 0])
+            ts += 1
+    return circuits
+
+
 def from_schedule(schedule_file, nb_node, nb_link):
     """
     Load a schedule matrix from a text file and convert it to circuits.
@@ -259,6 +359,8 @@ def from_schedule(schedule_file, nb_node, nb_link):
     Returns:
         List of circuits [time_slice, node1, node2, port1, port2].
     """
+    import numpy as np
+
     schedule = np.loadtxt(schedule_file, dtype=int)
     nb_time_slices = schedule.shape[0]
 
@@ -362,6 +464,132 @@ def add_guardband(circuits):
     return new_circuits
 
 
+def optimize_slice_order(circuits, transform=None, objective="max", max_hop=None,
+                         time_budget_s=1.0, nb_workers=None, seed=None):
+    """
+    Search time slice orderings of a schedule for lower time-expanded latency.
+
+    Candidate orders are scored in parallel worker processes until the time budget
+    runs out. Each slice keeps its connections; only the order in which slices are
+    served changes, so the result needs no data plane change. The original order is
+    always a candidate, so the result is never worse than the input. Slice 0 stays
+    in place since rotating a cyclic schedule does not change its latency.
+
+    Args:
+        circuits: List of circuits [time_slice, node1, node2, port1, port2],
+            without guardband slices.
+        transform: Optional picklable function applied to every reordered
+            schedule before scoring, e.g. a merge into a multi-link schedule.
+            The returned circuits are the transformed ones.
+        objective: "max" minimizes the worst-case latency, "mean" the mean latency.
+            The other one breaks ties.
+        max_hop: Maximum number of circuits a packet may traverse.
+            None by default (unlimited).
+        time_budget_s: Search time in seconds. 1.0 by default.
+        nb_workers: Number of worker processes. 1 searches in the calling process.
+            None by default (number of CPUs).
+        seed: Seed for sampling candidate orders.
+
+    Returns:
+        The best list of circuits found.
+    """
+    if objective not in ("max", "mean"):
+        raise ValueError(f"Unknown objective {objective!r}. Use 'max' or 'mean'.")
+
+    nb_time_slice = get_nb_time_slice_from_circuits(circuits)
+    identity = tuple(range(nb_time_slice))
+    best = _score_slice_orders(circuits, [identity], transform, objective, max_hop)
+
+    candidates = _slice_order_candidates(nb_time_slice, seed)
+    deadline = time.monotonic() + time_budget_s
+    batch_size = 16
+
+    def next_batch():
+        if time.monotonic() >= deadline:
+            return []
+        return list(itertools.islice(candidates, batch_size))
+
+    if nb_workers is None:
+        nb_workers = os.cpu_count() or 1
+
+    if nb_workers <= 1:
+        while batch := next_batch():
+            best = min(best, _score_slice_orders(circuits, batch, transform, objective, max_hop))
+    else:
+        with ProcessPoolExecutor(max_workers=nb_workers) as pool:
+            pending = set()
+            # Keep two batches per worker in flight so workers never idle on us.
+            while len(pending) < 2 * nb_workers and (batch := next_batch()):
+                pending.add(pool.submit(
+                    _score_slice_orders, circuits, batch, transform, objective, max_hop
+                ))
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    best = min(best, future.result())
+                    if batch := next_batch():
+                        pending.add(pool.submit(
+                            _score_slice_orders, circuits, batch, transform, objective, max_hop
+                        ))
+
+    score, order = best
+    best_circuits = _reorder_slices(circuits, order)
+    if transform is not None:
+        best_circuits = transform(best_circuits)
+    return best_circuits
+
+
+def optimize_port_assignment(circuits, nb_pass=3, print_flag=True):
+    """
+    Reassign circuits to ports so that fewer ports change connection between slices.
+
+    Each time slice keeps the same node pairs; only the ports carrying them change.
+    A circuit whose node pair was already connected in the previous slice stays on
+    those ports, so the OCS does not reconfigure them and add_guardband keeps them
+    active during the guardband. The schedule is cyclic, so the assignment is
+    refined over several passes with the last slice feeding back into the first.
+
+    Args:
+        circuits: List of circuits [time_slice, node1, node2, port1, port2],
+            without guardband slices.
+        nb_pass: Maximum number of passes over the schedule. 3 by default.
+        print_flag: Print the port change and guardband counts before and after.
+
+    Returns:
+        New list of circuits with reassigned ports, or the input circuits
+        if no better assignment is found.
+    """
+    from collections import defaultdict
+
+    nb_links = get_nb_links_from_circuits(circuits)
+    ts_circuits = defaultdict(list)
+    for circuit in circuits:
+        ts_circuits[circuit[0]].append(circuit)
+    time_slices = sorted(ts_circuits.keys())
+
+    best = circuits
+    best_changes = count_port_changes(circuits)
+    prev_conn = None
+    for _ in range(nb_pass):
+        new_circuits = []
+        for ts in time_slices:
+            assigned = _assign_ports(ts_circuits[ts], prev_conn, nb_links)
+            new_circuits.extend(assigned)
+            prev_conn = _port_connections(assigned)
+        changes = count_port_changes(new_circuits)
+        if changes >= best_changes:
+            break
+        best, best_changes = new_circuits, changes
+
+    if print_flag:
+        print(
+            f"Port assignment: {count_port_changes(circuits)} -> {best_changes} port changes, "
+            f"{count_guardbands(circuits)} -> {count_guardbands(best)} guardband slices",
+            flush=True,
+        )
+    return best
+
+
 ##########################
 #    Helper functions    #
 ##########################
@@ -397,6 +625,21 @@ def topo_randomize_ts(circuits: list):
     return shuffled_circuits
 
 
+def _split_time_slices(weights, nb_time_slices):
+    """
+    Helper function to split nb_time_slices among weights (largest remainder),
+    giving every weight at least one slice.
+    """
+    shares = [w / sum(weights) * (nb_time_slices - len(weights)) for w in weights]
+    slots = [1 + int(share) for share in shares]
+    by_remainder = sorted(
+        range(len(weights)), key=lambda i: shares[i] - int(shares[i]), reverse=True
+    )
+    for i in by_remainder[: nb_time_slices - sum(slots)]:
+        slots[i] += 1
+    return slots
+
+
 def port_offset(circuits: list, disable_last_ts=False):
     """
     Helper function to transform the circuits to reconfigure topology one port per time slice.
@@ -464,6 +707,249 @@ def get_nb_links_from_circuits(circuits: list):
     return max_port + 1
 
 
+def count_port_changes(circuits):
+    """
+    Count port reconfigurations over one cycle of the schedule.
+
+    A port changes when its peer (node, port) differs from the previous time slice,
+    including the wrap-around from the last slice to the first.
+
+    Args:
+        circuits: List of circuits [time_slice, node1, node2, port1, port2]
+
+    Returns:
+        The number of (node, port) changes summed over all slice boundaries.
+    """
+    from collections import defaultdict
+
+    ts_circuits = defaultdict(list)
+    for circuit in circuits:
+        ts_circuits[circuit[0]].append(circuit)
+    time_slices = sorted(ts_circuits.keys())
+    if len(time_slices) <= 1:
+        return 0
+
+    conns = [_port_connections(ts_circuits[ts]) for ts in time_slices]
+    changes = 0
+    for i, curr_conn in enumerate(conns):
+        next_conn = conns[(i + 1) % len(conns)]
+        all_ports = set(curr_conn.keys()) | set(next_conn.keys())
+        changes += sum(1 for p in all_ports if curr_conn.get(p) != next_conn.get(p))
+    return changes
+
+
+def count_guardbands(circuits):
+    """
+    Count the guardband slices add_guardband would insert into a circuit list.
+
+    Args:
+        circuits: List of circuits [time_slice, node1, node2, port1, port2]
+
+    Returns:
+        The number of guardband time slices.
+    """
+    if not circuits:
+        return 0
+    return (get_nb_time_slice_from_circuits(add_guardband(circuits))
+            - get_nb_time_slice_from_circuits(circuits))
+
+
+def _port_connections(circuits):
+    """
+    Helper function to map (node, port) -> (peer node, peer port) for one time slice.
+    """
+    conn = {}
+    for ts, node1, node2, port1, port2 in circuits:
+        if node1 == -1 or node2 == -1:
+            continue
+        conn[(node1, port1)] = (node2, port2)
+        conn[(node2, port2)] = (node1, port1)
+    return conn
+
+
+def _assign_ports(circuits, prev_conn, nb_links):
+    """
+    Helper function to assign ports to the circuits of one time slice.
+
+    Circuits connected in the previous slice keep their ports first. The rest
+    take their original port if it is still free, otherwise the lowest free one.
+    """
+    used = set()
+    assigned = [None] * len(circuits)
+
+    if prev_conn is not None:
+        for idx, (ts, node1, node2, port1, port2) in enumerate(circuits):
+            if node1 == -1 or node2 == -1:
+                continue
+            for p1 in range(nb_links):
+                peer = prev_conn.get((node1, p1))
+                if peer is None or peer[0] != node2 or (node1, p1) in used:
+                    continue
+                p2 = peer[1]
+                if node1 == node2 and p1 != p2:
+                    continue
+                if (node2, p2) in used:
+                    continue
+                assigned[idx] = [ts, node1, node2, p1, p2]
+                used.update({(node1, p1), (node2, p2)})
+                break
+
+    def free_port(node, preferred):
+        if (node, preferred) not in used:
+            return preferred
+        return next(p for p in range(nb_links) if (node, p) not in used)
+
+    for idx, (ts, node1, node2, port1, port2) in enumerate(circuits):
+        if assigned[idx] is not None:
+            continue
+        if node1 == -1 or node2 == -1:
+            assigned[idx] = [ts, node1, node2, port1, port2]
+            continue
+        if node1 == node2:
+            # A self-loop occupies a single port.
+            p1 = p2 = free_port(node1, port1)
+        else:
+            p1 = free_port(node1, port1)
+            used.add((node1, p1))
+            p2 = free_port(node2, port2)
+        used.update({(node1, p1), (node2, p2)})
+        assigned[idx] = [ts, node1, node2, p1, p2]
+
+    return assigned
+
+
+def time_expanded_latency(circuits, max_hop=None):
+    """
+    Compute the time-expanded latency between all node pairs for every start slice.
+
+    A packet ready at the start of a time slice may traverse one circuit per time
+    slice, or wait at its current node. The latency is the number of time slices
+    until the packet reaches its destination, including the slice it is sent in.
+    Slices are evaluated for all start slices at once with batched matrix products.
+
+    Args:
+        circuits: List of circuits [time_slice, node1, node2, port1, port2].
+            Guardband placeholders with node -1 are ignored.
+        max_hop: Maximum number of circuits a packet may traverse.
+            None by default (unlimited).
+
+    Returns:
+        (nodes, latency). nodes is the sorted list of node ids, latency is an array
+        of shape (nb_time_slice, nb_node, nb_node) where latency[s, i, j] is the
+        latency from nodes[i] to nodes[j] starting at slice s, inf if unreachable.
+    """
+    import numpy as np
+
+    nodes = sorted({n for _, n1, n2, _, _ in circuits for n in (n1, n2) if n != -1})
+    node_to_idx = {node: idx for idx, node in enumerate(nodes)}
+    nb_node = len(nodes)
+    nb_time_slice = get_nb_time_slice_from_circuits(circuits)
+
+    # adj[ts, i, j] = 1.0 if a circuit connects i and j in time slice ts.
+    adj = np.zeros((nb_time_slice, nb_node, nb_node), dtype=np.float32)
+    for ts, node1, node2, port1, port2 in circuits:
+        if node1 == -1 or node2 == -1 or node1 == node2:
+            continue
+        i, j = node_to_idx[node1], node_to_idx[node2]
+        adj[ts, i, j] = adj[ts, j, i] = 1.0
+    eye = np.eye(nb_node, dtype=np.float32)
+
+    latency = np.full((nb_time_slice, nb_node, nb_node), np.inf)
+    latency[:, np.arange(nb_node), np.arange(nb_node)] = 0
+    if nb_node == 0:
+        return nodes, latency
+
+    # reach[h, s, i, j] is True if j is reachable from i, starting at slice s,
+    # with at most h hops. Without a hop limit, a single layer is enough.
+    nb_layer = 1 if max_hop is None else max_hop + 1
+    reach = np.broadcast_to(eye > 0, (nb_layer, nb_time_slice, nb_node, nb_node)).copy()
+    starts = np.arange(nb_time_slice)
+
+    step = 0
+    steps_without_progress = 0
+    # Once a full cycle adds no new pair, the remaining pairs are unreachable.
+    while np.isinf(latency).any() and steps_without_progress < nb_time_slice:
+        # The k-th slice a packet sees, for every start slice at once.
+        adj_step = adj[(starts + step) % nb_time_slice]
+        step += 1
+        if max_hop is None:
+            reach = (reach.astype(np.float32) @ (adj_step + eye)) > 0
+        else:
+            moved = (reach[:-1].astype(np.float32) @ adj_step) > 0
+            reach[1:] |= moved
+        newly_reached = reach[-1] & np.isinf(latency)
+        if newly_reached.any():
+            latency[newly_reached] = step
+            steps_without_progress = 0
+        else:
+            steps_without_progress += 1
+
+    return nodes, latency
+
+
+def _latency_score(circuits, objective="max", max_hop=None):
+    """
+    Score a schedule by its time-expanded latency. Lower is better.
+
+    Returns:
+        (primary, secondary) with the objective first and the other metric as tie-breaker.
+    """
+    import numpy as np
+
+    nodes, latency = time_expanded_latency(circuits, max_hop)
+    off_diagonal = ~np.eye(len(nodes), dtype=bool)
+    values = latency[:, off_diagonal]
+    if values.size == 0:
+        return (0.0, 0.0)
+    worst, mean = float(values.max()), float(values.mean())
+    return (worst, mean) if objective == "max" else (mean, worst)
+
+
+def _reorder_slices(circuits, order):
+    """
+    Helper function to serve time slice order[k] at time slice k.
+    """
+    new_ts = {old_ts: k for k, old_ts in enumerate(order)}
+    reordered = [[new_ts[ts], node1, node2, port1, port2]
+                 for ts, node1, node2, port1, port2 in circuits]
+    reordered.sort(key=lambda x: x[0])
+    return reordered
+
+
+def _slice_order_candidates(nb_time_slice, seed=None):
+    """
+    Helper function to yield candidate time slice orders with slice 0 fixed.
+    Enumerates all orders when there are few enough, samples randomly otherwise.
+    """
+    rest = list(range(1, nb_time_slice))
+    if math.factorial(len(rest)) <= 5040:
+        for perm in itertools.permutations(rest):
+            yield (0,) + perm
+        return
+    rng = random.Random(seed)
+    while True:
+        rng.shuffle(rest)
+        yield (0,) + tuple(rest)
+
+
+def _score_slice_orders(circuits, orders, transform, objective, max_hop):
+    """
+    Score a batch of time slice orders. Runs in the optimize_slice_order workers.
+
+    Returns:
+        (score, order) of the best order in the batch.
+    """
+    best = None
+    for order in orders:
+        candidate = _reorder_slices(circuits, order)
+        if transform is not None:
+            candidate = transform(candidate)
+        scored = (_latency_score(candidate, objective, max_hop), order)
+        if best is None or scored < best:
+            best = scored
+    return best
+
+
 def draw_topo(slice_to_topo):
     """
     Draw the topology using matplotlib in a style that matches the dashboard
@@ -11,16 +11,33 @@
 import os
 import time
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 
 import networkx as nx
 import openoptics.utils as utils
 from openoptics.backends import create_backend
+from openoptics.backends.base import TableBatch, TableDelta, TableEntry
 from openoptics.dashboard import NullDashboard
 from openoptics.DeviceManager import DeviceManager
 from openoptics.OpticalCLI import OpticalCLI
+from openoptics.OperationLog import OperationLog, recorded, unrecorded
 from openoptics.TimeFlowTable import Path, TimeFlowEntry
+from openoptics.Tracer import traced, tracer
 
-from typing import List, Union
+from typing import List, Optional, Union
+
+
+def _run_coroutine(coro):
+    """Run a coroutine to completion from synchronous code."""
+    import asyncio  # lazy: asyncio alone costs more than the rest of startup
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # Already inside an event loop (e.g. a notebook): run on a fresh loop in a worker thread.
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
 
 
 class BaseNetwork:
@@ -35,6 +52,10 @@ class BaseNetwork:
     allowing for pre-defined topology or runtime reconfiguration.
     """
 
+    # How far ahead, in µs, synchronized queue and table switches are scheduled,
+    # so the batch reaches every switch before it takes effect.
+    sync_lead_us = 5_000
+
     def __init__(
         self,
         name,
@@ -109,6 +130,17 @@ class BaseNetwork:
         self.calendar_queue_mode = 0 if arch_mode == "TO" else 1
 
         self.slice_to_topo = {}
+        # Shadow copy of what each switch has installed,
+        # {switch_name: {table: {key: TableEntry}}} keyed by utils.table_entry_key. Lets redeploys push only the changes.
+        self._installed_tables = {}
+        # (topology, ip_to_tor) the ToR utility tables were last loaded for,
+        # and the cal_port_slice_to_node entries generated per topology.
+        self._node_tables_key = None
+        self._cal_port_entries = (None, {})
+        # Table version the switches match (see utils.version_table_entries), and
+        # the (version, slice_to_topo, tables) installed by stage_update() for commit_update().
+        self._active_version = 0
+        self._staged = None
         self.nb_node = nb_node
         self.nb_link = nb_link
         self.nb_host_per_tor = nb_host_per_tor
@@ -122,17 +154,28 @@ class BaseNetwork:
         # start_monitor() replaces this with a real DashboardService when
         # use_webserver=True.
         self.dashboard = NullDashboard()
+        # Receive TA control loop stage latencies and control-plane spans
+        # once the dashboard runs.
+        self._stage_timings = None
+        self._control_plane_timings = None
+        # Serves updates over the dashboard API in start_service().
+        self._controller = None
+        # Log of state-changing calls, see record_operations().
+        self.op_log = None
+        self._op_log_path = os.environ.get("OPENOPTICS_OPLOG")
 
         self._backend = create_backend(backend)
 
         accepted = type(self._backend).accepted_kwargs()
         unknown = set(backend_kwargs) - accepted
-        if unknown:
+        if unknown and not self._backend.accepts_any_backend_kwargs:
             raise ValueError(
                 f"Backend '{backend}' does not accept: {unknown}. "
                 f"Accepted backend-specific kwargs: {accepted or 'none'}"
             )
         self._backend_kwargs = backend_kwargs
+        if self._op_log_path:
+            self.record_operations()
 
         print("Setting up OpenOptics...")
 
@@ -194,6 +237,7 @@ class BaseNetwork:
                         else self.nb_node
                     ),
                     interval_s=self.dashboard.config.poll_interval_s,
+                    tor_metrics=not getattr(self._backend, "pushes_tor_metrics", False),
                 ))
 
             # Backend-specific wiring: simulator backends register their own
@@ -202,6 +246,19 @@ class BaseNetwork:
             self._backend.setup_dashboard(self.dashboard)
 
             self.dashboard.register_event_source(reconfig_publisher)
+            from openoptics.dashboard.collectors import StageTimingPublisher
+            self._stage_timings = StageTimingPublisher()
+            self.dashboard.register_event_source(self._stage_timings)
+
+            from openoptics.dashboard.collectors import ControlPlaneLatencyPublisher
+            self._control_plane_timings = ControlPlaneLatencyPublisher()
+            self.dashboard.register_event_source(self._control_plane_timings)
+            # Deployment usually happens before the dashboard starts; replay it.
+            for span in list(tracer.spans):
+                self._control_plane_timings.emit(span)
+            tracer.add_listener(self._control_plane_timings.emit)
+            if self._controller is not None:
+                self.dashboard.register_controller(self._controller)
             self.dashboard.start()
 
     def start_cli(self):
@@ -216,11 +273,49 @@ class BaseNetwork:
         """
         Stop the network.
 
-        Stops the dashboard (if running) and the backend network.
+        Stops the dashboard (if running), the DeviceManager and the backend
+        network.
         """
+        if self._control_plane_timings is not None:
+            tracer.remove_listener(self._control_plane_timings.emit)
+        if self.op_log is not None and self._op_log_path:
+            self.op_log.save(self._op_log_path)
+            print(f"Operation log saved to {self._op_log_path}.")
         self.dashboard.stop()
+        device_manager = getattr(self, "device_manager", None)
+        if device_manager is not None:
+            device_manager.close()
         self._backend.stop()
 
+    def record_operations(self) -> OperationLog:
+        """
+        Start logging the state-changing calls made on this network.
+
+        Topology and routing deployments, time flow entries, staged and
+        committed updates and calendar queue changes are logged with their
+        wall-clock time. Set ``OPENOPTICS_OPLOG=<file>`` to start recording
+        right away and save the log when the network stops.
+
+        Returns:
+            OperationLog: The log, also available as ``op_log``. Replay it in
+            ns-3 with :func:`openoptics.OperationLog.replay_ns3`.
+        """
+        if self.op_log is None:
+            self.op_log = OperationLog(
+                network=dict(
+                    name=self.name,
+                    nb_node=self.nb_node,
+                    nb_link=self.nb_link,
+                    nb_host_per_tor=self.nb_host_per_tor,
+                    time_slice_duration_us=self.time_slice_duration_us,
+                    guardband_us=self.guardband_us,
+                    arch_mode=self.arch_mode,
+                    ocs_tor_link_bw_gbps=self.ocs_tor_link_bw_gbps,
+                    tor_host_link_bw_gbps=self.tor_host_link_bw_gbps,
+                )
+            )
+        return self.op_log
+
     def create_nodes(self):
         """Create nodes via the configured backend."""
         self._backend.setup(
@@ -267,57 +362,198 @@ class BaseNetwork:
         """
         return port_id * self.nb_node + node_id
 
-    def setup_ocs(self):
+    def gen_ocs_entries(self, slice_to_topo=None) -> list:
         """
-        Generate commands for OCS forwarding.
+        Generate the OCS forwarding table entries for a topology.
 
-        Creates and loads the OCS forwarding table entries based on
-        the current topology configuration.
+        Args:
+            slice_to_topo (dict, optional): {time_slice : nx.DiGraph}. Defaults to the current topology.
+
+        Returns:
+            list: TableEntry objects for the OCS switch.
         """
+        if slice_to_topo is None:
+            slice_to_topo = self.slice_to_topo
         ocs_slice_port1_port2 = []
-        for ts, graph in self.slice_to_topo.items():
+        for ts, graph in slice_to_topo.items():
             for node1, node2, attr in nx.to_edgelist(graph):
                 port1, port2 = attr["port1"], attr["port2"]
                 ocs_port1 = self.cal_node_port_to_ocs_port(node1, port1)
                 ocs_port2 = self.cal_node_port_to_ocs_port(node2, port2)
                 ocs_slice_port1_port2.append((ts, ocs_port1, ocs_port2))
 
-        ocs_entries = utils.gen_ocs_commands(ocs_slice_port1_port2)
+        return utils.gen_ocs_commands(ocs_slice_port1_port2)
+
+    @traced()
+    def setup_ocs(self):
+        """
+        Generate commands for OCS forwarding.
+
+        Creates and loads the OCS forwarding table entries based on
+        the current topology configuration.
+        """
+        ocs_entries = utils.version_table_entries(
+            self.gen_ocs_entries(), self._active_version
+        )
 
         self._backend.load_table(
             switch_name="ocs",
             entries=ocs_entries,
             print_flag=False,
         )
+        self._installed_tables.setdefault("ocs", {})["ocs_schedule"] = {
+            utils.table_entry_key(e): e for e in ocs_entries
+        }
+
+    def update_ocs(self) -> bool:
+        """
+        Push only the OCS forwarding entries that changed since the last deployment.
+
+        Entries that stay the same keep forwarding while the update is applied,
+        so there is no window with an empty OCS schedule.
+
+        Returns:
+            bool: Whether the backend applied the changes.
+        """
+        ocs_entries = utils.version_table_entries(
+            self.gen_ocs_entries(), self._active_version
+        )
+        delta = self._load_tables({"ocs": {"ocs_schedule": ocs_entries}})
+        if delta is None:
+            return False
+        print(
+            f"Updating OCS schedule: {len(delta.adds)} added, "
+            f"{len(delta.modifies)} modified, {len(delta.deletes)} deleted entries."
+        )
+        return True
+
+    def _is_installed(self, switch_name, table) -> bool:
+        """Whether the toolbox holds a shadow copy of the table on the switch."""
+        return table in self._installed_tables.get(switch_name, {})
+
+    def _installed(self, switch_name, table) -> dict:
+        """The shadow copy of a table as {key : TableEntry}; empty if not installed.
+
+        Tables loaded as a TableBatch are kept as the batch until first read.
+        """
+        tables = self._installed_tables.get(switch_name, {})
+        shadow = tables.get(table, {})
+        if isinstance(shadow, TableBatch):
+            shadow = tables[table] = {utils.table_entry_key(e): e for e in shadow}
+        return shadow
+
+    def _load_tables(self, tables_by_switch) -> Optional[TableDelta]:
+        """
+        Make whole tables on switches hold the given entries.
+
+        Tables the toolbox already installed are updated in place when the
+        backend supports it; the rest are loaded. All switches are programmed
+        at once through the backend's batch APIs.
+
+        Args:
+            tables_by_switch (dict): {switch_name : {table : List[TableEntry] or TableBatch}}
 
+        Returns:
+            The in-place changes summed over all switches, or None if the
+            backend failed to load or apply them.
+        """
+        loads = {}
+        batch_loads = {}
+        deltas = {}
+        for switch_name, tables in tables_by_switch.items():
+            for table, entries in tables.items():
+                if self._backend.can_apply_table_delta(
+                    switch_name
+                ) and self._is_installed(switch_name, table):
+                    delta = utils.diff_table_entries(
+                        self._installed(switch_name, table).values(), entries
+                    )
+                    if delta.is_empty():
+                        continue
+                    merged = deltas.setdefault(switch_name, TableDelta())
+                    merged.adds += delta.adds
+                    merged.modifies += delta.modifies
+                    merged.deletes += delta.deletes
+                elif isinstance(entries, TableBatch):
+                    batch_loads.setdefault(switch_name, []).append(entries)
+                else:
+                    loads.setdefault(switch_name, []).extend(entries)
+
+        async def program():
+            # One switch may appear in several; its loads finish before its deltas start.
+            loaded = await self._backend.load_tables(loads) if loads else True
+            if batch_loads:
+                loaded = await self._backend.load_table_batches(batch_loads) and loaded
+            applied = await self._backend.apply_table_deltas(deltas) if deltas else True
+            return loaded and applied
+
+        if not _run_coroutine(program()):
+            return None
+
+        for switch_name, tables in tables_by_switch.items():
+            installed = self._installed_tables.setdefault(switch_name, {})
+            for table, entries in tables.items():
+                if isinstance(entries, TableBatch):
+                    installed[table] = entries
+                else:
+                    installed[table] = {utils.table_entry_key(e): e for e in entries}
+
+        total = TableDelta()
+        for delta in deltas.values():
+            total.adds += delta.adds
+            total.modifies += delta.modifies
+            total.deletes += delta.deletes
+        return total
+
+    @traced()
     def setup_nodes(self):
         """
         Load utility tables into nodes.
 
         Configures the ToR switches with necessary routing and forwarding tables
         including IP to destination mappings, arrival verification, and port calculation.
+        Does nothing if neither the topology nor the IP-to-ToR mapping changed
+        since the last call.
         """
+        ip_to_tor = self._backend.get_ip_to_tor()
+        topo_key = utils.topo_signature(self.slice_to_topo)
+        ip_key = tuple(sorted(ip_to_tor.items()))
+        if self._node_tables_key == (topo_key, ip_key):
+            # Switches already hold these tables.
+            return
+
         print("Setting up switch tables...")
 
-        ip_to_tor = self._backend.get_ip_to_tor()
+        if self._cal_port_entries[0] != topo_key:
+            self._cal_port_entries = (
+                topo_key,
+                {
+                    tor_id: utils.tor_table_cal_port_slice_to_node(
+                        tor_id, self.slice_to_topo
+                    )
+                    for tor_id in range(self.nb_node)
+                },
+            )
+        # Identical for every ToR, so generated once and shared.
         ip_to_dst_entries = utils.tor_table_ip_to_dst(ip_to_tor)
 
-        for tor_id in range(self.nb_node):
-            arrive_at_dst = utils.tor_table_arrive_at_dst(tor_id, self.tor_host_port)
-            verify_desired_node = utils.tor_table_verify_desired_node(tor_id)
-            cal_port_enqueue = utils.tor_table_cal_port_slice_to_node(
-                tor_id, self.slice_to_topo
-            )
+        self._load_tables(
+            {
+                f"tor{tor_id}": {
+                    "ip_to_dst_node": ip_to_dst_entries,
+                    "arrive_at_dst": utils.tor_table_arrive_at_dst(
+                        tor_id, self.tor_host_port
+                    ),
+                    "verify_desired_node": utils.tor_table_verify_desired_node(tor_id),
+                    "cal_port_slice_to_node": utils.version_table_entries(
+                        self._cal_port_entries[1][tor_id], self._active_version
+                    ),
+                }
+                for tor_id in range(self.nb_node)
+            }
+        )
 
-            self._backend.load_table(
-                switch_name=f"tor{tor_id}",
-                entries=ip_to_dst_entries
-                + arrive_at_dst
-                + verify_desired_node
-                + cal_port_enqueue,
-                print_flag=False,
-                save_flag=False,
-            )
+        self._node_tables_key = (topo_key, ip_key)
 
     def start(self):
         """
@@ -337,66 +573,269 @@ class BaseNetwork:
             self._backend.run()
         self.stop_network()
 
+    def start_service(self, window_s=0.05, routing_func=None, routing_mode="Per-hop"):
+        """
+        Keep the network running and apply updates submitted while it runs.
+
+        Topology, routing and calendar queue updates are accepted on the
+        dashboard's HTTP API (``POST /api/control/updates``) or from Python
+        through ``net._controller.submit()``, see :mod:`openoptics.Controller`.
+        Updates arriving within window_s of each other are deployed together.
+        Runs until interrupted with Ctrl-C, then shuts the network down.
+
+        Args:
+            window_s (float, optional): How long to collect a burst of updates
+                before deploying it. Defaults to 50 ms.
+            routing_func (callable, optional): Routing of the deployed network,
+                called with the topology. Re-run when a topology update comes
+                without a routing. Defaults to keeping the installed routing.
+            routing_mode (str, optional): The routing mode of routing_func,
+                "Per-hop" or "Source".
+        """
+        import threading
+
+        from openoptics.Controller import ControllerService
+
+        self._controller = ControllerService(
+            self, window_s=window_s, routing_func=routing_func, routing_mode=routing_mode
+        )
+        self.start_monitor()
+        if getattr(self.dashboard, "controller", None) is not self._controller:
+            warnings.warn(
+                "start_service: no dashboard runs (use_webserver=False or the "
+                "backend has none), so POST /api/control/updates is not served. "
+                "Updates are only applied from net._controller.submit().",
+                RuntimeWarning,
+            )
+        self._controller.start()
+        print("Controller service running. Press Ctrl-C to stop.")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._controller.stop()
+            self.stop_network()
+
     def start_traffic_aware(
-        self, topo_func=None, routing_func=None, routing_mode=None, update_interval=1
+        self,
+        topo_func=None,
+        routing_func=None,
+        routing_mode=None,
+        update_interval=1,
+        stage_deadline_s=None,
+        estimator=None,
+        reconfig_policy=None,
     ) -> bool:
         """Deploy traffic aware architecture.
 
+        The control loop is pipelined: the next metric poll and topo_func run
+        every update_interval while the previous topology is still being
+        deployed, and the deployer always picks up the most recent plan.
+
         Args:
-            topo_func: traffic aware topology function with traffic matrix as input
+            topo_func: traffic aware topology function with traffic matrix as input.
+                It must keep the number of time slices the network runs with;
+                with more than one slice, calendar queues follow the OCS slice by slice.
             routing_func: routing function used by traffic aware architecture
             routing_mode: Source or Per-hop
             update_interval: interval in seconds to update topology and routing
+            stage_deadline_s: latency budget in seconds for each control loop stage
+                ("poll", "compute", "stage", "commit"), either one value for all
+                stages or a dict keyed by stage name. Defaults to update_interval.
+                Stages over budget are reported; stage latencies are recorded
+                to the dashboard.
+            estimator: traffic matrix estimator, e.g. TrafficEstimator.EwmaEstimator,
+                fed every traffic matrix reading. Defaults to the raw reading.
+            reconfig_policy: reconfiguration policy, e.g. TrafficEstimator.ReconfigPolicy,
+                deciding whether a changed topology is worth deploying.
+                Defaults to deploying every change.
 
         Return:
             Whether the traffic aware architecture is successfully deployed.
         """
 
-        if self.nb_link != 1:
-            raise ValueError("Traffic aware architecture only supports one link.")
-
         import threading
 
         stop_event = threading.Event()
+        # Held while reconfiguring so slice rotation never activates queues
+        # for a topology that is being replaced.
+        reconfig_lock = threading.Lock()
+        # The OCS keeps the slice count it was started with.
+        nb_time_slices = self.nb_time_slices
 
         self.start_monitor()
 
         self.activate_calendar_queue()
 
-        def evolve():
+        def rotate():
+            # Multi-slice TA: serve each slice's circuits while the OCS serves it.
+            # Every slice boundary is scheduled on all ToRs sync_lead_us ahead.
+            slice_us = max(1, self.time_slice_duration_us // 1000) * 1000
+            last_us = 0
+            while True:
+                at_us = self.next_time_slice_start_us(lead_us=self.sync_lead_us)
+                if at_us <= last_us:
+                    at_us = last_us + slice_us
+                wake_s = (at_us - self.sync_lead_us) / 1e6 - time.time()
+                if stop_event.wait(timeout=max(0, wake_s)):
+                    break
+                # Not logged: one operation per slice for the whole run.
+                with reconfig_lock, unrecorded(self):
+                    self.activate_calendar_queue(at_us=at_us)
+                last_us = at_us
+
+        threads = self._traffic_aware_pipeline(
+            topo_func,
+            update_interval,
+            stop_event,
+            reconfig_lock,
+            stage_deadline_s=stage_deadline_s,
+            estimator=estimator,
+            reconfig_policy=reconfig_policy,
+        )
+        if nb_time_slices > 1:
+            threads.append(threading.Thread(target=rotate))
+        for thread in threads:
+            thread.start()
+
+        self.start_cli()
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+        self.stop_network()
+
+    def _traffic_aware_pipeline(
+        self,
+        topo_func,
+        update_interval,
+        stop_event,
+        reconfig_lock,
+        stage_deadline_s=None,
+        estimator=None,
+        reconfig_policy=None,
+    ) -> list:
+        """Return the (unstarted) planner and deployer threads of the TA control loop.
+
+        The planner polls metrics and runs topo_func on a fixed update_interval
+        cadence and hands changed circuits to the deployer through a one-slot
+        mailbox, replacing a plan the deployer has not picked up yet. The
+        deployer stages and commits plans, so deployment of one plan overlaps
+        with planning of the next.
+        """
+        import queue
+        import threading
+
+        nb_time_slices = self.nb_time_slices
+        if stage_deadline_s is None:
+            stage_deadline_s = update_interval
+        mailbox = queue.Queue(maxsize=1)
+
+        def timed(stage, func, *args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            self._record_stage(stage, time.perf_counter() - start, stage_deadline_s)
+            return result
+
+        def compute(metric, prev_circuits):
+            traffic_matrix = utils.metric_to_matrix(metric)
+            if estimator is not None:
+                traffic_matrix = estimator.update(traffic_matrix)
+            circuits = topo_func(
+                nb_node=self.nb_node,
+                nb_link=self.nb_link,
+                traffic_matrix=traffic_matrix,
+                prev_circuits=prev_circuits,
+            )
+            return traffic_matrix, circuits
+
+        def plan():
             prev_circuits = []
             while not stop_event.is_set():
-                metric = self.device_manager.get_device_metric()
-                traffic_matrix = utils.metric_to_matrix(metric)
+                start = time.monotonic()
+                metric = timed("poll", self.device_manager.get_device_metric)
                 if topo_func:
-                    circuits = topo_func(
-                        nb_node=self.nb_node,
-                        nb_link=self.nb_link,
-                        traffic_matrix=traffic_matrix,
-                        prev_circuits=prev_circuits,
-                    )
-
-                    if prev_circuits != circuits:
+                    traffic_matrix, circuits = timed("compute", compute, metric, prev_circuits)
+                    if prev_circuits != circuits and (
+                        reconfig_policy is None
+                        or reconfig_policy.should_reconfigure(
+                            traffic_matrix, prev_circuits, circuits
+                        )
+                    ):
                         prev_circuits = circuits
+                        try:
+                            mailbox.get_nowait()  # superseded before deployment
+                        except queue.Empty:
+                            pass
+                        mailbox.put(circuits)
+
+                stop_event.wait(
+                    timeout=max(0, update_interval - (time.monotonic() - start))
+                )
+
+        def deploy():
+            while not stop_event.is_set():
+                try:
+                    circuits = mailbox.get(timeout=update_interval)
+                except queue.Empty:
+                    continue
+
+                if self._backend.supports_versioned_tables:
+                    # The new schedule is installed while the old one runs;
+                    # tables and calendar queues of all switches flip together
+                    # at the next slice boundary.
+                    assert timed("stage", self.stage_update, circuits)
+                    with reconfig_lock:
+                        start = time.perf_counter()
+                        at_us = self.next_time_slice_start_us(lead_us=self.sync_lead_us)
+                        assert self.commit_update(at_us=at_us, keep_previous=True)
+                        self.activate_calendar_queue(at_us=at_us)
+                        self._record_stage(
+                            "commit", time.perf_counter() - start, stage_deadline_s
+                        )
+                    # The next stage_update reuses the previous version's slots.
+                    time.sleep(max(0, at_us / 1e6 - time.time()))
+                else:
+                    with reconfig_lock:
+                        start = time.perf_counter()
                         self.pause_calendar_queue()
 
                         assert self.deploy_topo(circuits, start_fresh=True)
+                        assert self.nb_time_slices == nb_time_slices, (
+                            f"topo_func returned {self.nb_time_slices} time slices, "
+                            f"but the network runs {nb_time_slices}."
+                        )
                         self.activate_calendar_queue()
+                        self._record_stage(
+                            "commit", time.perf_counter() - start, stage_deadline_s
+                        )
 
-                stop_event.wait(timeout=update_interval)
+        return [threading.Thread(target=plan), threading.Thread(target=deploy)]
 
-        evolve_thread = threading.Thread(target=evolve)
-        evolve_thread.start()
+    def _record_stage(self, stage, duration_s, deadline_s=None):
+        """Report one TA control loop stage latency to the dashboard.
 
-        self.start_cli()
-        stop_event.set()
-        evolve_thread.join()
-        self.stop_network()
+        Args:
+            stage (str): Stage name, e.g. "poll" or "commit".
+            duration_s (float): How long the stage took in seconds.
+            deadline_s (float or dict, optional): Latency budget of the stage,
+                or a dict of budgets keyed by stage name.
+        """
+        if isinstance(deadline_s, dict):
+            deadline_s = deadline_s.get(stage)
+        if deadline_s is not None and duration_s > deadline_s:
+            print(
+                f"Traffic-aware stage '{stage}' took {duration_s * 1000:.1f} ms, "
+                f"over its {deadline_s * 1000:.1f} ms budget."
+            )
+        if self._stage_timings is not None:
+            self._stage_timings.emit(stage, duration_s)
 
     ##########################
     #    Optical Topology    #
     ##########################
 
+    @recorded
     def connect(
         self, time_slice, node1, node2, port1=0, port2=0, unidirectional=False
     ) -> bool:
@@ -415,6 +854,14 @@ class BaseNetwork:
         Returns:
             bool: Whether the connect() was successful.
         """
+        return self._connect(
+            self.slice_to_topo, time_slice, node1, node2, port1, port2, unidirectional
+        )
+
+    def _connect(
+        self, slice_to_topo, time_slice, node1, node2, port1=0, port2=0, unidirectional=False
+    ) -> bool:
+        """connect() on the given {time_slice: topology}, which is not logged."""
         if not isinstance(time_slice, int) or time_slice < 0:
             raise ValueError(f"Invalid time slice {time_slice}.")
         if not isinstance(node1, int) or node1 < 0 or node1 >= self.nb_node:
@@ -426,24 +873,24 @@ class BaseNetwork:
                 f"Invalid node {node2}. Only nodes 0 to {self.nb_node - 1} are valid. Are you setting the correct nb_node when generating topology?"
             )
 
-        if time_slice not in self.slice_to_topo.keys():
+        if time_slice not in slice_to_topo.keys():
             for added_time_slice in range(time_slice + 1):
-                if added_time_slice not in self.slice_to_topo.keys():
-                    self.slice_to_topo[added_time_slice] = nx.DiGraph()
-                    self.slice_to_topo[added_time_slice].add_nodes_from(
+                if added_time_slice not in slice_to_topo.keys():
+                    slice_to_topo[added_time_slice] = nx.DiGraph()
+                    slice_to_topo[added_time_slice].add_nodes_from(
                         range(self.nb_node)
                     )
 
-        nodes = self.slice_to_topo[time_slice].nodes
+        nodes = slice_to_topo[time_slice].nodes
         if ((port1 not in nodes[node1]) or (nodes[node1][port1] == False)) and (
             (port2 not in nodes[node2]) or (nodes[node2][port2] == False)
         ):
             nodes[node1][port1] = True
             nodes[node2][port2] = True
 
-            self.slice_to_topo[time_slice].add_edge(node1, node2, port1=port1, port2=port2)
+            slice_to_topo[time_slice].add_edge(node1, node2, port1=port1, port2=port2)
             if unidirectional == False:
-                self.slice_to_topo[time_slice].add_edge(
+                slice_to_topo[time_slice].add_edge(
                     node2, node1, port1=port2, port2=port1
                 )
             return True
@@ -454,6 +901,7 @@ class BaseNetwork:
             )
             return False
 
+    @recorded
     def disconnect(
         self, time_slice, node1, node2, port1=0, port2=0, unidirectional=False
     ) -> bool:
@@ -505,6 +953,8 @@ class BaseNetwork:
 
         return True
 
+    @recorded
+    @traced()
     def deploy_topo(self, circuits=[], start_fresh=False) -> bool:
         """
         Create ocs schedules based on given circuits or existing slice_to_topo variable (updated by connect() before),
@@ -522,21 +972,9 @@ class BaseNetwork:
         if start_fresh:
             self.slice_to_topo = {}
 
-        nb_time_slices_hint = 0
-        for time_slice, node1, node2, port1, port2 in circuits:
-            nb_time_slices_hint = max(nb_time_slices_hint, time_slice + 1)
-            if node1 == -1 or node2 == -1:
-                # Placeholder for an empty time slice (e.g. guardband with no circuits)
-                continue
-            if not self.connect(time_slice, node1, node2, port1, port2):
-                print("Topology deployment failed.")
-                return False
-
-        # Create empty DiGraphs for any time slices not yet populated
-        for ts in range(nb_time_slices_hint):
-            if ts not in self.slice_to_topo:
-                self.slice_to_topo[ts] = nx.DiGraph()
-                self.slice_to_topo[ts].add_nodes_from(range(self.nb_node))
+        if not self._connect_circuits(circuits):
+            print("Topology deployment failed.")
+            return False
 
         self.nb_time_slices = len(self.slice_to_topo.keys())
         if self.nb_time_slices == 0:
@@ -551,17 +989,178 @@ class BaseNetwork:
 
         print("Deploying optical topologies...")
 
-        self._backend.clear_table(
-            switch_name="ocs",
-            table="ocs_schedule",
-        )
-        self.setup_ocs()
+        if self._backend.can_apply_table_delta("ocs") and self._is_installed(
+            "ocs", "ocs_schedule"
+        ):
+            if not self.update_ocs():
+                return False
+        else:
+            self._backend.clear_table(
+                switch_name="ocs",
+                table="ocs_schedule",
+            )
+            self.setup_ocs()
 
         if hasattr(self._backend, 'gen_schedule'):
             self._backend.gen_schedule(self.slice_to_topo)
 
         return True
 
+    def _connect_circuits(self, circuits, slice_to_topo=None) -> bool:
+        """Connect the circuits in slice_to_topo, creating the time slices they span.
+
+        Defaults to the network's slice_to_topo; pass a dict to build a
+        topology without touching the network's.
+        """
+        if slice_to_topo is None:
+            slice_to_topo = self.slice_to_topo
+        nb_time_slices_hint = 0
+        for time_slice, node1, node2, port1, port2 in circuits:
+            nb_time_slices_hint = max(nb_time_slices_hint, time_slice + 1)
+            if node1 == -1 or node2 == -1:
+                # Placeholder for an empty time slice (e.g. guardband with no circuits)
+                continue
+            if not self._connect(slice_to_topo, time_slice, node1, node2, port1, port2):
+                return False
+
+        # Create empty DiGraphs for any time slices not yet populated
+        for ts in range(nb_time_slices_hint):
+            if ts not in slice_to_topo:
+                slice_to_topo[ts] = nx.DiGraph()
+                slice_to_topo[ts].add_nodes_from(range(self.nb_node))
+        return True
+
+    @recorded
+    def stage_update(
+        self, circuits, paths: Optional[List[Path]] = None, routing_mode="Per-hop", arch_mode="TO"
+    ) -> bool:
+        """
+        Install a new topology and routing as the next table version, next to the running one.
+
+        The switches keep matching the active version, so traffic is unaffected until
+        commit_update() switches every switch to the staged version at once.
+
+        Args:
+            circuits (list): A list of tuples (time_slice, node1, node2, port1, port2),
+                spanning as many time slices as the network runs.
+            paths (List[Path], optional): Paths of the new routing.
+                Defaults to None, which keeps the installed routing.
+            routing_mode (str): The routing mode of paths, either "Per-hop" or "Source".
+            arch_mode (str, optional): The architecture mode of paths, either "TO" or "TA".
+
+        Returns:
+            bool: Whether the update was staged on every switch.
+        """
+        if not self._backend.supports_versioned_tables:
+            raise NotImplementedError(
+                f"{type(self._backend).__name__} does not support versioned tables."
+            )
+        if self.nb_time_slices > utils.VERSION_SLICE_OFFSET:
+            raise ValueError(
+                f"Versioned tables support up to {utils.VERSION_SLICE_OFFSET} time slices, "
+                f"but the network runs {self.nb_time_slices}."
+            )
+
+        running_topo = self.slice_to_topo
+        self.slice_to_topo = {}
+        try:
+            if not self._connect_circuits(circuits):
+                print("Staging failed.")
+                return False
+            staged_topo = self.slice_to_topo
+        finally:
+            self.slice_to_topo = running_topo
+        if len(staged_topo) != self.nb_time_slices:
+            raise ValueError(
+                f"circuits span {len(staged_topo)} time slices, "
+                f"but the network runs {self.nb_time_slices}."
+            )
+
+        staged = {"ocs": {"ocs_schedule": self.gen_ocs_entries(staged_topo)}}
+        for tor_id in range(self.nb_node):
+            staged[f"tor{tor_id}"] = {
+                "cal_port_slice_to_node": utils.tor_table_cal_port_slice_to_node(
+                    tor_id, staged_topo
+                )
+            }
+        if paths is not None:
+            entry_dict = utils.path2entries(paths, routing_mode, arch_mode=arch_mode)
+            for switch_name, tables in self._routing_tables(entry_dict, routing_mode).items():
+                staged[switch_name].update(tables)
+        else:
+            # The staged version needs its own copy of the installed routing.
+            for tor_id in range(self.nb_node):
+                for table in ("per_hop_routing", "add_source_routing_entries"):
+                    if self._is_installed(f"tor{tor_id}", table):
+                        staged[f"tor{tor_id}"][table] = list(
+                            self._installed(f"tor{tor_id}", table).values()
+                        )
+
+        # Two versions suffice: the running one and the staged one.
+        version = 1 - self._active_version
+        staged = {
+            switch_name: {
+                table: utils.version_table_entries(entries, version)
+                for table, entries in tables.items()
+            }
+            for switch_name, tables in staged.items()
+        }
+
+        # Keep the running version and shared entries; the staged version's slots are replaced.
+        tables_by_switch = {}
+        for switch_name, tables in staged.items():
+            tables_by_switch[switch_name] = {}
+            for table, entries in tables.items():
+                wanted = {utils.table_entry_key(e): e for e in entries}
+                for key, entry in self._installed(switch_name, table).items():
+                    if utils.table_entry_version(entry) != version:
+                        wanted.setdefault(key, entry)
+                tables_by_switch[switch_name][table] = list(wanted.values())
+
+        delta = self._load_tables(tables_by_switch)
+        if delta is None:
+            return False
+        print(
+            f"Staging version {version}: {len(delta.adds)} added, "
+            f"{len(delta.modifies)} modified, {len(delta.deletes)} deleted entries."
+        )
+        self._staged = (version, staged_topo, staged)
+        return True
+
+    @recorded
+    def commit_update(self, at_us=None, keep_previous=False) -> bool:
+        """
+        Switch every switch to the version installed by stage_update().
+
+        Args:
+            at_us (int, optional): When to switch, in µs of the backend's clock
+                (simulated time for ns-3). Defaults to None, the next time slice boundary.
+            keep_previous (bool, optional): Leave the previous version installed,
+                e.g. to switch sooner after the commit; the next stage_update()
+                reuses its slots. Always the case when at_us is given.
+
+        Returns:
+            bool: Whether every switch accepted the staged version.
+        """
+        if self._staged is None:
+            raise ValueError("No staged update. Call stage_update() first.")
+        version, staged_topo, staged = self._staged
+
+        if not _run_coroutine(self._backend.set_active_version(version, at_us=at_us)):
+            return False
+
+        self._staged = None
+        self._active_version = version
+        self.slice_to_topo = staged_topo
+        # setup_nodes() re-checks its tables against the new topology and version.
+        self._node_tables_key = None
+        self.dashboard.update_topology(self.slice_to_topo)
+
+        if at_us is None and not keep_previous:
+            # No switch matches the previous version anymore.
+            self._load_tables(staged)
+        return True
+
     def get_topo(self, time_slice=None) -> nx.Graph:
         """
         Get the topology (nx.Graph) at the given time slice.
@@ -582,43 +1181,95 @@ class BaseNetwork:
 
         return self.slice_to_topo[time_slice]
 
-    def pause_calendar_queue(self):
+    def current_time_slice(self, at_us=None) -> int:
+        """
+        Get the time slice the OCS is serving now.
+
+        The BMv2 OCS derives its slice from the wall clock,
+        (ms since epoch // slice duration in ms) % nb_time_slices,
+        so the controller can compute the same value without a switch query.
+
+        Args:
+            at_us (int, optional): Wall-clock time in µs since the epoch to get
+                the time slice of. Defaults to now.
+
+        Returns:
+            int: The current time slice.
+        """
+        if at_us is None:
+            at_us = time.time_ns() // 1000
+        slice_ms = max(1, self.time_slice_duration_us // 1000)
+        return (at_us // 1000 // slice_ms) % self.nb_time_slices
+
+    def next_time_slice_start_us(self, lead_us=0) -> int:
+        """
+        Get when the next time slice starts, on the clock current_time_slice() uses.
+
+        Args:
+            lead_us (int, optional): Minimum time from now, e.g. to leave room for
+                scheduling a change at that boundary. Defaults to 0.
+
+        Returns:
+            int: Start of the first time slice at least lead_us from now, in µs since the epoch.
+        """
+        slice_us = max(1, self.time_slice_duration_us // 1000) * 1000
+        earliest = time.time_ns() // 1000 + lead_us
+        return -(-earliest // slice_us) * slice_us
+
+    @recorded
+    def pause_calendar_queue(self, at_us=None):
         """Pause traffic before reconfigure topology. Used in TA architecture.
 
         Sets the active queue for each node to itself, as no pkts should be there,
         this effectively pauses the calendar queues during topology reconfiguration.
-        """
-        for node1, node2, attr in nx.to_edgelist(self.slice_to_topo[0]):
-            port1, port2 = attr["port1"], attr["port2"]
-            assert port1 == 0 and port2 == 0, (
-                "Now control calendar queue only supports one link per node"
-            )
 
-            self.device_manager.set_active_queue(f"tor{node1}", node1)
+        Args:
+            at_us (int, optional): When all ToRs pause, in µs since the epoch.
+                Defaults to right away.
+        """
+        self.device_manager.set_active_queues(
+            [(f"tor{node}", node, None) for node in range(self.nb_node)], at_us=at_us
+        )
 
-    def activate_calendar_queue(self):
+    @recorded
+    def activate_calendar_queue(self, time_slice=None, at_us=None):
         """Update active calendar queues based on the current topology, for traffic-aware.
 
         Each calendar queue buffers packets to a destination node.
         Pause calendar queues whose packets' dst is not directly connected.
-        """
+        With several links per node, each uplink port serves the queue of
+        the node it is connected to. All ToRs are updated in one batch.
 
-        assert len(self.slice_to_topo.keys()) == 1, (
-            f"Control calendar queue is only supported for TA with one time slice. \
-            {len(self.slice_to_topo.keys())} time slices found."
+        Args:
+            time_slice (int, optional): The time slice whose circuits to serve.
+                Defaults to the slice the OCS is serving at at_us.
+            at_us (int, optional): When all ToRs switch queues, in µs since the
+                epoch (see next_time_slice_start_us()). Defaults to right away.
+        """
+        if time_slice is None:
+            time_slice = self.current_time_slice(at_us=at_us)
+
+        active_qid = {
+            (node, port): node
+            for node in range(self.nb_node)
+            for port in range(self.nb_link)
+        }
+        for node1, node2, attr in nx.to_edgelist(self.slice_to_topo[time_slice]):
+            active_qid[(node1, attr["port1"])] = node2
+
+        self.device_manager.set_active_queues(
+            [
+                (f"tor{node}", qid, None if self.nb_link == 1 else port)
+                for (node, port), qid in active_qid.items()
+            ],
+            at_us=at_us,
         )
 
-        for node1, node2, attr in nx.to_edgelist(self.slice_to_topo[0]):
-            port1, port2 = attr["port1"], attr["port2"]
-            assert port1 == 0 and port2 == 0, (
-                "Now control calendar queue only supports one link per node"
-            )
-            self.device_manager.set_active_queue(f"tor{node1}", node2)
-
     ##########################
     #        Routing         #
     ##########################
 
+    @recorded
     def add_time_flow_entry(
         self, node_id, entries: Union[List[TimeFlowEntry], TimeFlowEntry], routing_mode="Per-hop"
     ) -> bool:
@@ -631,13 +1282,61 @@ class BaseNetwork:
             routing_mode (str): Source or Per-hop
 
         Returns:
-            bool: Whether the entries were successfully added.
+            bool: Whether the entries were successfully added. Entries for an
+            arrival slice the node already routes dst from are rejected.
         """
         if isinstance(entries, TimeFlowEntry):
             entries = [entries]
         elif not isinstance(entries, list):
             raise ValueError("entries must be a TimeFlowEntry or a list of TimeFlowEntry")
 
+        table_entries = self._time_flow_table_entries(entries, routing_mode)
+
+        if not self._backend.switch_exists(f"tor{node_id}"):
+            print(f"Error: Try deploying paths to non-existent node: node{node_id}.")
+            return False
+        if not self._check_range_overlap(f"tor{node_id}", table_entries):
+            return False
+
+        if not self._backend.load_table(f"tor{node_id}", table_entries):
+            return False
+        self._record_added(f"tor{node_id}", table_entries)
+        return True
+
+    def _check_range_overlap(self, switch_name, entries) -> bool:
+        """Whether entries can be added next to the switch's installed entries.
+
+        Routing entries match arrival slice ranges at one priority, so an
+        added range must not overlap an installed one or another added one.
+        """
+        installed = [
+            e
+            for table in {e.table for e in entries}
+            for e in self._installed(switch_name, table).values()
+        ]
+        overlap = utils.find_range_overlap(installed, entries)
+        if overlap is None:
+            return True
+        entry, other = overlap
+        print(
+            f"Error: {switch_name} {other.table} entry {dict(other.match_keys)} overlaps "
+            f"the arrival slices of {dict(entry.match_keys)}. Deploy the routing with "
+            f"start_fresh=True to replace entries."
+        )
+        return False
+
+    def _record_added(self, switch_name, entries):
+        """Add loaded entries to the switch's shadow copy."""
+        tables = self._installed_tables.setdefault(switch_name, {})
+        for e in entries:
+            if e.table not in tables:
+                tables[e.table] = {}
+            self._installed(switch_name, e.table)[utils.table_entry_key(e)] = e
+
+    def _time_flow_table_entries(
+        self, entries: List[TimeFlowEntry], routing_mode
+    ) -> List[TableEntry]:
+        """Convert time flow entries to routing table entries."""
         table_entries = []
         if routing_mode == "Source":
             for entry in entries:
@@ -647,13 +1346,12 @@ class BaseNetwork:
                 table_entries += utils.tor_table_routing_per_hop(entry, nb_time_slices=self.nb_time_slices)
         else:
             assert False, "Unsupported routing mode"
+        return utils.version_table_entries(
+            utils.compress_table_entries(table_entries), self._active_version
+        )
 
-        if not self._backend.switch_exists(f"tor{node_id}"):
-            print(f"Error: Try deploying paths to non-existent node: node{node_id}.")
-            return False
-
-        return self._backend.load_table(f"tor{node_id}", table_entries)
-
+    @recorded
+    @traced()
     def deploy_routing(
         self,
         paths: List[Path],
@@ -694,22 +1392,95 @@ class BaseNetwork:
                         f"(`routing_hoho(..., max_hop={cap})`) or switch to "
                         f"`routing_mode=\"Per-hop\"`.",
                         RuntimeWarning,
-                        stacklevel=2,
+                        stacklevel=3,  # past the tracing wrapper, to the caller
                     )
 
+        entry_dict = utils.path2entries(paths, routing_mode, arch_mode=arch_mode)
+
         if start_fresh:
-            print("Loading routings...")
             table_name = (
                 "per_hop_routing" if routing_mode == "Per-hop" else "add_source_routing_entries"
             )
+            if all(
+                self._backend.can_apply_table_delta(f"tor{node_id}")
+                and self._is_installed(f"tor{node_id}", table_name)
+                for node_id in range(self.nb_node)
+            ):
+                return self.update_routing(entry_dict, routing_mode=routing_mode)
+
+            print("Loading routings...")
             for node_id in range(self.nb_node):
                 self._backend.clear_table(
                     switch_name=f"tor{node_id}",
                     table=table_name,
                 )
+                self._installed_tables.get(f"tor{node_id}", {}).pop(table_name, None)
+            return self._load_tables(
+                self._routing_tables(entry_dict, routing_mode)
+            ) is not None
 
-        entry_dict = utils.path2entries(paths, routing_mode, arch_mode=arch_mode)
-
+        batch = {}
         for src, entries in entry_dict.items():
-            self.add_time_flow_entry(src, entries, routing_mode=routing_mode)
+            if not self._backend.switch_exists(f"tor{src}"):
+                print(f"Error: Try deploying paths to non-existent node: node{src}.")
+                continue
+            batch[f"tor{src}"] = self._time_flow_table_entries(entries, routing_mode)
+            if not self._check_range_overlap(f"tor{src}", batch[f"tor{src}"]):
+                return False
+        if not _run_coroutine(self._backend.load_tables(batch)):
+            return False
+        for switch_name, table_entries in batch.items():
+            self._record_added(switch_name, table_entries)
         return True
+
+    @recorded
+    def update_routing(self, entry_dict, routing_mode="Per-hop") -> bool:
+        """
+        Replace the routing on every node, pushing only the entries that changed.
+
+        Unchanged entries keep forwarding while the update is applied, so there
+        is no window with an empty routing table.
+
+        Args:
+            entry_dict (dict): {node_id : List[TimeFlowEntry]}, as returned by utils.path2entries.
+                Nodes without entries have their routing removed.
+            routing_mode (str): Source or Per-hop
+
+        Returns:
+            bool: Whether the backend applied the changes on every node.
+        """
+        delta = self._load_tables(self._routing_tables(entry_dict, routing_mode))
+        if delta is None:
+            return False
+        print(
+            f"Updating routings: {len(delta.adds)} added, {len(delta.modifies)} modified, "
+            f"{len(delta.deletes)} deleted entries."
+        )
+        return True
+
+    def _routing_tables(self, entry_dict, routing_mode) -> dict:
+        """The full routing table of every node, as {switch_name : {table : entries}}."""
+        if routing_mode == "Per-hop":
+            # Per-hop tables grow with paths x time slices; build them column-wise.
+            return {
+                f"tor{node_id}": {
+                    "per_hop_routing": utils.version_table_entries(
+                        utils.compress_table_batch(
+                            utils.tor_table_routing_per_hop_batch(
+                                entry_dict.get(node_id, []), nb_time_slices=self.nb_time_slices
+                            )
+                        ),
+                        self._active_version,
+                    )
+                }
+                for node_id in range(self.nb_node)
+            }
+        table_name = "add_source_routing_entries"
+        return {
+            f"tor{node_id}": {
+                table_name: self._time_flow_table_entries(
+                    entry_dict.get(node_id, []), routing_mode
+                )
+            }
+            for node_id in range(self.nb_node)
+        }
@@ -0,0 +1,202 @@
+# Copyright (c) Max-Planck-Gesellschaft zur Förderung der Wissenschaften e.V.
+# Developed at the Max Planck Institute for Informatics, Network and Cloud Systems Group
+#
+# Author: Yiming Lei (ylei@mpi-inf.mpg.de)
+#
+# This software is licensed for non-commercial scientific research purposes only.
+#
+# License text: Creative Commons NC BY SA 4.0
+# https://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
+
+"""
+Span timing for the control plane.
+
+Deploying a network runs through a few coarse phases: topology, routing, entry
+generation and the backend table operations. Each phase records a :class:`Span`
+with its duration and, for table operations, the number of entries and the
+bytes sent to the switch. Spans are published to the dashboard as
+``control_plane_latency`` samples and can be dumped as a Chrome trace, to be
+opened in chrome://tracing or https://ui.perfetto.dev.
+
+Set ``OPENOPTICS_TRACE=<file.json>`` to write the trace of a run on exit.
+"""
+
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+
+@dataclass
+class Span:
+    """
+    One timed call.
+
+    Attributes:
+        name: Phase name, e.g. ``"BaseNetwork.deploy_routing"``.
+        start_s: Wall-clock start time, in seconds since the epoch.
+        duration_s: Duration in seconds.
+        thread_id: Thread the call ran on.
+        args: Call details, e.g. ``switch``, ``entries`` and ``bytes``.
+    """
+    name: str
+    start_s: float
+    duration_s: float = 0.0
+    thread_id: int = 0
+    args: dict = field(default_factory=dict)
+
+
+class Tracer:
+    """
+    Records spans and hands each finished span to its listeners.
+
+    Only the most recent ``max_spans`` spans are kept.
+    """
+
+    def __init__(self, max_spans=10_000):
+        """
+        Args:
+            max_spans (int): Number of finished spans to keep.
+        """
+        self.spans = deque(maxlen=max_spans)
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def add_listener(self, listener) -> None:
+        """Call ``listener(span)`` for every span that finishes from now on."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener) -> None:
+        """Stop calling a listener added with add_listener()."""
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def _open_spans(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def span(self, name, **args):
+        """
+        Time the body of a ``with`` block.
+
+        Args:
+            name (str): Phase name.
+            **args: Call details recorded with the span.
+
+        Yields:
+            The open Span. Its ``args`` may be extended inside the block.
+        """
+        span = Span(name=name, start_s=time.time(), thread_id=threading.get_ident(), args=args)
+        stack = self._open_spans()
+        stack.append(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.duration_s = time.perf_counter() - start
+            stack.pop()
+            self._finish(span)
+
+    def annotate(self, **args) -> None:
+        """Add details to the innermost open span of the calling thread, if any."""
+        stack = self._open_spans()
+        if stack:
+            stack[-1].args.update(args)
+
+    def _finish(self, span) -> None:
+        with self._lock:
+            self.spans.append(span)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(span)
+            except Exception:
+                # A failing consumer must not break the traced call.
+                pass
+
+    def clear(self) -> None:
+        """Drop all recorded spans."""
+        with self._lock:
+            self.spans.clear()
+
+    def chrome_trace(self) -> dict:
+        """
+        The recorded spans in the Chrome trace event format.
+
+        Returns:
+            A dict with one complete ("X") event per span.
+        """
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "traceEvents": [
+                {
+                    "name": span.name,
+                    "ph": "X",
+                    "ts": span.start_s * 1e6,
+                    "dur": span.duration_s * 1e6,
+                    "pid": pid,
+                    "tid": span.thread_id,
+                    "args": span.args,
+                }
+                for span in spans
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+    def dump_chrome_trace(self, path) -> None:
+        """
+        Write the recorded spans to a Chrome trace JSON file.
+
+        Args:
+            path (str): Output file.
+        """
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f, default=str)
+
+
+# The process-wide tracer all instrumented calls record to.
+tracer = Tracer()
+
+
+def traced(name=None, entries=None):
+    """
+    Decorator recording each call of a function as a span.
+
+    Args:
+        name (str, optional): Phase name. Defaults to the function's qualified name.
+        entries (callable, optional): Maps the return value to the number of
+            entries produced, recorded as the span's ``entries``.
+    """
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(span_name) as span:
+                result = func(*args, **kwargs)
+                if entries is not None:
+                    span.args["entries"] = entries(result)
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+_trace_path = os.environ.get("OPENOPTICS_TRACE")
+if _trace_path:
+    atexit.register(tracer.dump_chrome_trace, _trace_path)
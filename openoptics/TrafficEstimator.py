@@ -0,0 +1,159 @@
+# Copyright (c) Max-Planck-Gesellschaft zur Förderung der Wissenschaften e.V.
+# Developed at the Max Planck Institute for Informatics, Network and Cloud Systems Group
+#
+# Author: Yiming Lei (ylei@mpi-inf.mpg.de)
+#
+# This software is licensed for non-commercial scientific research purposes only.
+#
+# License text: Creative Commons NC BY SA 4.0
+# https://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
+
+"""
+Traffic-matrix estimation and reconfiguration policies for traffic-aware architectures.
+
+A single queue depth snapshot is a noisy demand signal. The estimators here smooth
+the traffic matrices returned by ``utils.metric_to_matrix`` over time, and
+:class:`ReconfigPolicy` decides whether a new topology serves enough more of the
+estimated demand than the deployed one to be worth a reconfiguration.
+"""
+
+from collections import deque
+
+
+class EwmaEstimator:
+    """
+    Exponentially weighted moving average of traffic matrices.
+
+    Each update moves the estimate of every node pair ``alpha`` of the way to the
+    new reading; pairs missing from a reading count as 0.
+    """
+
+    def __init__(self, alpha=0.5):
+        """
+        Args:
+            alpha (float): Weight of the newest reading, in (0, 1]. 1 disables smoothing.
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError(f"alpha must be in (0, 1], got {alpha}.")
+        self.alpha = alpha
+        self.estimate = {}
+
+    def update(self, traffic_matrix: dict) -> dict:
+        """
+        Fold one traffic matrix reading into the estimate.
+
+        Args:
+            traffic_matrix: Dictionary of {(node1, node2): traffic}
+
+        Returns:
+            The estimated traffic matrix.
+        """
+        if not self.estimate:
+            self.estimate = dict(traffic_matrix)
+            return dict(self.estimate)
+        for pair in set(self.estimate) | set(traffic_matrix):
+            self.estimate[pair] = (1 - self.alpha) * self.estimate.get(
+                pair, 0
+            ) + self.alpha * traffic_matrix.get(pair, 0)
+        return dict(self.estimate)
+
+
+class WindowEstimator:
+    """
+    Mean of the last ``window`` traffic matrices.
+    """
+
+    def __init__(self, window=4):
+        """
+        Args:
+            window (int): Number of readings to average over.
+        """
+        if window < 1:
+            raise ValueError(f"window must be at least 1, got {window}.")
+        self.readings = deque(maxlen=window)
+
+    def update(self, traffic_matrix: dict) -> dict:
+        """
+        Add one traffic matrix reading to the window.
+
+        Args:
+            traffic_matrix: Dictionary of {(node1, node2): traffic}
+
+        Returns:
+            The estimated traffic matrix.
+        """
+        self.readings.append(dict(traffic_matrix))
+        estimate = {}
+        for reading in self.readings:
+            for pair, traffic in reading.items():
+                estimate[pair] = estimate.get(pair, 0) + traffic
+        return {pair: traffic / len(self.readings) for pair, traffic in estimate.items()}
+
+
+def served_traffic(circuits, traffic_matrix: dict) -> float:
+    """
+    Traffic a topology serves directly, averaged over its time slices.
+
+    Each circuit serves the demand of both directions between its nodes for the
+    time slice it is up.
+
+    Args:
+        circuits: List of circuits [time_slice, node1, node2, port1, port2]
+        traffic_matrix: Dictionary of {(node1, node2): traffic}
+
+    Returns:
+        The served traffic.
+    """
+    if not circuits:
+        return 0
+    time_slices = set()
+    links = set()
+    for time_slice, node1, node2, *_ in circuits:
+        time_slices.add(time_slice)
+        links.add((time_slice, min(node1, node2), max(node1, node2)))
+    served = sum(
+        traffic_matrix.get((node1, node2), 0) + traffic_matrix.get((node2, node1), 0)
+        for _, node1, node2 in links
+    )
+    return served / len(time_slices)
+
+
+class ReconfigPolicy:
+    """
+    Hysteresis for traffic-aware reconfiguration.
+
+    A new topology is only deployed when it serves more of the estimated traffic
+    than the deployed one by at least ``reconfig_cost`` plus ``min_gain`` times
+    the traffic the deployed topology already serves.
+    """
+
+    def __init__(self, reconfig_cost=0, min_gain=0.0):
+        """
+        Args:
+            reconfig_cost (float): Traffic, in traffic matrix units, lost to one
+                reconfiguration (e.g. the queue build-up during the pause).
+            min_gain (float): Relative gain required on top of reconfig_cost,
+                e.g. 0.1 for 10%.
+        """
+        self.reconfig_cost = reconfig_cost
+        self.min_gain = min_gain
+
+    def should_reconfigure(self, traffic_matrix: dict, prev_circuits, circuits) -> bool:
+        """
+        Decide whether to replace prev_circuits with circuits.
+
+        Args:
+            traffic_matrix: Estimated traffic matrix {(node1, node2): traffic}
+            prev_circuits: Circuits currently deployed
+            circuits: Candidate circuits
+
+        Returns:
+            Whether the candidate is worth a reconfiguration.
+        """
+        if not circuits:
+            return False
+        if not prev_circuits:
+            return True
+        prev_served = served_traffic(prev_circuits, traffic_matrix)
+        gain = served_traffic(circuits, traffic_matrix) - prev_served
+        return gain > self.reconfig_cost + self.min_gain * prev_served
@@ -17,6 +17,10 @@ __all__ = [
     "OpticalRouting",
     "OpticalTopo",
     "TimeFlowTable",
+    "TrafficEstimator",
+    "Tracer",
+    "Controller",
+    "OperationLog",
     "DeviceManager",
     "Dashboard",
     "OpticalCLI",
@@ -22,7 +22,9 @@ def create_backend(backend_name: str) -> BackendBase:
     """Instantiate and return the backend for the given name.
 
     Args:
-        backend_name: "Mininet", "ns3", or "Tofino"
+        backend_name: "Mininet", "ns3", "Tofino", or "Null" (records table
+            operations without programming any switch; see
+            :class:`~openoptics.backends.null.backend.NullBackend`)
 
     Returns:
         A BackendBase instance.
@@ -37,6 +39,9 @@ def create_backend(backend_name: str) -> BackendBase:
         elif backend_name == "ns3":
             from openoptics.backends.ns3.backend import Ns3Backend
             return Ns3Backend()
+        elif backend_name == "Null":
+            from openoptics.backends.null.backend import NullBackend
+            return NullBackend()
         else:
             raise ValueError(f"Unsupported backend: {backend_name}")
     except ImportError as e:
@@ -8,10 +8,14 @@
 # License text: Creative Commons NC BY SA 4.0
 # https://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
 
+import functools
+import inspect
 import warnings
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import Dict, Optional
+
+from openoptics.Tracer import tracer
 
 
 def warn_if_overhead_exhausts_slice(
@@ -53,6 +57,8 @@ class TableEntry:
         action: Logical action name, e.g. ``"ocs_forward"``, ``"write_time_flow_entry"``.
         match_keys: Ordered dict of match field name → value. Insertion order is
             preserved (Python 3.7+) and is significant for positional CLI formats.
+            A ``(first, last)`` tuple matches the inclusive range of values; see
+            :func:`match_range`.
         action_params: Ordered dict of action parameter name → value. For source-
             routing entries the special key ``"hops"`` maps to a list of
             ``(cur_node, send_ts, send_port)`` tuples (one per hop).
@@ -66,6 +72,89 @@ class TableEntry:
     is_default_action: bool = False
 
 
+def match_range(value) -> tuple:
+    """The inclusive ``(first, last)`` range a match value covers.
+
+    Range-matched fields (the arrival slice of the routing tables) hold either a
+    ``(first, last)`` tuple or a single value, which is the range of one.
+    """
+    if isinstance(value, tuple):
+        return value
+    return (value, value)
+
+
+@dataclass
+class TableBatch:
+    """Entries of one table that share an action, stored column-wise.
+
+    Producing and installing one :class:`TableEntry` per row costs two dicts
+    and a dataclass per entry. A batch keeps match keys and action parameters
+    in two integer arrays instead; backends install it through
+    :meth:`BackendBase.load_table_batch` without building per-row objects.
+    Iterating a batch yields the equivalent :class:`TableEntry` objects, so it
+    can stand in for an entry list wherever entries are compared or diffed.
+
+    Attributes:
+        table: Logical table name, as in :class:`TableEntry`.
+        action: Logical action name shared by every row.
+        key_names: Match field names, in the order of ``TableEntry.match_keys``.
+        param_names: Action parameter names, in the order of ``TableEntry.action_params``.
+        keys: Integer NumPy array of shape ``(n, len(key_names))``, or
+            ``(n, len(key_names) + 1)`` with a range key.
+        params: Integer NumPy array of shape ``(n, len(param_names))``.
+        range_key: Match field whose last value is held in the extra last
+            column of ``keys``. Its rows expand to ``(first, last)`` tuples.
+    """
+    table: str
+    action: str
+    key_names: tuple
+    param_names: tuple
+    keys: "numpy.ndarray"
+    params: "numpy.ndarray"
+    range_key: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __iter__(self):
+        for keys, params in zip(self.keys.tolist(), self.params.tolist()):
+            match_keys = dict(zip(self.key_names, keys))
+            if self.range_key is not None:
+                match_keys[self.range_key] = (match_keys[self.range_key], keys[-1])
+            yield TableEntry(
+                table=self.table,
+                action=self.action,
+                match_keys=match_keys,
+                action_params=dict(zip(self.param_names, params)),
+            )
+
+
+@dataclass
+class TableDelta:
+    """The minimal set of changes that turns one set of table entries into another.
+
+    Produced by :func:`openoptics.utils.diff_table_entries` and applied by
+    :meth:`BackendBase.apply_table_delta`.
+
+    Attributes:
+        adds: :class:`TableEntry` objects whose match key is not installed yet.
+        modifies: :class:`TableEntry` objects whose match key is installed with a
+            different action or action parameters. Default-action entries land here
+            when the default action changes.
+        deletes: Installed :class:`TableEntry` objects whose match key is no longer
+            wanted.
+    """
+    adds: list = field(default_factory=list)
+    modifies: list = field(default_factory=list)
+    deletes: list = field(default_factory=list)
+
+    def is_empty(self) -> bool:
+        return not (self.adds or self.modifies or self.deletes)
+
+    def __len__(self) -> int:
+        return len(self.adds) + len(self.modifies) + len(self.deletes)
+
+
 class SwitchHandle:
     """A backend-agnostic reference to a switch."""
 
@@ -74,6 +163,39 @@ class SwitchHandle:
         self.thrift_port = thrift_port
 
 
+def _delta_size(delta) -> int:
+    return len(delta.adds) + len(delta.modifies) + len(delta.deletes)
+
+
+# Table operations timed on every backend, with the argument that is counted
+# as the span's entries (see openoptics.Tracer). Backends that send a payload
+# to the switch add its size with tracer.annotate(bytes=...).
+_TRACED_TABLE_OPS = {
+    "load_table": ("entries", len),
+    "load_table_batch": ("batch", len),
+    "apply_table_delta": ("delta", _delta_size),
+    "clear_table": ("table", None),
+}
+
+
+def _traced_table_op(func, arg_name, count):
+    signature = inspect.signature(func)
+    span_name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind_partial(*args, **kwargs).arguments
+        with tracer.span(span_name, switch=bound.get("switch_name")) as span:
+            if arg_name in bound:
+                if count is None:
+                    span.args[arg_name] = bound[arg_name]
+                else:
+                    span.args["entries"] = count(bound[arg_name])
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
 class BackendBase(ABC):
     """Abstract base class for OpenOptics backends.
 
@@ -96,11 +218,40 @@ class BackendBase(ABC):
         backends (ns-3) where there is no live network to interact with; the
         whole scenario is scripted up front and ``run()`` just advances the
         simulator.
+    supports_table_delta : bool
+        If True, ``apply_table_delta()`` is implemented and ``BaseNetwork``
+        pushes only changed entries on redeploys instead of clearing and
+        reloading whole tables.
+    supports_versioned_tables : bool
+        If True, slice-keyed tables match only the entries of the active
+        table version (see :func:`openoptics.utils.version_table_entries`)
+        and ``set_active_version()`` is implemented, so ``BaseNetwork`` can
+        stage a whole update next to the running one and switch to it at once.
+    accepts_any_backend_kwargs : bool
+        If True, ``BaseNetwork`` passes every backend-specific keyword
+        argument to ``setup()`` instead of validating them against
+        ``accepted_kwargs()``.  Used by the null backend, which stands in
+        for any other backend.
+    pushes_tor_metrics : bool
+        If True, the ToR switches push their queue metrics to a collector
+        the backend registers in ``setup_dashboard()``, and the polling
+        ``DeviceMetricCollector`` only reads the optical switches.
     """
 
     supports_device_manager: bool = True
     supports_dashboard_without_device_manager: bool = False
     supports_cli: bool = True
+    supports_table_delta: bool = False
+    supports_versioned_tables: bool = False
+    accepts_any_backend_kwargs: bool = False
+    pushes_tor_metrics: bool = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Time every table operation the backend implements.
+        for method, (arg_name, count) in _TRACED_TABLE_OPS.items():
+            if method in cls.__dict__:
+                setattr(cls, method, _traced_table_op(cls.__dict__[method], arg_name, count))
 
     # Maximum number of transmit hops the source-routing data plane can
     # carry per packet. Set by each backend to its action/header limit
@@ -213,6 +364,75 @@ class BackendBase(ABC):
             True on success.
         """
 
+    def load_table_batch(
+        self,
+        switch_name: str,
+        batch: TableBatch,
+        print_flag: bool = False,
+    ) -> bool:
+        """Load a :class:`TableBatch` to the named switch.
+
+        The default expands the batch into :class:`TableEntry` objects and
+        calls :meth:`load_table`. Backends override it with a bulk path that
+        reads the key and parameter columns directly.
+
+        Args:
+            switch_name: Name of the switch (e.g. "tor0").
+            batch: The rows to install.
+            print_flag: Print backend output if True.
+
+        Returns:
+            True on success.
+        """
+        return self.load_table(switch_name, list(batch), print_flag=print_flag)
+
+    async def load_table_batches(
+        self,
+        batches_by_switch: Dict[str, list],
+        print_flag: bool = False,
+    ) -> bool:
+        """Load :class:`TableBatch` objects to several switches.
+
+        The default loads one batch after the other; see :meth:`load_tables`.
+
+        Args:
+            batches_by_switch: {switch_name: [TableBatch, ...]}
+            print_flag: Print backend output if True.
+
+        Returns:
+            True if every switch loaded successfully.
+        """
+        results = [
+            self.load_table_batch(switch_name, batch, print_flag=print_flag)
+            for switch_name, batches in batches_by_switch.items()
+            for batch in batches
+        ]
+        return all(results)
+
+    async def load_tables(
+        self,
+        batch_by_switch: Dict[str, list],
+        print_flag: bool = False,
+    ) -> bool:
+        """Load table entries to several switches.
+
+        The default loads one switch after the other. Backends whose switches
+        are programmed independently override this to load them concurrently,
+        so a deploy takes as long as the slowest switch.
+
+        Args:
+            batch_by_switch: {switch_name: [TableEntry, ...]}
+            print_flag: Print backend output if True.
+
+        Returns:
+            True if every switch loaded successfully.
+        """
+        results = [
+            self.load_table(switch_name, entries, print_flag=print_flag)
+            for switch_name, entries in batch_by_switch.items()
+        ]
+        return all(results)
+
     @abstractmethod
     def clear_table(
         self,
@@ -229,6 +449,79 @@ class BackendBase(ABC):
             print_flag: Print backend output if True.
         """
 
+    def can_apply_table_delta(self, switch_name: str) -> bool:
+        """Whether :meth:`apply_table_delta` can update the named switch.
+
+        Defaults to ``supports_table_delta``. Backends that can only patch
+        some switches at runtime override this.
+        """
+        return self.supports_table_delta
+
+    def apply_table_delta(
+        self,
+        switch_name: str,
+        delta: TableDelta,
+        print_flag: bool = False,
+    ) -> bool:
+        """Apply a :class:`TableDelta` to the named switch in place.
+
+        Only called when ``can_apply_table_delta(switch_name)`` is True. Entries not named in
+        the delta must stay installed and keep forwarding traffic.
+
+        Args:
+            switch_name: Name of the switch (e.g. "ocs", "tor0").
+            delta: Entries to add, modify and delete.
+            print_flag: Print backend output if True.
+
+        Returns:
+            True on success.
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support incremental table updates."
+        )
+
+    async def apply_table_deltas(
+        self,
+        delta_by_switch: Dict[str, TableDelta],
+        print_flag: bool = False,
+    ) -> bool:
+        """Apply a :class:`TableDelta` to each of several switches.
+
+        Same contract as :meth:`apply_table_delta` per switch. The default
+        applies them one after the other; see :meth:`load_tables`.
+
+        Args:
+            delta_by_switch: {switch_name: TableDelta}
+            print_flag: Print backend output if True.
+
+        Returns:
+            True if every switch applied its delta.
+        """
+        results = [
+            self.apply_table_delta(switch_name, delta, print_flag=print_flag)
+            for switch_name, delta in delta_by_switch.items()
+        ]
+        return all(results)
+
+    async def set_active_version(self, version: int, at_us: Optional[int] = None) -> bool:
+        """Make every switch match the entries of the given table version.
+
+        Only called when ``supports_versioned_tables`` is True.
+
+        Args:
+            version: The table version to activate.
+            at_us: When to switch, in µs of the backend's clock (simulated
+                time for simulators). None switches at the next time slice
+                boundary and returns once every switch has switched, so the
+                previous version can be removed.
+
+        Returns:
+            True if every switch accepted the version.
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support versioned tables."
+        )
+
     @abstractmethod
     def stop(self) -> None:
         """Stop the network."""
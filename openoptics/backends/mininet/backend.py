@@ -8,13 +8,18 @@
 # License text: Creative Commons NC BY SA 4.0
 # https://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
 
+import asyncio
+import functools
+import io
 import os
 import re
 import socket
 import sys
 import tempfile
+import time
 import warnings
 from pathlib import Path
+from typing import Optional
 
 import numpy as np
 
@@ -26,12 +31,21 @@ from mininet.moduledeps import pathCheck
 from mininet.node import Host, Switch
 from mininet.util import pmonitor
 
+from openoptics.Tracer import tracer
 from openoptics.backends.base import (
     BackendBase,
     SwitchHandle,
+    TableBatch,
+    TableDelta,
     TableEntry,
+    match_range,
     warn_if_overhead_exhausts_slice,
 )
+from openoptics.backends.mininet.thrift_client import (
+    TARGET_SWITCH_TYPES,
+    BMv2TableClient,
+    BMv2TableError,
+)
 
 
 def _floor_us_to_ms_with_warn(name: str, value_us: int, *, min_ms: int = 0) -> int:
@@ -111,6 +125,13 @@ class P4Host(Host):
         print("**********")
 
 
+def _in_thread(func, *args, **kwargs):
+    """Run func in the default executor; asyncio.to_thread needs Python 3.9."""
+    return asyncio.get_running_loop().run_in_executor(
+        None, functools.partial(func, *args, **kwargs)
+    )
+
+
 class P4Switch(Switch):
     """P4 virtual switch"""
 
@@ -132,6 +153,8 @@ class P4Switch(Switch):
         guardband_ms=0,
         nb_time_slices=None,
         calendar_queue_mode=0,  # 0 is TIME_BASED, 1 is CONTROL_BASED
+        telemetry_addr=None,
+        telemetry_interval_us=1000,
         **kwargs,
     ):
         Switch.__init__(self, name, **kwargs)
@@ -156,6 +179,11 @@ class P4Switch(Switch):
         assert nb_time_slices is not None
         self.nb_time_slices = nb_time_slices
         self.calendar_queue_mode = calendar_queue_mode
+        self.telemetry_addr = telemetry_addr
+        self.telemetry_interval_us = telemetry_interval_us
+        self.pid = None
+        self.launched_at = None
+        self.startup_s = None  # Launch to Thrift readiness, set by batchStartup()
 
         if device_id is not None:
             self.device_id = device_id
@@ -169,22 +197,40 @@ class P4Switch(Switch):
     def setup(cls):
         pass
 
-    def check_switch_started(self, pid):
-        """Poll the Thrift port until it accepts connections."""
-        while True:
-            if not os.path.exists(os.path.join("/proc", str(pid))):
-                return False
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            try:
-                sock.settimeout(0.5)
-                result = sock.connect_ex(("localhost", self.thrift_port))
-            finally:
-                sock.close()
-            if result == 0:
-                return True
+    @classmethod
+    def batchStartup(cls, switches, poll_interval_s=0.01):
+        """Wait until every launched switch accepts Thrift connections.
+
+        Mininet calls start() on all switches, which only launches their
+        processes, and then this once per switch class, so the switches boot
+        side by side instead of one after the other. Sets ``startup_s``, the
+        time from launch to readiness, on each switch.
+        """
+        pending = list(switches)
+        while pending:
+            for switch in list(pending):
+                if not os.path.exists(os.path.join("/proc", str(switch.pid))):
+                    error("P4 switch {} did not start correctly.\n".format(switch.name))
+                    exit(1)
+                if switch.thrift_ready():
+                    switch.startup_s = time.perf_counter() - switch.launched_at
+                    info("P4 switch {} has been started.\n".format(switch.name))
+                    pending.remove(switch)
+            if pending:
+                time.sleep(poll_interval_s)
+        return switches
+
+    def thrift_ready(self) -> bool:
+        """Whether the Thrift port accepts connections."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(0.5)
+            return sock.connect_ex(("localhost", self.thrift_port)) == 0
+        finally:
+            sock.close()
 
     def start(self, controllers):
-        "Start up a new P4 switch"
+        "Launch the P4 switch process; batchStartup() waits for it"
         info("Starting P4 switch {}.\n".format(self.name))
         args = [self.sw_path]
         for port, intf in self.intfs.items():
@@ -211,6 +257,9 @@ class P4Switch(Switch):
             args.extend(["--guardband-ms", str(self.guardband_ms)])
             args.extend(["--calendar-queue-mode", str(self.calendar_queue_mode)])
             args.extend(["--tor-id", str(self.tor_id)])
+            if self.telemetry_addr:
+                args.extend(["--telemetry-addr", self.telemetry_addr])
+                args.extend(["--telemetry-interval-us", str(self.telemetry_interval_us)])
 
         logfile = "/tmp/p4s.{}.log".format(self.name)
         info(" ".join(args) + "\n")
@@ -220,11 +269,9 @@ class P4Switch(Switch):
             self.cmd("echo" + " ".join(args) + ">" + logfile)
             self.cmd(" ".join(args) + " >" + logfile + " 2>&1 & echo $! >> " + f.name)
             pid = int(f.read())
+        self.pid = pid
+        self.launched_at = time.perf_counter()
         debug("P4 switch {} PID is {}.\n".format(self.name, pid))
-        if not self.check_switch_started(pid):
-            error("P4 switch {} did not start correctly.\n".format(self.name))
-            exit(1)
-        info("P4 switch {} has been started.\n".format(self.name))
 
     def stop(self):
         "Terminate P4 switch."
@@ -321,7 +368,13 @@ class MininetBackend(BackendBase):
     # parser/MATs can install.
     max_source_route_hops = 3
 
-    _CLI_PATH = "/behavioral-model/targets/simple_switch/runtime_CLI"
+    # runtime_CLI can modify and delete entries by match key, so redeploys
+    # only touch the entries that changed.
+    supports_table_delta = True
+
+    # tor_switch and optical_switch offset the slice they match on by the
+    # active table version.
+    supports_versioned_tables = True
 
     _BACKEND_DIR = Path(__file__).resolve().parent
 
@@ -338,9 +391,18 @@ class MininetBackend(BackendBase):
         "cal_port_slice_to_node":    "cal_port_slice_to_node",
     }
 
+    # Range-matched key of each tor.p4 table. BMv2 needs a priority on range
+    # entries; BaseNetwork rejects overlapping ranges of one destination (see
+    # utils.find_range_overlap), so any fixed one works.
+    _RANGE_MATCH_KEYS = {
+        "per_hop_routing":           "arrival_ts",
+        "add_source_routing_entries": "arrival_ts",
+    }
+    _RANGE_PRIORITY = 1
+
     @classmethod
     def accepted_kwargs(cls) -> set:
-        return {"link_delay_ms"}
+        return {"link_delay_ms", "telemetry_addr", "telemetry_interval_us"}
 
     def __init__(
         self,
@@ -357,6 +419,11 @@ class MininetBackend(BackendBase):
         self._ip_to_tor: dict = {}
         self._tor_switches: list = []  # list[SwitchHandle]
         self._optical_switches: list = []  # list[SwitchHandle]
+        self._time_slice_duration_ms: int = 1
+        self._telemetry_addr = None
+        self.pushes_tor_metrics = False
+        # Persistent Thrift connections for table programming, by switch name.
+        self._table_clients: dict = {}
 
     # ------------------------------------------------------------------
     # BackendBase interface
@@ -373,14 +440,29 @@ class MininetBackend(BackendBase):
         guardband_us,
         calendar_queue_mode,
         link_delay_ms=0,
+        telemetry_addr=None,
+        telemetry_interval_us=1000,
         ocs_tor_link_bw_gbps: float = 1.0,
         tor_host_link_bw_gbps: float = 1.0,
         **backend_kwargs,
     ) -> None:
-        """Create the Mininet topology and start the network."""
+        """Create the Mininet topology and start the network.
+
+        With ``telemetry_addr`` (``"udp:<ip>:<port>"`` or ``"unix:<path>"``),
+        the ToR switches push their queue metrics there every
+        ``telemetry_interval_us`` and the dashboard receives them instead of
+        polling the switches.
+        """
+        if telemetry_addr is not None:
+            from openoptics.dashboard.collectors.tor_telemetry import parse_address
+
+            parse_address(telemetry_addr)  # Fail before starting any switch
+        self._telemetry_addr = telemetry_addr
+        self.pushes_tor_metrics = telemetry_addr is not None
         time_slice_duration_ms = _floor_us_to_ms_with_warn(
             "time_slice_duration", time_slice_duration_us, min_ms=1
         )
+        self._time_slice_duration_ms = time_slice_duration_ms
         guardband_ms = _floor_us_to_ms_with_warn("guardband", guardband_us)
         guardband_ms = guardband_ms + link_delay_ms
         warn_if_overhead_exhausts_slice(
@@ -425,6 +507,8 @@ class MininetBackend(BackendBase):
                 time_slice_duration_ms=time_slice_duration_ms,
                 guardband_ms=guardband_ms,
                 calendar_queue_mode=calendar_queue_mode,
+                telemetry_addr=telemetry_addr,
+                telemetry_interval_us=telemetry_interval_us,
                 cls=P4Switch,
             )
 
@@ -468,7 +552,15 @@ class MininetBackend(BackendBase):
             mac = "00:aa:bb:00:00:%02x" % node_id
             h.setARP(ip, mac)
 
-        self._net.start()
+        # P4Switch.batchStartup() waits for all switch processes at once.
+        with tracer.span("MininetBackend.start_switches", switches=len(self._net.switches)) as span:
+            self._net.start()
+            report = self.startup_report()
+            span.args.update(slowest=report["slowest"], slowest_s=report["slowest_s"])
+        print(
+            f"{len(report['switches'])} switches started in {span.duration_s:.1f} s "
+            f"(slowest: {report['slowest']}, {report['slowest_s']:.1f} s)."
+        )
 
         # Cache ToR + optical switch handles
         for switch in self._net.switches:
@@ -477,6 +569,32 @@ class MininetBackend(BackendBase):
             elif switch.switch_type() == "optical":
                 self._optical_switches.append(SwitchHandle(switch.name, switch.thrift_port))
 
+    def startup_report(self) -> dict:
+        """Time each switch took from launch to accepting Thrift connections.
+
+        Returns:
+            ``{"switches": {name: seconds}, "slowest": name, "slowest_s": seconds}``.
+        """
+        times = {
+            switch.name: switch.startup_s
+            for switch in self._net.switches
+            if isinstance(switch, P4Switch) and switch.startup_s is not None
+        }
+        slowest = max(times, key=times.get, default=None)
+        return {"switches": times, "slowest": slowest, "slowest_s": times.get(slowest, 0.0)}
+
+    def setup_dashboard(self, service) -> None:
+        """Receive the metrics the ToR switches push, if setup() enabled it."""
+        if self._telemetry_addr is None:
+            return
+        from openoptics.dashboard.collectors import TorTelemetryReceiver
+
+        service.register_collector(TorTelemetryReceiver(
+            self._telemetry_addr,
+            switch_names={int(sw.name[len("tor"):]): sw.name for sw in self._tor_switches},
+            interval_s=service.config.poll_interval_s,
+        ))
+
     def get_switch(self, name: str) -> SwitchHandle:
         node = self._net.nameToNode[name]
         return SwitchHandle(node.name, node.thrift_port)
@@ -508,6 +626,25 @@ class MininetBackend(BackendBase):
             )
         return " ".join(str(v) for v in params.values())
 
+    @staticmethod
+    def _render_match_keys(entry: TableEntry) -> str:
+        """Render match keys to a space-separated BMv2 CLI string.
+
+        The range key of a range-matched table is written as ``first->last``.
+        """
+        range_key = MininetBackend._RANGE_MATCH_KEYS.get(entry.table)
+        return " ".join(
+            "{}->{}".format(*match_range(v)) if k == range_key else str(v)
+            for k, v in entry.match_keys.items()
+        )
+
+    @staticmethod
+    def _priority_suffix(table: str) -> str:
+        """The trailing priority argument BMv2 needs for entries of range tables."""
+        if table in MininetBackend._RANGE_MATCH_KEYS:
+            return f" {MininetBackend._RANGE_PRIORITY}"
+        return ""
+
     @staticmethod
     def _entries_to_cli_str(entries: list) -> str:
         """Convert a list of TableEntry objects to BMv2 runtime_CLI commands."""
@@ -516,14 +653,73 @@ class MininetBackend(BackendBase):
             if e.is_default_action:
                 lines.append(f"table_set_default {e.table} {e.action}")
             else:
-                keys_str = " ".join(str(v) for v in e.match_keys.values())
+                keys_str = MininetBackend._render_match_keys(e)
                 params_str = MininetBackend._render_action_params(e.action_params)
+                priority = MininetBackend._priority_suffix(e.table)
                 if params_str:
-                    lines.append(f"table_add {e.table} {e.action} {keys_str} => {params_str}")
+                    lines.append(f"table_add {e.table} {e.action} {keys_str} => {params_str}{priority}")
                 else:
-                    lines.append(f"table_add {e.table} {e.action} {keys_str} => ")
+                    lines.append(f"table_add {e.table} {e.action} {keys_str} => {priority}")
         return "\n".join(lines) + ("\n" if lines else "")
 
+    @staticmethod
+    def _batch_to_cli_str(batch: TableBatch) -> str:
+        """Convert a TableBatch to BMv2 runtime_CLI commands, one row per command."""
+        if not len(batch):
+            return ""
+        range_key = MininetBackend._RANGE_MATCH_KEYS.get(batch.table)
+        key_fmts = []
+        cols = []
+        for i, name in enumerate(batch.key_names):
+            cols.append(i)
+            if name == range_key:
+                # An exact batch of a range table matches one slice per row.
+                cols.append(len(batch.key_names) if batch.range_key == name else i)
+                key_fmts.append("%d->%d")
+            else:
+                key_fmts.append("%d")
+        fmt = (
+            f"table_add {batch.table} {batch.action} "
+            + " ".join(key_fmts)
+            + " => "
+            + " ".join(["%d"] * len(batch.param_names))
+            + MininetBackend._priority_suffix(batch.table)
+        )
+        buf = io.StringIO()
+        np.savetxt(buf, np.hstack([batch.keys[:, cols], batch.params]), fmt=fmt)
+        return buf.getvalue()
+
+    @staticmethod
+    def _delta_to_cli_str(delta: TableDelta) -> str:
+        """Convert a TableDelta to BMv2 runtime_CLI commands.
+
+        Deletes run first so that a freed match key can be re-added in the
+        same batch. Modified and deleted entries are addressed by match key
+        (``table_modify_wkey`` / ``table_delete_wkey``), so no entry handles
+        need to be tracked.
+        """
+        lines = []
+        for e in delta.deletes:
+            if e.is_default_action:
+                lines.append(f"table_reset_default {e.table}")
+            else:
+                keys_str = MininetBackend._render_match_keys(e)
+                priority = MininetBackend._priority_suffix(e.table)
+                lines.append(f"table_delete_wkey {e.table} {keys_str}{priority}")
+        for e in delta.modifies:
+            if e.is_default_action:
+                lines.append(f"table_set_default {e.table} {e.action}")
+            else:
+                keys_str = MininetBackend._render_match_keys(e)
+                params_str = MininetBackend._render_action_params(e.action_params)
+                priority = MininetBackend._priority_suffix(e.table)
+                lines.append(
+                    f"table_modify_wkey {e.table} {e.action} {keys_str} => {params_str}".rstrip()
+                    + priority
+                )
+        adds = MininetBackend._entries_to_cli_str(delta.adds)
+        return "\n".join(lines) + ("\n" if lines else "") + adds
+
     def load_table(
         self,
         switch_name: str,
@@ -532,31 +728,109 @@ class MininetBackend(BackendBase):
         save_flag: bool = False,
         save_name: str = "saved_commands",
     ) -> bool:
-        switch = self._net.nameToNode[switch_name]
         table_commands = self._entries_to_cli_str(entries)
 
         if save_flag:
             with open(f"{save_name}.txt", "w") as fh:
                 fh.write(table_commands)
 
-        if not table_commands:
-            return True
-        if table_commands[-1] == "\n":
-            table_commands = table_commands[:-1]
+        return self._run_cli_commands(switch_name, table_commands, print_flag)
 
-        rst = switch.cmd(
-            f'echo "{table_commands}" | {self._CLI_PATH} --thrift-port {switch.thrift_port}'
+    def apply_table_delta(
+        self,
+        switch_name: str,
+        delta: TableDelta,
+        print_flag: bool = False,
+    ) -> bool:
+        return self._run_cli_commands(
+            switch_name, self._delta_to_cli_str(delta), print_flag
+        )
+
+    async def load_tables(self, batch_by_switch: dict, print_flag: bool = False) -> bool:
+        # Each switch's Thrift calls block on that switch; run them side by side.
+        results = await asyncio.gather(*(
+            _in_thread(self.load_table, switch_name, entries, print_flag=print_flag)
+            for switch_name, entries in batch_by_switch.items()
+        ))
+        return all(results)
+
+    def load_table_batch(
+        self, switch_name: str, batch: TableBatch, print_flag: bool = False
+    ) -> bool:
+        return self._run_cli_commands(
+            switch_name, self._batch_to_cli_str(batch), print_flag
         )
 
-        if rst is not None and print_flag:
-            print(rst)
+    async def load_table_batches(
+        self, batches_by_switch: dict, print_flag: bool = False
+    ) -> bool:
+        def load(switch_name, batches) -> bool:
+            # One pass over the switch's connection covers all of its batches.
+            entries = sum(len(b) for b in batches)
+            with tracer.span("MininetBackend.load_table_batches", switch=switch_name, entries=entries):
+                commands = "".join(self._batch_to_cli_str(b) for b in batches)
+                return self._run_cli_commands(switch_name, commands, print_flag)
+
+        results = await asyncio.gather(*(
+            _in_thread(load, switch_name, batches)
+            for switch_name, batches in batches_by_switch.items()
+        ))
+        return all(results)
+
+    async def apply_table_deltas(self, delta_by_switch: dict, print_flag: bool = False) -> bool:
+        results = await asyncio.gather(*(
+            _in_thread(self.apply_table_delta, switch_name, delta, print_flag=print_flag)
+            for switch_name, delta in delta_by_switch.items()
+        ))
+        return all(results)
+
+    async def set_active_version(self, version: int, at_us: Optional[int] = None) -> bool:
+        def flip(switch_name) -> bool:
+            try:
+                # at_time_us 0 asks the target for its next slice boundary.
+                self._table_client(switch_name).set_active_version(version, at_us or 0)
+            except BMv2TableError as e:
+                warnings.warn(f"Table version flip failed: {e}", RuntimeWarning, stacklevel=2)
+                return False
+            return True
 
-        if "Error:" in rst:
-            assert False, f"Error for {switch_name}!\n{rst}\n{table_commands}"
+        results = await asyncio.gather(*(
+            _in_thread(flip, switch.name)
+            for switch in self._net.switches
+            if switch.switch_type() in TARGET_SWITCH_TYPES
+        ))
+        if at_us is None:
+            # Every switch flips within one slice of receiving the command.
+            await asyncio.sleep(self._time_slice_duration_ms / 1000)
+        return all(results)
+
+    def _table_client(self, switch_name: str) -> BMv2TableClient:
+        """The switch's table programming connection, opened on first use."""
+        client = self._table_clients.get(switch_name)
+        if client is None:
+            switch = self._net.nameToNode[switch_name]
+            switch_type = switch.switch_type()
+            client = BMv2TableClient(
+                switch_name, switch.thrift_port, switch.json_path,
+                switch_type=switch_type if switch_type in TARGET_SWITCH_TYPES else None,
+            )
+            self._table_clients[switch_name] = client
+        return client
 
-        if "DUPLICATE_ENTRY" in rst:
-            assert False, f"DUPLICATE_ENTRY for {switch_name}!\n{rst}\n{table_commands}"
+    def _run_cli_commands(
+        self, switch_name: str, table_commands: str, print_flag: bool = False
+    ) -> bool:
+        """Run newline-separated runtime_CLI table commands on the named switch.
 
+        Raises:
+            BMv2TableError: The switch rejected a command.
+        """
+        if not table_commands:
+            return True
+        nb_commands = self._table_client(switch_name).run(table_commands)
+        tracer.annotate(bytes=len(table_commands), commands=nb_commands)
+        if print_flag:
+            print(f"{switch_name}: {nb_commands} table commands applied.")
         return True
 
     def clear_table(
@@ -566,14 +840,10 @@ class MininetBackend(BackendBase):
         print_flag: bool = False,
     ) -> None:
         bm2_name = self._TABLE_CLEAR_MAP.get(table, table)
-        switch = self._net.nameToNode[switch_name]
-        rst = switch.cmd(
-            f'echo "table_clear {bm2_name}" | {self._CLI_PATH} --thrift-port {switch.thrift_port}'
-        )
-        if print_flag and rst:
-            print(rst)
+        self._run_cli_commands(switch_name, f"table_clear {bm2_name}", print_flag)
 
     def stop(self) -> None:
+        self._table_clients.clear()
         self._net.stop()
 
     def cleanup(self) -> None:
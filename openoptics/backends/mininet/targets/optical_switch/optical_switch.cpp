@@ -26,6 +26,7 @@
 
 #include <unistd.h>
 
+#include <algorithm>
 #include <condition_variable>
 #include <deque>
 #include <fstream>
@@ -209,6 +210,7 @@ OpticalSwitch::OpticalSwitch(bool enable_swap, port_t drop_port,
     nb_queues_per_port(nb_queues_per_port),
     nb_time_slices(nb_time_slices),
     time_slice_duration_ms(time_slice_duration_ms),
+    slice_forwards(nb_time_slices),
     egress_buffers(nb_egress_threads,
                    64, EgressThreadMapper(nb_egress_threads),
                    nb_queues_per_port),
@@ -369,6 +371,55 @@ OpticalSwitch::set_all_egress_queue_rates(const uint64_t rate_pps) {
   return 0;
 }
 
+size_t
+OpticalSwitch::set_active_version(size_t version, int64_t at_time_us) {
+  int64_t now_us = get_ts().count();
+  if (at_time_us <= 0) {
+    int64_t slice_us = std::max<int64_t>(time_slice_duration_ms, 1) * 1000;
+    at_time_us = (now_us / slice_us + 1) * slice_us;
+  }
+  std::lock_guard<std::mutex> lock(version_mutex);
+  // Settle a flip that is already due before scheduling the next one.
+  if (now_us >= version_switch_us) active_version = next_version;
+  next_version = version;
+  version_switch_us = at_time_us;
+  return 0;
+}
+
+size_t
+OpticalSwitch::get_active_version() const {
+  return version_at(get_ts().count());
+}
+
+void
+OpticalSwitch::get_ocs_counters(oswitch_runtime::OcsCounters &_return,
+                                const std::string &hit_counter,
+                                const std::string &miss_counter,
+                                size_t nb_ports) {
+  bm::MatchTableAbstract::counter_value_t bytes, hits, misses;
+  for (size_t port = 0; port < nb_ports; port++) {
+    if (read_counters(0, hit_counter, port, &bytes, &hits) !=
+            bm::Counter::CounterErrorCode::SUCCESS ||
+        read_counters(0, miss_counter, port, &bytes, &misses) !=
+            bm::Counter::CounterErrorCode::SUCCESS) {
+      // The program lacks the counters, or has fewer ports.
+      break;
+    }
+    _return.hits.push_back(static_cast<int64_t>(hits));
+    _return.misses.push_back(static_cast<int64_t>(misses));
+  }
+  for (const auto &forwards : slice_forwards) {
+    _return.slice_forwards.push_back(
+        static_cast<int64_t>(forwards.load(std::memory_order_relaxed)));
+  }
+}
+
+size_t
+OpticalSwitch::version_at(int64_t ts_us) const {
+  std::lock_guard<std::mutex> lock(version_mutex);
+  return ts_us >= version_switch_us ? next_version : active_version;
+}
+
 uint64_t
 OpticalSwitch::get_time_elapsed_us() const {
   return get_ts().count();
@@ -506,7 +557,9 @@ OpticalSwitch::ingress_thread() {
                     ingress_port);
 
     //Reuse ingress_global_timestamp to represent time slice.
-    size_t time_slice = ts2time_slice(get_ts().count());
+    //The active table version selects which copy of the schedule matches.
+    int64_t now_us = get_ts().count();
+    size_t time_slice = ts2time_slice(now_us) + version_at(now_us) * version_slice_offset;
     phv->get_field("standard_metadata.ingress_global_timestamp").set(time_slice);
     //phv->get_field("standard_metadata.ingress_global_timestamp")
     //      .set(get_ts().count() / 1000); // In milliseconds
@@ -656,6 +709,7 @@ OpticalSwitch::ingress_thread() {
     auto &f_instance_type = phv->get_field("standard_metadata.instance_type");
     f_instance_type.set(PKT_INSTANCE_TYPE_NORMAL);
 
+    slice_forwards[ts2time_slice(now_us)].fetch_add(1, std::memory_order_relaxed);
     enqueue(egress_port, std::move(packet));
   }
 }
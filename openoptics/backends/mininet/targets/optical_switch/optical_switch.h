@@ -27,12 +27,16 @@
 #include <bm/bm_sim/switch.h>
 #include <bm/bm_sim/event_logger.h>
 #include <bm/bm_sim/simple_pre_lag.h>
+#include <bm/optical_switch_types.h>  // For OcsCounters
 
+#include <atomic>
 #include <memory>
 #include <chrono>
 #include <thread>
 #include <vector>
 #include <functional>
+#include <mutex>
+#include <string>
 
 // TODO(antonin)
 // experimental support for priority queueing
@@ -77,6 +81,8 @@ class OpticalSwitch : public Switch {
   static constexpr size_t default_nb_queues_per_port = 1;
   static constexpr size_t default_nb_time_slices = 1;
   static constexpr size_t default_time_slice_duration_ms = 0;
+  // Table entries of version v are keyed on time slice + v * offset.
+  static constexpr size_t version_slice_offset = 128;
 
  private:
   using clock = std::chrono::high_resolution_clock;
@@ -117,6 +123,18 @@ class OpticalSwitch : public Switch {
   int set_egress_queue_rate(size_t port, const uint64_t rate_pps);
   int set_all_egress_queue_rates(const uint64_t rate_pps);
 
+  // Make `version` the active table version at `at_time_us` (microseconds
+  // since the switch started), or at the next time slice boundary if <= 0.
+  size_t set_active_version(size_t version, int64_t at_time_us);
+  size_t get_active_version() const;
+
+  // Reads the P4 hit/miss counters of ports [0, nb_ports) and the number of
+  // packets forwarded in each time slice, for one bulk Thrift response.
+  void get_ocs_counters(oswitch_runtime::OcsCounters &_return,
+                        const std::string &hit_counter,
+                        const std::string &miss_counter,
+                        size_t nb_ports);
+
   // returns the number of microseconds elapsed since the switch started
   uint64_t get_time_elapsed_us() const;
 
@@ -175,6 +193,7 @@ class OpticalSwitch : public Switch {
 
   ts_res get_ts() const;
   size_t ts2time_slice(int64_t current_time);
+  size_t version_at(int64_t ts_us) const;
 
   // TODO(antonin): switch to pass by value?
   void enqueue(port_t egress_port, std::unique_ptr<Packet> &&packet);
@@ -197,6 +216,8 @@ class OpticalSwitch : public Switch {
   size_t nb_queues_per_port;
   size_t nb_time_slices;
   size_t time_slice_duration_ms;
+  // Packets forwarded per time slice; written by the ingress thread only.
+  std::vector<std::atomic<uint64_t> > slice_forwards;
   bm::QueueingLogicPriRL<std::unique_ptr<Packet>, EgressThreadMapper>
   egress_buffers;
   Queue<std::unique_ptr<Packet> > output_buffer;
@@ -205,6 +226,11 @@ class OpticalSwitch : public Switch {
   clock::time_point start;
   bool with_queueing_metadata{false};
   std::unique_ptr<MirroringSessions> mirroring_sessions;
+  // active_version until version_switch_us, next_version from then on.
+  mutable std::mutex version_mutex;
+  size_t active_version{0};
+  size_t next_version{0};
+  int64_t version_switch_us{0};
 };
 
 #endif  // SIMPLE_SWITCH_SIMPLE_SWITCH_H_
@@ -118,6 +118,20 @@ class OpticalSwitchAPI(runtime_CLI.RuntimeAPI):
         config = self.sswitch_client.mirroring_session_get(mirror_id)
         print(config)
 
+    @handle_bad_input
+    def do_set_active_version(self, line):
+        "Set the table version the schedule matches: set_active_version <version> [<at_time_us>]"
+        args = line.split()
+        self.at_least_n_args(args, 1)
+        version = self.parse_int(args[0], "version")
+        at_time_us = self.parse_int(args[1], "at_time_us") if len(args) > 1 else 0
+        self.sswitch_client.set_active_version(version, at_time_us)
+
+    @handle_bad_input
+    def do_get_active_version(self, line):
+        "Get the active table version: get_active_version"
+        print(self.sswitch_client.get_active_version())
+
     @handle_bad_input
     def do_get_time_elapsed(self, line):
         "Get time elapsed (in microseconds) since the switch started: get_time_elapsed"
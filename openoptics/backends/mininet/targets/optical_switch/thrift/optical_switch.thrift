@@ -34,6 +34,17 @@ exception InvalidMirroringOperation {
   1:MirroringOperationErrorCode code;
 }
 
+// Schedule counters of the OCS, read in one call.
+struct OcsCounters {
+  // packets per ingress port that matched / missed the schedule; empty if the
+  // P4 program does not define the counters
+  1:required list<i64> hits;
+  2:required list<i64> misses;
+  // packets forwarded in each time slice of the schedule since the switch
+  // started
+  3:required list<i64> slice_forwards;
+}
+
 service OpticalSwitch {
 
   // deprecated, use the mirroring_session_* RPCs instead
@@ -55,6 +66,16 @@ service OpticalSwitch {
   i32 set_egress_queue_rate(1:i32 port_num, 2:i64 rate_pps);
   i32 set_all_egress_queue_rates(1:i64 rate_pps);
 
+  // table version matched by the schedule; at_time_us <= 0 flips at the next
+  // time slice boundary
+  i32 set_active_version(1:i32 version, 2:i64 at_time_us);
+  i32 get_active_version();
+
+  // hit and miss counters of ports [0, nb_ports) and the per-slice forward
+  // counts, replacing 2 * nb_ports bm_counter_read calls
+  OcsCounters get_ocs_counters(1:string hit_counter, 2:string miss_counter,
+                               3:i32 nb_ports);
+
   // these methods are here as an experiment, prefer get_time_elapsed_us() when
   // possible
   i64 get_time_elapsed_us();
@@ -32,6 +32,9 @@ namespace thrift_provider = apache::thrift;
 #include <bm/bm_sim/logger.h>
 #include <bm/thrift/stdcxx.h>
 
+#include <algorithm>
+#include <string>
+
 #include "optical_switch.h"
 
 namespace oswitch_runtime {
@@ -145,6 +148,24 @@ class OpticalSwitchHandler : virtual public OpticalSwitchIf {
     return switch_->set_all_egress_queue_rates(static_cast<uint64_t>(rate_pps));
   }
 
+  int32_t set_active_version(const int32_t version, const int64_t at_time_us) {
+    bm::Logger::get()->trace("set_active_version");
+    return switch_->set_active_version(version, at_time_us);
+  }
+
+  int32_t get_active_version() {
+    bm::Logger::get()->trace("get_active_version");
+    return switch_->get_active_version();
+  }
+
+  void get_ocs_counters(OcsCounters& _return, const std::string &hit_counter,
+                        const std::string &miss_counter,
+                        const int32_t nb_ports) {
+    bm::Logger::get()->trace("get_ocs_counters");
+    switch_->get_ocs_counters(_return, hit_counter, miss_counter,
+                              static_cast<size_t>(std::max(nb_ports, 0)));
+  }
+
   int64_t get_time_elapsed_us() {
     bm::Logger::get()->trace("get_time_elapsed_us");
     // cast from unsigned to signed
@@ -18,7 +18,7 @@
  * Yiming Lei (ylei@mpi-inf.mpg.de)
  */
 
-//! @file queueing.h
+//! @file calendar_queue.h
 //! This file contains convenience classes that can be useful for targets that
 //! wish to queue packets at some point during processing (for example, between
 //! an ingress pipeline and an egress pipeline, as is the case for the standard
@@ -27,53 +27,45 @@
 //! for the standard, basic case: one queue per egress port, with a limited
 //! number of threads processing all the queues.
 
-#include <algorithm>  // for std::max
+#ifndef TOR_SWITCH_CALENDAR_QUEUE_H_
+#define TOR_SWITCH_CALENDAR_QUEUE_H_
+
+#include <algorithm>  // for std::min
+#include <atomic>
 #include <chrono>
 #include <condition_variable>
 #include <deque>
+#include <map>
+#include <memory>
 #include <mutex>
-#include <queue>
-#include <tuple>  // for std::forward_as_tuple
+#include <new>
+#include <tuple>
 #include <unordered_map>
-#include <utility>  // for std::piecewise_construct
+#include <utility>
 #include <vector>
 
-// These queueing implementations used to have one lock for each worker, which
-// meant that as long as 2 queues were assigned to different workers, they could
-// operate (push / pop) in parallel. Since we added support for arbitrary port
-// ids (and the port id is used as the queue id), we no longer have a reasonable
-// upper bound on the maximum possible port id at construction time and we can
-// no longer use a vector indexed by the queue id to store queue
-// information. Each push / pop operation can potentially insert a new entry
-// into the map. In order to accomodate for this, we had to start using a single
-// lock, shared by all the workers. It's unlikely that contention for this lock
-// will be a bottleneck.
-
-//! One of the most basic queueing block possible. Supports an arbitrary number
-//! of logical queues (identified by arbitrary integer ids). Lets you choose (at
-//! runtime) the number of worker threads that will be reading from these
-//! queues. I write "logical queues" because the implementation actually uses as
-//! many physical queues as there are worker threads. However, each logical
-//! queue still has its own maximum capacity.  As of now, the behavior is
-//! blocking for both read (pop_back()) and write (push_front()), but we may
-//! offer additional options if there is interest expressed in the future.
-//!
-//! Template parameter `T` is the type (has to be movable) of the objects that
-//! will be stored in the queues. Template parameter `FMap` is a callable object
-//! that has to be able to map every logical queue id to a worker id. The
-//! following is a good example of functor that meets the requirements:
-//! @code
-//! struct WorkerMapper {
-//!   WorkerMapper(size_t nb_workers)
-//!       : nb_workers(nb_workers) { }
+// The packets of each calendar queue used to sit in one std::deque, guarded
+// by a single lock that the ingress thread took for every push and the
+// egress thread for every (mostly unsuccessful) pop while it spun on the
+// active queue. Now each producer (worker) has its own single-producer /
+// single-consumer FIFO per calendar queue, which needs no lock: the producer
+// publishes entries with a release store and the consumer moves them out in
+// batches. Occupancy is kept in atomic counters. The egress thread sleeps
+// while the queue it serves is empty, and a producer only signals it when
+// its push takes that queue from empty to non-empty.
+
+//! Calendar queues of a ToR: one FIFO per time slice (or per destination for
+//! control-based queues), shared by all egress ports. Each (port, queue) pair
+//! still has its own maximum capacity.
 //!
-//!   size_t operator()(size_t queue_id) const {
-//!     return queue_id % nb_workers;
-//!   }
+//! Any number of producer threads may push, each with its own worker id
+//! below the `nb_workers` given at construction; a worker id must not be used
+//! by two threads at a time. Exactly one consumer thread may call
+//! pop_back(), pop_back_active() and the wait functions. Occupancy queries
+//! and active queue changes may come from any thread.
 //!
-//!   size_t nb_workers;
-//! };
-//! @endcode
+//! Template parameter `T` is the type (has to be movable) of the objects that
+//! will be stored in the queues.
 
 template <typename T>
 class CalendarQueue {
@@ -81,112 +73,184 @@ class CalendarQueue {
   using LockType = std::unique_lock<MutexType>;
 
  public:
-  //! \p capacity is the number of objects that each logical queue
-  //! can hold. 
-  CalendarQueue(size_t capacity, size_t nb_calendar_queues)
+  //! Wait on every queue, see wait_not_empty().
+  static constexpr size_t kAnyQueue = static_cast<size_t>(-1);
+
+  //! \p capacity is the number of objects that each (port, queue) pair can
+  //! hold. \p nb_workers is the number of producer threads.
+  CalendarQueue(size_t capacity, size_t nb_calendar_queues,
+                size_t nb_workers = 1)
       : capacity(capacity),
         nb_calendar_queues(nb_calendar_queues),
-        q_not_empty(new std::condition_variable[nb_calendar_queues]),
-        calendar_queues(new MyQ[nb_calendar_queues]) { }
+        nb_workers(nb_workers),
+        producers(new Producer[nb_workers]),
+        staged(nb_calendar_queues),
+        queue_depth(new std::atomic<size_t>[nb_calendar_queues]) {
+    for (size_t i = 0; i < nb_workers; i++) {
+      producers[i].fifos.reset(new SpscFifo[nb_calendar_queues]);
+    }
+    for (size_t q = 0; q < nb_calendar_queues; q++) queue_depth[q] = 0;
+  }
 
   //! Makes a copy of \p item and pushes it to the front of the calendar queue
   //! with \p port_id  \p queue_id.
   //! Return -1 if drop because of out of buffer
-  size_t push_front(size_t port_id, size_t queue_id, const T &item) {
-    LockType lock(mutex);
-    auto &q_info = get_queue(port_id, queue_id);
-    if (q_info.size >= capacity) {
-      return -1;
-    }
-    calendar_queues[queue_id].emplace_front(item, port_id);
-    q_info.size++;
-    overal_qdepth++;
-    q_not_empty[queue_id].notify_one();
-    return 0;
+  size_t push_front(size_t port_id, size_t queue_id, const T &item,
+                    size_t worker_id = 0) {
+    T copy(item);
+    return push_front(port_id, queue_id, std::move(copy), worker_id) ? 0 : -1;
   }
 
   //! Moves \p item to the front of the logical queue with id \p queue_id.
-  //! Return -1 if drop because of out of buffer
-  bool push_front(size_t port_id, size_t queue_id, T &&item) {
-    LockType lock(mutex);
-    auto &q_info = get_queue(port_id, queue_id);
-    if (q_info.size >= capacity) {
+  //! Returns false if dropped because the (port, queue) pair is full.
+  bool push_front(size_t port_id, size_t queue_id, T &&item,
+                  size_t worker_id = 0) {
+    auto &producer = producers[worker_id];
+    QueueInfo *info = producer_queue_info(&producer, port_id, queue_id);
+    if (info->size.load(std::memory_order_relaxed) >= capacity) {
       return false;
     }
-    calendar_queues[queue_id].emplace_front(std::move(item), port_id);
-    q_info.size++;
-    overal_qdepth++;
-    q_not_empty[queue_id].notify_one();
+    info->size.fetch_add(1, std::memory_order_relaxed);
+    overall_qdepth.fetch_add(1, std::memory_order_relaxed);
+    producer.fifos[queue_id].push(QE(std::move(item), port_id, info));
+    // seq_cst: pairs with the consumer publishing waiting_queue, see
+    // wait_not_empty().
+    if (queue_depth[queue_id].fetch_add(1) == 0) notify_consumer(queue_id);
     return true;
   }
 
-  //! Retrieves the oldest element for the worker thread indentified by \p
-  //! worker_id and moves it to \p pItem. The id of the logical queue which
-  //! contained this element is copied to \p queue_id. As a remainder, the
-  //! `map_to_worker` argument provided when constructing the class is used to
-  //! map every queue id to the corresponding worker id. Therefore, if an
-  //! element `E` was pushed to queue `queue_id`, you need to use the worker id
-  //! `map_to_worker(queue_id)` to retrieve it with this function.
+  //! Retrieves the oldest element of queue \p queue_id and moves it to \p
+  //! pItem. The port it was pushed for is copied to \p port_id. Returns false
+  //! if the queue is empty. Consumer thread only.
   bool pop_back(size_t queue_id, size_t *port_id, T *pItem) {
+    if (queue_id >= nb_calendar_queues) return false;
+    auto &batch = staged[queue_id];
+    if (batch.empty() && !refill(queue_id)) return false;
+    QE &qe = batch.front();
+    *port_id = qe.port_id;
+    *pItem = std::move(qe.e);
+    qe.info->size.fetch_sub(1, std::memory_order_relaxed);
+    batch.pop_front();
+    overall_qdepth.fetch_sub(1, std::memory_order_relaxed);
+    queue_depth[queue_id].fetch_sub(1, std::memory_order_relaxed);
+    return true;
+  }
+
+  //! Retrieves the oldest element of an active queue. Without per-port
+  //! assignments this pops the switch-wide active queue. Otherwise the ports
+  //! with an assigned queue are served round robin, and \p port_id is set to
+  //! the serving port rather than the port the element was enqueued for.
+  //! The id of the queue popped from is copied to \p queue_id. Consumer
+  //! thread only.
+  bool pop_back_active(size_t *queue_id, size_t *port_id, T *pItem) {
     LockType lock(mutex);
-    auto &queue = calendar_queues[queue_id];
-    //while (queue.size() == 0) {
-    //  q_not_empty[queue_id].wait(lock);
-    //}
-    if (queue.size() == 0) {
-      return false;
+    if (port_active_queue.empty()) {
+      *queue_id = active_calendar_queue.load(std::memory_order_relaxed);
+      return pop_back(*queue_id, port_id, pItem);
     }
-    *port_id = queue.back().port_id;
-    *pItem = std::move(queue.back().e);
-    queue.pop_back();
-    auto &q_info = get_queue_or_throw(*port_id, queue_id);
-    q_info.size--;
-    overal_qdepth--;
+    auto it = port_active_queue.upper_bound(last_served_port);
+    for (size_t i = 0; i < port_active_queue.size(); i++, it++) {
+      if (it == port_active_queue.end()) it = port_active_queue.begin();
+      if (pop_back(it->second, port_id, pItem)) {
+        last_served_port = it->first;
+        *queue_id = it->second;
+        *port_id = it->first;
+        return true;
+      }
+    }
+    return false;
+  }
 
-    return true;
+  //! Blocks the consumer until queue \p queue_id (any queue for kAnyQueue)
+  //! goes from empty to non-empty, the active queues change, or \p timeout
+  //! passes. Returns immediately if the queue is not empty.
+  template <typename Rep, typename Period>
+  void wait_not_empty(size_t queue_id,
+                      const std::chrono::duration<Rep, Period> &timeout) {
+    wait_(queue_id, timeout, [this, queue_id] {
+      return queue_id == kAnyQueue
+          ? overall_qdepth.load() > 0
+          : queue_id < nb_calendar_queues && queue_depth[queue_id].load() > 0;
+    });
+  }
+
+  //! Like wait_not_empty(), for the queues pop_back_active() serves.
+  template <typename Rep, typename Period>
+  void wait_active_not_empty(const std::chrono::duration<Rep, Period> &timeout) {
+    std::vector<size_t> queues;
+    {
+      LockType lock(mutex);
+      for (const auto &p : port_active_queue) queues.push_back(p.second);
+      if (queues.empty()) queues.push_back(active_calendar_queue.load());
+    }
+    wait_(queues.size() == 1 ? queues[0] : kAnyQueue, timeout, [&] {
+      for (size_t q : queues) {
+        if (q < nb_calendar_queues && queue_depth[q].load() > 0) return true;
+      }
+      return false;
+    });
   }
 
   //! Get the occupancy of the logical queue with id \p queue_id.
   size_t size(size_t port_id, size_t queue_id) const {
-    LockType lock(mutex);
+    LockType lock(info_mutex);
     auto it = port_q_info.find({port_id, queue_id});
     if (it == port_q_info.end()) return 0;
-    auto &q_info = it->second;
-    return q_info.size;
+    return it->second->size.load(std::memory_order_relaxed);
   }
 
   size_t get_q_size(size_t port_id, size_t queue_id) const {
     return size(port_id, queue_id);
   }
-  
+
   size_t get_overall_size() const {
-    LockType lock(mutex);
-    return overal_qdepth;
+    return overall_qdepth.load(std::memory_order_relaxed);
   }
 
   std::vector<std::tuple<size_t, size_t, size_t>> get_port_queue_size() const {
-      std::vector<std::tuple<size_t, size_t, size_t>> p_q_size;
-    LockType lock(mutex);
+    std::vector<std::tuple<size_t, size_t, size_t>> p_q_size;
+    LockType lock(info_mutex);
     for (auto it = port_q_info.begin(); it != port_q_info.end(); ++it) {
-        size_t port_id = it->first.first;
-        size_t queue_id = it->first.second;
-        size_t q_size = it->second.size;
+      size_t port_id = it->first.first;
+      size_t queue_id = it->first.second;
+      size_t q_size = it->second->size.load(std::memory_order_relaxed);
 
-        p_q_size.push_back(std::make_tuple(port_id, queue_id, q_size));
+      p_q_size.push_back(std::make_tuple(port_id, queue_id, q_size));
     }
-      return p_q_size;
+    return p_q_size;
   }
 
-
+  //! Sets the active queue for all ports, dropping per-port assignments.
   size_t set_active_queue(size_t qid) {
-    LockType lock(mutex);
-    active_calendar_queue = qid;
+    {
+      LockType lock(mutex);
+      active_calendar_queue = qid;
+      port_active_queue.clear();
+    }
+    wake_consumer();
     return 0;
   }
 
   size_t get_active_queue() const {
+    return active_calendar_queue.load(std::memory_order_relaxed);
+  }
+
+  //! Sets the queue served by egress port \p port_id. Once any port has an
+  //! assignment, only ports with an assignment are served.
+  size_t set_port_active_queue(size_t port_id, size_t qid) {
+    {
+      LockType lock(mutex);
+      port_active_queue[port_id] = qid;
+    }
+    wake_consumer();
+    return 0;
+  }
+
+  size_t get_port_active_queue(size_t port_id) const {
     LockType lock(mutex);
-    return active_calendar_queue;
+    auto it = port_active_queue.find(port_id);
+    if (it == port_active_queue.end()) return active_calendar_queue;
+    return it->second;
   }
 
   //! Deleted copy constructor
@@ -200,37 +264,93 @@ class CalendarQueue {
   CalendarQueue &&operator =(CalendarQueue &&) = delete;
 
  private:
+  struct QueueInfo {
+    std::atomic<size_t> size{0};
+  };
+
   struct QE {
-    QE(T e, size_t port_id)
-        : e(std::move(e)), port_id(port_id) { }
+    QE(T e, size_t port_id, QueueInfo *info)
+        : e(std::move(e)), port_id(port_id), info(info) { }
 
     T e;
     size_t port_id;
+    QueueInfo *info;  // Occupancy of (port_id, queue), decremented on pop
   };
 
-  using MyQ = std::deque<QE>;
+  static constexpr size_t kCacheLine = 64;
 
-  struct QueueInfo {
-    explicit QueueInfo(): size(0) { }
-    size_t size;
-  };
+  // Unbounded single-producer / single-consumer FIFO: a linked list of
+  // fixed-size blocks. A calendar queue holds up to `capacity` entries per
+  // port and the ports are not known up front, so it cannot be a fixed ring.
+  // The producer only allocates once per block and the consumer frees
+  // drained blocks.
+  class SpscFifo {
+   public:
+    SpscFifo() : head(new Block()), tail(head) { }
 
-  QueueInfo &get_queue(size_t port_id, size_t queue_id) {
-    auto it = port_q_info.find({port_id,queue_id});
-    if (it != port_q_info.end()) return it->second;
-    // piecewise_construct because QueueInfo is not copyable (because of mutex
-    // member)
-    auto p = port_q_info.emplace(std::make_pair(port_id,queue_id), QueueInfo());
-    return p.first->second;
-  }
+    ~SpscFifo() {
+      std::deque<QE> rest;
+      while (pop_batch(&rest, kBlockSize) > 0) rest.clear();
+      delete head;
+    }
 
-  const QueueInfo &get_queue_or_throw(size_t port_id, size_t queue_id) const {
-    return port_q_info.at({port_id,queue_id});
-  }
+    //! Producer side.
+    void push(QE &&qe) {
+      if (tail_idx == kBlockSize) {
+        auto *block = new Block();
+        tail->next.store(block, std::memory_order_release);
+        tail = block;
+        tail_idx = 0;
+      }
+      new (tail->slot(tail_idx)) QE(std::move(qe));
+      tail->committed.store(++tail_idx, std::memory_order_release);
+    }
 
-  QueueInfo &get_queue_or_throw(size_t port_id, size_t queue_id) {
-    return port_q_info.at({port_id,queue_id});
-  }
+    //! Consumer side: moves up to \p max entries to the back of \p out.
+    size_t pop_batch(std::deque<QE> *out, size_t max) {
+      size_t n = 0;
+      while (n < max) {
+        size_t committed = head->committed.load(std::memory_order_acquire);
+        if (head_idx < committed) {
+          for (; head_idx < committed && n < max; head_idx++, n++) {
+            QE *qe = head->slot(head_idx);
+            out->push_back(std::move(*qe));
+            qe->~QE();
+          }
+          continue;
+        }
+        if (head_idx < kBlockSize) break;
+        Block *next = head->next.load(std::memory_order_acquire);
+        if (next == nullptr) break;
+        delete head;
+        head = next;
+        head_idx = 0;
+      }
+      return n;
+    }
+
+   private:
+    static constexpr size_t kBlockSize = 256;
+
+    struct Block {
+      QE *slot(size_t i) { return reinterpret_cast<QE *>(slots[i]); }
+
+      std::atomic<size_t> committed{0};  // Slots the producer has filled
+      std::atomic<Block *> next{nullptr};
+      alignas(QE) unsigned char slots[kBlockSize][sizeof(QE)];
+    };
+
+    // Consumer and producer ends on separate cache lines. The FIFOs are
+    // allocated with new[], which only guarantees 16-byte alignment before
+    // C++17, so they are padded rather than alignas(64): each end is 16 bytes
+    // at a 16-byte aligned offset, kCacheLine bytes from the next one.
+    Block *head;
+    size_t head_idx{0};
+    char head_pad[kCacheLine - sizeof(Block *) - sizeof(size_t)];
+    Block *tail;
+    size_t tail_idx{0};
+    char tail_pad[kCacheLine - sizeof(Block *) - sizeof(size_t)];
+  };
 
   struct PairHash {
     template <class T1, class T2>
@@ -248,13 +368,118 @@ class CalendarQueue {
       }
   };
 
-  mutable MutexType mutex{};
+  using QueueKey = std::pair<size_t, size_t>;
+
+  struct Producer {
+    std::unique_ptr<SpscFifo[]> fifos;  // One per calendar queue
+    // This producer's view of port_q_info, so that only the first push to a
+    // (port, queue) pair takes info_mutex.
+    std::unordered_map<QueueKey, QueueInfo *, PairHash, PairEqual> info_cache;
+    // Keeps the workers' producers, allocated with new[], off each other's
+    // cache lines.
+    char pad[kCacheLine];
+  };
+
+  // Entries moved out of the FIFOs per batch.
+  static constexpr size_t kPopBatch = 64;
+
+  QueueInfo *producer_queue_info(Producer *producer, size_t port_id,
+                                 size_t queue_id) {
+    auto key = std::make_pair(port_id, queue_id);
+    auto it = producer->info_cache.find(key);
+    if (it != producer->info_cache.end()) return it->second;
+    QueueInfo *info;
+    {
+      LockType lock(info_mutex);
+      auto &slot = port_q_info[key];
+      if (!slot) slot.reset(new QueueInfo());
+      info = slot.get();
+    }
+    producer->info_cache.emplace(key, info);
+    return info;
+  }
+
+  bool refill(size_t queue_id) {
+    auto &batch = staged[queue_id];
+    size_t n = 0;
+    for (size_t i = 0; i < nb_workers && n < kPopBatch; i++) {
+      size_t worker = (next_worker + i) % nb_workers;
+      n += producers[worker].fifos[queue_id].pop_batch(&batch, kPopBatch - n);
+    }
+    next_worker = (next_worker + 1) % nb_workers;
+    return n > 0;
+  }
+
+  template <typename Rep, typename Period, typename Pred>
+  void wait_(size_t queue_id, const std::chrono::duration<Rep, Period> &timeout,
+             Pred has_elements) {
+    if (has_elements()) return;
+    LockType lock(wait_mutex);
+    auto seen = wake_seq;
+    // Publish the wait before checking again, so that a producer either sees
+    // it or its element is seen here (both seq_cst).
+    waiting_queue.store(queue_id);
+    if (!has_elements()) {
+      wake_cv.wait_for(lock, timeout, [&] { return wake_seq != seen; });
+    }
+    waiting_queue.store(kNoQueue, std::memory_order_relaxed);
+  }
+
+  void notify_consumer(size_t queue_id) {
+    auto waiting = waiting_queue.load();
+    if (waiting == queue_id || waiting == kAnyQueue) wake_consumer();
+  }
+
+  void wake_consumer() {
+    {
+      LockType lock(wait_mutex);
+      wake_seq++;
+    }
+    wake_cv.notify_one();
+  }
+
+  static constexpr size_t kNoQueue = static_cast<size_t>(-2);
+
   size_t capacity;  // default capacity
-  size_t overal_qdepth;
   size_t nb_calendar_queues;
-  size_t active_calendar_queue = nb_calendar_queues;
-  std::unordered_map<std::pair<size_t, size_t>, QueueInfo, PairHash, PairEqual> port_q_info;
+  size_t nb_workers;
+  std::unique_ptr<Producer[]> producers;
+
+  // Consumer state: entries moved out of the FIFOs, by queue.
+  std::vector<std::deque<QE>> staged;
+  size_t next_worker = 0;
+  size_t last_served_port = 0;
+
+  // Elements per calendar queue and in total, over all ports.
+  std::unique_ptr<std::atomic<size_t>[]> queue_depth;
+  std::atomic<size_t> overall_qdepth{0};
+
+  mutable MutexType info_mutex{};
+  std::unordered_map<QueueKey, std::unique_ptr<QueueInfo>, PairHash, PairEqual>
+      port_q_info;
+
+  // Guards port_active_queue; pushes never take it.
+  mutable MutexType mutex{};
+  std::atomic<size_t> active_calendar_queue{nb_calendar_queues};
+  // Per-port active queues (multi-link TA); empty means all ports use
+  // active_calendar_queue.
+  std::map<size_t, size_t> port_active_queue;
+
+  // The consumer sleeps on wake_cv while waiting_queue is empty.
+  MutexType wait_mutex{};
+  std::condition_variable wake_cv;
+  uint64_t wake_seq = 0;
+  std::atomic<size_t> waiting_queue{kNoQueue};
+};
+
+// Definitions of the constants that are odr-used (needed before C++17).
+template <typename T>
+constexpr size_t CalendarQueue<T>::kAnyQueue;
+template <typename T>
+constexpr size_t CalendarQueue<T>::kNoQueue;
+template <typename T>
+constexpr size_t CalendarQueue<T>::kPopBatch;
+template <typename T>
+constexpr size_t CalendarQueue<T>::SpscFifo::kBlockSize;
 
-  std::condition_variable *q_not_empty;
-  MyQ *calendar_queues;
-};
\ No newline at end of file
+#endif  // TOR_SWITCH_CALENDAR_QUEUE_H_
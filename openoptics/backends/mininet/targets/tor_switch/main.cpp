@@ -22,6 +22,9 @@
 
 #include <bm/config.h>
 
+#include <iostream>
+#include <string>
+
 #include <bm/TorSwitch.h>
 #include <bm/bm_runtime/bm_runtime.h>
 #include <bm/bm_sim/options_parse.h>
@@ -64,6 +67,12 @@ main(int argc, char* argv[]) {
   tor_switch_parser.add_uint_option(
       "calendar-queue-mode",
       "Calendar queue mode (default is TIME_BASED)");
+  tor_switch_parser.add_string_option(
+      "telemetry-addr",
+      "Push queue telemetry to udp:<ip>:<port> or unix:<path> (default is off)");
+  tor_switch_parser.add_uint_option(
+      "telemetry-interval-us",
+      "Telemetry push interval in microseconds (default is 1000)");
 
   bm::OptionsParser parser;
   parser.parse(argc, argv, &tor_switch_parser);
@@ -164,6 +173,26 @@ main(int argc, char* argv[]) {
   int status = tor_switch->init_from_options_parser(parser);
   if (status != 0) std::exit(status);
 
+  std::string telemetry_addr;
+  {
+    auto rc = tor_switch_parser.get_string_option(
+        "telemetry-addr", &telemetry_addr);
+    if (rc == bm::TargetParserBasic::ReturnCode::SUCCESS) {
+      uint32_t telemetry_interval_us = 1000;
+      auto rc_interval = tor_switch_parser.get_uint_option(
+          "telemetry-interval-us", &telemetry_interval_us);
+      if (rc_interval != bm::TargetParserBasic::ReturnCode::SUCCESS &&
+          rc_interval != bm::TargetParserBasic::ReturnCode::OPTION_NOT_PROVIDED)
+        std::exit(1);
+      if (!tor_switch->enable_telemetry(telemetry_addr, telemetry_interval_us)) {
+        std::cerr << "Invalid telemetry address: " << telemetry_addr << std::endl;
+        std::exit(1);
+      }
+    } else if (rc != bm::TargetParserBasic::ReturnCode::OPTION_NOT_PROVIDED) {
+      std::exit(1);
+    }
+  }
+
   int thrift_port = tor_switch->get_runtime_port();
   bm_runtime::start_server(tor_switch, thrift_port);
   using ::tswitch_runtime::TorSwitchIf;
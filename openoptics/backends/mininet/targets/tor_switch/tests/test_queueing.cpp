@@ -21,9 +21,13 @@
 #include <memory>
 #include <vector>
 #include <algorithm>  // for std::is_sorted
+#include <chrono>
+#include <iostream>
+#include <thread>
 
 #include <boost/filesystem.hpp>
 
+#include "calendar_queue.h"
 #include "tor_switch.h"
 
 #include "utils.h"
@@ -241,3 +245,106 @@ TEST_F(TorSwitch_QueueingP4, QueueingAdvanced) {
   // when last packet leaves queue, it is empty
   ASSERT_EQ(0, deq_qdepths.back());
 }
+
+// CalendarQueue on its own, without a switch.
+
+TEST(CalendarQueue, FifoAndCapacity) {
+  CalendarQueue<std::unique_ptr<int> > cq(4 /* per (port, queue) */, 2);
+  for (int i = 0; i < 5; i++) {
+    ASSERT_EQ(i < 4, cq.push_front(1, 0, std::unique_ptr<int>(new int(i))));
+  }
+  ASSERT_TRUE(cq.push_front(2, 0, std::unique_ptr<int>(new int(4))));
+  ASSERT_EQ(4u, cq.size(1, 0));
+  ASSERT_EQ(5u, cq.get_overall_size());
+
+  size_t port;
+  std::unique_ptr<int> item;
+  for (int i = 0; i < 5; i++) {
+    ASSERT_TRUE(cq.pop_back(0, &port, &item));
+    ASSERT_EQ(i, *item);
+    ASSERT_EQ(i < 4 ? 1u : 2u, port);
+  }
+  ASSERT_FALSE(cq.pop_back(0, &port, &item));
+  ASSERT_FALSE(cq.pop_back(2, &port, &item));  // no such queue
+  ASSERT_EQ(0u, cq.size(1, 0));
+  ASSERT_EQ(0u, cq.get_overall_size());
+}
+
+TEST(CalendarQueue, PopBackActivePerPort) {
+  CalendarQueue<int> cq(16, 3);
+  cq.set_port_active_queue(0, 1);
+  cq.set_port_active_queue(1, 2);
+  cq.push_front(7, 0, 30);  // not served
+  cq.push_front(7, 1, 10);
+  cq.push_front(7, 2, 20);
+
+  size_t queue_id, port;
+  int item;
+  ASSERT_TRUE(cq.pop_back_active(&queue_id, &port, &item));
+  ASSERT_EQ(2u, queue_id);
+  ASSERT_EQ(1u, port);  // the serving port
+  ASSERT_TRUE(cq.pop_back_active(&queue_id, &port, &item));
+  ASSERT_EQ(10, item);
+  ASSERT_FALSE(cq.pop_back_active(&queue_id, &port, &item));
+
+  cq.set_active_queue(0);
+  ASSERT_TRUE(cq.pop_back_active(&queue_id, &port, &item));
+  ASSERT_EQ(30, item);
+}
+
+TEST(CalendarQueue, PushWakesWaitingConsumer) {
+  CalendarQueue<int> cq(16, 2);
+  std::thread producer([&cq] {
+    std::this_thread::sleep_for(std::chrono::milliseconds(20));
+    cq.push_front(0, 1, 1);
+  });
+  auto start = std::chrono::steady_clock::now();
+  cq.wait_not_empty(1, std::chrono::seconds(10));
+  auto waited = std::chrono::steady_clock::now() - start;
+  producer.join();
+  ASSERT_LT(waited, std::chrono::seconds(5));
+  ASSERT_EQ(1u, cq.get_overall_size());
+}
+
+// Micro-benchmark: producers push to rotating queues while one consumer
+// drains them, sleeping whenever its queue is empty, like egress_cq_thread.
+// Prints the throughput; fails only if elements are lost or reordered.
+TEST(CalendarQueue, Throughput) {
+  static constexpr size_t kWorkers = 2;
+  static constexpr size_t kQueues = 4;
+  static constexpr size_t kPerWorker = 1000000;
+  CalendarQueue<std::unique_ptr<size_t> > cq(kPerWorker, kQueues, kWorkers);
+
+  auto start = std::chrono::steady_clock::now();
+  std::vector<std::thread> producers;
+  for (size_t w = 0; w < kWorkers; w++) {
+    producers.emplace_back([&cq, w] {
+      for (size_t i = 0; i < kPerWorker; i++) {
+        cq.push_front(w, i % kQueues, std::unique_ptr<size_t>(new size_t(i)), w);
+      }
+    });
+  }
+
+  std::vector<size_t> next(kWorkers * kQueues);
+  for (size_t i = 0; i < next.size(); i++) next[i] = i % kQueues;
+  size_t received = 0, queue_id = 0, port;
+  std::unique_ptr<size_t> item;
+  while (received < kWorkers * kPerWorker) {
+    if (cq.pop_back(queue_id, &port, &item)) {
+      // Each worker pushed i to queue i % kQueues, for port w.
+      ASSERT_EQ(next[port * kQueues + queue_id], *item);
+      next[port * kQueues + queue_id] += kQueues;
+      received++;
+    } else {
+      cq.wait_not_empty(queue_id, std::chrono::microseconds(100));
+      queue_id = (queue_id + 1) % kQueues;
+    }
+  }
+  for (auto &producer : producers) producer.join();
+  std::chrono::duration<double> elapsed = std::chrono::steady_clock::now() - start;
+
+  ASSERT_EQ(0u, cq.get_overall_size());
+  std::cout << "CalendarQueue: " << received / elapsed.count() / 1e6
+            << " Mpkt/s (" << kWorkers << " producers, " << kQueues
+            << " queues)\n";
+}
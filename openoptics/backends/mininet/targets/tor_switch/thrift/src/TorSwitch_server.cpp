@@ -155,6 +155,32 @@ class TorSwitchHandler : virtual public TorSwitchIf {
     return switch_->get_active_queue();
   }
 
+  int32_t set_port_active_queue(const int32_t port_num, const int32_t active_q) {
+    bm::Logger::get()->trace("set_port_active_queue");
+    return switch_->set_port_active_queue(port_num, active_q);
+  }
+
+  int32_t get_port_active_queue(const int32_t port_num) {
+    bm::Logger::get()->trace("get_port_active_queue");
+    return switch_->get_port_active_queue(port_num);
+  }
+
+  int32_t schedule_active_queue(const int32_t port_num, const int32_t active_q,
+                                const int64_t at_time_us) {
+    bm::Logger::get()->trace("schedule_active_queue");
+    return switch_->schedule_active_queue(port_num, active_q, at_time_us);
+  }
+
+  int32_t set_active_version(const int32_t version, const int64_t at_time_us) {
+    bm::Logger::get()->trace("set_active_version");
+    return switch_->set_active_version(version, at_time_us);
+  }
+
+  int32_t get_active_version() {
+    bm::Logger::get()->trace("get_active_version");
+    return switch_->get_active_version();
+  }
+
   int64_t get_time_elapsed_us() {
     bm::Logger::get()->trace("get_time_elapsed_us");
     // cast from unsigned to signed
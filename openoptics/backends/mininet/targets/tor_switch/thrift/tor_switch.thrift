@@ -75,6 +75,16 @@ service TorSwitch {
 
   i32 set_active_queue(1:i32 qid);
   i32 get_active_queue();
+  i32 set_port_active_queue(1:i32 port_num, 2:i32 qid);
+  i32 get_port_active_queue(1:i32 port_num);
+  // serve qid on port_num (every port if port_num < 0) from at_time_us,
+  // microseconds since the clock's epoch
+  i32 schedule_active_queue(1:i32 port_num, 2:i32 qid, 3:i64 at_time_us);
+
+  // table version matched by the routing tables; at_time_us <= 0 flips at the
+  // next time slice boundary
+  i32 set_active_version(1:i32 version, 2:i64 at_time_us);
+  i32 get_active_version();
 
   // these methods are here as an experiment, prefer get_time_elapsed_us() when
   // possible
@@ -25,8 +25,15 @@
 #include <bm/bm_sim/logger.h>
 
 #include <unistd.h>
+#include <arpa/inet.h>
+#include <netinet/in.h>
+#include <sys/socket.h>
+#include <sys/un.h>
 
+#include <algorithm>
 #include <condition_variable>
+#include <cstdlib>
+#include <cstring>
 #include <deque>
 #include <fstream>
 #include <iostream>
@@ -281,15 +288,18 @@ TorSwitch::receive_(port_t port_num, const char *buffer, int len) {
   f_instance_type.set(PKT_INSTANCE_TYPE_NORMAL);
 
   size_t time_slice;
+  int64_t now_us = slice_clock_us();
   if (calendar_queue_mode == CalendarQueueMode::TIME_BASED) {
     // Advance ingress time slice by guardband. It is equivalent to ending the current time slice earlier.
     //BMLOG_DEBUG("guardband_ms={}. Original time slice={}", guardband_ms,ts2time_slice(get_ts().count()));
-    time_slice = ts2time_slice(get_ts().count() + guardband_ms*1000);
+    time_slice = ts2time_slice(now_us);
     //time_slice = ts2time_slice(get_ts().count());
     //BMLOG_DEBUG("Offset time slice with guardband={}", time_slice);
   } else {
     time_slice = 0; // TA
   }
+  // The active table version selects which copy of the routing tables matches.
+  time_slice += version_at(now_us) * version_slice_offset;
 
   if (phv->has_field("intrinsic_metadata.ingress_global_timestamp")) {
     phv->get_field("intrinsic_metadata.ingress_global_timestamp")
@@ -313,6 +323,10 @@ TorSwitch::start_and_return_() {
     threads_.push_back(std::thread(&TorSwitch::egress_thread, this, i));
   }
   threads_.push_back(std::thread(&TorSwitch::transmit_thread, this));
+  threads_.push_back(std::thread(&TorSwitch::queue_schedule_thread, this));
+  if (telemetry_fd >= 0) {
+    threads_.push_back(std::thread(&TorSwitch::telemetry_thread, this));
+  }
 }
 
 void
@@ -333,9 +347,20 @@ TorSwitch::~TorSwitch() {
     while (egress_buffers.push_front(i, 0, nullptr) == 0) continue;
   }
   output_buffer.push_front(nullptr);
+  {
+    std::lock_guard<std::mutex> lock(queue_schedule_mutex);
+    queue_schedule_stop = true;
+  }
+  queue_schedule_cv.notify_all();
+  {
+    std::lock_guard<std::mutex> lock(telemetry_stop_mutex);
+    telemetry_stop = true;
+  }
+  telemetry_cv.notify_all();
   for (auto& thread_ : threads_) {
     thread_.join();
   }
+  if (telemetry_fd >= 0) close(telemetry_fd);
 }
 
 void
@@ -429,6 +454,96 @@ TorSwitch::get_active_queue() const {
   return qid;
 }
 
+size_t
+TorSwitch::set_port_active_queue(size_t port, size_t qid) {
+  if (calendar_queue_mode == TorSwitch::CalendarQueueMode::TIME_BASED) {
+    printf("Cannot set active queue at time-based mode.\n");
+    return 1;
+  }
+  egress_cq_buffers.set_port_active_queue(port, qid);
+  return 0;
+}
+
+size_t
+TorSwitch::get_port_active_queue(size_t port) const {
+  return egress_cq_buffers.get_port_active_queue(port);
+}
+
+size_t
+TorSwitch::schedule_active_queue(int port, size_t qid, int64_t at_time_us) {
+  if (calendar_queue_mode == TorSwitch::CalendarQueueMode::TIME_BASED) {
+    printf("Cannot set active queue at time-based mode.\n");
+    return 1;
+  }
+  {
+    std::lock_guard<std::mutex> lock(queue_schedule_mutex);
+    queue_schedule.emplace(at_time_us, std::make_pair(port, qid));
+  }
+  queue_schedule_cv.notify_all();
+  return 0;
+}
+
+void
+TorSwitch::queue_schedule_thread() {
+  std::unique_lock<std::mutex> lock(queue_schedule_mutex);
+  while (!queue_schedule_stop) {
+    if (queue_schedule.empty()) {
+      queue_schedule_cv.wait(lock);
+      continue;
+    }
+    auto next = queue_schedule.begin();
+    int64_t wait_us = next->first - get_ts().count();
+    if (wait_us > 0) {
+      // Woken early by a new, earlier change or by shutdown; re-check.
+      queue_schedule_cv.wait_for(lock, std::chrono::microseconds(wait_us));
+      continue;
+    }
+    auto port = next->second.first;
+    auto qid = next->second.second;
+    queue_schedule.erase(next);
+    if (port < 0) {
+      egress_cq_buffers.set_active_queue(qid);
+    } else {
+      egress_cq_buffers.set_port_active_queue(port, qid);
+    }
+  }
+}
+
+size_t
+TorSwitch::set_active_version(size_t version, int64_t at_time_us) {
+  int64_t now_us = slice_clock_us();
+  if (at_time_us <= 0) {
+    int64_t slice_us = std::max<int64_t>(time_slice_duration_ms, 1) * 1000;
+    at_time_us = (now_us / slice_us + 1) * slice_us;
+  }
+  std::lock_guard<std::mutex> lock(version_mutex);
+  // Settle a flip that is already due before scheduling the next one.
+  if (now_us >= version_switch_us) active_version = next_version;
+  next_version = version;
+  version_switch_us = at_time_us;
+  return 0;
+}
+
+size_t
+TorSwitch::get_active_version() const {
+  return version_at(slice_clock_us());
+}
+
+int64_t
+TorSwitch::slice_clock_us() const {
+  // Time slices start a guardband early in time-based mode.
+  if (calendar_queue_mode == CalendarQueueMode::TIME_BASED) {
+    return get_ts().count() + guardband_ms*1000;
+  }
+  return get_ts().count();
+}
+
+size_t
+TorSwitch::version_at(int64_t ts_us) const {
+  std::lock_guard<std::mutex> lock(version_mutex);
+  return ts_us >= version_switch_us ? next_version : active_version;
+}
+
 void
 TorSwitch::get_num_queued_packets(std::string& _return) const {
   std::string output;
@@ -507,6 +622,169 @@ TorSwitch::record_queue_latency(size_t port, size_t queue,
   w.head = (w.head + 1) % kLatencyWindow;
   if (w.count < kLatencyWindow) w.count++;
   if (deq_timedelta_us > w.max_since_read) w.max_since_read = deq_timedelta_us;
+
+  if (telemetry_fd >= 0) {
+    std::lock_guard<std::mutex> telemetry_lock(telemetry_mutex_);
+    auto &t = telemetry_counters_[key];
+    t.latency_sum_us += deq_timedelta_us;
+    t.latency_max_us = std::max(t.latency_max_us, deq_timedelta_us);
+    t.nb_latency_samples++;
+  }
+}
+
+namespace {
+
+// Telemetry wire format, little-endian; decoded by
+// openoptics/dashboard/collectors/tor_telemetry.py. A datagram holds a header and
+// up to kTelemetryMaxEntries entries; a record with more queues spans several
+// datagrams with the same sequence number.
+constexpr uint32_t kTelemetryMagic = 0x4c544f4f;  // "OOTL"
+constexpr uint16_t kTelemetryVersion = 2;
+constexpr size_t kTelemetryMaxEntries = 1024;
+
+struct __attribute__((packed)) TelemetryHeader {
+  uint32_t magic;
+  uint16_t version;
+  uint16_t tor_id;
+  uint32_t seq;
+  uint32_t nb_entries;
+  uint64_t timestamp_us;
+  uint64_t drop_ctr;
+};
+
+struct __attribute__((packed)) TelemetryEntry {
+  uint16_t port;
+  uint16_t queue;
+  uint32_t depth;          // packets, at the time of the record
+  uint64_t enq_bytes;      // since the previous record
+  uint64_t deq_bytes;      // since the previous record
+  uint32_t latency_us_mean;  // over the dequeues since the previous record
+  uint32_t latency_us_max;
+  uint32_t nb_dequeues;    // latency samples; weights the mean when aggregated
+};
+
+static_assert(sizeof(TelemetryHeader) == 32, "telemetry header size");
+static_assert(sizeof(TelemetryEntry) == 36, "telemetry entry size");
+
+}  // namespace
+
+bool
+TorSwitch::enable_telemetry(const std::string &addr, uint32_t interval_us) {
+  if (interval_us == 0) return false;
+  int family;
+  if (addr.compare(0, 4, "udp:") == 0) {
+    auto colon = addr.rfind(':');
+    char *end = nullptr;
+    auto port = std::strtoul(addr.c_str() + colon + 1, &end, 10);
+    auto *sin = reinterpret_cast<sockaddr_in *>(&telemetry_sockaddr);
+    sin->sin_family = AF_INET;
+    if (colon <= 4 || *end != '\0' || port == 0 || port > 65535 ||
+        inet_pton(AF_INET, addr.substr(4, colon - 4).c_str(),
+                  &sin->sin_addr) != 1) {
+      return false;
+    }
+    sin->sin_port = htons(static_cast<uint16_t>(port));
+    telemetry_sockaddr_len = sizeof(sockaddr_in);
+    family = AF_INET;
+  } else if (addr.compare(0, 5, "unix:") == 0) {
+    auto path = addr.substr(5);
+    auto *sun = reinterpret_cast<sockaddr_un *>(&telemetry_sockaddr);
+    if (path.empty() || path.size() >= sizeof(sun->sun_path)) return false;
+    sun->sun_family = AF_UNIX;
+    std::memcpy(sun->sun_path, path.c_str(), path.size() + 1);
+    telemetry_sockaddr_len = sizeof(sockaddr_un);
+    family = AF_UNIX;
+  } else {
+    return false;
+  }
+  // Not connected: the receiver may come up, or restart, after the switch.
+  telemetry_fd = socket(family, SOCK_DGRAM, 0);
+  telemetry_interval_us = interval_us;
+  return telemetry_fd >= 0;
+}
+
+void
+TorSwitch::record_telemetry(size_t port, size_t queue, size_t enq_bytes,
+                            size_t deq_bytes) {
+  auto key = (static_cast<uint64_t>(port) << 32) |
+             static_cast<uint32_t>(queue);
+  std::lock_guard<std::mutex> lock(telemetry_mutex_);
+  auto &t = telemetry_counters_[key];
+  t.enq_bytes += enq_bytes;
+  t.deq_bytes += deq_bytes;
+}
+
+void
+TorSwitch::telemetry_thread() {
+  std::unique_lock<std::mutex> lock(telemetry_stop_mutex);
+  auto next = clock::now();
+  while (true) {
+    // After a stall, resume the period from now instead of bursting.
+    next = std::max(next, clock::now()) +
+           std::chrono::microseconds(telemetry_interval_us);
+    if (telemetry_cv.wait_until(lock, next, [this] { return telemetry_stop; }))
+      break;
+    send_telemetry();
+  }
+}
+
+void
+TorSwitch::send_telemetry() {
+  std::unordered_map<uint64_t, QueueTelemetry> counters;
+  {
+    std::lock_guard<std::mutex> lock(telemetry_mutex_);
+    counters.swap(telemetry_counters_);
+  }
+
+  std::vector<TelemetryEntry> entries;
+  for (const auto &item : egress_cq_buffers.get_port_queue_size()) {
+    TelemetryEntry entry = {};
+    entry.port = static_cast<uint16_t>(std::get<0>(item));
+    entry.queue = static_cast<uint16_t>(std::get<1>(item));
+    entry.depth = static_cast<uint32_t>(std::get<2>(item));
+    auto key = (static_cast<uint64_t>(std::get<0>(item)) << 32) |
+               static_cast<uint32_t>(std::get<1>(item));
+    auto it = counters.find(key);
+    if (it != counters.end()) {
+      const auto &t = it->second;
+      entry.enq_bytes = t.enq_bytes;
+      entry.deq_bytes = t.deq_bytes;
+      if (t.nb_latency_samples > 0) {
+        entry.latency_us_mean =
+            static_cast<uint32_t>(t.latency_sum_us / t.nb_latency_samples);
+        entry.latency_us_max = t.latency_max_us;
+        entry.nb_dequeues = t.nb_latency_samples;
+      }
+    }
+    entries.push_back(entry);
+  }
+
+  TelemetryHeader header = {};
+  header.magic = kTelemetryMagic;
+  header.version = kTelemetryVersion;
+  header.tor_id = static_cast<uint16_t>(tor_id);
+  header.seq = telemetry_seq++;
+  header.timestamp_us = static_cast<uint64_t>(get_ts().count());
+  header.drop_ctr = nb_pkts_dropped;
+
+  std::vector<char> datagram;
+  size_t offset = 0;
+  do {
+    size_t nb = std::min(kTelemetryMaxEntries, entries.size() - offset);
+    header.nb_entries = static_cast<uint32_t>(nb);
+    datagram.resize(sizeof(header) + nb * sizeof(TelemetryEntry));
+    std::memcpy(datagram.data(), &header, sizeof(header));
+    if (nb > 0) {
+      std::memcpy(datagram.data() + sizeof(header), entries.data() + offset,
+                  nb * sizeof(TelemetryEntry));
+    }
+    // Non-blocking: without a receiver, or behind a slow one, records are
+    // dropped rather than stalling the switch.
+    sendto(telemetry_fd, datagram.data(), datagram.size(), MSG_DONTWAIT,
+           reinterpret_cast<const sockaddr *>(&telemetry_sockaddr),
+           telemetry_sockaddr_len);
+    offset += nb;
+  } while (offset < entries.size());
 }
 
 void
@@ -557,11 +835,14 @@ TorSwitch::enqueue_cq(port_t egress_port, size_t send_time_slice, std::unique_pt
     bm::Logger::get()->error("Priority out of range, dropping packet");
     return;
   }
+  size_t packet_size = packet->get_data_size();
   bool push_flag = egress_cq_buffers.push_front(
       egress_port, send_time_slice,
       std::move(packet));
   // push_front returns false if queue is full
   if (push_flag == false) nb_pkts_dropped++;
+  else if (telemetry_fd >= 0)
+    record_telemetry(egress_port, send_time_slice, packet_size, 0);
 }
 
 void
@@ -842,6 +1123,13 @@ TorSwitch::ts2time_slice(int64_t ts_us) {
   return ((ts_us / 1000 ) / time_slice_duration_ms) % nb_time_slices; // one slice per second
 }
 
+std::chrono::microseconds
+TorSwitch::time_to_next_slice(int64_t ts_us) const {
+  int64_t slice_us = static_cast<int64_t>(time_slice_duration_ms) * 1000;
+  if (slice_us <= 0) return std::chrono::microseconds(1000);
+  return std::chrono::microseconds(slice_us - ts_us % slice_us);
+}
+
 size_t
 TorSwitch::calculate_active_q() {
   size_t active_q;
@@ -865,14 +1153,28 @@ TorSwitch::egress_cq_thread() {
 
     BMLOG_DEBUG("Current time {}, active q {}", ts_ms, active_q);
 
-    while(!egress_cq_buffers.pop_back(active_q, &port, &packet)) {
-      active_q = calculate_active_q();
+    // Sleep while the served queue is empty: a push to it, or a change of
+    // the active queue, wakes this thread up.
+    if (calendar_queue_mode == CalendarQueueMode::TIME_BASED) {
+      while(!egress_cq_buffers.pop_back(active_q, &port, &packet)) {
+        egress_cq_buffers.wait_not_empty(
+            active_q, time_to_next_slice(get_ts().count()));
+        active_q = calculate_active_q();
+      }
+    } else {
+      // Control-based: each uplink may serve a different queue (multi-link TA).
+      while(!egress_cq_buffers.pop_back_active(&active_q, &port, &packet)) {
+        egress_cq_buffers.wait_active_not_empty(std::chrono::milliseconds(1));
+      }
     }
 
     BMLOG_DEBUG_PKT(*packet, "Packet is popped out from q {}.",active_q);
     
     if (packet == nullptr) break;
 
+    if (telemetry_fd >= 0)
+      record_telemetry(port, active_q, 0, packet->get_data_size());
+
     Deparser *deparser = this->get_deparser("deparser");
     Pipeline *egress_mau = this->get_pipeline("egress");
 
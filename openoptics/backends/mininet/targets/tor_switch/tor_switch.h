@@ -36,9 +36,14 @@
 #include <thread>
 #include <vector>
 #include <functional>
+#include <map>
 #include <mutex>
+#include <condition_variable>
 #include <unordered_map>
 #include <cstdint>
+#include <string>
+
+#include <sys/socket.h>
 
 // TODO(antonin)
 // experimental support for priority queueing
@@ -90,6 +95,9 @@ class TorSwitch : public Switch {
   static constexpr size_t default_time_slice_duration_ms = 0;
   static constexpr size_t default_guardband_ms = 0;
   static constexpr CalendarQueueMode default_calendar_queue_mode = CalendarQueueMode::TIME_BASED;
+  // Table entries of version v are keyed on time slice + v * offset.
+  // The P4 arrival time slice is 8 bits, so two versions fit below 256.
+  static constexpr size_t version_slice_offset = 128;
 
  private:
   using clock = std::chrono::high_resolution_clock;
@@ -135,6 +143,17 @@ class TorSwitch : public Switch {
 
   size_t set_active_queue(size_t active_q);
   size_t get_active_queue() const;
+  size_t set_port_active_queue(size_t port, size_t active_q);
+  size_t get_port_active_queue(size_t port) const;
+  // Serve `active_q` on `port` (every port if port < 0) from `at_time_us`
+  // microseconds since the clock's epoch, so ToRs sharing a clock switch
+  // together. Changes that are already due apply right away.
+  size_t schedule_active_queue(int port, size_t active_q, int64_t at_time_us);
+
+  // Make `version` the active table version at `at_time_us` (microseconds
+  // on the time slice clock), or at the next time slice boundary if <= 0.
+  size_t set_active_version(size_t version, int64_t at_time_us);
+  size_t get_active_version() const;
 
   // returns the number of microseconds elapsed since the switch started
   uint64_t get_time_elapsed_us() const;
@@ -148,6 +167,11 @@ class TorSwitch : public Switch {
 
   void get_device_metric(tswitch_runtime::MonitorResult& _return) const;
 
+  // Push a telemetry record every `interval_us` to `addr`, "udp:<ip>:<port>"
+  // or "unix:<path>" (datagram socket). Call before start_and_return().
+  // Returns false if the address is invalid.
+  bool enable_telemetry(const std::string &addr, uint32_t interval_us);
+
   // returns the packet id of most recently received packet. Not thread-safe.
   static packet_id_t get_packet_id() {
     return packet_id - 1;
@@ -199,9 +223,15 @@ class TorSwitch : public Switch {
   void egress_cq_thread();
   void egress_thread(size_t worker_id);
   void transmit_thread();
+  void queue_schedule_thread();
+  void telemetry_thread();
 
   ts_res get_ts() const;
   size_t ts2time_slice(int64_t current_time);
+  // Time until the slice of `ts_us` ends.
+  std::chrono::microseconds time_to_next_slice(int64_t ts_us) const;
+  int64_t slice_clock_us() const;
+  size_t version_at(int64_t ts_us) const;
 
   // TODO(antonin): switch to pass by value?
   void enqueue(port_t egress_port, std::unique_ptr<Packet> &&packet);
@@ -234,6 +264,29 @@ class TorSwitch : public Switch {
   // max_since_read after reading it.
   mutable std::unordered_map<uint64_t, LatencyWindow> latency_windows_;
 
+  // Per-(port, queue) counters since the last telemetry record, keyed like
+  // latency_windows_. Only kept while telemetry is enabled.
+  struct QueueTelemetry {
+    uint64_t enq_bytes = 0;
+    uint64_t deq_bytes = 0;
+    uint64_t latency_sum_us = 0;
+    uint32_t latency_max_us = 0;
+    uint32_t nb_latency_samples = 0;
+  };
+  void record_telemetry(size_t port, size_t queue, size_t enq_bytes,
+                        size_t deq_bytes);
+  void send_telemetry();
+  std::mutex telemetry_mutex_;
+  std::unordered_map<uint64_t, QueueTelemetry> telemetry_counters_;
+  int telemetry_fd{-1};
+  sockaddr_storage telemetry_sockaddr{};
+  socklen_t telemetry_sockaddr_len{0};
+  uint32_t telemetry_interval_us{0};
+  uint32_t telemetry_seq{0};
+  std::mutex telemetry_stop_mutex;
+  std::condition_variable telemetry_cv;
+  bool telemetry_stop{false};
+
  private:
   port_t drop_port;
   std::vector<std::thread> threads_;
@@ -256,6 +309,16 @@ class TorSwitch : public Switch {
   std::unique_ptr<MirroringSessions> mirroring_sessions;
   size_t nb_pkts_rcvd;
   size_t nb_pkts_dropped;
+  // active_version until version_switch_us, next_version from then on.
+  mutable std::mutex version_mutex;
+  size_t active_version{0};
+  size_t next_version{0};
+  int64_t version_switch_us{0};
+  // Pending schedule_active_queue() changes: at_time_us -> (port, qid).
+  std::mutex queue_schedule_mutex;
+  std::condition_variable queue_schedule_cv;
+  std::multimap<int64_t, std::pair<int, size_t> > queue_schedule;
+  bool queue_schedule_stop{false};
 };
 
 #endif  // SIMPLE_SWITCH_SIMPLE_SWITCH_H_
\ No newline at end of file
@@ -141,6 +141,47 @@ class TorSwitchAPI(runtime_CLI.RuntimeAPI):
         "Get id of active calendar queue."
         print(self.sswitch_client.get_active_queue())
 
+    @handle_bad_input
+    def do_set_port_active_queue(self, line):
+        "Set the active queue for one port: set_port_active_queue <port> <queue_id>"
+        args = line.split()
+        self.exactly_n_args(args, 2)
+        port = self.parse_int(args[0], "port")
+        active_qid = self.parse_int(args[1], "queue_id")
+        self.sswitch_client.set_port_active_queue(port, active_qid)
+
+    @handle_bad_input
+    def do_get_port_active_queue(self, line):
+        "Get id of the calendar queue served by a port: get_port_active_queue <port>"
+        args = line.split()
+        self.exactly_n_args(args, 1)
+        port = self.parse_int(args[0], "port")
+        print(self.sswitch_client.get_port_active_queue(port))
+
+    @handle_bad_input
+    def do_schedule_active_queue(self, line):
+        "Serve a queue from a time on (us since epoch; port -1 for all ports): schedule_active_queue <port> <queue_id> <at_time_us>"
+        args = line.split()
+        self.exactly_n_args(args, 3)
+        port = self.parse_int(args[0], "port")
+        active_qid = self.parse_int(args[1], "queue_id")
+        at_time_us = self.parse_int(args[2], "at_time_us")
+        self.sswitch_client.schedule_active_queue(port, active_qid, at_time_us)
+
+    @handle_bad_input
+    def do_set_active_version(self, line):
+        "Set the table version the routing tables match: set_active_version <version> [<at_time_us>]"
+        args = line.split()
+        self.at_least_n_args(args, 1)
+        version = self.parse_int(args[0], "version")
+        at_time_us = self.parse_int(args[1], "at_time_us") if len(args) > 1 else 0
+        self.sswitch_client.set_active_version(version, at_time_us)
+
+    @handle_bad_input
+    def do_get_active_version(self, line):
+        "Get the active table version: get_active_version"
+        print(self.sswitch_client.get_active_version())
+
     @handle_bad_input
     def do_get_num_queued_packets(self, line):
         "Get number of packets in queues"
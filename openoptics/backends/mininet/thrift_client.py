@@ -0,0 +1,218 @@
+# Copyright (c) Max-Planck-Gesellschaft zur Förderung der Wissenschaften e.V.
+# Developed at the Max Planck Institute for Informatics, Network and Cloud Systems Group
+#
+# Author: Yiming Lei (ylei@mpi-inf.mpg.de)
+#
+# This software is licensed for non-commercial scientific research purposes only.
+#
+# License text: Creative Commons NC BY SA 4.0
+# https://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
+
+"""Persistent runtime_CLI Thrift connections for BMv2 table programming.
+
+Piping commands into a ``runtime_CLI`` process per call starts a Python
+interpreter and downloads the P4 JSON from the switch every time, and errors
+can only be found by scanning its output. :class:`BMv2TableClient` keeps one
+Thrift connection per switch open, issues each table command as one
+``bm_mt_*`` call on it and raises :class:`BMv2TableError` on the first
+failure. Commands use the runtime_CLI syntax the backend already renders.
+The same connection carries the calls of the switch's target service, such
+as the table version flip.
+"""
+
+import importlib
+import os
+import sys
+import threading
+
+_BMV2_TOOLS_DIR = "/behavioral-model/tools"
+_BMV2_TARGETS_DIR = "/behavioral-model/targets"
+
+# Target service by switch type: (target directory, CLI module, API class).
+_TARGET_APIS = {
+    "tor": ("tor_switch", "tswitch_CLI", "TorSwitchAPI"),
+    "optical": ("optical_switch", "oswitch_CLI", "OpticalSwitchAPI"),
+}
+# Switch types BMv2TableClient can connect the target service of.
+TARGET_SWITCH_TYPES = frozenset(_TARGET_APIS)
+
+# P4 resources by JSON path, see _p4_resources().
+_resources = {}
+_resources_lock = threading.Lock()
+
+
+def _runtime_cli():
+    """Import BMv2's runtime_CLI module."""
+    if _BMV2_TOOLS_DIR not in sys.path:
+        sys.path.insert(1, _BMV2_TOOLS_DIR)
+    import runtime_CLI
+
+    return runtime_CLI
+
+
+def _target_api(switch_type):
+    """Import the CLI API class of a BMv2 target, e.g. TorSwitchAPI."""
+    target_dir, module, api = _TARGET_APIS[switch_type]
+    path = os.path.join(_BMV2_TARGETS_DIR, target_dir)
+    if path not in sys.path:
+        sys.path.insert(1, path)
+    return getattr(importlib.import_module(module), api)
+
+
+def _p4_resources(json_path) -> dict:
+    """The tables and actions of a P4 program, keyed by (ResType, name or unique suffix)."""
+    with _resources_lock:
+        if json_path not in _resources:
+            runtime_CLI = _runtime_cli()
+            # load_json_config() fills module-level maps that hold one program
+            # at a time; keep a copy per program (ToR and OCS differ).
+            runtime_CLI.load_json_config(None, json_path)
+            _resources[json_path] = dict(runtime_CLI.SUFFIX_LOOKUP_MAP)
+        return _resources[json_path]
+
+
+class BMv2TableError(RuntimeError):
+    """A table command was rejected by the switch or could not be parsed.
+
+    Attributes:
+        switch_name: The switch the command was sent to.
+        command: The runtime_CLI command.
+        reason: The error, e.g. ``"DUPLICATE_ENTRY"`` for a Thrift
+            ``InvalidTableOperation``.
+    """
+
+    def __init__(self, switch_name, command, reason):
+        super().__init__(f"{switch_name}: {reason}: {command}")
+        self.switch_name = switch_name
+        self.command = command
+        self.reason = reason
+
+
+class BMv2TableClient:
+    """A persistent Thrift connection for programming the tables of one switch."""
+
+    def __init__(self, switch_name, thrift_port, json_path, thrift_ip="localhost", switch_type=None):
+        """
+        Args:
+            switch_name (str): Name of the switch, for error messages.
+            thrift_port (int): Thrift port of the switch.
+            json_path (str): The P4 JSON the switch runs.
+            thrift_ip (str): Address of the switch's Thrift server.
+            switch_type (str, optional): ``"tor"`` or ``"optical"`` to also
+                connect the target service of tor_switch or optical_switch.
+        """
+        self._rc = _runtime_cli()
+        services = self._rc.RuntimeAPI.get_thrift_services(self._rc.PreType.SimplePreLAG)
+        if switch_type is not None:
+            services = services + _target_api(switch_type).get_thrift_services()
+        clients = self._rc.thrift_connect(thrift_ip, thrift_port, services)
+        self._client = clients[0]
+        self._target = clients[-1] if switch_type is not None else None
+        self._resources = _p4_resources(json_path)
+        self.switch_name = switch_name
+        # A Thrift client carries one call at a time.
+        self._lock = threading.Lock()
+
+    def run(self, commands: str) -> int:
+        """Run newline-separated runtime_CLI table commands, in order.
+
+        Supported: ``table_add``, ``table_modify_wkey``, ``table_delete_wkey``,
+        ``table_set_default``, ``table_reset_default`` and ``table_clear``.
+
+        Args:
+            commands: The commands.
+
+        Returns:
+            Number of commands run.
+
+        Raises:
+            BMv2TableError: A command failed; the commands before it were applied.
+        """
+        rc = self._rc
+        count = 0
+        with self._lock:
+            for command in commands.splitlines():
+                args = command.split()
+                if not args:
+                    continue
+                try:
+                    self._run_command(args)
+                except rc.InvalidTableOperation as e:
+                    reason = rc.TableOperationErrorCode._VALUES_TO_NAMES.get(e.code, e.code)
+                    raise BMv2TableError(self.switch_name, command, reason) from e
+                except (rc.UIn_Error, ValueError, IndexError) as e:
+                    raise BMv2TableError(self.switch_name, command, str(e) or type(e).__name__) from e
+                count += 1
+        return count
+
+    def set_active_version(self, version, at_time_us=0) -> None:
+        """Make the switch match table version ``version`` from at_time_us on.
+
+        Args:
+            version (int): The table version.
+            at_time_us (int): When to switch, in µs of the switch's clock; 0
+                for its next time slice boundary.
+
+        Raises:
+            BMv2TableError: The switch rejected the call or was unreachable.
+        """
+        command = f"set_active_version {version} {at_time_us}"
+        if self._target is None:
+            raise BMv2TableError(self.switch_name, command, "no target service")
+        from thrift.Thrift import TException
+
+        with self._lock:
+            try:
+                status = self._target.set_active_version(version, at_time_us)
+            except (TException, OSError) as e:
+                raise BMv2TableError(self.switch_name, command, str(e) or type(e).__name__) from e
+        if status != 0:
+            raise BMv2TableError(self.switch_name, command, f"status {status}")
+
+    def _table(self, name):
+        table = self._resources.get((self._rc.ResType.table, name))
+        if table is None:
+            raise ValueError(f"unknown table {name!r}")
+        return table
+
+    def _action(self, table, name):
+        action = self._resources.get((self._rc.ResType.action, name))
+        if action is None or action.name not in table.actions:
+            raise ValueError(f"table {table.name} has no action {name!r}")
+        return action
+
+    def _split_priority(self, table, args) -> tuple:
+        """Split the trailing priority runtime_CLI expects on ternary and range entries."""
+        if table.match_type in (self._rc.MatchType.TERNARY, self._rc.MatchType.RANGE):
+            return args[:-1], int(args[-1])
+        return args, 0
+
+    def _run_command(self, args) -> None:
+        rc, client = self._rc, self._client
+        op, table = args[0], self._table(args[1])
+        if op == "table_clear":
+            client.bm_mt_clear_entries(0, table.name, False)
+        elif op == "table_reset_default":
+            client.bm_mt_reset_default_entry(0, table.name)
+        elif op == "table_set_default":
+            action = self._action(table, args[2])
+            client.bm_mt_set_default_action(
+                0, table.name, action.name, rc.parse_runtime_data(action, args[3:])
+            )
+        elif op == "table_delete_wkey":
+            key_fields, priority = self._split_priority(table, args[2:])
+            client.bm_mt_delete_entry_wkey(
+                0, table.name, rc.parse_match_key(table, key_fields),
+                rc.BmAddEntryOptions(priority=priority),
+            )
+        elif op in ("table_add", "table_modify_wkey"):
+            action = self._action(table, args[2])
+            sep = args.index("=>")
+            params, priority = self._split_priority(table, args[sep + 1:])
+            call = client.bm_mt_add_entry if op == "table_add" else client.bm_mt_modify_entry_wkey
+            call(
+                0, table.name, rc.parse_match_key(table, args[3:sep]), action.name,
+                rc.parse_runtime_data(action, params), rc.BmAddEntryOptions(priority=priority),
+            )
+        else:
+            raise ValueError(f"unsupported command {op!r}")
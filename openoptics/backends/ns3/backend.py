@@ -32,7 +32,10 @@ from typing import Dict, List, Optional, Tuple
 from openoptics.backends.base import (
     BackendBase,
     SwitchHandle,
+    TableBatch,
+    TableDelta,
     TableEntry,
+    match_range,
     warn_if_overhead_exhausts_slice,
 )
 from openoptics.backends.ns3.install import env_config_path
@@ -127,6 +130,12 @@ class Ns3Backend(BackendBase):
     # Mirrors ``OpenOpticsSourceRouteHeader::kMaxHops``; exceeding it
     # ``NS_FATAL_ERROR``s on serialize/deserialize.
     max_source_route_hops = 16
+    # OcsApp entries are addressable by key, so redeploys update them in
+    # place instead of clearing the schedule mid-simulation.
+    supports_table_delta = True
+    # OcsApp and TorApp key lookups on slice + active version * 128, and
+    # switch versions at a scheduled simulated time.
+    supports_versioned_tables = True
 
     @classmethod
     def accepted_kwargs(cls) -> set:
@@ -353,6 +362,54 @@ class Ns3Backend(BackendBase):
             self._apply_entry(switch_name, entry)
         return True
 
+    def load_table_batch(
+        self,
+        switch_name: str,
+        batch: TableBatch,
+        print_flag: bool = False,
+    ) -> bool:
+        if not (switch_name.startswith("tor") and batch.table == "per_hop_routing"):
+            return super().load_table_batch(switch_name, batch, print_flag)
+        app = self._tor_apps[int(switch_name[3:])]
+        rows = zip(batch.keys.tolist(), batch.params.tolist())
+        if batch.range_key is None:
+            for (dst, arrival_ts), (cur_node, send_ts, send_port) in rows:
+                app.AddPerHopEntry(dst, arrival_ts, cur_node, send_ts, send_port)
+        else:
+            for (dst, first_ts, last_ts), (cur_node, send_ts, send_port) in rows:
+                app.AddPerHopRange(dst, first_ts, last_ts, cur_node, send_ts, send_port)
+        return True
+
+    def apply_table_delta(
+        self,
+        switch_name: str,
+        delta: TableDelta,
+        print_flag: bool = False,
+    ) -> bool:
+        for entry in delta.deletes:
+            if entry.is_default_action:
+                continue
+            self._remove_entry(switch_name, entry)
+        # Add* methods overwrite an existing key, so a modify is an add.
+        for entry in delta.modifies + delta.adds:
+            if entry.is_default_action:
+                continue
+            self._apply_entry(switch_name, entry)
+        return True
+
+    async def set_active_version(self, version: int, at_us: Optional[int] = None) -> bool:
+        apps = [self._ocs_app, *self._tor_apps.values()]
+        if at_us is None:
+            # Tables are programmed between simulator runs, so switching
+            # now is switching at a slice boundary.
+            for app in apps:
+                app.SetActiveVersion(version)
+        else:
+            at = self._ns.MicroSeconds(int(at_us))
+            for app in apps:
+                app.ScheduleActiveVersion(version, at)
+        return True
+
     def clear_table(
         self,
         switch_name: str,
@@ -409,7 +466,8 @@ class Ns3Backend(BackendBase):
         """
         if self._ns is None:
             return
-        self._ns.Simulator.Stop(self._ns.Seconds(self._simulation_stop_s))
+        now_s = self._ns.Simulator.Now().GetSeconds()
+        self._ns.Simulator.Stop(self._ns.Seconds(max(0.0, self._simulation_stop_s - now_s)))
         print(f"[ns3] Running simulation for {self._simulation_stop_s:.2f}s...")
         self._ns.Simulator.Run()
         self._last_sim_time_s = self._ns.Simulator.Now().GetSeconds()
@@ -429,6 +487,21 @@ class Ns3Backend(BackendBase):
             except EOFError:
                 pass
 
+    def run_until(self, sim_time_s: float) -> None:
+        """Advance the simulator to ``sim_time_s`` and return.
+
+        Tables changed afterwards take effect at that simulated time, which
+        is how :func:`openoptics.OperationLog.replay_ns3` replays a recorded
+        session. A later :meth:`run` continues up to ``simulation_stop_s``.
+        """
+        if self._ns is None:
+            return
+        delay_s = sim_time_s - self._ns.Simulator.Now().GetSeconds()
+        if delay_s <= 0:
+            return
+        self._ns.Simulator.Stop(self._ns.Seconds(delay_s))
+        self._ns.Simulator.Run()
+
     @staticmethod
     def _should_pause_post_run() -> bool:
         if os.environ.get("OPENOPTICS_NS3_NO_PAUSE"):
@@ -1277,12 +1350,12 @@ class Ns3Backend(BackendBase):
         if switch_name.startswith("tor") and table == "per_hop_routing":
             tor_id = int(switch_name[3:])
             dst = int(entry.match_keys["dst"])
-            arrival_ts = int(entry.match_keys["arrival_ts"])
+            first_ts, last_ts = match_range(entry.match_keys["arrival_ts"])
             cur_node = int(entry.action_params.get("cur_node", tor_id))
             send_ts = int(entry.action_params["send_ts"])
             send_port = int(entry.action_params["send_port"])
-            self._tor_apps[tor_id].AddPerHopEntry(
-                dst, arrival_ts, cur_node, send_ts, send_port
+            self._tor_apps[tor_id].AddPerHopRange(
+                dst, int(first_ts), int(last_ts), cur_node, send_ts, send_port
             )
             return
 
@@ -1323,7 +1396,7 @@ class Ns3Backend(BackendBase):
                 self._sr_adm_warned = True
             tor_id = int(switch_name[3:])
             dst = int(entry.match_keys["dst"])
-            arrival_ts = int(entry.match_keys["arrival_ts"])
+            first_ts, last_ts = match_range(entry.match_keys["arrival_ts"])
             hops_raw = entry.action_params["hops"]
             # Explicit std::vector<Hop> — cppyy can convert Python lists
             # of struct-typed items, but spelling the type out makes the
@@ -1339,8 +1412,8 @@ class Ns3Backend(BackendBase):
                 h.send_ts = int(send_ts)
                 h.send_port_or_node = int(send_port_or_node)
                 hop_vec.push_back(h)
-            self._tor_apps[tor_id].AddSourceRoutingEntry(
-                dst, arrival_ts, hop_vec
+            self._tor_apps[tor_id].AddSourceRoutingRange(
+                dst, int(first_ts), int(last_ts), hop_vec
             )
             return
 
@@ -1348,3 +1421,53 @@ class Ns3Backend(BackendBase):
             f"Ns3Backend cannot dispatch TableEntry on switch={switch_name!r} "
             f"table={table!r}. Entry was: {entry}"
         )
+
+    def _remove_entry(self, switch_name: str, entry: TableEntry) -> None:
+        table = entry.table
+        if table in _IGNORED_TABLES:
+            return
+
+        if switch_name == "ocs" and table == "ocs_schedule":
+            ingress = int(entry.match_keys["ingress_port"])
+            slice_id = int(entry.match_keys["slice_id"])
+            self._ocs_app.RemoveScheduleEntry(ingress, slice_id)
+            return
+
+        if switch_name.startswith("tor") and table == "ip_to_dst_node":
+            tor_id = int(switch_name[3:])
+            self._tor_apps[tor_id].RemoveIpToDst(str(entry.match_keys["ip"]))
+            return
+
+        if switch_name.startswith("tor") and table == "per_hop_routing":
+            tor_id = int(switch_name[3:])
+            dst = int(entry.match_keys["dst"])
+            first_ts, last_ts = match_range(entry.match_keys["arrival_ts"])
+            self._tor_apps[tor_id].RemovePerHopRange(dst, int(first_ts), int(last_ts))
+            return
+
+        if switch_name.startswith("tor") and table == "arrive_at_dst":
+            tor_id = int(switch_name[3:])
+            dst_node = int(entry.match_keys["tor_id"])
+            self._tor_apps[tor_id].RemoveArriveAtDst(dst_node)
+            return
+
+        if (switch_name.startswith("tor")
+                and table == "cal_port_slice_to_node"):
+            tor_id = int(switch_name[3:])
+            dst = int(entry.match_keys["dst"])
+            arrival_ts = int(entry.match_keys["arrival_ts"])
+            self._tor_apps[tor_id].RemoveCalPortSliceToNode(dst, arrival_ts)
+            return
+
+        if (switch_name.startswith("tor")
+                and table == "add_source_routing_entries"):
+            tor_id = int(switch_name[3:])
+            dst = int(entry.match_keys["dst"])
+            first_ts, last_ts = match_range(entry.match_keys["arrival_ts"])
+            self._tor_apps[tor_id].RemoveSourceRoutingRange(dst, int(first_ts), int(last_ts))
+            return
+
+        raise NotImplementedError(
+            f"Ns3Backend cannot remove TableEntry on switch={switch_name!r} "
+            f"table={table!r}. Entry was: {entry}"
+        )
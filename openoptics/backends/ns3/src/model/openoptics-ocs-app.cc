@@ -40,6 +40,7 @@ OcsApp::OcsApp()
     : m_sliceDurationUs(0),
       m_numSlices(0),
       m_guardbandUs(0),
+      m_activeVersion(0),
       m_forwardCount(0),
       m_dropCount(0),
       m_started(false),
@@ -97,12 +98,48 @@ OcsApp::AddScheduleEntry(uint32_t ingress_port, uint32_t slice, uint32_t egress_
     m_schedule[MakeKey(ingress_port, slice)] = egress_port;
 }
 
+void
+OcsApp::RemoveScheduleEntry(uint32_t ingress_port, uint32_t slice)
+{
+    m_schedule.erase(MakeKey(ingress_port, slice));
+}
+
 void
 OcsApp::ClearSchedule()
 {
     m_schedule.clear();
 }
 
+void
+OcsApp::SetActiveVersion(uint32_t version)
+{
+    m_activeVersion = version;
+}
+
+void
+OcsApp::ScheduleActiveVersion(uint32_t version, Time at)
+{
+    if (m_versionEvent.IsPending())
+    {
+        Simulator::Cancel(m_versionEvent);
+    }
+    if (at <= Simulator::Now())
+    {
+        SetActiveVersion(version);
+        return;
+    }
+    m_versionEvent = Simulator::Schedule(at - Simulator::Now(),
+                                         &OcsApp::SetActiveVersion,
+                                         this,
+                                         version);
+}
+
+uint32_t
+OcsApp::GetActiveVersion() const
+{
+    return m_activeVersion;
+}
+
 uint64_t
 OcsApp::GetForwardCount() const
 {
@@ -157,6 +194,10 @@ OcsApp::StopApplication()
     {
         Simulator::Cancel(m_snapshotEvent);
     }
+    if (m_versionEvent.IsPending())
+    {
+        Simulator::Cancel(m_versionEvent);
+    }
 }
 
 void
@@ -216,7 +257,7 @@ OcsApp::ReceiveFromPort(Ptr<NetDevice> device,
     }
 
     uint32_t in_port = portIt->second;
-    uint32_t slice = CurrentSlice();
+    uint32_t slice = CurrentSlice() + m_activeVersion * kVersionSliceOffset;
 
     auto schedIt = m_schedule.find(MakeKey(in_port, slice));
     if (schedIt == m_schedule.end())
@@ -58,8 +58,20 @@ class OcsApp : public Application
 
     // Schedule-table programming (called from Python load_table()).
     void AddScheduleEntry(uint32_t ingress_port, uint32_t slice, uint32_t egress_port);
+    // Remove a single entry; missing entries are ignored.
+    void RemoveScheduleEntry(uint32_t ingress_port, uint32_t slice);
     void ClearSchedule();
 
+    // Entries of table version v are keyed on slice + v * kVersionSliceOffset.
+    // Only the active version's entries match, so the next version can be
+    // installed alongside it and switched to at once.
+    static constexpr uint32_t kVersionSliceOffset = 128;
+    void SetActiveVersion(uint32_t version);
+    // Switch to ``version`` at simulated time ``at`` (immediately if it has
+    // passed), replacing any pending switch.
+    void ScheduleActiveVersion(uint32_t version, Time at);
+    uint32_t GetActiveVersion() const;
+
     // Introspection (counters + state for tests).
     uint64_t GetForwardCount() const;
     uint64_t GetDropCount() const;
@@ -110,6 +122,9 @@ class OcsApp : public Application
     uint32_t m_numSlices;
     uint64_t m_guardbandUs;
 
+    uint32_t m_activeVersion;
+    EventId m_versionEvent;
+
     uint64_t m_forwardCount;
     uint64_t m_dropCount;
 
@@ -66,7 +66,8 @@ TorApp::TorApp()
       m_ocsLinkDelayUs(0),
       m_effectiveActiveUs(0),
       m_verifySrCurNode(false),
-      m_snapshotInterval(Seconds(0))
+      m_snapshotInterval(Seconds(0)),
+      m_activeVersion(0)
 {
 }
 
@@ -230,12 +231,24 @@ TorApp::AddIpToDst(const std::string& ip, uint32_t dst_node)
     m_ipToDst[ip] = dst_node;
 }
 
+void
+TorApp::RemoveIpToDst(const std::string& ip)
+{
+    m_ipToDst.erase(ip);
+}
+
 uint64_t
 TorApp::PerHopKey(uint32_t dst_node, uint32_t arrival_ts)
 {
     return (static_cast<uint64_t>(dst_node) << 32) | arrival_ts;
 }
 
+uint64_t
+TorApp::LookupKey(uint32_t dst_node, uint32_t arrival_ts) const
+{
+    return PerHopKey(dst_node, arrival_ts + m_activeVersion * kVersionSliceOffset);
+}
+
 void
 TorApp::AddPerHopEntry(uint32_t dst_node,
                        uint32_t arrival_ts,
@@ -250,12 +263,49 @@ TorApp::AddPerHopEntry(uint32_t dst_node,
     m_perHopSendTs[k] = send_ts;
 }
 
+void
+TorApp::RemovePerHopEntry(uint32_t dst_node, uint32_t arrival_ts)
+{
+    uint64_t k = PerHopKey(dst_node, arrival_ts);
+    m_perHopSendPort.erase(k);
+    m_perHopSendTs.erase(k);
+}
+
+void
+TorApp::AddPerHopRange(uint32_t dst_node,
+                       uint32_t first_ts,
+                       uint32_t last_ts,
+                       uint32_t cur_node,
+                       uint32_t send_ts,
+                       uint32_t send_port)
+{
+    for (uint32_t ts = first_ts; ts <= last_ts; ++ts)
+    {
+        AddPerHopEntry(dst_node, ts, cur_node, send_ts, send_port);
+    }
+}
+
+void
+TorApp::RemovePerHopRange(uint32_t dst_node, uint32_t first_ts, uint32_t last_ts)
+{
+    for (uint32_t ts = first_ts; ts <= last_ts; ++ts)
+    {
+        RemovePerHopEntry(dst_node, ts);
+    }
+}
+
 void
 TorApp::AddArriveAtDst(uint32_t dst_node, uint32_t host_port)
 {
     m_arriveAtDst[dst_node] = host_port;
 }
 
+void
+TorApp::RemoveArriveAtDst(uint32_t dst_node)
+{
+    m_arriveAtDst.erase(dst_node);
+}
+
 void
 TorApp::AddSourceRoutingEntry(
     uint32_t dst_node,
@@ -265,6 +315,34 @@ TorApp::AddSourceRoutingEntry(
     m_sourceRouting[PerHopKey(dst_node, arrival_ts)] = hops;
 }
 
+void
+TorApp::RemoveSourceRoutingEntry(uint32_t dst_node, uint32_t arrival_ts)
+{
+    m_sourceRouting.erase(PerHopKey(dst_node, arrival_ts));
+}
+
+void
+TorApp::AddSourceRoutingRange(
+    uint32_t dst_node,
+    uint32_t first_ts,
+    uint32_t last_ts,
+    const std::vector<OpenOpticsSourceRouteHeader::Hop>& hops)
+{
+    for (uint32_t ts = first_ts; ts <= last_ts; ++ts)
+    {
+        AddSourceRoutingEntry(dst_node, ts, hops);
+    }
+}
+
+void
+TorApp::RemoveSourceRoutingRange(uint32_t dst_node, uint32_t first_ts, uint32_t last_ts)
+{
+    for (uint32_t ts = first_ts; ts <= last_ts; ++ts)
+    {
+        RemoveSourceRoutingEntry(dst_node, ts);
+    }
+}
+
 void
 TorApp::ClearSourceRouting()
 {
@@ -282,6 +360,14 @@ TorApp::AddCalPortSliceToNode(uint32_t dst_node,
     m_calSendTs[k] = send_ts;
 }
 
+void
+TorApp::RemoveCalPortSliceToNode(uint32_t dst_node, uint32_t arrival_ts)
+{
+    const uint64_t k = PerHopKey(dst_node, arrival_ts);
+    m_calSendPort.erase(k);
+    m_calSendTs.erase(k);
+}
+
 void
 TorApp::ClearCalPortSliceToNode()
 {
@@ -308,6 +394,36 @@ TorApp::ClearArriveAtDst()
     m_arriveAtDst.clear();
 }
 
+void
+TorApp::SetActiveVersion(uint32_t version)
+{
+    m_activeVersion = version;
+}
+
+void
+TorApp::ScheduleActiveVersion(uint32_t version, Time at)
+{
+    if (m_versionEvent.IsPending())
+    {
+        Simulator::Cancel(m_versionEvent);
+    }
+    if (at <= Simulator::Now())
+    {
+        SetActiveVersion(version);
+        return;
+    }
+    m_versionEvent = Simulator::Schedule(at - Simulator::Now(),
+                                         &TorApp::SetActiveVersion,
+                                         this,
+                                         version);
+}
+
+uint32_t
+TorApp::GetActiveVersion() const
+{
+    return m_activeVersion;
+}
+
 // --- Introspection ----------------------------------------------------------
 
 uint64_t TorApp::GetIngressFromHostCount() const   { return m_ingressFromHost; }
@@ -622,6 +738,10 @@ TorApp::StopApplication()
     {
         Simulator::Cancel(m_snapshotEvent);
     }
+    if (m_versionEvent.IsPending())
+    {
+        Simulator::Cancel(m_versionEvent);
+    }
 }
 
 void
@@ -817,7 +937,7 @@ TorApp::HandleRoutedPacket(Ptr<Packet> packet_with_header,
         for (uint32_t offset = 0; offset < m_numSlices; ++offset)
         {
             const uint32_t try_ts = (arrival_ts + offset) % m_numSlices;
-            const uint64_t k = PerHopKey(dst_node, try_ts);
+            const uint64_t k = LookupKey(dst_node, try_ts);
             auto pIt = m_perHopSendPort.find(k);
             auto tIt = m_perHopSendTs.find(k);
             if (pIt == m_perHopSendPort.end() || tIt == m_perHopSendTs.end())
@@ -842,7 +962,7 @@ TorApp::HandleRoutedPacket(Ptr<Packet> packet_with_header,
         return;
     }
 
-    uint64_t k = PerHopKey(dst_node, arrival_ts);
+    uint64_t k = LookupKey(dst_node, arrival_ts);
     auto portIt = m_perHopSendPort.find(k);
     auto tsIt = m_perHopSendTs.find(k);
     if (portIt == m_perHopSendPort.end() || tsIt == m_perHopSendTs.end())
@@ -971,7 +1091,7 @@ TorApp::ResolveHop(const OpenOpticsSourceRouteHeader::Hop& hop,
     {
         // Node-type hop. send_port_or_node is a destination node id;
         // consult cal_port_slice_to_node keyed on (node_dst, arrival_ts).
-        const uint64_t k = PerHopKey(hop.send_port_or_node, arrival_ts);
+        const uint64_t k = LookupKey(hop.send_port_or_node, arrival_ts);
         auto portIt = m_calSendPort.find(k);
         auto tsIt = m_calSendTs.find(k);
         if (portIt == m_calSendPort.end() || tsIt == m_calSendTs.end())
@@ -1001,7 +1121,7 @@ TorApp::TrySourceRoutingIngress(Ptr<const Packet> raw_ip_packet,
                                 uint32_t arrival_ts,
                                 uint16_t /*host_protocol*/)
 {
-    auto it = m_sourceRouting.find(PerHopKey(dst_node, arrival_ts));
+    auto it = m_sourceRouting.find(LookupKey(dst_node, arrival_ts));
     if (it == m_sourceRouting.end())
     {
         return false;
@@ -81,12 +81,25 @@ class TorApp : public Application
 
     // Table programming (called from Python load_table()).
     void AddIpToDst(const std::string& ip, uint32_t dst_node);
+    void RemoveIpToDst(const std::string& ip);
     void AddPerHopEntry(uint32_t dst_node,
                         uint32_t arrival_ts,
                         uint32_t cur_node,
                         uint32_t send_ts,
                         uint32_t send_port);
+    void RemovePerHopEntry(uint32_t dst_node, uint32_t arrival_ts);
+    // Range entries cover arrival slices first_ts..last_ts (inclusive).
+    // They are unrolled into the exact-match map, so lookups stay O(1);
+    // only the number of calls from Python shrinks.
+    void AddPerHopRange(uint32_t dst_node,
+                        uint32_t first_ts,
+                        uint32_t last_ts,
+                        uint32_t cur_node,
+                        uint32_t send_ts,
+                        uint32_t send_port);
+    void RemovePerHopRange(uint32_t dst_node, uint32_t first_ts, uint32_t last_ts);
     void AddArriveAtDst(uint32_t dst_node, uint32_t host_port);
+    void RemoveArriveAtDst(uint32_t dst_node);
 
     // Source-routing table: one entry per (dst, arrival_ts) at the
     // ingress ToR; value is the full hop list (same shape as
@@ -95,6 +108,13 @@ class TorApp : public Application
         uint32_t dst_node,
         uint32_t arrival_ts,
         const std::vector<OpenOpticsSourceRouteHeader::Hop>& hops);
+    void RemoveSourceRoutingEntry(uint32_t dst_node, uint32_t arrival_ts);
+    void AddSourceRoutingRange(
+        uint32_t dst_node,
+        uint32_t first_ts,
+        uint32_t last_ts,
+        const std::vector<OpenOpticsSourceRouteHeader::Hop>& hops);
+    void RemoveSourceRoutingRange(uint32_t dst_node, uint32_t first_ts, uint32_t last_ts);
     void ClearSourceRouting();
 
     // cal_port_slice_to_node: resolves (dst, arrival_ts) -> (send_port,
@@ -104,12 +124,23 @@ class TorApp : public Application
                                uint32_t arrival_ts,
                                uint32_t send_port,
                                uint32_t send_ts);
+    void RemoveCalPortSliceToNode(uint32_t dst_node, uint32_t arrival_ts);
     void ClearCalPortSliceToNode();
 
     void ClearIpToDst();
     void ClearPerHop();
     void ClearArriveAtDst();
 
+    // Entries of table version v in the per-hop, SR and
+    // cal_port_slice_to_node tables are keyed on arrival_ts +
+    // v * kVersionSliceOffset; lookups only match the active version.
+    static constexpr uint32_t kVersionSliceOffset = 128;
+    void SetActiveVersion(uint32_t version);
+    // Switch to ``version`` at simulated time ``at`` (immediately if it has
+    // passed), replacing any pending switch.
+    void ScheduleActiveVersion(uint32_t version, Time at);
+    uint32_t GetActiveVersion() const;
+
     // Introspection.
     uint64_t GetIngressFromHostCount() const;
     uint64_t GetIngressFromUplinkCount() const;
@@ -408,6 +439,11 @@ class TorApp : public Application
 
     // Compose the LUT key for per-hop / SR / cal_port_slice_to_node tables.
     static uint64_t PerHopKey(uint32_t dst_node, uint32_t arrival_ts);
+    // PerHopKey of the active table version, for lookups.
+    uint64_t LookupKey(uint32_t dst_node, uint32_t arrival_ts) const;
+
+    uint32_t m_activeVersion;
+    EventId m_versionEvent;
 };
 
 } // namespace openoptics
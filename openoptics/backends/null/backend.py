@@ -0,0 +1,240 @@
+# Copyright (c) Max-Planck-Gesellschaft zur Förderung der Wissenschaften e.V.
+# Developed at the Max Planck Institute for Informatics, Network and Cloud Systems Group
+#
+# Author: Yiming Lei (ylei@mpi-inf.mpg.de)
+#
+# This software is licensed for non-commercial scientific research purposes only.
+#
+# License text: Creative Commons NC BY SA 4.0
+# https://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
+
+"""Null backend.
+
+Programs no switches. Every table operation is recorded and returns at once,
+so the whole ``BaseNetwork`` control plane (topology, routing, entry
+generation, diffing, versioning) runs without Mininet, ns-3 or hardware.
+This makes it possible to benchmark and regression-test deployments of
+thousands of ToRs on any machine::
+
+    net = BaseNetwork(name="bench", backend="Null", nb_node=1024, use_webserver=False)
+    net.deploy_topo(OpticalTopo.round_robin(nb_node=1024))
+    net.deploy_routing(OpticalRouting.routing_direct(net.get_topo()))
+    print(net._backend.report())
+
+The recorded program can be loaded into another backend later with
+:meth:`NullBackend.replay`.
+"""
+
+import asyncio
+import pickle
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from openoptics.backends.base import BackendBase, SwitchHandle, TableBatch, TableDelta
+
+
+@dataclass
+class TableOp:
+    """One recorded table operation.
+
+    The payload is kept by reference: entry lists, batches and deltas are not
+    copied, so recording costs one small object per call.
+
+    Attributes:
+        op: Backend method, ``"load_table"``, ``"load_table_batch"``,
+            ``"apply_table_delta"``, ``"clear_table"`` or ``"set_active_version"``.
+        switch: Switch name, or ``None`` for ``set_active_version``.
+        payload: The entry list, :class:`TableBatch` or :class:`TableDelta`,
+            the table name for ``clear_table`` and ``(version, at_us)`` for
+            ``set_active_version``.
+        at_s: Seconds since :meth:`NullBackend.setup` when the call was made.
+    """
+    op: str
+    switch: Optional[str]
+    payload: Any
+    at_s: float
+
+    @property
+    def entries(self) -> int:
+        """Number of entries the operation writes."""
+        if self.op in ("load_table", "load_table_batch", "apply_table_delta"):
+            return len(self.payload)
+        return 0
+
+
+class NullBackend(BackendBase):
+    """Backend that records table operations instead of programming switches.
+
+    ``setup()`` accepts every backend-specific keyword argument, so a script
+    written for another backend runs unchanged with ``backend="Null"``. Two
+    of them are honored: ``supports_table_delta`` and
+    ``supports_versioned_tables`` (both default True) select how
+    ``BaseNetwork`` updates the tables, e.g. to record a program for a
+    backend without incremental updates.
+    """
+
+    # No Thrift to poll, no live network to interact with.
+    supports_device_manager = False
+    supports_cli = False
+    supports_table_delta = True
+    supports_versioned_tables = True
+    accepts_any_backend_kwargs = True
+
+    def __init__(self) -> None:
+        self.ops: list = []  # [TableOp, ...]
+        self.config: dict = {}
+        self._switches: dict = {}
+        self._tor_handles: list = []
+        self._ip_to_tor: dict = {}
+        self._start = time.perf_counter()
+
+    def setup(
+        self,
+        *,
+        nb_node,
+        nb_host_per_tor,
+        nb_link,
+        nb_time_slices,
+        time_slice_duration_us,
+        guardband_us,
+        calendar_queue_mode,
+        **backend_kwargs,
+    ) -> None:
+        self.config = dict(
+            nb_node=nb_node,
+            nb_host_per_tor=nb_host_per_tor,
+            nb_link=nb_link,
+            nb_time_slices=nb_time_slices,
+            time_slice_duration_us=time_slice_duration_us,
+            guardband_us=guardband_us,
+            calendar_queue_mode=calendar_queue_mode,
+            **backend_kwargs,
+        )
+        for flag in ("supports_table_delta", "supports_versioned_tables"):
+            if flag in backend_kwargs:
+                setattr(self, flag, bool(backend_kwargs[flag]))
+
+        self._tor_handles = [SwitchHandle(f"tor{i}", 9091 + i) for i in range(nb_node)]
+        self._switches = {sw.name: sw for sw in self._tor_handles}
+        self._switches["ocs"] = SwitchHandle("ocs", 9090)
+        # One host address per ToR, as the other backends assign them.
+        self._ip_to_tor = {f"10.{i >> 8}.{i & 0xFF}.1": i for i in range(nb_node)}
+        self.reset()
+
+    def get_switch(self, name: str) -> SwitchHandle:
+        return self._switches[name]
+
+    def switch_exists(self, name: str) -> bool:
+        return name in self._switches
+
+    def get_tor_switches(self) -> list:
+        return list(self._tor_handles)
+
+    def get_ip_to_tor(self) -> dict:
+        return dict(self._ip_to_tor)
+
+    def _record(self, op, switch, payload) -> bool:
+        self.ops.append(TableOp(op, switch, payload, time.perf_counter() - self._start))
+        return True
+
+    def load_table(
+        self,
+        switch_name,
+        entries,
+        print_flag=False,
+        save_flag=False,
+        save_name="saved_commands",
+    ) -> bool:
+        return self._record("load_table", switch_name, entries)
+
+    def load_table_batch(self, switch_name, batch: TableBatch, print_flag=False) -> bool:
+        return self._record("load_table_batch", switch_name, batch)
+
+    def clear_table(self, switch_name, table, print_flag=False) -> None:
+        self._record("clear_table", switch_name, table)
+
+    def apply_table_delta(self, switch_name, delta: TableDelta, print_flag=False) -> bool:
+        return self._record("apply_table_delta", switch_name, delta)
+
+    async def set_active_version(self, version, at_us=None) -> bool:
+        return self._record("set_active_version", None, (version, at_us))
+
+    def stop(self) -> None:
+        pass
+
+    def cleanup(self) -> None:
+        pass
+
+    def reset(self) -> None:
+        """Drop the recorded operations and restart the clock, e.g. between benchmark phases."""
+        self.ops = []
+        self._start = time.perf_counter()
+
+    def report(self) -> dict:
+        """Summarize the recorded operations.
+
+        ``bytes`` is the pickled size of the payloads, a backend-independent
+        measure of how much a deployment writes. It is computed here rather
+        than while recording, so it does not slow down the control plane.
+
+        Returns:
+            ``{op: {"calls": n, "entries": n, "bytes": n}}`` for every recorded
+            operation type, plus ``"total"`` over all of them and
+            ``"elapsed_s"``, the time from setup() (or reset()) to the last
+            recorded operation.
+        """
+        report = {}
+        total = {"calls": 0, "entries": 0, "bytes": 0}
+        for table_op in self.ops:
+            stats = report.setdefault(table_op.op, {"calls": 0, "entries": 0, "bytes": 0})
+            nbytes = len(pickle.dumps(table_op.payload, pickle.HIGHEST_PROTOCOL))
+            for counts in (stats, total):
+                counts["calls"] += 1
+                counts["entries"] += table_op.entries
+                counts["bytes"] += nbytes
+        report["total"] = total
+        report["elapsed_s"] = self.ops[-1].at_s if self.ops else 0.0
+        return report
+
+    def replay(self, backend: BackendBase, print_flag: bool = False) -> bool:
+        """Apply the recorded operations, in order, to another backend.
+
+        The target must already be set up with the same switches. It must
+        support the incremental updates and table versions the recording
+        uses; record with ``supports_table_delta=False`` or
+        ``supports_versioned_tables=False`` for backends that do not.
+        Version switches keep their recorded ``at_us``.
+
+        Args:
+            backend: The backend to program.
+            print_flag: Print backend output if True.
+
+        Returns:
+            True if every operation succeeded.
+
+        Raises:
+            ValueError: The recording uses operations the target does not support.
+        """
+        for table_op in self.ops:
+            if table_op.op == "apply_table_delta" and not backend.can_apply_table_delta(table_op.switch):
+                raise ValueError(
+                    f"{type(backend).__name__} cannot apply table deltas to {table_op.switch}."
+                )
+            if table_op.op == "set_active_version" and not backend.supports_versioned_tables:
+                raise ValueError(f"{type(backend).__name__} does not support versioned tables.")
+
+        ok = True
+        for table_op in self.ops:
+            if table_op.op == "load_table":
+                ok &= backend.load_table(table_op.switch, table_op.payload, print_flag=print_flag)
+            elif table_op.op == "load_table_batch":
+                ok &= backend.load_table_batch(table_op.switch, table_op.payload, print_flag=print_flag)
+            elif table_op.op == "apply_table_delta":
+                ok &= backend.apply_table_delta(table_op.switch, table_op.payload, print_flag=print_flag)
+            elif table_op.op == "clear_table":
+                backend.clear_table(table_op.switch, table_op.payload, print_flag=print_flag)
+            else:
+                version, at_us = table_op.payload
+                ok &= asyncio.run(backend.set_active_version(version, at_us))
+        return ok
@@ -52,10 +52,13 @@ from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional
 
+from openoptics.Tracer import tracer
 from openoptics.backends.base import (
     BackendBase,
     SwitchHandle,
+    TableDelta,
     TableEntry,
+    match_range,
 )
 
 logger = logging.getLogger(__name__)
@@ -77,6 +80,7 @@ class TofinoBackend(BackendBase):
     Logical table (frontend)  Handling
     ========================= =========================================
     ``ocs_schedule``          → JSON → ``setup_ocs.py`` on OCS switch
+                              (later deltas → ``update_ocs.py``)
     ``per_hop_routing``       → JSON → ``setup_tor.py`` on ToR switch
     ``ip_to_dst_node``        → ``ip_to_mac_tor{N}.json`` → ``setup_tor.py``
                               (populates the source-ToR IP→dst-MAC rewrite
@@ -89,6 +93,8 @@ class TofinoBackend(BackendBase):
     """
 
     supports_device_manager = False
+    # OCS schedule changes after the first deploy go through update_ocs.py.
+    supports_table_delta = True
     # Tofino SR action carries at most two hops; the load_table path also
     # raises if a longer SR entry slips through.
     max_source_route_hops = 2
@@ -358,6 +364,47 @@ class TofinoBackend(BackendBase):
             logger.warning("load_table: unknown switch '%s', skipping.", switch_name)
         return True
 
+    def can_apply_table_delta(self, switch_name: str) -> bool:
+        """Only the OCS is updated at runtime; ToR tables are set at deploy."""
+        return switch_name == "ocs"
+
+    def apply_table_delta(
+        self,
+        switch_name: str,
+        delta: TableDelta,
+        print_flag: bool = False,
+    ) -> bool:
+        """Apply an OCS schedule delta on the running OCS via ``update_ocs.py``.
+
+        Returns False for any other switch: ToR tables are only set at deploy.
+        """
+        if not self.can_apply_table_delta(switch_name):
+            logger.error(
+                "apply_table_delta: runtime updates are only supported for the OCS, "
+                "not '%s'.", switch_name,
+            )
+            return False
+        self._wait_for_ocs()
+        if self._deployer is None or self._skip_deploy:
+            logger.info("OCS delta skipped (no config or skip_deploy).")
+            return True
+
+        delta_json = {
+            "adds": self._gen_ocs_json(delta.adds)["entries"],
+            "modifies": self._gen_ocs_json(delta.modifies)["entries"],
+            "deletes": self._gen_ocs_json(delta.deletes)["entries"],
+        }
+        json_path = self._tofino_repo / "emulated-ocs" / "ocs_delta.json"
+        with open(json_path, "w") as f:
+            json.dump(delta_json, f, indent=2)
+        tracer.annotate(bytes=os.path.getsize(json_path))
+        logger.info(
+            "Generated OCS delta JSON: %d adds, %d modifies, %d deletes.",
+            len(delta_json["adds"]), len(delta_json["modifies"]), len(delta_json["deletes"]),
+        )
+        self._deployer.update_ocs(json_path, remote_workdir=self._remote_workdir)
+        return True
+
     def clear_table(
         self,
         switch_name: str,
@@ -724,6 +771,7 @@ class TofinoBackend(BackendBase):
         json_path = self._tofino_repo / "emulated-ocs" / "ocs_entries.json"
         with open(json_path, "w") as f:
             json.dump(ocs_json, f, indent=2)
+        tracer.annotate(bytes=os.path.getsize(json_path))
         logger.info("Generated OCS JSON with %d entries.", len(ocs_json["entries"]))
 
         # Write runtime config for the remote setup script
@@ -799,6 +847,7 @@ class TofinoBackend(BackendBase):
             return
 
         # Generate one JSON file per ToR
+        payload_bytes = 0
         for tor_id, entries in self._pending_tor_entries.items():
             pipe_id = self._tor_pipe_ids.get(tor_id, tor_id % 4)
             tor_json = self._gen_tor_json(tor_id, pipe_id, entries)
@@ -806,6 +855,7 @@ class TofinoBackend(BackendBase):
             json_path = self._tofino_repo / "openoptics-tor" / f"tor_entries_tor{tor_id}.json"
             with open(json_path, "w") as f:
                 json.dump(tor_json, f, indent=2)
+            payload_bytes += os.path.getsize(json_path)
             logger.info("Generated ToR %d JSON with %d per-hop, %d source-routing, "
                         "%d node-to-port, %d ip-to-mac entries (pipe %d).",
                         tor_id,
@@ -814,6 +864,8 @@ class TofinoBackend(BackendBase):
                         len(tor_json["node_to_port_slice_entries"]),
                         len(tor_json["ip_to_mac_entries"]),
                         pipe_id)
+        # Every ToR deploys from the load_table call that completes the set.
+        tracer.annotate(bytes=payload_bytes)
 
         # Write runtime config for the remote setup script
         self._write_config(self._tofino_repo / "openoptics-tor" / "openoptics_config.json")
@@ -845,7 +897,7 @@ class TofinoBackend(BackendBase):
                 continue
             if e.table == "per_hop_routing":
                 dst = e.match_keys["dst"]
-                cur_slice = e.match_keys["arrival_ts"]
+                cur_slice, cur_slice_end = match_range(e.match_keys["arrival_ts"])
                 slot = e.action_params["send_ts"]
                 port = e.action_params["send_port"]
                 dst_group = dst + 0x10
@@ -855,6 +907,7 @@ class TofinoBackend(BackendBase):
 
                 per_hop_json.append({
                     "cur_slice": cur_slice,
+                    "cur_slice_end": cur_slice_end,
                     "dst_group": dst_group,
                     "port": port,
                     "slot": slot,
@@ -865,7 +918,7 @@ class TofinoBackend(BackendBase):
                 })
             elif e.table == "add_source_routing_entries":
                 dst = e.match_keys["dst"]
-                cur_slice = e.match_keys["arrival_ts"]
+                cur_slice, cur_slice_end = match_range(e.match_keys["arrival_ts"])
                 hops = e.action_params["hops"]  # list of (cur_node, send_ts, send_port)
                 dst_group = dst + 0x10
 
@@ -946,6 +999,7 @@ class TofinoBackend(BackendBase):
 
                 sr_json_entries.append({
                     "cur_slice": cur_slice,
+                    "cur_slice_end": cur_slice_end,
                     "dst_group": dst_group,
                     "hops": hop_json,
                 })
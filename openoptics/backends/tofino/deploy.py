@@ -124,6 +124,36 @@ class TofinoDeployer:
         logger.info("OCS ready at %s", addr)
         return addr
 
+    def update_ocs(
+        self,
+        delta_path: Path,
+        remote_workdir: str = "/tmp/openoptics",
+    ) -> None:
+        """Apply an OCS schedule delta to the running OCS switch.
+
+        Uploads the delta JSON next to the deployed ``emulated-ocs/`` tree
+        and runs ``update_ocs.py`` via bfshell. bf_switchd keeps running and
+        unchanged entries keep forwarding throughout.
+        """
+        ssh = self._ssh_clients.get("ocs")
+        if ssh is None:
+            ssh = self.ssh_connect(self._config["ocs_switch"])
+            self._ssh_clients["ocs"] = ssh
+
+        remote_dir = remote_workdir + "/emulated-ocs"
+        sftp = ssh.open_sftp()
+        try:
+            sftp.put(str(delta_path), f"{remote_dir}/ocs_delta.json")
+        finally:
+            sftp.close()
+
+        self._run_setup_via_bfshell(
+            ssh, role="ocs",
+            remote_workdir=remote_workdir,
+            subdir="emulated-ocs",
+            setup_script="update_ocs.py",
+        )
+
     def deploy_tors(
         self,
         remote_workdir: str = "/tmp/openoptics",
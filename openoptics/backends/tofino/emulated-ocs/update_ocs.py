@@ -0,0 +1,62 @@
+"""
+update_ocs.py — BFRt Python script that applies an OCS schedule delta in place.
+
+Reads ocs_delta.json (generated by backend.py) with "adds", "modifies" and
+"deletes" lists in the same format as ocs_entries.json. Unlike setup_ocs.py it
+does not clear tables or touch ports, so unchanged entries keep forwarding.
+"""
+
+import os
+import json
+
+_script_dir = os.path.dirname(os.path.abspath(os.environ.get("SETUP_SCRIPT") or __file__))
+
+with open(os.path.join(_script_dir, 'openoptics_config.json')) as _f:
+    _cfg = json.load(_f)
+
+# ── OCS front-panel layout from config (same as setup_ocs.py) ───────────────
+
+TOR_NUM = _cfg["TOR_NUM"]
+
+ocs_fp_layout = [[] for _ in range(TOR_NUM)]
+for tor_id, port_idx, cage_str in _cfg["ocs_fp_layout"]:
+    cage, lane = cage_str.split("/")
+    while len(ocs_fp_layout[tor_id]) <= port_idx:
+        ocs_fp_layout[tor_id].append(None)
+    ocs_fp_layout[tor_id][port_idx] = (int(cage), int(lane))
+
+def get_dev_port(cage, lane=0):
+    return bfrt.port.port_hdl_info.get(CONN_ID=cage, CHNL_ID=lane, print_ents=False).data[b'$DEV_PORT']
+
+ocs_dev_ports = [
+    [get_dev_port(*p) if p is not None else None for p in tor_fps]
+    for tor_fps in ocs_fp_layout
+]
+
+# ── Apply delta ──────────────────────────────────────────────────────────────
+
+ocs_table = bfrt.ocs.pipe.Ingress.ocs_table
+
+with open(os.path.join(_script_dir, 'ocs_delta.json')) as _f:
+    _delta = json.load(_f)
+
+# Deletes first so that a freed (cur_slice, ingress_port) key can be re-added.
+for e in _delta["deletes"]:
+    ocs_table.delete(
+        cur_slice=e["cur_slice"],
+        ingress_port=ocs_dev_ports[e["ingress_tor"]][e["ingress_port"]])
+
+for e in _delta["modifies"]:
+    ocs_table.mod_with_set_egress_port(
+        cur_slice=e["cur_slice"],
+        ingress_port=ocs_dev_ports[e["ingress_tor"]][e["ingress_port"]],
+        egress_port=ocs_dev_ports[e["egress_tor"]][e["egress_port"]])
+
+for e in _delta["adds"]:
+    ocs_table.add_with_set_egress_port(
+        cur_slice=e["cur_slice"],
+        ingress_port=ocs_dev_ports[e["ingress_tor"]][e["ingress_port"]],
+        egress_port=ocs_dev_ports[e["egress_tor"]][e["egress_port"]])
+
+print(f"[OpenOptics] Loaded OCS delta: {len(_delta['adds'])} adds, "
+      f"{len(_delta['modifies'])} modifies, {len(_delta['deletes'])} deletes.")
@@ -318,7 +318,9 @@ def setup_tor(pipe_id, tor_id):
     #   time_flow_table_source    — source-routed paths; 2-hop paths pack the
     #                               second hop into hdr.sr_entry at the source ToR
     # A given (cur_slice, dst_group) may live in either table; the source table
-    # takes priority at runtime (see routing.p4 apply block).
+    # takes priority at runtime (see routing.p4 apply block). Both match
+    # cur_slice as a range; the ranges of one dst_group never overlap, so
+    # every entry gets the same priority.
     time_flow_table_per_hop = tor_pipe.Ingress.routing.time_flow_table_per_hop
     time_flow_table_source  = tor_pipe.Ingress.routing.time_flow_table_source
 
@@ -330,7 +332,9 @@ def setup_tor(pipe_id, tor_id):
     for e in _tor_payload.get("per_hop_routing_entries", []):
         time_flow_table_per_hop.add_with_set_send_slice(
             pipe=pipe_id,
-            cur_slice=e["cur_slice"],
+            cur_slice_start=e["cur_slice"],
+            cur_slice_end=e["cur_slice_end"],
+            match_priority=0,
             dst_group=e["dst_group"],
             port=e["port"],
             next_tor=e["next_tor"],
@@ -349,7 +353,9 @@ def setup_tor(pipe_id, tor_id):
             h0 = hops[0]
             time_flow_table_source.add_with_set_sr_1_hops(
                 pipe=pipe_id,
-                cur_slice=e["cur_slice"],
+                cur_slice_start=e["cur_slice"],
+                cur_slice_end=e["cur_slice_end"],
+                match_priority=0,
                 dst_group=e["dst_group"],
                 port=h0["send_port"],
                 slot=h0["send_slice"],
@@ -358,7 +364,9 @@ def setup_tor(pipe_id, tor_id):
             h0, h1 = hops[0], hops[1]
             time_flow_table_source.add_with_set_sr_2_hops(
                 pipe=pipe_id,
-                cur_slice=e["cur_slice"],
+                cur_slice_start=e["cur_slice"],
+                cur_slice_end=e["cur_slice_end"],
+                match_priority=0,
                 dst_group=e["dst_group"],
                 port=h0["send_port"],
                 slot=h0["send_slice"],
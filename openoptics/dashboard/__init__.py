@@ -16,14 +16,32 @@ See ``openoptics.dashboard.service`` for lifecycle; ``openoptics.dashboard.event
 for the event schema; ``openoptics.dashboard.collectors.base`` for writing
 custom collectors.
 """
-from .config import DashboardConfig
-from .events import MetricSample, TopologyUpdate
-from .service import DashboardService, NullDashboard
-
-# Backward-compatible alias for the (now-deleted) top-level
-# ``openoptics.Dashboard`` class. Any user code doing
-# ``from openoptics import Dashboard`` keeps working.
-Dashboard = DashboardService
+from .null import NullDashboard
+
+# Everything else is loaded on first access (PEP 562), so that
+# ``BaseNetwork(use_webserver=False)`` never imports the service stack.
+_LAZY_ATTRS = {
+    "DashboardService": ".service",
+    "DashboardConfig": ".config",
+    "MetricSample": ".events",
+    "TopologyUpdate": ".events",
+    # Backward-compatible alias for the (now-deleted) top-level
+    # ``openoptics.Dashboard`` class. Any user code doing
+    # ``from openoptics import Dashboard`` keeps working.
+    "Dashboard": ".service",
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+
+    module = importlib.import_module(_LAZY_ATTRS[name], __name__)
+    value = getattr(module, "DashboardService" if name == "Dashboard" else name)
+    globals()[name] = value
+    return value
+
 
 __all__ = [
     "DashboardService",
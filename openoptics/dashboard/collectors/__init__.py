@@ -1,11 +1,17 @@
 from .base import Collector
+from .control_plane import ControlPlaneLatencyPublisher
 from .device_metrics import DeviceMetricCollector
 from .ns3_metrics import Ns3MetricSink
 from .reconfig_events import ReconfigEventPublisher
+from .stage_timings import StageTimingPublisher
+from .tor_telemetry import TorTelemetryReceiver
 
 __all__ = [
     "Collector",
+    "ControlPlaneLatencyPublisher",
     "DeviceMetricCollector",
     "Ns3MetricSink",
     "ReconfigEventPublisher",
+    "StageTimingPublisher",
+    "TorTelemetryReceiver",
 ]
@@ -0,0 +1,63 @@
+# Copyright (c) Max-Planck-Gesellschaft zur Förderung der Wissenschaften e.V.
+# Developed at the Max Planck Institute for Informatics, Network and Cloud Systems Group
+#
+# Author: Yiming Lei (ylei@mpi-inf.mpg.de)
+#
+# License: Creative Commons NC BY SA 4.0
+# https://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
+"""Event-driven publisher for control-plane phase latencies.
+
+Listens to the :mod:`openoptics.Tracer` spans of topology and routing
+deployment and backend table operations. Each finished span persists one
+:class:`MetricSample` with ``metric_type="control_plane_latency"``, the span
+duration in milliseconds and the phase name as a label. Entry and byte counts
+stay in the span; they are in the Chrome trace dump.
+"""
+from __future__ import annotations
+
+import itertools
+import threading
+from typing import Optional
+
+from ..broker import EventBroker
+from ..events import MetricSample
+from ..storage.repository import Repository
+
+METRIC_TYPE = "control_plane_latency"
+DEVICE = "controller"
+
+
+class ControlPlaneLatencyPublisher:
+    def __init__(self) -> None:
+        self._repo: Optional[Repository] = None
+        self._broker: Optional[EventBroker] = None
+        self._epoch_id: Optional[int] = None
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+
+    def bind(self, repo: Repository, broker: EventBroker, epoch_id: int) -> None:
+        self._repo = repo
+        self._broker = broker
+        self._epoch_id = epoch_id
+
+    def emit(self, span) -> None:
+        if self._repo is None or self._broker is None or self._epoch_id is None:
+            # Dashboard inactive (NullDashboard path) — silently no-op.
+            return
+        with self._lock:
+            timestep = next(self._counter)
+        sample = MetricSample(
+            metric_type=METRIC_TYPE,
+            device=DEVICE,
+            value=span.duration_s * 1000.0,
+            timestep=timestep,
+            timestamp=span.start_s + span.duration_s,
+            epoch_id=self._epoch_id,
+            labels={"phase": span.name},
+        )
+        try:
+            self._repo.insert_samples([sample])
+        except Exception:
+            # Persistence failure must not break the traced call.
+            pass
+        self._broker.publish_threadsafe(sample)
@@ -30,18 +30,22 @@ class DeviceMetricCollector(Collector):
         nb_port: int = 1,
         nb_queue: int = 1,
         interval_s: float = 1.0,
+        tor_metrics: bool = True,
     ):
         super().__init__(interval_s=interval_s, name="DeviceMetricCollector")
         self._dm = device_manager
         self._nb_port = nb_port
         self._nb_queue = nb_queue
+        # False when the ToRs push their metrics (TorTelemetryReceiver) and
+        # only the OCS counters are polled.
+        self._tor_metrics = tor_metrics
 
     def _sample(self, timestep: int) -> Iterable[Event]:
         now = time.time()
-        metrics = self._dm.get_device_metric()
+        metrics = self._dm.get_device_metric() if self._tor_metrics else {}
         events: List[Event] = []
 
-        for switch in self._dm.switches:
+        for switch in self._dm.switches if self._tor_metrics else ():
             name = switch.name
             per_switch = metrics.get(name, {})
             pq_depths = per_switch.get("pq_depth", {}) or {}
@@ -109,32 +113,52 @@ class DeviceMetricCollector(Collector):
 
         # OCS schedule hit/miss counters. Optional: backends without optical
         # switches return {} and no OCS samples are emitted.
+        # get_ocs_counters() reads each OCS in one round trip and adds the
+        # per-slice forward counts; get_ocs_metric() has the hits/misses only.
+        ocs_counters_fn = getattr(self._dm, "get_ocs_counters", None)
         ocs_metric_fn = getattr(self._dm, "get_ocs_metric", None)
-        if ocs_metric_fn is not None:
-            try:
-                ocs_metrics = ocs_metric_fn()
-            except Exception:
-                ocs_metrics = {}
-            for sw_name, per_port in ocs_metrics.items():
-                for port, (hits, misses) in per_port.items():
-                    events.append(MetricSample(
-                        metric_type="ocs_schedule_hit",
-                        device=sw_name,
-                        labels={"port": port},
-                        value=float(hits),
-                        timestep=timestep,
-                        timestamp=now,
-                        epoch_id=self._epoch_id,
-                    ))
-                    events.append(MetricSample(
-                        metric_type="ocs_schedule_miss",
-                        device=sw_name,
-                        labels={"port": port},
-                        value=float(misses),
-                        timestep=timestep,
-                        timestamp=now,
-                        epoch_id=self._epoch_id,
-                    ))
+        try:
+            if ocs_counters_fn is not None:
+                ocs_counters = ocs_counters_fn()
+            elif ocs_metric_fn is not None:
+                ocs_counters = {
+                    sw_name: {"ports": per_port, "slice_forwards": []}
+                    for sw_name, per_port in ocs_metric_fn().items()
+                }
+            else:
+                ocs_counters = {}
+        except Exception:
+            ocs_counters = {}
+        for sw_name, counters in ocs_counters.items():
+            for port, (hits, misses) in counters["ports"].items():
+                events.append(MetricSample(
+                    metric_type="ocs_schedule_hit",
+                    device=sw_name,
+                    labels={"port": port},
+                    value=float(hits),
+                    timestep=timestep,
+                    timestamp=now,
+                    epoch_id=self._epoch_id,
+                ))
+                events.append(MetricSample(
+                    metric_type="ocs_schedule_miss",
+                    device=sw_name,
+                    labels={"port": port},
+                    value=float(misses),
+                    timestep=timestep,
+                    timestamp=now,
+                    epoch_id=self._epoch_id,
+                ))
+            for time_slice, forwards in enumerate(counters.get("slice_forwards", [])):
+                events.append(MetricSample(
+                    metric_type="ocs_slice_forward",
+                    device=sw_name,
+                    labels={"slice": time_slice},
+                    value=float(forwards),
+                    timestep=timestep,
+                    timestamp=now,
+                    epoch_id=self._epoch_id,
+                ))
 
         return events
 
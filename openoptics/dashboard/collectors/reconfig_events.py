@@ -39,7 +39,7 @@ class ReconfigEventPublisher:
         self._broker = broker
         self._epoch_id = epoch_id
 
-    def emit(self, switch_name: str, qid: int) -> None:
+    def emit(self, switch_name: str, qid: int, port: Optional[int] = None) -> None:
         if self._repo is None or self._broker is None or self._epoch_id is None:
             # Dashboard inactive (NullDashboard path) — silently no-op.
             return
@@ -52,7 +52,7 @@ class ReconfigEventPublisher:
             timestep=timestep,
             timestamp=time.time(),
             epoch_id=self._epoch_id,
-            labels={},
+            labels={} if port is None else {"port": port},
         )
         try:
             self._repo.insert_samples([sample])
@@ -0,0 +1,65 @@
+# Copyright (c) Max-Planck-Gesellschaft zur Förderung der Wissenschaften e.V.
+# Developed at the Max Planck Institute for Informatics, Network and Cloud Systems Group
+#
+# Author: Yiming Lei (ylei@mpi-inf.mpg.de)
+#
+# License: Creative Commons NC BY SA 4.0
+# https://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
+"""Event-driven publisher for traffic-aware control-loop stage latencies.
+
+Like :class:`ReconfigEventPublisher`, this has no polling thread — the
+traffic-aware controller calls :meth:`emit` once per finished stage (metric
+poll, matching computation, staging, commit). Each call persists one
+:class:`MetricSample` with ``metric_type="ta_stage_latency"``, the stage
+duration in milliseconds and the stage name as a label, so every stage
+becomes its own line on the controller chart.
+"""
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from typing import Optional
+
+from ..broker import EventBroker
+from ..events import MetricSample
+from ..storage.repository import Repository
+
+METRIC_TYPE = "ta_stage_latency"
+DEVICE = "controller"
+
+
+class StageTimingPublisher:
+    def __init__(self) -> None:
+        self._repo: Optional[Repository] = None
+        self._broker: Optional[EventBroker] = None
+        self._epoch_id: Optional[int] = None
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+
+    def bind(self, repo: Repository, broker: EventBroker, epoch_id: int) -> None:
+        self._repo = repo
+        self._broker = broker
+        self._epoch_id = epoch_id
+
+    def emit(self, stage: str, duration_s: float) -> None:
+        if self._repo is None or self._broker is None or self._epoch_id is None:
+            # Dashboard inactive (NullDashboard path) — silently no-op.
+            return
+        with self._lock:
+            timestep = next(self._counter)
+        sample = MetricSample(
+            metric_type=METRIC_TYPE,
+            device=DEVICE,
+            value=duration_s * 1000.0,
+            timestep=timestep,
+            timestamp=time.time(),
+            epoch_id=self._epoch_id,
+            labels={"stage": stage},
+        )
+        try:
+            self._repo.insert_samples([sample])
+        except Exception:
+            # Persistence failure must not break the control loop.
+            pass
+        self._broker.publish_threadsafe(sample)
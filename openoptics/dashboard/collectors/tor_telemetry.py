@@ -0,0 +1,267 @@
+# Copyright (c) Max-Planck-Gesellschaft zur Förderung der Wissenschaften e.V.
+# Developed at the Max Planck Institute for Informatics, Network and Cloud Systems Group
+#
+# Author: Yiming Lei (ylei@mpi-inf.mpg.de)
+#
+# License: Creative Commons NC BY SA 4.0
+# https://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
+"""Receiver for the queue telemetry ToR switches push.
+
+Started with ``--telemetry-addr``, the BMv2 ``tor_switch`` target sends a
+record of every (port, queue) every ``--telemetry-interval-us`` as datagrams
+to a UDP or Unix socket, instead of waiting for the dashboard to poll it over
+Thrift. :class:`TorTelemetryReceiver` listens on that socket, folds the
+records of each ``interval_s`` window into one sample per queue (peak depth,
+bytes enqueued and dequeued, latency) and persists and broadcasts them like
+:class:`DeviceMetricCollector` does.
+
+Wire format (little-endian), one header and ``nb_entries`` entries per
+datagram; a record with more queues than fit in one datagram spans several
+with the same ``seq``::
+
+    header: magic u32, version u16, tor_id u16, seq u32, nb_entries u32,
+            timestamp_us u64, drop_ctr u64
+    entry:  port u16, queue u16, depth u32, enq_bytes u64, deq_bytes u64,
+            latency_us_mean u32, latency_us_max u32, nb_dequeues u32
+
+Byte and latency fields cover the time since the switch's previous record;
+``nb_dequeues`` weights ``latency_us_mean`` when records are aggregated.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..events import Event, MetricSample
+from .base import Collector
+from .device_metrics import AGGREGATE_DEVICE
+
+log = logging.getLogger(__name__)
+
+MAGIC = 0x4C544F4F  # b"OOTL"
+VERSION = 2
+HEADER = struct.Struct("<IHHIIQQ")
+ENTRY = struct.Struct("<HHIQQIII")
+
+# Records arrive every millisecond or so from each ToR; give the socket room
+# to absorb them while a window's samples are written.
+_RCVBUF_BYTES = 4 * 1024 * 1024
+
+
+@dataclass
+class QueueTelemetry:
+    """One (port, queue) entry of a telemetry record."""
+    port: int
+    queue: int
+    depth: int
+    enq_bytes: int
+    deq_bytes: int
+    latency_us_mean: int
+    latency_us_max: int
+    nb_dequeues: int
+
+
+@dataclass
+class TelemetryRecord:
+    """One decoded telemetry datagram."""
+    tor_id: int
+    seq: int
+    timestamp_us: int
+    drop_ctr: int
+    entries: List[QueueTelemetry] = field(default_factory=list)
+
+
+def decode_datagram(data: bytes) -> TelemetryRecord:
+    """Decode one telemetry datagram.
+
+    Raises:
+        ValueError: The datagram is truncated or of another wire format version.
+    """
+    if len(data) < HEADER.size:
+        raise ValueError(f"telemetry datagram of {len(data)} bytes is too short")
+    magic, version, tor_id, seq, nb_entries, timestamp_us, drop_ctr = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"not a version {VERSION} telemetry record")
+    if len(data) != HEADER.size + nb_entries * ENTRY.size:
+        raise ValueError(f"telemetry datagram of {len(data)} bytes for {nb_entries} entries")
+    entries = [
+        QueueTelemetry(*fields)
+        for fields in ENTRY.iter_unpack(data[HEADER.size:])
+    ]
+    return TelemetryRecord(tor_id, seq, timestamp_us, drop_ctr, entries)
+
+
+def parse_address(addr: str) -> Tuple[int, object]:
+    """Split ``"udp:<ip>:<port>"`` or ``"unix:<path>"`` into a family and address."""
+    kind, _, rest = addr.partition(":")
+    if kind == "udp":
+        host, _, port = rest.rpartition(":")
+        if host and port.isdigit():
+            return socket.AF_INET, (host, int(port))
+    elif kind == "unix" and rest:
+        return socket.AF_UNIX, rest
+    raise ValueError(f"telemetry address must be udp:<ip>:<port> or unix:<path>, got {addr!r}")
+
+
+@dataclass
+class _Window:
+    """What one (tor, port, queue) reported within one window."""
+    depth_peak: int = 0
+    depth_last: int = 0
+    enq_bytes: int = 0
+    deq_bytes: int = 0
+    latency_us_sum: int = 0
+    latency_us_max: int = 0
+    nb_dequeues: int = 0
+
+
+class TorTelemetryReceiver(Collector):
+    """Receives pushed ToR telemetry; persists and broadcasts it per window."""
+
+    def __init__(
+        self,
+        addr: str,
+        switch_names: Optional[Dict[int, str]] = None,
+        interval_s: float = 1.0,
+    ):
+        """
+        Args:
+            addr: Address the switches push to, ``udp:<ip>:<port>`` or ``unix:<path>``.
+            switch_names: Device name by ToR id. Defaults to ``tor<id>``.
+            interval_s: Length of the window records are aggregated over.
+        """
+        super().__init__(interval_s=interval_s, name="TorTelemetryReceiver")
+        self.family, self.address = parse_address(addr)
+        self._switch_names = dict(switch_names or {})
+        self._sock: Optional[socket.socket] = None
+        self._last_seq: Dict[int, int] = {}
+        self.nb_records = 0
+        self.nb_lost = 0  # Records missing from the sequence of their switch
+        self.nb_malformed = 0
+
+    def bind(self, repo, broker, epoch_id: int) -> None:
+        super().bind(repo, broker, epoch_id)
+        repo.upsert_metric_type(
+            "queue_enq_bytes", "Queue Enqueued Bytes", "bytes", "line",
+            sort_order=12,
+        )
+        repo.upsert_metric_type(
+            "queue_deq_bytes", "Queue Dequeued Bytes", "bytes", "line",
+            sort_order=13,
+        )
+
+    def open(self) -> None:
+        """Bind the socket; records sent before this are lost."""
+        if self._sock is not None:
+            return
+        if self.family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)  # Left behind by an earlier run
+        sock = socket.socket(self.family, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, _RCVBUF_BYTES)
+        sock.bind(self.address)
+        self._sock = sock
+
+    def close(self) -> None:
+        if self._sock is None:
+            return
+        self._sock.close()
+        self._sock = None
+        if self.family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+
+    def start(self) -> None:
+        self.open()
+        super().start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        super().stop(timeout=timeout)
+        self.close()
+
+    def _receive(self, deadline: float) -> Iterable[TelemetryRecord]:
+        """Yield the records that arrive until deadline or stop()."""
+        while not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            # Wake up regularly so stop() is not held up by a quiet socket.
+            self._sock.settimeout(min(remaining, 0.1))
+            try:
+                data = self._sock.recv(65536)
+            except socket.timeout:
+                continue
+            except OSError:
+                return  # Closed by stop()
+            try:
+                record = decode_datagram(data)
+            except ValueError:
+                self.nb_malformed += 1
+                continue
+            yield record
+
+    def _track_seq(self, record: TelemetryRecord) -> None:
+        last = self._last_seq.get(record.tor_id)
+        if last == record.seq:
+            return  # Continuation datagram of the same record
+        if last is not None:
+            gap = (record.seq - last) & 0xFFFFFFFF  # seq wraps at 2**32
+            if gap < 1 << 31:
+                self.nb_lost += gap - 1
+        self._last_seq[record.tor_id] = record.seq
+        self.nb_records += 1
+
+    def _sample(self, timestep: int) -> Iterable[Event]:
+        if self._sock is None:
+            return []
+        windows: Dict[int, Dict[Tuple[int, int], _Window]] = {}
+        drops: Dict[int, int] = {}
+        for record in self._receive(time.monotonic() + self.interval_s):
+            self._track_seq(record)
+            drops[record.tor_id] = record.drop_ctr
+            per_tor = windows.setdefault(record.tor_id, {})
+            for entry in record.entries:
+                w = per_tor.setdefault((entry.port, entry.queue), _Window())
+                w.depth_peak = max(w.depth_peak, entry.depth)
+                w.depth_last = entry.depth
+                w.enq_bytes += entry.enq_bytes
+                w.deq_bytes += entry.deq_bytes
+                if entry.nb_dequeues:
+                    w.latency_us_sum += entry.latency_us_mean * entry.nb_dequeues
+                    w.latency_us_max = max(w.latency_us_max, entry.latency_us_max)
+                    w.nb_dequeues += entry.nb_dequeues
+        return self._events(timestep, time.time(), windows, drops)
+
+    def _events(self, timestep, now, windows, drops) -> List[Event]:
+        events: List[Event] = []
+
+        def sample(metric_type, device, labels, value):
+            events.append(MetricSample(
+                metric_type=metric_type,
+                device=device,
+                labels=labels,
+                value=float(value),
+                timestep=timestep,
+                timestamp=now,
+                epoch_id=self._epoch_id,
+            ))
+
+        for tor_id, per_tor in sorted(windows.items()):
+            name = self._switch_names.get(tor_id, f"tor{tor_id}")
+            for (port, queue), w in sorted(per_tor.items()):
+                labels = {"port": port, "queue": queue}
+                sample("queue_depth", name, labels, w.depth_peak)
+                sample("queue_enq_bytes", name, labels, w.enq_bytes)
+                sample("queue_deq_bytes", name, labels, w.deq_bytes)
+                if w.nb_dequeues:
+                    # µs on the wire, ms on the dashboard.
+                    sample("queue_latency_mean", name, labels,
+                           w.latency_us_sum / w.nb_dequeues / 1000.0)
+                    sample("queue_latency_max", name, labels, w.latency_us_max / 1000.0)
+            total_depth = sum(w.depth_last for w in per_tor.values())
+            sample("queue_depth", AGGREGATE_DEVICE, {"switch": name}, total_depth)
+            sample("drop_count", AGGREGATE_DEVICE, {"switch": name}, drops[tor_id])
+        return events
@@ -11,6 +11,7 @@ from __future__ import annotations
 import os
 from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Optional
 
 
 def _default_state_dir() -> Path:
@@ -22,6 +23,8 @@ class DashboardConfig:
     enabled: bool = True
     host: str = "localhost"
     port: int = 8001
+    # Serve on this Unix socket instead of host:port.
+    uds: Optional[str] = None
     poll_interval_s: float = 1.0
     state_dir: Path = field(default_factory=_default_state_dir)
 
@@ -52,6 +55,8 @@ class DashboardConfig:
             cfg.host = v
         if v := os.environ.get("OPENOPTICS_DASHBOARD_PORT"):
             cfg.port = int(v)
+        if v := os.environ.get("OPENOPTICS_DASHBOARD_UDS"):
+            cfg.uds = v
         if v := os.environ.get("OPENOPTICS_DASHBOARD_POLL_INTERVAL"):
             cfg.poll_interval_s = float(v)
         return cfg
@@ -0,0 +1,27 @@
+# Copyright (c) Max-Planck-Gesellschaft zur Förderung der Wissenschaften e.V.
+# Developed at the Max Planck Institute for Informatics, Network and Cloud Systems Group
+#
+# Author: Yiming Lei (ylei@mpi-inf.mpg.de)
+#
+# License: Creative Commons NC BY SA 4.0
+# https://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
+"""No-op dashboard, kept apart from :mod:`.service` so that importing it does
+not load the broker, the SQLite repository or asyncio.
+"""
+
+
+class NullDashboard:
+    """No-op dashboard used when ``use_webserver=False``.
+
+    Exposes the same surface as :class:`DashboardService` so callers
+    (``BaseNetwork``, ``OpticalCLI``) never need to check whether the
+    dashboard is active.
+    """
+
+    def begin_epoch(self, seed=None): return None
+    def update_topology(self, slice_to_topo): return None
+    def register_collector(self, collector): return None
+    def register_event_source(self, source): return None
+    def register_controller(self, controller): return None
+    def start(self): return None
+    def stop(self): return None
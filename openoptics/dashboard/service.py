@@ -26,6 +26,7 @@ from .broker import EventBroker
 from .collectors.base import Collector
 from .config import DashboardConfig
 from .events import TopologyUpdate
+from .null import NullDashboard  # noqa: F401  (re-exported)
 from .storage.repository import Epoch, Repository
 
 log = logging.getLogger(__name__)
@@ -40,6 +41,7 @@ class DashboardService:
         self.broker = EventBroker(queue_size=self.config.live_queue_size)
         self.collectors: List[Collector] = []
         self.epoch: Optional[Epoch] = None
+        self.controller = None  # openoptics.Controller.ControllerService
 
         self._server = None  # uvicorn.Server
         self._loop: Optional[asyncio.AbstractEventLoop] = None
@@ -106,6 +108,13 @@ class DashboardService:
             raise RuntimeError("begin_epoch() must be called before register_event_source()")
         source.bind(self.repo, self.broker, self.epoch.id)
 
+    def register_controller(self, controller) -> None:
+        """Serve ``controller``'s update API (``/api/control/*``) next to the dashboard.
+
+        Must be called before ``start()``.
+        """
+        self.controller = controller
+
     # -- lifecycle ------------------------------------------------------
 
     def start(self) -> None:
@@ -129,11 +138,12 @@ class DashboardService:
 
         from .web.app import create_app
 
-        app = create_app(self.config, self.repo, self.broker)
+        app = create_app(self.config, self.repo, self.broker, controller=self.controller)
         cfg = uvicorn.Config(
             app,
             host=self.config.host,
             port=self.config.port,
+            uds=self.config.uds,
             log_level="warning",
             access_log=False,
         )
@@ -174,7 +184,9 @@ class DashboardService:
                 break
             time.sleep(0.05)
 
-        if getattr(server, "started", False):
+        if getattr(server, "started", False) and self.config.uds:
+            print(f"Access dashboard at unix:{self.config.uds}")
+        elif getattr(server, "started", False):
             print(f"Access dashboard at http://{self.config.host}:{self.config.port}")
         else:
             # Bind failure or similar — the loop is closed. Null it out so
@@ -209,18 +221,3 @@ class DashboardService:
         self._loop = None
         self._loop_thread = None
 
-
-class NullDashboard:
-    """No-op dashboard used when ``use_webserver=False``.
-
-    Exposes the same surface as :class:`DashboardService` so callers
-    (``BaseNetwork``, ``OpticalCLI``) never need to check whether the
-    dashboard is active.
-    """
-
-    def begin_epoch(self, seed=None): return None
-    def update_topology(self, slice_to_topo): return None
-    def register_collector(self, collector): return None
-    def register_event_source(self, source): return None
-    def start(self): return None
-    def stop(self): return None
@@ -35,9 +35,12 @@ BUILTIN_METRIC_TYPES: Sequence[tuple] = (
     ("drop_count",  "Drop Count",  "packets", "line", 20),
     ("ocs_schedule_hit", "OCS Schedule Hits", "packets", "line", 30),
     ("ocs_schedule_miss", "OCS Schedule Misses", "packets", "line", 40),
+    ("ocs_slice_forward", "OCS Forwards per Slice", "packets", "line", 41),
     ("queue_latency_mean", "Queue Latency (mean)", "ms", "line", 50),
     ("queue_latency_max",  "Queue Latency (max)",  "ms", "line", 51),
     ("ta_reconfig", "TA Queue Activation", "qid", "line", 60),
+    ("ta_stage_latency", "TA Stage Latency", "ms", "line", 61),
+    ("control_plane_latency", "Control Plane Latency", "ms", "line", 62),
 )
 
 
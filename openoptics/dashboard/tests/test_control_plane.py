@@ -0,0 +1,48 @@
+# Copyright (c) Max-Planck-Gesellschaft zur Förderung der Wissenschaften e.V.
+# License: Creative Commons NC BY SA 4.0
+import tempfile
+import unittest
+from pathlib import Path
+
+from openoptics.dashboard.broker import EventBroker
+from openoptics.dashboard.collectors.control_plane import (
+    DEVICE,
+    METRIC_TYPE,
+    ControlPlaneLatencyPublisher,
+)
+from openoptics.dashboard.storage.repository import Repository
+from openoptics.Tracer import Span
+
+
+class TestControlPlaneLatencyPublisher(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.repo = Repository(Path(self._tmp.name) / "db.sqlite3")
+        self.broker = EventBroker()
+        self.epoch = self.repo.create_epoch("test")
+        self.pub = ControlPlaneLatencyPublisher()
+        self.pub.bind(self.repo, self.broker, self.epoch.id)
+
+    def tearDown(self):
+        self.repo.close()
+        self._tmp.cleanup()
+
+    def test_emit_persists_span_latency_in_ms(self):
+        self.pub.emit(Span(name="BaseNetwork.deploy_routing", start_s=10.0, duration_s=0.25,
+                           args={"entries": 12}))
+        (row,) = self.repo.query_samples(self.epoch.id, metric_type=METRIC_TYPE)
+        self.assertEqual(row.device, DEVICE)
+        self.assertEqual(row.value, 250.0)
+        self.assertEqual(row.timestamp, 10.25)
+        self.assertEqual(row.labels, {"phase": "BaseNetwork.deploy_routing"})
+
+    def test_metric_type_is_registered(self):
+        types = {m.metric_type: m for m in self.repo.list_metric_types()}
+        self.assertEqual(types[METRIC_TYPE].unit, "ms")
+
+    def test_emit_unbound_is_noop(self):
+        ControlPlaneLatencyPublisher().emit(Span(name="x", start_s=0.0))  # must not raise
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -166,6 +166,33 @@ class TestDeviceMetricCollector(unittest.TestCase):
         self.assertEqual(len(misses), 2)
         self.assertTrue(all(e.value == 0 for e in hits + misses))
 
+    def test_sample_emits_slice_forwards_from_bulk_counters(self):
+        dm = FakeDeviceManager(switch_names=("tor0",))
+        dm.get_ocs_counters = lambda: {
+            "ocs": {"ports": {0: (5, 1)}, "slice_forwards": [7, 0, 2]},
+        }
+        c = DeviceMetricCollector(dm, nb_port=1, nb_queue=1, interval_s=0.05)
+        c.bind(self.repo, self.broker, self.epoch.id)
+        events = list(c._sample(timestep=0))
+
+        hits = [e for e in events if e.metric_type == "ocs_schedule_hit"]
+        self.assertEqual([(e.labels["port"], e.value) for e in hits], [(0, 5)])
+        forwards = [e for e in events if e.metric_type == "ocs_slice_forward"]
+        self.assertEqual(
+            [(e.labels["slice"], e.value) for e in forwards], [(0, 7), (1, 0), (2, 2)]
+        )
+        self.assertTrue(all(e.device == "ocs" for e in forwards))
+
+    def test_sample_polls_only_ocs_when_tors_push_metrics(self):
+        dm = FakeDeviceManager(switch_names=("tor0",), ocs_payload={"ocs": {0: (1, 0)}})
+        dm.get_device_metric = lambda: self.fail("ToR metrics polled")
+        c = DeviceMetricCollector(dm, nb_port=1, nb_queue=1, interval_s=0.05, tor_metrics=False)
+        c.bind(self.repo, self.broker, self.epoch.id)
+        events = list(c._sample(timestep=0))
+        self.assertEqual(
+            sorted(e.metric_type for e in events), ["ocs_schedule_hit", "ocs_schedule_miss"]
+        )
+
     def test_sample_skips_ocs_emit_when_manager_lacks_method(self):
         # DeviceManager without get_ocs_metric must not crash the collector.
         class NoOcsDM:
@@ -37,6 +37,11 @@ class TestReconfigEventPublisher(unittest.TestCase):
         self.assertEqual(row.labels, {})
         self.assertEqual(row.epoch_id, self.epoch.id)
 
+    def test_emit_labels_port(self):
+        self.pub.emit("tor0", 3, port=1)
+        (row,) = self.repo.query_samples(self.epoch.id, metric_type=METRIC_TYPE)
+        self.assertEqual(row.labels, {"port": 1})
+
     def test_emit_assigns_monotonic_timesteps(self):
         for qid in (3, 5, 1, 9):
             self.pub.emit("tor0", qid)
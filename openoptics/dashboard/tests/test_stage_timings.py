@@ -0,0 +1,51 @@
+# Copyright (c) Max-Planck-Gesellschaft zur Förderung der Wissenschaften e.V.
+# License: Creative Commons NC BY SA 4.0
+import tempfile
+import unittest
+from pathlib import Path
+
+from openoptics.dashboard.broker import EventBroker
+from openoptics.dashboard.collectors.stage_timings import (
+    DEVICE,
+    METRIC_TYPE,
+    StageTimingPublisher,
+)
+from openoptics.dashboard.storage.repository import Repository
+
+
+class TestStageTimingPublisher(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.repo = Repository(Path(self._tmp.name) / "db.sqlite3")
+        self.broker = EventBroker()
+        self.epoch = self.repo.create_epoch("test")
+        self.pub = StageTimingPublisher()
+        self.pub.bind(self.repo, self.broker, self.epoch.id)
+
+    def tearDown(self):
+        self.repo.close()
+        self._tmp.cleanup()
+
+    def test_emit_persists_stage_latency_in_ms(self):
+        self.pub.emit("compute", 0.25)
+        (row,) = self.repo.query_samples(self.epoch.id, metric_type=METRIC_TYPE)
+        self.assertEqual(row.device, DEVICE)
+        self.assertEqual(row.value, 250.0)
+        self.assertEqual(row.labels, {"stage": "compute"})
+
+    def test_emit_assigns_monotonic_timesteps(self):
+        for stage in ("poll", "compute", "stage", "commit"):
+            self.pub.emit(stage, 0.001)
+        rows = self.repo.query_samples(self.epoch.id, metric_type=METRIC_TYPE)
+        self.assertEqual([r.timestep for r in rows], [0, 1, 2, 3])
+
+    def test_metric_type_is_registered(self):
+        types = {m.metric_type: m for m in self.repo.list_metric_types()}
+        self.assertEqual(types[METRIC_TYPE].unit, "ms")
+
+    def test_emit_unbound_is_noop(self):
+        StageTimingPublisher().emit("poll", 0.1)  # must not raise
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+# Copyright (c) Max-Planck-Gesellschaft zur Förderung der Wissenschaften e.V.
+# License: Creative Commons NC BY SA 4.0
+import os
+import socket
+import tempfile
+import unittest
+from pathlib import Path
+
+from openoptics.dashboard.broker import EventBroker
+from openoptics.dashboard.collectors.tor_telemetry import (
+    ENTRY,
+    HEADER,
+    MAGIC,
+    VERSION,
+    TorTelemetryReceiver,
+    decode_datagram,
+    parse_address,
+)
+from openoptics.dashboard.storage.repository import Repository
+
+
+def datagram(tor_id, seq, entries, drop_ctr=0, timestamp_us=0):
+    """Pack a record the way tor_switch does; entries are ENTRY field tuples."""
+    data = HEADER.pack(MAGIC, VERSION, tor_id, seq, len(entries), timestamp_us, drop_ctr)
+    return data + b"".join(ENTRY.pack(*e) for e in entries)
+
+
+class TestDecode(unittest.TestCase):
+    def test_round_trip(self):
+        record = decode_datagram(datagram(3, 7, [(1, 2, 5, 1500, 900, 40, 80, 6)], drop_ctr=4))
+        self.assertEqual((record.tor_id, record.seq, record.drop_ctr), (3, 7, 4))
+        entry = record.entries[0]
+        self.assertEqual((entry.port, entry.queue, entry.depth), (1, 2, 5))
+        self.assertEqual((entry.enq_bytes, entry.deq_bytes), (1500, 900))
+        self.assertEqual((entry.latency_us_mean, entry.latency_us_max), (40, 80))
+        self.assertEqual(entry.nb_dequeues, 6)
+
+    def test_rejects_malformed(self):
+        good = datagram(0, 0, [(0, 0, 1, 0, 0, 0, 0, 0)])
+        for bad in (good[:10], good[:-1], b"XXXX" + good[4:]):
+            with self.assertRaises(ValueError):
+                decode_datagram(bad)
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address("udp:127.0.0.1:9500"), (socket.AF_INET, ("127.0.0.1", 9500)))
+        self.assertEqual(parse_address("unix:/tmp/t.sock"), (socket.AF_UNIX, "/tmp/t.sock"))
+        for bad in ("tcp:1.2.3.4:5", "udp:127.0.0.1", "unix:"):
+            with self.assertRaises(ValueError):
+                parse_address(bad)
+
+
+class TestTorTelemetryReceiver(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.repo = Repository(Path(self._tmp.name) / "db.sqlite3")
+        self.epoch = self.repo.create_epoch("test")
+        self.path = os.path.join(self._tmp.name, "telemetry.sock")
+        self.receiver = TorTelemetryReceiver(f"unix:{self.path}", interval_s=0.2)
+        self.receiver.bind(self.repo, EventBroker(), self.epoch.id)
+        self.receiver.open()
+        self.sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+    def tearDown(self):
+        self.sender.close()
+        self.receiver.close()
+        self.repo.close()
+        self._tmp.cleanup()
+
+    def send(self, *args, **kwargs):
+        self.sender.sendto(datagram(*args, **kwargs), self.path)
+
+    def test_aggregates_window(self):
+        self.send(0, 1, [(0, 1, 4, 3000, 1000, 10, 20, 1)], drop_ctr=1)
+        self.send(0, 2, [(0, 1, 2, 1000, 2000, 30, 50, 3)], drop_ctr=2)
+        self.send(1, 9, [(0, 0, 0, 0, 0, 0, 0, 0)])
+        events = self.receiver._sample(timestep=0)
+        by_key = {(e.metric_type, e.device, tuple(sorted(e.labels.items()))): e.value for e in events}
+        q = (("port", 0), ("queue", 1))
+
+        self.assertEqual(by_key[("queue_depth", "tor0", q)], 4.0)  # peak
+        self.assertEqual(by_key[("queue_enq_bytes", "tor0", q)], 4000.0)
+        self.assertEqual(by_key[("queue_deq_bytes", "tor0", q)], 3000.0)
+        # Weighted by dequeues: (10 * 1 + 30 * 3) / 4 µs.
+        self.assertAlmostEqual(by_key[("queue_latency_mean", "tor0", q)], 0.025)
+        self.assertAlmostEqual(by_key[("queue_latency_max", "tor0", q)], 0.05)
+        # Network aggregates: the last depth and drop counter of each switch.
+        self.assertEqual(by_key[("queue_depth", "network", (("switch", "tor0"),))], 2.0)
+        self.assertEqual(by_key[("drop_count", "network", (("switch", "tor0"),))], 2.0)
+        # No dequeues on tor1: no latency samples.
+        self.assertNotIn(("queue_latency_mean", "tor1", (("port", 0), ("queue", 0))), by_key)
+        self.assertEqual(self.receiver.nb_records, 3)
+
+    def test_counts_lost_and_malformed(self):
+        self.send(0, 1, [])
+        self.send(0, 4, [])
+        self.send(0, 4, [])  # Continuation of record 4
+        self.sender.sendto(b"garbage", self.path)
+        self.receiver._sample(timestep=0)
+        self.assertEqual(self.receiver.nb_records, 2)
+        self.assertEqual(self.receiver.nb_lost, 2)
+        self.assertEqual(self.receiver.nb_malformed, 1)
+
+    def test_registers_byte_metrics(self):
+        types = {m.metric_type for m in self.repo.list_metric_types()}
+        self.assertTrue({"queue_enq_bytes", "queue_deq_bytes"} <= types)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -117,5 +117,58 @@ class TestWebAPI(unittest.TestCase):
             self.assertEqual(msg["timestep"], 99)
 
 
+@unittest.skipUnless(HAVE_FASTAPI, "fastapi not installed")
+class TestControlAPI(unittest.TestCase):
+    def setUp(self):
+        from concurrent.futures import Future
+        from fastapi.testclient import TestClient
+        from openoptics.dashboard.web.app import create_app
+
+        self._tmp = tempfile.TemporaryDirectory()
+        self.config = DashboardConfig(state_dir=Path(self._tmp.name))
+        self.config.ensure_dirs()
+        self.repo = Repository(self.config.db_path)
+
+        submitted = self.submitted = []
+
+        class FakeController:
+            def submit(self, update):
+                if "bogus" in update:
+                    raise ValueError("Unknown update keys: ['bogus'].")
+                submitted.append(update)
+                future = Future()
+                future.set_result({"ok": True, "coalesced": len(submitted)})
+                return future
+
+            def status(self):
+                return {"pending": 0, "batches": len(submitted)}
+
+        self.client = TestClient(
+            create_app(self.config, self.repo, EventBroker(), controller=FakeController())
+        )
+
+    def tearDown(self):
+        self.repo.close()
+        self._tmp.cleanup()
+
+    def test_update_returns_batch_result(self):
+        r = self.client.post("/api/control/updates", json={"routing": "routing_direct"})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json(), {"ok": True, "coalesced": 1})
+        self.assertEqual(self.submitted, [{"routing": "routing_direct"}])
+        self.assertEqual(self.client.get("/api/control/status").json()["batches"], 1)
+
+    def test_malformed_update_is_rejected(self):
+        r = self.client.post("/api/control/updates", json={"bogus": 1})
+        self.assertEqual(r.status_code, 400)
+
+    def test_not_mounted_without_controller(self):
+        from fastapi.testclient import TestClient
+        from openoptics.dashboard.web.app import create_app
+
+        client = TestClient(create_app(self.config, self.repo, EventBroker()))
+        self.assertEqual(client.get("/api/control/status").status_code, 404)
+
+
 if __name__ == "__main__":
     unittest.main()
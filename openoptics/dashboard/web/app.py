@@ -19,7 +19,7 @@ from fastapi.templating import Jinja2Templates
 from ..broker import EventBroker
 from ..config import DashboardConfig
 from ..storage.repository import Repository
-from . import routes, websocket
+from . import control, routes, websocket
 
 WEB_DIR = Path(__file__).parent
 STATIC_DIR = WEB_DIR / "static"
@@ -30,6 +30,7 @@ def create_app(
     config: DashboardConfig,
     repo: Repository,
     broker: EventBroker,
+    controller=None,
 ) -> FastAPI:
     @asynccontextmanager
     async def lifespan(app: FastAPI):
@@ -49,12 +50,15 @@ def create_app(
     app.state.repo = repo
     app.state.broker = broker
     app.state.templates = templates
+    app.state.controller = controller
 
     app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
     config.media_dir.mkdir(parents=True, exist_ok=True)
     app.mount("/media", StaticFiles(directory=str(config.media_dir)), name="media")
 
     app.include_router(routes.router)
+    if controller is not None:
+        app.include_router(control.router)
     app.add_api_websocket_route("/ws/live", websocket.live_endpoint)
 
     return app
@@ -0,0 +1,46 @@
+# Copyright (c) Max-Planck-Gesellschaft zur Förderung der Wissenschaften e.V.
+# Developed at the Max Planck Institute for Informatics, Network and Cloud Systems Group
+#
+# Author: Yiming Lei (ylei@mpi-inf.mpg.de)
+#
+# License: Creative Commons NC BY SA 4.0
+# https://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
+"""Controller API: submit updates to the running network.
+
+Only mounted when the dashboard serves a controller (see
+:meth:`openoptics.Toolbox.BaseNetwork.start_service`).
+"""
+from __future__ import annotations
+
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Request
+
+router = APIRouter(prefix="/api/control")
+
+
+@router.get("/status")
+def api_status(request: Request):
+    return request.app.state.controller.status()
+
+
+@router.post("/updates")
+async def api_submit_update(request: Request):
+    """Queue one update and return once the batch holding it is deployed.
+
+    Response shape::
+
+        {"ok": true, "coalesced": 3}
+
+    ``coalesced`` is the number of updates deployed together with this one.
+    """
+    try:
+        future = request.app.state.controller.submit(await request.json())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    try:
+        return await asyncio.wrap_future(future)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
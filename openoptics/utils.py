@@ -8,14 +8,17 @@
 # License text: Creative Commons NC BY SA 4.0
 # https://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
 
-from typing import List, Dict
+import dataclasses
+from typing import List, Dict, Iterable, Optional, Tuple
 import networkx as nx
 
 from openoptics.TimeFlowTable import TimeFlowEntry, TimeFlowHop, Path
 from openoptics.OpticalRouting import find_direct_path
-from openoptics.backends.base import TableEntry
+from openoptics.Tracer import traced
+from openoptics.backends.base import TableBatch, TableEntry, TableDelta, match_range
 
 
+@traced(entries=lambda entries: sum(len(e) for e in entries.values()))
 def path2entries(
     paths: List[Path], routing_mode, arch_mode="TO"
 ) -> Dict[int, TimeFlowEntry]:
@@ -69,6 +72,288 @@ def path2entries(
 
 
 
+def table_entry_key(entry: TableEntry) -> tuple:
+    """
+    Identify the table slot an entry occupies.
+
+    Two entries with the same key cannot be installed at the same time; a new entry
+    with an installed key replaces the old one. Each table has a single default action.
+
+    Args:
+        entry: A TableEntry
+
+    Returns:
+        A hashable (table, match) tuple. match is None for default-action entries.
+    """
+    if entry.is_default_action:
+        return (entry.table, None)
+    return (entry.table, tuple(entry.match_keys.items()))
+
+
+def diff_table_entries(
+    installed: Iterable[TableEntry], wanted: Iterable[TableEntry]
+) -> TableDelta:
+    """
+    Compute the minimal changes that turn the installed entries into the wanted ones.
+
+    Args:
+        installed: Entries currently installed on a switch
+        wanted: Entries the switch should have afterwards
+
+    Returns:
+        A TableDelta. Deletes come from installed, adds and modifies from wanted.
+    """
+    installed_by_key = {table_entry_key(e): e for e in installed}
+    wanted_by_key = {table_entry_key(e): e for e in wanted}
+
+    delta = TableDelta()
+    for key, entry in wanted_by_key.items():
+        old = installed_by_key.get(key)
+        if old is None:
+            delta.adds.append(entry)
+        elif old.action != entry.action or old.action_params != entry.action_params:
+            delta.modifies.append(entry)
+    for key, entry in installed_by_key.items():
+        if key not in wanted_by_key:
+            delta.deletes.append(entry)
+    return delta
+
+
+# Entries of table version v key their time slice as slice + v * VERSION_SLICE_OFFSET.
+# The BMv2 ToR matches an 8-bit slice, so two versions of up to 128 slices fit.
+VERSION_SLICE_OFFSET = 128
+
+# The time slice match key of each table that holds one copy per table version.
+VERSIONED_SLICE_KEYS = {
+    "ocs_schedule": "slice_id",
+    "per_hop_routing": "arrival_ts",
+    "add_source_routing_entries": "arrival_ts",
+    "cal_port_slice_to_node": "arrival_ts",
+}
+
+
+def version_table_entries(entries: Iterable[TableEntry], version: int) -> List[TableEntry]:
+    """
+    Key table entries to a table version.
+
+    Backends with versioned tables only match the entries of the active version,
+    so the next version can be installed next to it. Version 0 leaves slices as they are.
+
+    Args:
+        entries: TableEntry objects, of any version, or a TableBatch
+        version: The table version to key them to
+
+    Returns:
+        A list of TableEntry objects, or a TableBatch for a TableBatch. Default
+        actions and entries of tables without a time slice key are returned unchanged.
+    """
+    if isinstance(entries, TableBatch):
+        key = VERSIONED_SLICE_KEYS.get(entries.table)
+        if key not in entries.key_names:
+            return entries
+        cols = [entries.key_names.index(key)]
+        if entries.range_key == key:
+            cols.append(len(entries.key_names))
+        keys = entries.keys.copy()
+        keys[:, cols] = keys[:, cols] % VERSION_SLICE_OFFSET + version * VERSION_SLICE_OFFSET
+        return dataclasses.replace(entries, keys=keys)
+
+    result = []
+    for entry in entries:
+        key = VERSIONED_SLICE_KEYS.get(entry.table)
+        if entry.is_default_action or key not in entry.match_keys:
+            result.append(entry)
+            continue
+        match_keys = dict(entry.match_keys)
+        if isinstance(match_keys[key], tuple):
+            match_keys[key] = tuple(
+                v % VERSION_SLICE_OFFSET + version * VERSION_SLICE_OFFSET for v in match_keys[key]
+            )
+        else:
+            match_keys[key] = match_keys[key] % VERSION_SLICE_OFFSET + version * VERSION_SLICE_OFFSET
+        result.append(dataclasses.replace(entry, match_keys=match_keys))
+    return result
+
+
+def table_entry_version(entry: TableEntry) -> Optional[int]:
+    """
+    The table version an entry is keyed to.
+
+    Args:
+        entry: A TableEntry
+
+    Returns:
+        The version, or None for default actions and entries of tables
+        without a time slice key, which every version shares.
+    """
+    key = VERSIONED_SLICE_KEYS.get(entry.table)
+    if entry.is_default_action or key not in entry.match_keys:
+        return None
+    return match_range(entry.match_keys[key])[0] // VERSION_SLICE_OFFSET
+
+
+# The arrival slice key of each routing table that matches slices as a range.
+RANGE_MATCH_KEYS = {
+    "per_hop_routing": "arrival_ts",
+    "add_source_routing_entries": "arrival_ts",
+}
+
+
+def compress_table_entries(entries: Iterable[TableEntry]) -> List[TableEntry]:
+    """
+    Merge entries of consecutive arrival slices that take the same action.
+
+    Routing entries are generated per (dst, arrival_ts), but a destination is
+    usually reached the same way from a run of arrival slices, e.g. wait for the
+    one direct circuit. Each such run becomes one entry whose arrival_ts is a
+    (first, last) range.
+
+    Args:
+        entries: TableEntry objects. Their arrival slices must not be versioned yet.
+
+    Returns:
+        A list of TableEntry objects. Entries of RANGE_MATCH_KEYS tables match
+        ranges, including single slices; other entries are returned unchanged.
+    """
+    result = []
+    runs = []
+    for entry in entries:
+        key = RANGE_MATCH_KEYS.get(entry.table)
+        if entry.is_default_action or key not in entry.match_keys:
+            result.append(entry)
+            continue
+        others = tuple((k, v) for k, v in entry.match_keys.items() if k != key)
+        runs.append((entry.table, others, match_range(entry.match_keys[key]), entry))
+    runs.sort(key=lambda run: (run[0], run[1], run[2]))
+
+    merged = []
+    for table, others, (first, last), entry in runs:
+        if merged:
+            prev_table, prev_others, prev_first, prev_last, prev = merged[-1]
+            if (
+                (table, others) == (prev_table, prev_others)
+                and first == prev_last + 1
+                and (entry.action, entry.action_params) == (prev.action, prev.action_params)
+            ):
+                merged[-1] = (table, others, prev_first, last, prev)
+                continue
+        merged.append((table, others, first, last, entry))
+
+    for table, _, first, last, entry in merged:
+        key = RANGE_MATCH_KEYS[table]
+        match_keys = {k: (first, last) if k == key else v for k, v in entry.match_keys.items()}
+        result.append(dataclasses.replace(entry, match_keys=match_keys))
+    return result
+
+
+def compress_table_batch(batch: TableBatch) -> TableBatch:
+    """
+    Merge rows of consecutive arrival slices that take the same action.
+
+    The column-wise counterpart of compress_table_entries().
+
+    Args:
+        batch: A TableBatch. Its arrival slices must not be versioned yet.
+
+    Returns:
+        A TableBatch with range_key set, or batch if its table is not range-matched.
+    """
+    import numpy as np
+
+    key = RANGE_MATCH_KEYS.get(batch.table)
+    if key not in batch.key_names or batch.range_key is not None or not len(batch):
+        return batch
+    col = batch.key_names.index(key)
+    others = [i for i in range(len(batch.key_names)) if i != col]
+    # lexsort's last key is the primary one: sort by the other keys, then slice.
+    order = np.lexsort([batch.keys[:, col]] + [batch.keys[:, i] for i in reversed(others)])
+    keys = batch.keys[order]
+    params = batch.params[order]
+
+    starts = np.ones(len(keys), dtype=bool)
+    starts[1:] = (
+        (keys[1:, others] != keys[:-1, others]).any(axis=1)
+        | (params[1:] != params[:-1]).any(axis=1)
+        | (keys[1:, col] != keys[:-1, col] + 1)
+    )
+    first = np.flatnonzero(starts)
+    last = np.append(first[1:], len(keys)) - 1
+    return dataclasses.replace(
+        batch,
+        keys=np.column_stack([keys[first], keys[last, col]]),
+        params=params[first],
+        range_key=key,
+    )
+
+
+def find_range_overlap(
+    installed: Iterable[TableEntry], added: Iterable[TableEntry]
+) -> Optional[Tuple[TableEntry, TableEntry]]:
+    """
+    Find an added entry whose arrival slices overlap those of another entry.
+
+    Range-matched entries that agree on their other match keys are installed at
+    one priority, so their ranges must be disjoint: a packet matching two of
+    them could take either action. Adding an entry for an installed slice used
+    to fail with a duplicate key, and still must.
+
+    Args:
+        installed: Entries already on the switch.
+        added: Entries about to be added to it.
+
+    Returns:
+        An overlapping (entry, other_entry) pair, at least one of them added,
+        or None.
+    """
+    groups = {}
+    for is_added, entries in ((True, added), (False, installed)):
+        for entry in entries:
+            key = RANGE_MATCH_KEYS.get(entry.table)
+            if entry.is_default_action or key not in entry.match_keys:
+                continue
+            group = (entry.table, tuple((k, v) for k, v in entry.match_keys.items() if k != key))
+            if not is_added and group not in groups:
+                continue  # No added entry to overlap with
+            groups.setdefault(group, []).append((match_range(entry.match_keys[key]), is_added, entry))
+
+    for ranges in groups.values():
+        ranges.sort(key=lambda r: r[0])
+        # The entry reaching furthest among those sorted so far.
+        reach, reach_added, reach_entry = None, False, None
+        for (first, last), is_added, entry in ranges:
+            if reach is not None and first <= reach and (is_added or reach_added):
+                return reach_entry, entry
+            if reach is None or last > reach:
+                reach, reach_added, reach_entry = last, is_added, entry
+    return None
+
+
+def topo_signature(slice_to_topo: Dict[int, nx.Graph]) -> tuple:
+    """
+    Summarize a topology as a hashable value.
+
+    Two topologies have the same signature iff they have the same nodes and
+    the same circuits, including ports, in every time slice.
+
+    Args:
+        slice_to_topo: Dictionary mapping time slices to network topology graphs
+
+    Returns:
+        A tuple of (ts, nodes, edges) per time slice, sorted by ts.
+    """
+    return tuple(
+        (
+            ts,
+            tuple(sorted(graph.nodes())),
+            tuple(sorted(
+                (node1, node2, attr.get("port1"), attr.get("port2"))
+                for node1, node2, attr in graph.edges(data=True)
+            )),
+        )
+        for ts, graph in sorted(slice_to_topo.items())
+    )
+
+
 def gen_ocs_commands(ocs_schedule_entries) -> List[TableEntry]:
     """
     Generate table entries for OCS (Optical Circuit Switching) scheduling.
@@ -301,6 +586,52 @@ def tor_table_routing_per_hop(entry: TimeFlowEntry, nb_time_slices=None) -> List
         ]
 
 
+def tor_table_routing_per_hop_batch(
+    entries: List[TimeFlowEntry], nb_time_slices=None
+) -> TableBatch:
+    """
+    Generate the per-hop routing table of a node as one TableBatch.
+
+    Holds the same rows as tor_table_routing_per_hop() over all entries,
+    without building a TableEntry per row.
+
+    Args:
+        entries: TimeFlowEntry objects of one node
+        nb_time_slices: Number of time slices. Required when an arrival_ts is None
+            (wildcard), to generate one row per time slice.
+
+    Returns:
+        A TableBatch of the per_hop_routing table.
+    """
+    import numpy as np
+
+    rows = []
+    for entry in entries:
+        if len(entry.hops) != 1:
+            print(
+                f"Warning: Find multi-hop time flow entry ({entry}) in Per-hop forwarding mode. Trim following hops."
+            )
+        hop = entry.hops[0]
+        if entry.arrival_ts is None:
+            rows.extend(
+                (entry.dst, arrival_ts, hop.cur_node, arrival_ts, hop.send_port_or_node)
+                for arrival_ts in range(nb_time_slices)
+            )
+        else:
+            rows.append(
+                (entry.dst, entry.arrival_ts, hop.cur_node, hop.send_ts, hop.send_port_or_node)
+            )
+    columns = np.array(rows, dtype=np.int64).reshape(-1, 5)
+    return TableBatch(
+        table="per_hop_routing",
+        action="write_time_flow_entry",
+        key_names=("dst", "arrival_ts"),
+        param_names=("cur_node", "send_ts", "send_port"),
+        keys=columns[:, :2],
+        params=columns[:, 2:],
+    )
+
+
 def gen_tor_commands(tor_id, slices, port_to_ip, num_hosts, offset):
     """
     Old implementation of loading direct routing table entries.
@@ -362,7 +693,7 @@ def metric_to_matrix(metric: dict) -> dict:
         src = int(sw_name[3:])  # tor0
         queue_depth_dict = metric["pq_depth"]
         for (port, queue), depth in queue_depth_dict.items():
-            assert port == 0, "Only support single port for now"
             dst = queue  # queue id is the dst id
-            traffic_matrix[(src, dst)] = depth
+            # Queues to the same dst on different ports add up.
+            traffic_matrix[(src, dst)] = traffic_matrix.get((src, dst), 0) + depth
     return traffic_matrix
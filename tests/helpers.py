@@ -11,7 +11,7 @@ import sys
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from openoptics.backends.base import BackendBase, SwitchHandle
+from openoptics.backends.base import BackendBase, SwitchHandle, TableDelta
 
 
 class FakeBackend(BackendBase):
@@ -67,3 +67,37 @@ class FakeBackend(BackendBase):
 
     def cleanup(self) -> None:
         pass
+
+
+class FakeDeltaBackend(FakeBackend):
+    """FakeBackend that also accepts incremental table updates.
+
+    Records ``apply_table_delta`` calls in ``applied``.
+    """
+
+    supports_table_delta = True
+
+    def __init__(self, nb_node=4):
+        super().__init__(nb_node=nb_node)
+        self.applied: list = []  # [(switch_name, TableDelta), ...]
+
+    def apply_table_delta(self, switch_name, delta: TableDelta, **kwargs) -> bool:
+        self.applied.append((switch_name, delta))
+        return True
+
+
+class FakeVersionedBackend(FakeDeltaBackend):
+    """FakeDeltaBackend with versioned tables.
+
+    Records ``set_active_version`` calls in ``versions``.
+    """
+
+    supports_versioned_tables = True
+
+    def __init__(self, nb_node=4):
+        super().__init__(nb_node=nb_node)
+        self.versions: list = []  # [(version, at_us), ...]
+
+    async def set_active_version(self, version, at_us=None) -> bool:
+        self.versions.append((version, at_us))
+        return True
@@ -116,6 +116,33 @@ class TestBackendBaseAbstract(unittest.TestCase):
             IncompleteBackend()
 
 
+# ---------------------------------------------------------------------------
+# BackendBase — batch table APIs
+# ---------------------------------------------------------------------------
+
+class TestBatchTableApis(unittest.TestCase):
+
+    def test_default_load_tables_loads_every_switch(self):
+        import asyncio
+        loaded = []
+
+        class RecordingBackend(_ConcreteBackend):
+            def load_table(self, switch_name, entries, **kwargs):
+                loaded.append(switch_name)
+                return switch_name != "tor1"
+
+        backend = RecordingBackend()
+        ok = asyncio.run(backend.load_tables({"tor0": [], "tor1": [], "tor2": []}))
+        self.assertFalse(ok)
+        self.assertEqual(loaded, ["tor0", "tor1", "tor2"])
+
+    def test_default_apply_table_deltas_requires_delta_support(self):
+        import asyncio
+        from openoptics.backends.base import TableDelta
+        with self.assertRaises(NotImplementedError):
+            asyncio.run(_ConcreteBackend().apply_table_deltas({"ocs": TableDelta()}))
+
+
 # ---------------------------------------------------------------------------
 # create_backend factory
 # ---------------------------------------------------------------------------
@@ -133,6 +160,86 @@ class TestCreateBackend(unittest.TestCase):
             create_backend("")
 
 
+# ---------------------------------------------------------------------------
+# NullBackend — recorded control plane without a network
+# ---------------------------------------------------------------------------
+
+class TestNullBackend(unittest.TestCase):
+
+    def _deploy(self, **backend_kwargs):
+        from openoptics import OpticalRouting, OpticalTopo
+        from openoptics.Toolbox import BaseNetwork
+        net = BaseNetwork(name="test_net", backend="Null", nb_node=8,
+                          use_webserver=False, **backend_kwargs)
+        net.deploy_topo(OpticalTopo.round_robin(nb_node=8))
+        net.deploy_routing(OpticalRouting.routing_direct(net.get_topo()))
+        return net
+
+    def test_create_backend_returns_null_backend(self):
+        from openoptics.backends import create_backend
+        from openoptics.backends.null.backend import NullBackend
+        self.assertIsInstance(create_backend("Null"), NullBackend)
+
+    def test_accepts_other_backends_kwargs(self):
+        net = self._deploy(link_delay_ms=1, cq_buffer_bytes=1000)
+        self.assertEqual(net._backend.config["link_delay_ms"], 1)
+        self.assertEqual(len(net._backend.get_tor_switches()), 8)
+
+    def test_host_addresses_are_unique_past_256_tors(self):
+        from openoptics.backends.null.backend import NullBackend
+        backend = NullBackend()
+        backend.setup(nb_node=300, nb_host_per_tor=1, nb_link=1, nb_time_slices=1,
+                      time_slice_duration_us=100, guardband_us=10, calendar_queue_mode=0)
+        self.assertEqual(sorted(backend.get_ip_to_tor().values()), list(range(300)))
+
+    def test_report_counts_recorded_operations(self):
+        backend = self._deploy()._backend
+        report = backend.report()
+        loaded = [op for op in backend.ops if op.op == "load_table"]
+        self.assertEqual(report["load_table"]["calls"], len(loaded))
+        self.assertEqual(report["load_table"]["entries"], sum(len(op.payload) for op in loaded))
+        self.assertGreater(report["total"]["bytes"], 0)
+        self.assertEqual(report["elapsed_s"], backend.ops[-1].at_s)
+        backend.reset()
+        self.assertEqual(backend.report()["total"]["calls"], 0)
+
+    def test_redeploy_records_deltas(self):
+        from openoptics import OpticalRouting, OpticalTopo
+        net = self._deploy()
+        net._backend.reset()
+        net.deploy_topo(OpticalTopo.opera(nb_node=8, nb_link=1), start_fresh=True)
+        net.deploy_routing(OpticalRouting.routing_direct(net.get_topo()))
+        self.assertIn("apply_table_delta", net._backend.report())
+
+    def test_replay_reproduces_loads(self):
+        from helpers import FakeVersionedBackend
+        backend = self._deploy()._backend
+        target = FakeVersionedBackend(nb_node=8)
+        self.assertTrue(backend.replay(target))
+        self.assertEqual(
+            target.loaded,
+            [(op.switch, op.payload) for op in backend.ops if op.op == "load_table"],
+        )
+
+    def test_replay_requires_delta_support(self):
+        from helpers import FakeBackend
+        from openoptics.backends.base import TableDelta
+        from openoptics.backends.null.backend import NullBackend
+        backend = NullBackend()
+        backend.apply_table_delta("tor0", TableDelta())
+        target = FakeBackend()
+        with self.assertRaises(ValueError):
+            backend.replay(target)
+        self.assertEqual(target.loaded, [])
+
+    def test_record_without_deltas(self):
+        from helpers import FakeBackend
+        backend = self._deploy(supports_table_delta=False,
+                               supports_versioned_tables=False)._backend
+        self.assertNotIn("apply_table_delta", backend.report())
+        self.assertTrue(backend.replay(FakeBackend(nb_node=8)))
+
+
 # ---------------------------------------------------------------------------
 # accepted_kwargs — BackendBase interface only (no networkx dependency)
 # ---------------------------------------------------------------------------
@@ -152,6 +259,280 @@ class TestAcceptedKwargs(unittest.TestCase):
         self.assertIn("link_delay_ms", BackendWithDelay.accepted_kwargs())
 
 
+# ---------------------------------------------------------------------------
+# MininetBackend — TableDelta rendered to runtime_CLI commands
+# ---------------------------------------------------------------------------
+
+@unittest.skipUnless(HAS_MININET, "mininet not installed")
+class TestMininetBackendDeltaCli(unittest.TestCase):
+
+    def test_delta_commands_by_key(self):
+        from openoptics import utils
+        from openoptics.backends.base import TableDelta
+        from openoptics.backends.mininet.backend import MininetBackend
+
+        add, modify, delete = utils.gen_ocs_commands([(1, 0, 2), (0, 1, 3), (0, 2, 0)])[1:]
+        cli = MininetBackend._delta_to_cli_str(
+            TableDelta(adds=[add], modifies=[modify], deletes=[delete])
+        ).splitlines()
+        self.assertEqual(cli, [
+            "table_delete_wkey ocs_schedule 2 0",
+            "table_modify_wkey ocs_schedule ocs_forward 1 0 => 3",
+            "table_add ocs_schedule ocs_forward 0 1 => 2",
+        ])
+
+    def test_batch_commands_match_entries(self):
+        from openoptics import utils
+        from openoptics.TimeFlowTable import TimeFlowEntry, TimeFlowHop
+        from openoptics.backends.mininet.backend import MininetBackend
+
+        entries = [
+            TimeFlowEntry(dst=1, arrival_ts=None, hops=TimeFlowHop(cur_node=0, send_port=2, send_ts=0)),
+        ]
+        batch = utils.tor_table_routing_per_hop_batch(entries, nb_time_slices=2)
+        self.assertEqual(
+            MininetBackend._batch_to_cli_str(batch),
+            MininetBackend._entries_to_cli_str(list(batch)),
+        )
+        compressed = utils.compress_table_batch(batch)
+        self.assertEqual(
+            MininetBackend._batch_to_cli_str(compressed),
+            MininetBackend._entries_to_cli_str(list(compressed)),
+        )
+
+    def test_range_commands(self):
+        from openoptics.backends.base import TableDelta, TableEntry
+        from openoptics.backends.mininet.backend import MininetBackend
+
+        route = TableEntry(
+            table="per_hop_routing",
+            action="write_time_flow_entry",
+            match_keys={"dst": 1, "arrival_ts": (0, 2)},
+            action_params={"cur_node": 0, "send_ts": 2, "send_port": 1},
+        )
+        cli = MininetBackend._delta_to_cli_str(
+            TableDelta(adds=[route], modifies=[route], deletes=[route])
+        ).splitlines()
+        self.assertEqual(cli, [
+            "table_delete_wkey per_hop_routing 1 0->2 1",
+            "table_modify_wkey per_hop_routing write_time_flow_entry 1 0->2 => 0 2 1 1",
+            "table_add per_hop_routing write_time_flow_entry 1 0->2 => 0 2 1 1",
+        ])
+
+
+@unittest.skipUnless(HAS_MININET, "mininet not installed")
+class TestMininetBackendConcurrentLoad(unittest.TestCase):
+
+    def test_switches_load_concurrently(self):
+        import asyncio
+        import time
+        from unittest.mock import patch
+        from openoptics.backends.mininet.backend import MininetBackend
+
+        def slow_load(switch_name, entries, **kwargs):
+            time.sleep(0.2)
+            return True
+
+        backend = MininetBackend()
+        with patch.object(backend, "load_table", side_effect=slow_load):
+            start = time.monotonic()
+            ok = asyncio.run(backend.load_tables({f"tor{i}": [] for i in range(4)}))
+            elapsed = time.monotonic() - start
+        self.assertTrue(ok)
+        self.assertLess(elapsed, 0.6)
+
+
+@unittest.skipUnless(HAS_MININET, "mininet not installed")
+class TestP4SwitchBatchStartup(unittest.TestCase):
+
+    def test_switches_become_ready_together(self):
+        import socket
+        import threading
+        import time
+        from openoptics.backends.mininet.backend import P4Switch
+
+        servers, switches = [], []
+        for name in ("tor0", "tor1"):
+            server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            server.bind(("localhost", 0))
+            servers.append(server)
+            switch = P4Switch.__new__(P4Switch)
+            switch.name, switch.pid = name, os.getpid()
+            switch.thrift_port = server.getsockname()[1]
+            switch.launched_at, switch.startup_s = time.perf_counter(), None
+            switches.append(switch)
+        self.addCleanup(lambda: [server.close() for server in servers])
+
+        # Each "switch" opens its Thrift port after 0.2 s.
+        timers = [threading.Timer(0.2, server.listen) for server in servers]
+        for timer in timers:
+            timer.start()
+        start = time.monotonic()
+        self.assertEqual(list(P4Switch.batchStartup(switches)), switches)
+        self.assertLess(time.monotonic() - start, 0.35)
+        for switch in switches:
+            self.assertGreaterEqual(switch.startup_s, 0.2)
+
+
+# ---------------------------------------------------------------------------
+# BMv2TableClient — table commands over a persistent Thrift connection
+# ---------------------------------------------------------------------------
+
+def _fake_runtime_cli():
+    """A runtime_CLI stand-in with one exact and one range table."""
+    import enum
+    import types
+    from types import SimpleNamespace
+
+    rc = types.ModuleType("runtime_CLI")
+    rc.ResType = enum.Enum("ResType", "table action")
+    rc.MatchType = enum.Enum("MatchType", "EXACT TERNARY RANGE")
+    rc.PreType = SimpleNamespace(SimplePreLAG="SimplePreLAG")
+    rc.RuntimeAPI = SimpleNamespace(get_thrift_services=lambda pre: [])
+    rc.UIn_Error = type("UIn_Error", (Exception,), {})
+    rc.InvalidTableOperation = type(
+        "InvalidTableOperation", (Exception,), {"__init__": lambda self, code: setattr(self, "code", code)}
+    )
+    rc.TableOperationErrorCode = SimpleNamespace(_VALUES_TO_NAMES={1: "DUPLICATE_ENTRY"})
+    rc.BmAddEntryOptions = lambda priority: ("priority", priority)
+    rc.parse_match_key = lambda table, fields: list(fields)
+    rc.parse_runtime_data = lambda action, params: list(params)
+
+    calls = []
+
+    class Client:
+        def __getattr__(self, name):
+            def call(*args):
+                if args[1:3] == ("MyIngress.ocs_schedule", ["9"]):
+                    raise rc.InvalidTableOperation(1)
+                calls.append((name,) + args[1:])
+            return call
+
+    forward = SimpleNamespace(name="MyIngress.ocs_forward")
+    route = SimpleNamespace(name="write_time_flow_entry")
+    ocs = SimpleNamespace(name="MyIngress.ocs_schedule", match_type=rc.MatchType.EXACT,
+                          actions={forward.name: forward})
+    routing = SimpleNamespace(name="per_hop_routing", match_type=rc.MatchType.RANGE,
+                              actions={route.name: route})
+    rc.SUFFIX_LOOKUP_MAP = {}
+
+    def load_json_config(client, json_path):
+        rc.SUFFIX_LOOKUP_MAP = {
+            (rc.ResType.table, "ocs_schedule"): ocs,
+            (rc.ResType.table, "per_hop_routing"): routing,
+            (rc.ResType.action, "ocs_forward"): forward,
+            (rc.ResType.action, "write_time_flow_entry"): route,
+        }
+
+    rc.load_json_config = load_json_config
+    rc.thrift_connect = lambda ip, port, services: (Client(), None)
+    return rc, calls
+
+
+class TestBMv2TableClient(unittest.TestCase):
+
+    def setUp(self):
+        from unittest.mock import patch
+        from openoptics.backends.mininet import thrift_client
+
+        self.rc, self.calls = _fake_runtime_cli()
+        patcher = patch.dict(sys.modules, {"runtime_CLI": self.rc})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        thrift_client._resources.clear()
+        self.addCleanup(thrift_client._resources.clear)
+        self.client = thrift_client.BMv2TableClient("tor0", 9091, "tor.json")
+
+    def test_commands_map_to_thrift_calls(self):
+        nb = self.client.run(
+            "table_add ocs_schedule ocs_forward 1 0 => 3\n"
+            "table_modify_wkey per_hop_routing write_time_flow_entry 1 0->2 => 0 2 1 1\n"
+            "table_delete_wkey per_hop_routing 1 0->2 1\n"
+            "table_clear ocs_schedule\n"
+        )
+        self.assertEqual(nb, 4)
+        self.assertEqual(self.calls, [
+            ("bm_mt_add_entry", "MyIngress.ocs_schedule", ["1", "0"], "MyIngress.ocs_forward",
+             ["3"], ("priority", 0)),
+            ("bm_mt_modify_entry_wkey", "per_hop_routing", ["1", "0->2"], "write_time_flow_entry",
+             ["0", "2", "1"], ("priority", 1)),
+            ("bm_mt_delete_entry_wkey", "per_hop_routing", ["1", "0->2"], ("priority", 1)),
+            ("bm_mt_clear_entries", "MyIngress.ocs_schedule", False),
+        ])
+
+    def test_rejected_entry_raises_structured_error(self):
+        from openoptics.backends.mininet.thrift_client import BMv2TableError
+
+        with self.assertRaises(BMv2TableError) as ctx:
+            self.client.run(
+                "table_add ocs_schedule ocs_forward 1 0 => 3\n"
+                "table_add ocs_schedule ocs_forward 9 => 3\n"
+                "table_clear ocs_schedule\n"
+            )
+        self.assertEqual(ctx.exception.switch_name, "tor0")
+        self.assertEqual(ctx.exception.reason, "DUPLICATE_ENTRY")
+        self.assertEqual(ctx.exception.command, "table_add ocs_schedule ocs_forward 9 => 3")
+        self.assertEqual(len(self.calls), 1)
+
+    def test_unknown_action_raises(self):
+        from openoptics.backends.mininet.thrift_client import BMv2TableError
+
+        with self.assertRaisesRegex(BMv2TableError, "no action"):
+            self.client.run("table_add ocs_schedule write_time_flow_entry 1 0 => 3")
+        self.assertEqual(self.calls, [])
+
+    def _target_client(self, status=0, error=None):
+        """A client whose fake tswitch_CLI target service returns status or raises error."""
+        import types
+        from types import SimpleNamespace
+        from unittest.mock import patch
+        from openoptics.backends.mininet import thrift_client
+
+        thrift = types.ModuleType("thrift")
+        thrift.Thrift = types.ModuleType("thrift.Thrift")
+        thrift.Thrift.TException = type("TException", (Exception,), {})
+        flips = []
+
+        def set_active_version(version, at_time_us):
+            if error is not None:
+                raise thrift.Thrift.TException(error)
+            flips.append((version, at_time_us))
+            return status
+
+        target = SimpleNamespace(set_active_version=set_active_version)
+        tswitch_cli = types.ModuleType("tswitch_CLI")
+        tswitch_cli.TorSwitchAPI = SimpleNamespace(get_thrift_services=lambda: [("tor_switch", None)])
+        self.rc.thrift_connect = lambda ip, port, services: (object(), None, target)
+        patcher = patch.dict(sys.modules, {
+            "tswitch_CLI": tswitch_cli, "thrift": thrift, "thrift.Thrift": thrift.Thrift,
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        client = thrift_client.BMv2TableClient("tor0", 9091, "tor.json", switch_type="tor")
+        return client, flips
+
+    def test_set_active_version_uses_target_service(self):
+        client, flips = self._target_client()
+        client.set_active_version(3, 0)
+        self.assertEqual(flips, [(3, 0)])
+
+    def test_set_active_version_errors_are_structured(self):
+        from openoptics.backends.mininet.thrift_client import BMv2TableError
+
+        client, _ = self._target_client(error="connection reset")
+        with self.assertRaises(BMv2TableError) as ctx:
+            client.set_active_version(1, 0)
+        self.assertEqual(ctx.exception.command, "set_active_version 1 0")
+        self.assertEqual(ctx.exception.reason, "connection reset")
+
+        client, _ = self._target_client(status=1)
+        with self.assertRaisesRegex(BMv2TableError, "status 1"):
+            client.set_active_version(1, 0)
+        # Table programming only connections have no target service.
+        with self.assertRaisesRegex(BMv2TableError, "no target service"):
+            self.client.set_active_version(1, 0)
+
+
 # ---------------------------------------------------------------------------
 # MininetBackend — link bandwidth forwarded to addLink()
 # ---------------------------------------------------------------------------
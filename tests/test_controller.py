@@ -0,0 +1,136 @@
+# Copyright (c) Max-Planck-Gesellschaft zur Förderung der Wissenschaften e.V.
+# Developed at the Max Planck Institute for Informatics, Network and Cloud Systems Group
+#
+# This software is licensed for non-commercial scientific research purposes only.
+# License text: Creative Commons NC BY SA 4.0
+#
+# Tests for openoptics/Controller.py
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from openoptics import OpticalRouting, OpticalTopo
+from openoptics.Controller import ControllerService, validate_update
+from openoptics.Toolbox import BaseNetwork
+
+
+def _deployed_net(**backend_kwargs):
+    net = BaseNetwork(name="test_net", backend="Null", nb_node=8,
+                      use_webserver=False, **backend_kwargs)
+    net.deploy_topo(OpticalTopo.round_robin(nb_node=8))
+    net.deploy_routing(OpticalRouting.routing_direct(net.get_topo()))
+    return net
+
+
+class TestValidateUpdate(unittest.TestCase):
+
+    def test_named_topology_is_resolved(self):
+        update = validate_update({"topo": "round_robin", "topo_args": {"nb_node": 4}})
+        self.assertEqual(update["circuits"], [list(c) for c in OpticalTopo.round_robin(nb_node=4)])
+        self.assertIsNone(update["routing"])
+
+    def test_rejects_malformed_updates(self):
+        for update in (
+            {},
+            {"circuits": [[0, 1, 2]]},
+            {"topo": "draw_topo"},
+            {"topo": "round_robin", "topo_args": {"bogus": 1}},
+            {"routing": "find_send_port"},
+            {"routing": "routing_direct", "routing_mode": "Direct"},
+            {"queue": "stop"},
+            {"routing": "routing_direct", "color": "red"},
+        ):
+            with self.assertRaises(ValueError, msg=update):
+                validate_update(update)
+
+
+class TestControllerService(unittest.TestCase):
+
+    def _service(self, net, **kwargs):
+        service = ControllerService(net, window_s=0.2, **kwargs)
+        service.start()
+        self.addCleanup(service.stop)
+        return service
+
+    def test_burst_is_coalesced_into_one_deployment(self):
+        net = _deployed_net()
+        service = self._service(net)
+        futures = [
+            service.submit({"topo": "round_robin", "topo_args": {"nb_node": 8, "port2": 0}}),
+            service.submit({"circuits": OpticalTopo.round_robin(nb_node=8)[::-1]}),
+            service.submit({"routing": "routing_direct"}),
+        ]
+        results = [f.result(timeout=10) for f in futures]
+        self.assertEqual(results, [{"ok": True, "coalesced": 3}] * 3)
+        self.assertEqual(service.status()["batches"], 1)
+        # Versioned backends stage the update and switch to it at once.
+        versions = [op for op in net._backend.ops if op.op == "set_active_version"]
+        self.assertEqual(len(versions), 1)
+
+    def test_topology_update_reruns_routing(self):
+        net = _deployed_net(supports_versioned_tables=False)
+        service = self._service(net, routing_func=OpticalRouting.routing_direct)
+        before = dict(net._installed("tor0", "per_hop_routing"))
+        circuits = OpticalTopo.opera(nb_node=8, nb_link=1)
+        self.assertTrue(service.submit({"circuits": circuits}).result(timeout=10)["ok"])
+        self.assertNotEqual(dict(net._installed("tor0", "per_hop_routing")), before)
+
+        expected = _deployed_net(supports_versioned_tables=False)
+        expected.deploy_topo(circuits, start_fresh=True)
+        expected.deploy_routing(OpticalRouting.routing_direct(expected.get_topo()), start_fresh=True)
+        self.assertEqual(
+            dict(net._installed("tor0", "per_hop_routing")),
+            dict(expected._installed("tor0", "per_hop_routing")),
+        )
+
+    def test_deploy_errors_reach_every_submitter(self):
+        net = BaseNetwork(name="test_net", backend="Null", nb_node=8, use_webserver=False)
+        service = self._service(net)
+        future = service.submit({"routing": "routing_direct"})
+        with self.assertRaises(ValueError):
+            future.result(timeout=10)
+
+    def test_queue_updates_need_a_device_manager(self):
+        service = self._service(_deployed_net())
+        with self.assertRaises(ValueError):
+            service.submit({"queue": "pause"})
+
+    def test_preview_topology_leaves_the_network_alone(self):
+        net = _deployed_net()
+        running = net.slice_to_topo
+        edges = {ts: set(topo.edges) for ts, topo in running.items()}
+        circuits = OpticalTopo.opera(nb_node=8, nb_link=1)
+        preview = ControllerService(net)._slice_to_topo(circuits)
+        self.assertIs(net.slice_to_topo, running)
+        self.assertEqual({ts: set(topo.edges) for ts, topo in running.items()}, edges)
+
+        expected = _deployed_net()
+        expected.deploy_topo(circuits, start_fresh=True)
+        self.assertEqual(
+            {ts: set(topo.edges) for ts, topo in preview.items()},
+            {ts: set(topo.edges) for ts, topo in expected.get_topo().items()},
+        )
+
+    def test_service_without_dashboard_warns(self):
+        net = _deployed_net()
+        # Interrupt the service right away instead of blocking.
+        with patch.object(ControllerService, "start"), patch.object(ControllerService, "stop"), \
+                patch("threading.Event") as event:
+            event.return_value.wait.side_effect = KeyboardInterrupt
+            with self.assertWarns(RuntimeWarning):
+                net.start_service()
+
+    def test_stopped_service_rejects_updates(self):
+        service = ControllerService(_deployed_net())
+        service.start()
+        service.stop()
+        with self.assertRaises(RuntimeError):
+            service.submit({"routing": "routing_direct"})
+
+
+if __name__ == "__main__":
+    unittest.main()
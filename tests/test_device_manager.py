@@ -0,0 +1,225 @@
+# Copyright (c) Max-Planck-Gesellschaft zur Förderung der Wissenschaften e.V.
+# Developed at the Max Planck Institute for Informatics, Network and Cloud Systems Group
+#
+# This software is licensed for non-commercial scientific research purposes only.
+# License text: Creative Commons NC BY SA 4.0
+#
+# Tests for openoptics/DeviceManager.py.
+# Thrift clients are replaced with mocks so no BMv2 switch is required.
+
+import os
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from openoptics.DeviceManager import DeviceManager
+
+
+def _make_manager(nb_switch=2):
+    """Return a DeviceManager with mocked ToR clients, bypassing the Thrift connect."""
+    manager = DeviceManager.__new__(DeviceManager)
+    manager.switch_clients = {f"tor{n}": MagicMock() for n in range(nb_switch)}
+    manager._event_publisher = MagicMock()
+    manager._poll_lock = threading.Lock()
+    manager._polls = {}
+    manager._last_metric = {}
+    manager._client_locks = {name: threading.Lock() for name in manager.switch_clients}
+    manager._executor = ThreadPoolExecutor(max_workers=nb_switch)
+    return manager
+
+
+def _exclusive(result, calls, overlaps):
+    """Return a client method that records calls overlapping on the same client."""
+    def call(*args):
+        if not calls.acquire(blocking=False):
+            overlaps.append(args)
+            return result
+        try:
+            time.sleep(0.002)
+            return result
+        finally:
+            calls.release()
+    return call
+
+
+def _make_ocs_manager(ocs_client):
+    """Return a DeviceManager with one mocked OCS on 2 ToRs of one uplink each."""
+    manager = _make_manager()
+    manager.switches = [SimpleNamespace(name=name) for name in manager.switch_clients]
+    manager.tor_ocs_ports = [0]
+    manager.ocs_standard_clients = {"ocs": MagicMock()}
+    manager.ocs_clients = {"ocs": ocs_client}
+    manager._ocs_bulk_unsupported = set()
+    manager._ocs_counters_warned = False
+    return manager
+
+
+def _device_metric(depth):
+    pq_metric = SimpleNamespace(port=0, queue=1, depth=depth, latency_us_mean=5, latency_us_max=9)
+    return SimpleNamespace(drop_ctr=0, port_queue_metrics=[pq_metric])
+
+
+class TestSetActiveQueues(unittest.TestCase):
+
+    def test_immediate_changes_use_set_active_queue(self):
+        manager = _make_manager()
+        manager.set_active_queues([("tor0", 1, None), ("tor1", 0, 1)])
+        manager.switch_clients["tor0"].set_active_queue.assert_called_once_with(1)
+        manager.switch_clients["tor1"].set_port_active_queue.assert_called_once_with(1, 0)
+
+    def test_scheduled_changes_carry_the_timestamp(self):
+        manager = _make_manager()
+        manager.set_active_queues([("tor0", 1, None), ("tor1", 0, 1)], at_us=42)
+        manager.switch_clients["tor0"].schedule_active_queue.assert_called_once_with(-1, 1, 42)
+        manager.switch_clients["tor1"].schedule_active_queue.assert_called_once_with(1, 0, 42)
+        manager.switch_clients["tor0"].set_active_queue.assert_not_called()
+
+    def test_workers_are_kept_across_calls(self):
+        manager = _make_manager()
+        workers = set()
+        for client in manager.switch_clients.values():
+            client.set_active_queue.side_effect = (
+                lambda qid: workers.add(threading.current_thread().name)
+            )
+        for qid in range(20):
+            manager.set_active_queues([("tor0", qid, None), ("tor1", qid, None)])
+        # At most one worker per switch, however many calls.
+        self.assertLessEqual(len(workers), 2)
+        manager.close()
+        with self.assertRaises(RuntimeError):
+            manager.set_active_queues([("tor0", 1, None)])
+
+    def test_failed_changes_are_not_published(self):
+        manager = _make_manager()
+        manager.switch_clients["tor1"].set_active_queue.side_effect = RuntimeError
+        manager.set_active_queues([("tor0", 1, None), ("tor1", 0, None)])
+        manager._event_publisher.emit.assert_called_once_with("tor0", 1, port=None)
+
+
+class TestGetDeviceMetric(unittest.TestCase):
+
+    def test_switches_are_polled_concurrently(self):
+        manager = _make_manager(nb_switch=8)
+        for client in manager.switch_clients.values():
+            client.get_device_metric.side_effect = lambda: time.sleep(0.1) or _device_metric(3)
+        start = time.monotonic()
+        metric = manager.get_device_metric()
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual(metric["tor7"]["pq_depth"], {(0, 1): 3})
+        self.assertEqual(metric["tor7"]["pq_latency"], {(0, 1): (5, 9)})
+        self.assertFalse(metric["tor7"]["stale"])
+
+    def test_slow_switch_is_reported_stale(self):
+        manager = _make_manager()
+        manager.poll_timeout_s = 0.05
+        manager.switch_clients["tor1"].get_device_metric.return_value = _device_metric(2)
+        manager.get_device_metric()
+
+        answer = threading.Event()
+        manager.switch_clients["tor0"].get_device_metric.return_value = _device_metric(1)
+        manager.switch_clients["tor1"].get_device_metric.side_effect = (
+            lambda: answer.wait() and _device_metric(4)
+        )
+        start = time.monotonic()
+        metric = manager.get_device_metric()
+        self.assertLess(time.monotonic() - start, 0.3)
+        self.assertFalse(metric["tor0"]["stale"])
+        self.assertTrue(metric["tor1"]["stale"])
+        self.assertEqual(metric["tor1"]["pq_depth"], {(0, 1): 2})
+
+        # The pending call is not duplicated; its answer is used once it comes.
+        manager.get_device_metric()
+        answer.set()
+        time.sleep(0.05)
+        metric = manager.get_device_metric()
+        self.assertEqual(manager.switch_clients["tor1"].get_device_metric.call_count, 2)
+        self.assertFalse(metric["tor1"]["stale"])
+        self.assertEqual(metric["tor1"]["pq_depth"], {(0, 1): 4})
+
+    def test_failed_switch_is_reported_stale(self):
+        manager = _make_manager(nb_switch=1)
+        manager.switch_clients["tor0"].get_device_metric.side_effect = RuntimeError
+        metric = manager.get_device_metric()
+        self.assertEqual(metric["tor0"], {"pq_depth": {}, "pq_latency": {}, "drop_ctr": 0, "stale": True})
+
+    def test_concurrent_callers_share_the_clients(self):
+        # The metric collector and the planner poll and program the same switches.
+        manager = _make_manager()
+        overlaps, errors = [], []
+        for client in manager.switch_clients.values():
+            calls = threading.Lock()
+            client.get_device_metric.side_effect = _exclusive(_device_metric(1), calls, overlaps)
+            client.set_active_queue.side_effect = _exclusive(None, calls, overlaps)
+
+        def run(work):
+            try:
+                for _ in range(50):
+                    work()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [
+            threading.Thread(target=run, args=(manager.get_device_metric,)),
+            threading.Thread(target=run, args=(manager.get_device_metric,)),
+            threading.Thread(target=run, args=(lambda: manager.set_active_queue("tor0", 1),)),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(overlaps, [])
+
+
+class TestGetOcsCounters(unittest.TestCase):
+
+    def test_counters_are_read_in_one_call(self):
+        ocs_client = MagicMock()
+        ocs_client.get_ocs_counters.return_value = SimpleNamespace(
+            hits=[5, 3], misses=[0, 2], slice_forwards=[4, 4]
+        )
+        manager = _make_ocs_manager(ocs_client)
+        self.assertEqual(manager.get_ocs_counters(), {
+            "ocs": {"ports": {0: (5, 0), 1: (3, 2)}, "slice_forwards": [4, 4]},
+        })
+        self.assertEqual(manager.get_ocs_metric(), {"ocs": {0: (5, 0), 1: (3, 2)}})
+        ocs_client.get_ocs_counters.assert_called_with(
+            DeviceManager._OCS_HIT_COUNTER, DeviceManager._OCS_MISS_COUNTER, 2
+        )
+        manager.ocs_standard_clients["ocs"].bm_counter_read.assert_not_called()
+
+    def test_older_binary_falls_back_to_counter_reads(self):
+        try:
+            from thrift.Thrift import TApplicationException
+        except ImportError:
+            self.skipTest("thrift not installed")
+        ocs_client = MagicMock()
+        ocs_client.get_ocs_counters.side_effect = TApplicationException(
+            TApplicationException.UNKNOWN_METHOD
+        )
+        manager = _make_ocs_manager(ocs_client)
+        manager.ocs_standard_clients["ocs"].bm_counter_read.return_value = SimpleNamespace(packets=1)
+        self.assertEqual(manager.get_ocs_metric(), {"ocs": {0: (1, 1), 1: (1, 1)}})
+        manager.get_ocs_metric()
+        ocs_client.get_ocs_counters.assert_called_once()
+
+    def test_unreachable_ocs_is_skipped(self):
+        ocs_client = MagicMock()
+        ocs_client.get_ocs_counters.return_value = SimpleNamespace(
+            hits=[5, 3], misses=[0, 2], slice_forwards=[4, 4]
+        )
+        manager = _make_ocs_manager(ocs_client)
+        manager.ocs_standard_clients["ocs_down"] = MagicMock()
+        manager.ocs_clients["ocs_down"] = MagicMock()
+        manager.ocs_clients["ocs_down"].get_ocs_counters.side_effect = OSError("Connection refused")
+        self.assertEqual(manager.get_ocs_metric(), {"ocs": {0: (5, 0), 1: (3, 2)}})
+
+
+if __name__ == "__main__":
+    unittest.main()
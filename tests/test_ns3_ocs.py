@@ -122,6 +122,44 @@ class OcsAppUnitTests(unittest.TestCase):
         self.assertEqual(ocs.GetDropCount(), 1)
         self.assertEqual(ocs.GetForwardCount(), 0)
 
+    def test_remove_schedule_entry_keeps_others(self):
+        ns, ocs, peers = self._make_ocs()
+        ocs.AddScheduleEntry(0, 0, 1)
+        ocs.AddScheduleEntry(2, 0, 3)
+        ocs.RemoveScheduleEntry(0, 0)
+        self.assertEqual(ocs.GetScheduleEntryCount(), 1)
+        self.assertEqual(ocs.LookupSchedule(2, 0), 3)
+        # Removing a missing entry is a no-op.
+        ocs.RemoveScheduleEntry(0, 0)
+        self.assertEqual(ocs.GetScheduleEntryCount(), 1)
+
+    def test_scheduled_version_switch(self):
+        ns, ocs, peers = self._make_ocs(slice_us=10_000, nb_slices=1)
+        offset = ocs.kVersionSliceOffset
+        # Version 0 forwards 0 -> 1; version 1 is staged next to it as 0 -> 2.
+        ocs.AddScheduleEntry(0, 0, 1)
+        ocs.AddScheduleEntry(0, offset, 2)
+        ocs.ScheduleActiveVersion(1, ns.MilliSeconds(5))
+
+        peers[0].Send(ns.Create["ns3::Packet"](64),
+                      peers[0].GetBroadcast(), 0x0800)
+        ns.Simulator.Stop(ns.MilliSeconds(4))
+        ns.Simulator.Run()
+        self.assertEqual(ocs.GetActiveVersion(), 0)
+        self.assertEqual(ocs.GetForwardCount(), 1)
+
+        ns.Simulator.Stop(ns.MilliSeconds(6))
+        ns.Simulator.Run()
+        self.assertEqual(ocs.GetActiveVersion(), 1)
+        # Drop the staged entry: version 1 traffic no longer matches version 0.
+        ocs.RemoveScheduleEntry(0, offset)
+        peers[0].Send(ns.Create["ns3::Packet"](64),
+                      peers[0].GetBroadcast(), 0x0800)
+        ns.Simulator.Stop(ns.MilliSeconds(8))
+        ns.Simulator.Run()
+        self.assertEqual(ocs.GetForwardCount(), 1)
+        self.assertEqual(ocs.GetDropCount(), 1)
+
     def test_guardband_passes_light_window(self):
         """With a 2ms guardband on a 10ms slice, the light window is
         offset 0..7_999us. A packet sent near t=0 should forward."""
@@ -306,6 +344,28 @@ class OcsGeneratedScheduleTests(unittest.TestCase):
         backend.stop()
         backend.cleanup()
 
+    def test_redeploy_applies_delta(self):
+        """A second deploy_topo updates OcsApp in place instead of clearing it."""
+        from openoptics import Toolbox
+        from openoptics.backends.ns3.backend import Ns3Backend
+
+        backend = Ns3Backend()
+        with patch("openoptics.Toolbox.create_backend", return_value=backend):
+            net = Toolbox.BaseNetwork(
+                name="ocs_delta_test", backend="ns3", nb_node=4,
+                time_slice_duration_us=10_000, guardband_ms=0,
+                use_webserver=False,
+            )
+            net.deploy_topo([(0, 0, 1, 0, 0), (0, 2, 3, 0, 0)])
+            net.deploy_topo([(0, 0, 2, 0, 0), (0, 1, 3, 0, 0)], start_fresh=True)
+
+        self.assertEqual(backend._ocs_app.GetScheduleEntryCount(), 4)
+        self.assertEqual(backend._ocs_app.LookupSchedule(0, 0), 2)
+        self.assertEqual(backend._ocs_app.LookupSchedule(1, 0), 3)
+
+        backend.stop()
+        backend.cleanup()
+
     def test_deploy_topo_workflow(self):
         """End-to-end setup()+clear_table()+load_table() via deploy_topo."""
         from openoptics import OpticalTopo, Toolbox
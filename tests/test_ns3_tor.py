@@ -163,6 +163,16 @@ class TorAppBehaviourTests(unittest.TestCase):
         self.assertEqual(app.GetForwardedCount(), 1)
         self.assertEqual(app.GetDropCount(), 0)
 
+    def test_per_hop_range_covers_each_slice(self):
+        """A range entry matches every arrival slice it covers."""
+        ns, app, host_peer, uplinks = self._make_tor(
+            tor_id=0, nb_slices=3, slice_us=10_000, nb_uplinks=1,
+        )
+        app.AddPerHopRange(1, 0, 2, 0, 2, 0)
+        self.assertEqual(app.GetPerHopEntryCount(), 3)
+        app.RemovePerHopRange(1, 1, 2)
+        self.assertEqual(app.GetPerHopEntryCount(), 1)
+
     def test_cq_buffer_drops_by_total_queued_bytes(self):
         """The ToR calendar queue rejects when total buffered bytes exceed
         the configured byte limit, independent of packet count."""
@@ -605,6 +615,31 @@ class TorGeneratedTableTests(unittest.TestCase):
         backend.stop()
         backend.cleanup()
 
+    def test_redeploy_routing_removes_stale_entries(self):
+        """A start_fresh redeploy drops routes that are no longer wanted."""
+        from unittest.mock import patch
+        from openoptics import OpticalTopo, OpticalRouting, Toolbox
+        from openoptics.backends.ns3.backend import Ns3Backend
+
+        backend = Ns3Backend()
+        with patch("openoptics.Toolbox.create_backend", return_value=backend):
+            net = Toolbox.BaseNetwork(
+                name="tor_delta_test", backend="ns3", nb_node=4,
+                time_slice_duration_us=10_000, guardband_ms=0,
+                use_webserver=False,
+            )
+            net.deploy_topo(OpticalTopo.round_robin(nb_node=4))
+            paths = OpticalRouting.routing_direct(net.get_topo())
+            net.deploy_routing(paths, routing_mode="Per-hop", start_fresh=True)
+            paths = [p for p in paths if not (p.src == 0 and p.dst == 1)]
+            net.deploy_routing(paths, routing_mode="Per-hop", start_fresh=True)
+
+        # dst 1 is gone from tor0: 2 destinations × 3 arrival slices.
+        self.assertEqual(backend._tor_apps[0].GetPerHopEntryCount(), 6)
+
+        backend.stop()
+        backend.cleanup()
+
 
 if __name__ == "__main__":
     unittest.main()
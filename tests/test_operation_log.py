@@ -0,0 +1,135 @@
+# Copyright (c) Max-Planck-Gesellschaft zur Förderung der Wissenschaften e.V.
+# Developed at the Max Planck Institute for Informatics, Network and Cloud Systems Group
+#
+# This software is licensed for non-commercial scientific research purposes only.
+# License text: Creative Commons NC BY SA 4.0
+#
+# Tests for openoptics/OperationLog.py
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ns3_helpers import skip_if_no_ns3
+from openoptics import OpticalRouting, OpticalTopo
+from openoptics.Controller import ControllerService
+from openoptics.OperationLog import OperationLog, unrecorded
+from openoptics.Toolbox import BaseNetwork
+
+
+def _recorded_session():
+    net = BaseNetwork(name="test_net", backend="Null", nb_node=4, use_webserver=False)
+    log = net.record_operations()
+    net.deploy_topo(OpticalTopo.round_robin(nb_node=4))
+    net.deploy_routing(OpticalRouting.routing_direct(net.get_topo()))
+    net.stage_update(OpticalTopo.round_robin(nb_node=4)[::-1])
+    net.commit_update(at_us=int(log.start_s * 1e6) + 500_000)
+    net.deploy_routing(OpticalRouting.routing_direct(net.get_topo()), start_fresh=True)
+    return net, log
+
+
+class TestOperationLog(unittest.TestCase):
+
+    def test_records_outermost_calls(self):
+        net, log = _recorded_session()
+        self.assertEqual(
+            [op.method for op in log.ops],
+            ["deploy_topo", "deploy_routing", "stage_update", "commit_update", "deploy_routing"],
+        )
+        self.assertEqual(log.ops[-1].kwargs, {"start_fresh": True})
+        self.assertEqual(log.network["nb_node"], 4)
+        self.assertGreaterEqual(log.duration_s, 0)
+
+    def test_unrecorded_calls_are_not_logged(self):
+        net, log = _recorded_session()
+        with unrecorded(net):
+            net.deploy_routing(OpticalRouting.routing_direct(net.get_topo()), start_fresh=True)
+        self.assertEqual(len(log), 5)
+        net.deploy_routing(OpticalRouting.routing_direct(net.get_topo()), start_fresh=True)
+        self.assertEqual(len(log), 6)
+
+    def test_controller_update_logs_only_the_update(self):
+        net, log = _recorded_session()
+        del log.ops[:]
+        service = ControllerService(net, window_s=0.05, routing_func=OpticalRouting.routing_direct)
+        service.start()
+        self.addCleanup(service.stop)
+        # Same slice count: staged next to the running topology.
+        circuits = OpticalTopo.round_robin(nb_node=4)[::-1]
+        self.assertTrue(service.submit({"circuits": circuits}).result(timeout=10)["ok"])
+        self.assertEqual([op.method for op in log.ops], ["stage_update", "commit_update"])
+
+    def test_not_recording_by_default(self):
+        net = BaseNetwork(name="test_net", backend="Null", nb_node=4, use_webserver=False)
+        net.deploy_topo(OpticalTopo.round_robin(nb_node=4))
+        self.assertIsNone(net.op_log)
+
+    def test_save_and_load(self):
+        _, log = _recorded_session()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ops.log.gz")
+            log.save(path)
+            loaded = OperationLog.load(path)
+        self.assertEqual(loaded.network, log.network)
+        self.assertEqual([op.method for op in loaded.ops], [op.method for op in log.ops])
+        self.assertEqual(loaded.ops[0].args, log.ops[0].args)
+
+    def test_replay_reproduces_tables(self):
+        net, log = _recorded_session()
+        replay = BaseNetwork(backend="Null", use_webserver=False, **log.network)
+        offsets = []
+        self.assertEqual(log.replay(replay, advance=offsets.append), len(log))
+        self.assertEqual(offsets, [op.t_s - log.start_s for op in log.ops])
+        self.assertEqual(replay._installed_tables.keys(), net._installed_tables.keys())
+        for switch_name, tables in net._installed_tables.items():
+            for table in tables:
+                self.assertEqual(
+                    dict(replay._installed(switch_name, table)), dict(net._installed(switch_name, table))
+                )
+        # The commit was scheduled 0.5 s after the first operation.
+        (version,) = [op for op in replay._backend.ops if op.op == "set_active_version"]
+        self.assertEqual(version.payload, (1, 500_000))
+
+    def test_replay_skips_methods(self):
+        _, log = _recorded_session()
+        replay = BaseNetwork(backend="Null", use_webserver=False, **log.network)
+        self.assertEqual(log.replay(replay, skip=("deploy_routing",)), len(log) - 2)
+
+    def test_env_var_saves_log_on_stop(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ops.log.gz")
+            with patch.dict(os.environ, {"OPENOPTICS_OPLOG": path}):
+                net = BaseNetwork(name="test_net", backend="Null", nb_node=4, use_webserver=False)
+            net.deploy_topo(OpticalTopo.round_robin(nb_node=4))
+            net.stop_network()
+            self.assertEqual([op.method for op in OperationLog.load(path).ops], ["deploy_topo"])
+
+
+@skip_if_no_ns3
+class TestReplayNs3(unittest.TestCase):
+
+    def tearDown(self):
+        from ns import ns
+        ns.Simulator.Destroy()
+
+    def test_operations_are_made_at_their_simulated_time(self):
+        from openoptics.OperationLog import replay_ns3
+
+        _, log = _recorded_session()
+        for i, op in enumerate(log.ops):
+            op.t_s = log.ops[0].t_s + 0.1 * i
+        seen = []
+        with patch.dict(os.environ, {"OPENOPTICS_NS3_NO_REPORT": "1"}):
+            net = replay_ns3(log, on_start=lambda net: seen.append(net.nodes_created),
+                             simulation_stop_s=1.0)
+        self.assertEqual(seen, [True])
+        self.assertAlmostEqual(net._backend._last_sim_time_s, 1.0)
+        net.stop_network()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -147,10 +147,11 @@ class TestRoutingDirect(unittest.TestCase):
 
 class TestRoutingDirectTa(unittest.TestCase):
 
-    def test_raises_for_multiple_time_slices(self):
+    def test_multiple_time_slices_get_a_path_per_slice(self):
         slice_to_topo = _rr_topo(nb_node=4)  # has 3 slices
-        with self.assertRaises(AssertionError):
-            OpticalRouting.routing_direct_ta(slice_to_topo)
+        paths = OpticalRouting.routing_direct_ta(slice_to_topo)
+        self.assertEqual(len(paths), 3 * 4 * 3)
+        self.assertEqual({p.arrival_ts for p in paths}, {0, 1, 2})
 
     def test_single_slice_returns_n_squared_minus_n_paths(self):
         nb_node = 4
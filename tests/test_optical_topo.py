@@ -223,9 +223,191 @@ class TestBipartiteMatching(unittest.TestCase):
         )
         self.assertEqual(circuits, prev)
 
-    def test_raises_if_nb_link_not_1(self):
-        with self.assertRaises(AssertionError):
-            OpticalTopo.bipartite_matching(nb_node=4, nb_link=2, traffic_matrix={})
+    def test_multi_link_gives_each_node_distinct_peers(self):
+        traffic = {(0, 1): 10, (2, 3): 8, (0, 2): 5, (1, 3): 4}
+        circuits = OpticalTopo.bipartite_matching(
+            nb_node=4, nb_link=2, traffic_matrix=traffic
+        )
+        self.assertEqual(len(circuits), 4)
+        for port in range(2):
+            nodes = [n for c in circuits if c[3] == port for n in c[1:3]]
+            self.assertEqual(sorted(nodes), [0, 1, 2, 3])
+            self.assertTrue(all(c[3] == c[4] for c in circuits))
+        pairs = {frozenset(c[1:3]) for c in circuits}
+        self.assertEqual(len(pairs), 4)
+        self.assertIn(frozenset((0, 1)), pairs)
+        self.assertIn(frozenset((0, 2)), pairs)
+
+
+# ---------------------------------------------------------------------------
+# bvn_matching
+# ---------------------------------------------------------------------------
+
+class TestBvnMatching(unittest.TestCase):
+
+    def test_uniform_traffic_uses_every_slice(self):
+        traffic = {(i, j): 1 for i in range(4) for j in range(4) if i != j}
+        circuits = OpticalTopo.bvn_matching(nb_node=4, nb_link=1, traffic_matrix=traffic)
+        self.assertEqual({c[0] for c in circuits}, {0, 1, 2})
+        pairs = {frozenset(c[1:3]) for c in circuits}
+        self.assertEqual(len(pairs), 6)  # each pair served once
+
+    def test_slices_proportional_to_demand(self):
+        traffic = {(0, 1): 30, (2, 3): 30, (0, 2): 10, (1, 3): 10}
+        circuits = OpticalTopo.bvn_matching(
+            nb_node=4, nb_link=1, traffic_matrix=traffic, nb_time_slices=4
+        )
+        slots = [c[0] for c in circuits if {c[1], c[2]} == {0, 1}]
+        self.assertEqual(len(slots), 3)
+        self.assertEqual({c[0] for c in circuits}, {0, 1, 2, 3})
+
+    def test_each_node_has_one_circuit_per_slice(self):
+        traffic = {(0, 1): 5, (1, 2): 3, (2, 3): 2, (3, 0): 1}
+        circuits = OpticalTopo.bvn_matching(nb_node=4, nb_link=1, traffic_matrix=traffic)
+        for ts in {c[0] for c in circuits}:
+            nodes = [n for c in circuits if c[0] == ts for n in c[1:3]]
+            self.assertEqual(len(nodes), len(set(nodes)))
+
+    def test_keeps_prev_slice_count(self):
+        prev = [[0, 0, 1, 0, 0], [1, 2, 3, 0, 0]]
+        circuits = OpticalTopo.bvn_matching(
+            nb_node=4, nb_link=1, traffic_matrix={(0, 3): 1, (1, 2): 1, (0, 1): 9},
+            prev_circuits=prev,
+        )
+        self.assertEqual(max(c[0] for c in circuits), 1)
+
+    def test_returns_prev_circuits_for_zero_traffic(self):
+        prev = [[0, 0, 1, 0, 0]]
+        circuits = OpticalTopo.bvn_matching(
+            nb_node=4, nb_link=1, traffic_matrix={(0, 1): 0}, prev_circuits=prev
+        )
+        self.assertEqual(circuits, prev)
+
+
+# ---------------------------------------------------------------------------
+# time_expanded_latency / optimize_slice_order
+# ---------------------------------------------------------------------------
+
+class TestTimeExpandedLatency(unittest.TestCase):
+
+    def test_direct_latency_round_robin(self):
+        # Every pair meets once per 3-slice cycle; direct paths wait up to 3 slices.
+        nodes, latency = OpticalTopo.time_expanded_latency(
+            OpticalTopo.round_robin(nb_node=4), max_hop=1
+        )
+        self.assertEqual(nodes, [0, 1, 2, 3])
+        self.assertEqual(latency.shape, (3, 4, 4))
+        self.assertEqual(latency.max(), 3)
+        self.assertTrue((latency[:, range(4), range(4)] == 0).all())
+
+    def test_multi_hop_lowers_latency(self):
+        circuits = OpticalTopo.round_robin(nb_node=4)
+        _, direct = OpticalTopo.time_expanded_latency(circuits, max_hop=1)
+        _, multi = OpticalTopo.time_expanded_latency(circuits)
+        self.assertTrue((multi <= direct).all())
+        self.assertEqual(multi.max(), 2)
+
+    def test_unreachable_is_inf(self):
+        circuits = [[0, 0, 1, 0, 0], [0, 2, 3, 0, 0]]
+        _, latency = OpticalTopo.time_expanded_latency(circuits)
+        self.assertEqual(latency[0, 0, 1], 1)
+        self.assertEqual(latency[0, 0, 2], float("inf"))
+
+    def test_ignores_guardband_placeholder(self):
+        circuits = OpticalTopo.round_robin(nb_node=4, guardband=True)
+        _, latency = OpticalTopo.time_expanded_latency(circuits)
+        self.assertEqual(latency.shape[1], 4)
+
+
+class TestOptimizeSliceOrder(unittest.TestCase):
+
+    def _slices(self, circuits):
+        return sorted(
+            sorted((n1, n2) for ts, n1, n2, p1, p2 in circuits if ts == t)
+            for t in range(OpticalTopo.get_nb_time_slice_from_circuits(circuits))
+        )
+
+    def test_keeps_per_slice_connectivity(self):
+        circuits = OpticalTopo.round_robin(nb_node=8)
+        best = OpticalTopo.optimize_slice_order(
+            circuits, time_budget_s=0.2, nb_workers=1, seed=0
+        )
+        self.assertEqual(self._slices(best), self._slices(circuits))
+
+    def test_never_worse_than_input(self):
+        circuits = OpticalTopo.round_robin(nb_node=16)
+        best = OpticalTopo.optimize_slice_order(
+            circuits, time_budget_s=0.2, nb_workers=1, seed=0
+        )
+        _, before = OpticalTopo.time_expanded_latency(circuits)
+        _, after = OpticalTopo.time_expanded_latency(best)
+        self.assertLessEqual(after.max(), before.max())
+
+    def test_zero_budget_returns_input_order(self):
+        circuits = OpticalTopo.round_robin(nb_node=6)
+        best = OpticalTopo.optimize_slice_order(circuits, time_budget_s=0, nb_workers=1)
+        self.assertEqual(best, sorted(circuits, key=lambda x: x[0]))
+
+    def test_parallel_workers(self):
+        circuits = OpticalTopo.round_robin(nb_node=6)
+        best = OpticalTopo.optimize_slice_order(circuits, time_budget_s=0.2, nb_workers=2)
+        self.assertEqual(self._slices(best), self._slices(circuits))
+
+    def test_invalid_objective_raises(self):
+        with self.assertRaises(ValueError):
+            OpticalTopo.optimize_slice_order([[0, 0, 1, 0, 0]], objective="p99")
+
+    def test_opera_with_budget(self):
+        circuits = OpticalTopo.opera(nb_node=4, nb_link=2, optimize_time_budget_s=0.1)
+        self.assertEqual(len(circuits), len(OpticalTopo.opera(nb_node=4, nb_link=2)))
+        self.assertEqual(OpticalTopo.get_nb_links_from_circuits(circuits), 2)
+
+
+# ---------------------------------------------------------------------------
+# optimize_port_assignment
+# ---------------------------------------------------------------------------
+
+class TestOptimizePortAssignment(unittest.TestCase):
+
+    # 0-1 stays connected in all slices, but on a different port each time.
+    SWAPPING = [
+        [0, 0, 1, 0, 0], [0, 2, 3, 0, 0], [0, 0, 2, 1, 1], [0, 1, 3, 1, 1],
+        [1, 0, 2, 0, 0], [1, 1, 3, 0, 0], [1, 0, 1, 1, 1], [1, 2, 3, 1, 1],
+        [2, 0, 3, 0, 0], [2, 1, 2, 0, 0], [2, 0, 1, 1, 1], [2, 2, 3, 1, 1],
+    ]
+
+    def _pairs(self, circuits):
+        return sorted((ts, min(n1, n2), max(n1, n2)) for ts, n1, n2, p1, p2 in circuits)
+
+    def test_count_port_changes_static(self):
+        self.assertEqual(OpticalTopo.count_port_changes([[0, 0, 1, 0, 0]]), 0)
+
+    def test_count_guardbands_round_robin(self):
+        # Every boundary of a 3-slice round robin changes ports.
+        self.assertEqual(OpticalTopo.count_guardbands(OpticalTopo.round_robin(nb_node=4)), 3)
+
+    def test_reduces_port_changes_and_guardbands(self):
+        best = OpticalTopo.optimize_port_assignment(self.SWAPPING, print_flag=False)
+        self.assertLess(OpticalTopo.count_port_changes(best),
+                        OpticalTopo.count_port_changes(self.SWAPPING))
+        self.assertLess(OpticalTopo.count_guardbands(best),
+                        OpticalTopo.count_guardbands(self.SWAPPING))
+
+    def test_keeps_per_slice_connectivity(self):
+        best = OpticalTopo.optimize_port_assignment(self.SWAPPING, print_flag=False)
+        self.assertEqual(self._pairs(best), self._pairs(self.SWAPPING))
+
+    def test_no_port_used_twice_per_slice(self):
+        best = OpticalTopo.optimize_port_assignment(self.SWAPPING, print_flag=False)
+        used = set()
+        for ts, n1, n2, p1, p2 in best:
+            for key in {(ts, n1, p1), (ts, n2, p2)}:
+                self.assertNotIn(key, used)
+                used.add(key)
+
+    def test_returns_input_when_already_optimal(self):
+        circuits = OpticalTopo.opera(nb_node=8, nb_link=2)
+        self.assertIs(OpticalTopo.optimize_port_assignment(circuits, print_flag=False), circuits)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,98 @@
+# Copyright (c) Max-Planck-Gesellschaft zur Förderung der Wissenschaften e.V.
+# Developed at the Max Planck Institute for Informatics, Network and Cloud Systems Group
+#
+# This software is licensed for non-commercial scientific research purposes only.
+# License text: Creative Commons NC BY SA 4.0
+#
+# Startup-time benchmark: keeps heavy optional modules out of the import path
+# of BaseNetwork and the openoptics-* console scripts.
+#
+# Run directly to print an import-time profile:
+#   python tests/test_startup.py [module] [top_n]
+
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Loaded on first use only (numpy by OpticalTopo helpers, asyncio by backend
+# calls, matplotlib by draw_topo, the rest by the dashboard).
+DEFERRED_MODULES = (
+    "numpy",
+    "asyncio",
+    "matplotlib",
+    "sqlite3",
+    "fastapi",
+    "uvicorn",
+    "openoptics.dashboard.service",
+)
+
+# Generous against the ~0.2 s measured, but catches an eager heavy import.
+STARTUP_BUDGET_S = 1.0
+
+
+def profile_imports(statement):
+    """Run statement in a fresh interpreter with ``-X importtime``.
+
+    Returns:
+        (modules, rows): the names in sys.modules afterwards, and
+        [(cumulative_us, self_us, module), ...] from the import-time log.
+    """
+    code = f"{statement}\nimport sys\nprint(' '.join(sys.modules))"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), module.strip()))
+    return set(proc.stdout.split()), rows
+
+
+class TestStartup(unittest.TestCase):
+
+    def _check(self, statement, module):
+        modules, rows = profile_imports(statement)
+        self.assertEqual(
+            [m for m in DEFERRED_MODULES if m in modules], [],
+            f"`{statement}` imports modules that should load lazily",
+        )
+        cumulative_us = max(c for c, _, name in rows if name == module)
+        self.assertLess(cumulative_us / 1e6, STARTUP_BUDGET_S)
+
+    def test_base_network_import(self):
+        self._check("from openoptics.Toolbox import BaseNetwork", "openoptics.Toolbox")
+
+    def test_topology_and_routing_libraries(self):
+        self._check(
+            "from openoptics import OpticalTopo, OpticalRouting, TrafficEstimator",
+            "openoptics.OpticalTopo",
+        )
+
+    def test_console_scripts(self):
+        for module in (
+            "openoptics._cli.gen_examples",
+            "openoptics._cli.gen_tutorials",
+            "openoptics._cli.clean_dashboard",
+            "openoptics.backends.tofino.gen_config",
+            "openoptics.backends.ns3.install",
+        ):
+            with self.subTest(module=module):
+                self._check(f"import {module}", module)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and not sys.argv[1].startswith("-"):
+        module = sys.argv[1]
+        top_n = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+        _, rows = profile_imports(f"import {module}")
+        print(f"{'self (ms)':>10} {'cumulative (ms)':>16}  module")
+        for cumulative_us, self_us, name in sorted(rows, key=lambda r: -r[1])[:top_n]:
+            print(f"{self_us / 1000:10.1f} {cumulative_us / 1000:16.1f}  {name}")
+    else:
+        unittest.main()
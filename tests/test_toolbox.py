@@ -9,15 +9,16 @@
 
 import os
 import sys
+import time
 import unittest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from helpers import FakeBackend
+from helpers import FakeBackend, FakeDeltaBackend, FakeVersionedBackend
 from openoptics.Toolbox import BaseNetwork
 from openoptics.dashboard import NullDashboard
-from openoptics import OpticalRouting
+from openoptics import OpticalRouting, utils
 
 
 class DashboardlessBackend(FakeBackend):
@@ -277,6 +278,120 @@ class TestDeployTopo(unittest.TestCase):
         self.assertEqual(self.net.nb_time_slices, 2)
 
 
+class TestDeployTopoDelta(unittest.TestCase):
+    """Redeploys on a backend with supports_table_delta push only OCS changes."""
+
+    def setUp(self):
+        self.backend = FakeDeltaBackend(nb_node=4)
+        with patch("openoptics.Toolbox.create_backend", return_value=self.backend):
+            self.net = BaseNetwork(name="test_net", nb_node=4, use_webserver=False)
+        self.net.deploy_topo([(0, 0, 1, 0, 0), (0, 2, 3, 0, 0)])
+
+    def test_first_deploy_loads_full_table(self):
+        self.assertIn(("ocs", "ocs_schedule"), self.backend.cleared)
+        self.assertEqual(self.backend.applied, [])
+
+    def test_redeploy_sends_delta_without_clearing(self):
+        self.backend.cleared.clear()
+        self.backend.loaded.clear()
+        self.assertTrue(self.net.deploy_topo([(1, 0, 2, 0, 0)]))
+        self.assertEqual(self.backend.cleared, [])
+        self.assertEqual(self.backend.loaded, [])
+        switch, delta = self.backend.applied[0]
+        self.assertEqual(switch, "ocs")
+        self.assertEqual(len(delta.adds), 2)  # both directions of 0<->2
+        self.assertEqual(delta.modifies, [])
+        self.assertEqual(delta.deletes, [])
+
+    def test_disconnect_produces_deletes(self):
+        self.net.disconnect(0, 2, 3)
+        self.net.deploy_topo()
+        _, delta = self.backend.applied[-1]
+        self.assertEqual(len(delta.deletes), 2)
+        self.assertEqual(delta.adds, [])
+
+    def test_unchanged_topology_sends_nothing(self):
+        self.net.deploy_topo()
+        self.assertEqual(self.backend.applied, [])
+
+    def test_shadow_tracks_installed_entries(self):
+        self.net.deploy_topo([(0, 0, 2, 0, 0), (0, 1, 3, 0, 0)], start_fresh=True)
+        installed = self.net._installed_tables["ocs"]["ocs_schedule"].values()
+        self.assertTrue(
+            utils.diff_table_entries(installed, self.net.gen_ocs_entries()).is_empty()
+        )
+
+
+# ---------------------------------------------------------------------------
+# BaseNetwork calendar queue control — traffic-aware
+# ---------------------------------------------------------------------------
+
+class TestCalendarQueueControl(unittest.TestCase):
+
+    def setUp(self):
+        self.net, _ = _make_net(nb_node=4, arch_mode="TA")
+        self.net.device_manager = MagicMock()
+        self.net.deploy_topo([(0, 0, 1, 0, 0), (1, 0, 2, 0, 0), (1, 1, 3, 0, 0)])
+
+    def _active_queues(self):
+        return {
+            sw_name: qid
+            for c in self.net.device_manager.set_active_queues.call_args_list
+            for sw_name, qid, _ in c.args[0]
+        }
+
+    def test_activate_serves_peer_and_pauses_unconnected(self):
+        self.net.activate_calendar_queue(time_slice=0)
+        self.assertEqual(
+            self._active_queues(), {"tor0": 1, "tor1": 0, "tor2": 2, "tor3": 3}
+        )
+
+    def test_activate_follows_time_slice(self):
+        self.net.activate_calendar_queue(time_slice=1)
+        self.assertEqual(
+            self._active_queues(), {"tor0": 2, "tor1": 3, "tor2": 0, "tor3": 1}
+        )
+
+    def test_activate_defaults_to_current_slice(self):
+        with patch.object(BaseNetwork, "current_time_slice", return_value=1):
+            self.net.activate_calendar_queue()
+        self.assertEqual(self._active_queues()["tor0"], 2)
+
+    def test_pause_sets_every_tor_to_itself(self):
+        self.net.pause_calendar_queue()
+        self.assertEqual(
+            self._active_queues(), {f"tor{n}": n for n in range(4)}
+        )
+
+    def test_current_time_slice_in_range(self):
+        self.assertIn(self.net.current_time_slice(), range(self.net.nb_time_slices))
+
+    def test_activate_at_schedules_one_batch_for_that_slice(self):
+        slice_us = self.net.time_slice_duration_us
+        at_us = self.net.next_time_slice_start_us(lead_us=3 * slice_us)
+        self.assertEqual(at_us % slice_us, 0)
+        self.assertGreaterEqual(at_us, time.time_ns() // 1000 + 2 * slice_us)
+
+        self.net.activate_calendar_queue(at_us=at_us)
+        (call,) = self.net.device_manager.set_active_queues.call_args_list
+        self.assertEqual(call.kwargs["at_us"], at_us)
+        time_slice = (at_us // slice_us) % self.net.nb_time_slices
+        self.assertEqual(self._active_queues()["tor0"], [1, 2][time_slice])
+
+    def test_multi_link_activates_per_port(self):
+        net, _ = _make_net(nb_node=4, nb_link=2, arch_mode="TA")
+        net.device_manager = MagicMock()
+        net.deploy_topo([(0, 0, 1, 0, 0), (0, 0, 2, 1, 1)])
+        net.activate_calendar_queue(time_slice=0)
+        (call,) = net.device_manager.set_active_queues.call_args_list
+        calls = {(sw_name, port): qid for sw_name, qid, port in call.args[0]}
+        self.assertEqual(calls[("tor0", 0)], 1)
+        self.assertEqual(calls[("tor0", 1)], 2)
+        self.assertEqual(calls[("tor2", 1)], 0)
+        self.assertEqual(calls[("tor3", 0)], 3)  # unconnected port paused
+        self.assertEqual(len(calls), 8)
+
+
 # ---------------------------------------------------------------------------
 # BaseNetwork.deploy_routing() — command dispatch
 # ---------------------------------------------------------------------------
@@ -303,6 +418,26 @@ class TestDeployRouting(unittest.TestCase):
         for i in range(4):
             self.assertIn(f"tor{i}", loaded_nodes)
 
+    def test_overlapping_time_flow_entries_are_rejected(self):
+        from openoptics.TimeFlowTable import TimeFlowEntry, TimeFlowHop
+
+        def entry(arrival_ts, send_ts):
+            return TimeFlowEntry(
+                dst=1, arrival_ts=arrival_ts, hops=TimeFlowHop(send_port=0, send_ts=send_ts)
+            )
+
+        # Compressed to one entry for arrival slices 0 to 2.
+        self.assertTrue(self.net.add_time_flow_entry(0, [entry(ts, 0) for ts in range(3)]))
+        self.assertFalse(self.net.add_time_flow_entry(0, entry(1, 2)))
+        self.assertEqual(len(self.net._installed("tor0", "per_hop_routing")), 1)
+        self.assertFalse(self.net.add_time_flow_entry(0, [entry(1, 0), entry(1, 2)]))
+
+    def test_deploy_routing_twice_is_rejected_without_start_fresh(self):
+        self.assertTrue(self.net.deploy_routing(self.paths, routing_mode="Per-hop"))
+        nb_loaded = len(self.backend.loaded)
+        self.assertFalse(self.net.deploy_routing(self.paths, routing_mode="Per-hop"))
+        self.assertEqual(len(self.backend.loaded), nb_loaded)
+
     def test_deploy_routing_start_fresh_clears_tables(self):
         self.net.deploy_routing(self.paths, routing_mode="Per-hop", start_fresh=True)
         cleared_nodes = {sw for sw, _ in self.backend.cleared}
@@ -310,6 +445,321 @@ class TestDeployRouting(unittest.TestCase):
             self.assertIn(f"tor{i}", cleared_nodes)
 
 
+class TestDeployRoutingBatch(unittest.TestCase):
+    """deploy_routing hands every switch to the backend in one batch."""
+
+    def setUp(self):
+        from openoptics import OpticalTopo
+
+        class BatchBackend(FakeBackend):
+            def __init__(self, nb_node=4):
+                super().__init__(nb_node=nb_node)
+                self.batches = []
+
+            async def load_tables(self, batch_by_switch, print_flag=False):
+                self.batches.append(sorted(batch_by_switch))
+                return await super().load_tables(batch_by_switch, print_flag)
+
+            async def load_table_batches(self, batches_by_switch, print_flag=False):
+                self.batches.append(sorted(batches_by_switch))
+                return await super().load_table_batches(batches_by_switch, print_flag)
+
+        self.backend = BatchBackend(nb_node=4)
+        with patch("openoptics.Toolbox.create_backend", return_value=self.backend):
+            self.net = BaseNetwork(name="test_net", nb_node=4, use_webserver=False)
+        self.net.deploy_topo(OpticalTopo.round_robin(nb_node=4))
+        self.paths = OpticalRouting.routing_direct(self.net.get_topo())
+
+    def test_routing_and_node_tables_are_batched(self):
+        self.assertTrue(self.net.deploy_routing(self.paths, start_fresh=True))
+        tors = [f"tor{i}" for i in range(4)]
+        self.assertEqual(self.backend.batches, [tors, tors])
+
+    def test_deploy_inside_running_event_loop(self):
+        import asyncio
+
+        async def deploy():
+            return self.net.deploy_routing(self.paths)
+
+        self.assertTrue(asyncio.run(deploy()))
+
+
+class TestDeployRoutingDelta(unittest.TestCase):
+    """start_fresh redeploys on a delta backend push only routing changes."""
+
+    def setUp(self):
+        from openoptics import OpticalTopo
+        self.backend = FakeDeltaBackend(nb_node=4)
+        with patch("openoptics.Toolbox.create_backend", return_value=self.backend):
+            self.net = BaseNetwork(name="test_net", nb_node=4, use_webserver=False)
+        self.net.deploy_topo(OpticalTopo.round_robin(nb_node=4))
+        self.paths = OpticalRouting.routing_direct(self.net.get_topo())
+        self.net.deploy_routing(self.paths, start_fresh=True)
+        self.backend.cleared.clear()
+        self.backend.applied.clear()
+
+    def _routing_deltas(self):
+        return {sw: d for sw, d in self.backend.applied if sw.startswith("tor")}
+
+    def test_first_deploy_clears_and_loads(self):
+        self.assertTrue(self.net._is_installed("tor0", "per_hop_routing"))
+        self.assertGreater(len(self.net._installed_tables["tor0"]["per_hop_routing"]), 0)
+
+    def test_same_routing_sends_nothing(self):
+        self.assertTrue(self.net.deploy_routing(self.paths, start_fresh=True))
+        self.assertEqual(self.backend.cleared, [])
+        self.assertEqual(self._routing_deltas(), {})
+
+    def test_changed_paths_send_delta(self):
+        paths = [p for p in self.paths if not (p.src == 0 and p.dst == 1)]
+        self.assertTrue(self.net.deploy_routing(paths, start_fresh=True))
+        self.assertEqual(self.backend.cleared, [])
+        deltas = self._routing_deltas()
+        self.assertEqual(list(deltas), ["tor0"])
+        self.assertEqual(deltas["tor0"].adds, [])
+        self.assertGreater(len(deltas["tor0"].deletes), 0)
+        self.assertTrue(all(e.match_keys["dst"] == 1 for e in deltas["tor0"].deletes))
+
+    def test_other_routing_mode_loads_fresh(self):
+        self.net.deploy_routing(self.paths, routing_mode="Source", start_fresh=True)
+        self.assertIn(("tor0", "add_source_routing_entries"), self.backend.cleared)
+
+    def test_partial_backend_falls_back_to_reload(self):
+        self.backend.can_apply_table_delta = lambda name: name == "ocs"
+        self.net.deploy_routing(self.paths, start_fresh=True)
+        self.assertIn(("tor0", "per_hop_routing"), self.backend.cleared)
+
+
+class TestSetupNodesCache(unittest.TestCase):
+    """setup_nodes reloads ToR utility tables only when their inputs change."""
+
+    def _make(self, backend):
+        from openoptics import OpticalTopo
+        with patch("openoptics.Toolbox.create_backend", return_value=backend):
+            net = BaseNetwork(name="test_net", nb_node=4, use_webserver=False)
+        net.deploy_topo(OpticalTopo.round_robin(nb_node=4))
+        net.setup_nodes()
+        backend.loaded.clear()
+        return net
+
+    def test_unchanged_inputs_skip_reload(self):
+        backend = FakeBackend(nb_node=4)
+        net = self._make(backend)
+        net.setup_nodes()
+        self.assertEqual(backend.loaded, [])
+
+    def test_topology_change_reloads(self):
+        backend = FakeBackend(nb_node=4)
+        net = self._make(backend)
+        node1, node2, attr = next(iter(net.slice_to_topo[0].edges(data=True)))
+        self.assertTrue(net.disconnect(0, node1, node2, attr["port1"], attr["port2"]))
+        net.setup_nodes()
+        self.assertEqual({sw for sw, _ in backend.loaded}, {f"tor{i}" for i in range(4)})
+
+    def test_ip_to_tor_change_reloads(self):
+        backend = FakeBackend(nb_node=4)
+        net = self._make(backend)
+        backend._ip_to_tor["10.0.9.1"] = 0
+        net.setup_nodes()
+        self.assertEqual(len(backend.loaded), 4)
+
+    def test_delta_backend_pushes_only_changed_tables(self):
+        backend = FakeDeltaBackend(nb_node=4)
+        net = self._make(backend)
+        backend.applied.clear()
+        backend._ip_to_tor["10.0.9.1"] = 0
+        net.setup_nodes()
+        self.assertEqual(backend.loaded, [])
+        self.assertEqual(len(backend.applied), 4)
+        for _, delta in backend.applied:
+            self.assertEqual(len(delta.adds), 1)
+            self.assertEqual(delta.adds[0].table, "ip_to_dst_node")
+
+
+class TestStageCommitUpdate(unittest.TestCase):
+    """stage_update installs the next table version; commit_update switches to it."""
+
+    def setUp(self):
+        from openoptics import OpticalTopo
+        self.backend = FakeVersionedBackend(nb_node=4)
+        with patch("openoptics.Toolbox.create_backend", return_value=self.backend):
+            self.net = BaseNetwork(name="test_net", nb_node=4, use_webserver=False)
+        circuits = OpticalTopo.round_robin(nb_node=4)
+        self.net.deploy_topo(circuits)
+        self.net.deploy_routing(
+            OpticalRouting.routing_direct(self.net.get_topo()), start_fresh=True
+        )
+        # Same circuits, one time slice later.
+        self.new_circuits = [[(ts + 1) % 3, *rest] for ts, *rest in circuits]
+        self.nb_routes = len(self.net._installed_tables["tor0"]["per_hop_routing"])
+        self.backend.applied.clear()
+
+    def _versions(self, switch_name, table):
+        return {
+            utils.table_entry_version(e)
+            for e in self.net._installed(switch_name, table).values()
+        }
+
+    def test_stage_installs_next_to_running_version(self):
+        old_topo = utils.topo_signature(self.net.slice_to_topo)
+        self.assertTrue(self.net.stage_update(self.new_circuits))
+        self.assertEqual(self.backend.versions, [])
+        self.assertEqual(utils.topo_signature(self.net.slice_to_topo), old_topo)
+        self.assertEqual(self._versions("ocs", "ocs_schedule"), {None, 0, 1})
+        self.assertEqual(self._versions("tor0", "per_hop_routing"), {0, 1})
+        for _, delta in self.backend.applied:
+            self.assertEqual(delta.deletes, [])
+
+    def test_commit_switches_and_removes_previous_version(self):
+        self.net.stage_update(self.new_circuits)
+        self.assertTrue(self.net.commit_update())
+        self.assertEqual(self.backend.versions, [(1, None)])
+        self.assertEqual(self._versions("ocs", "ocs_schedule"), {None, 1})
+        self.assertEqual(self._versions("tor0", "cal_port_slice_to_node"), {1})
+        self.assertEqual(self._versions("tor0", "per_hop_routing"), {1})
+        self.assertEqual(
+            len(self.net._installed_tables["tor0"]["per_hop_routing"]), self.nb_routes
+        )
+        ts, node1, node2, *_ = self.new_circuits[0]
+        self.assertTrue(self.net.get_topo(ts).has_edge(node1, node2))
+
+    def test_keep_previous_reuses_slots_on_next_stage(self):
+        self.net.stage_update(self.new_circuits)
+        self.net.commit_update(keep_previous=True)
+        self.assertEqual(self._versions("ocs", "ocs_schedule"), {None, 0, 1})
+        self.backend.applied.clear()
+        self.assertTrue(self.net.stage_update(self.new_circuits))
+        # Version 0 slots now hold the same schedule as version 1.
+        ocs_delta = dict(self.backend.applied)["ocs"]
+        self.assertGreater(len(ocs_delta.modifies) + len(ocs_delta.deletes), 0)
+        self.net.commit_update()
+        self.assertEqual(self.backend.versions[-1], (0, None))
+        self.assertEqual(self._versions("ocs", "ocs_schedule"), {None, 0})
+
+    def test_later_deploys_keep_active_version(self):
+        self.net.stage_update(self.new_circuits)
+        self.net.commit_update()
+        self.backend.applied.clear()
+        self.net.setup_nodes()
+        self.net.deploy_topo()
+        self.assertEqual(self.backend.applied, [])
+
+    def test_scheduled_commit_keeps_previous_version(self):
+        self.net.stage_update(self.new_circuits)
+        self.assertTrue(self.net.commit_update(at_us=5_000))
+        self.assertEqual(self.backend.versions, [(1, 5_000)])
+        self.assertEqual(self._versions("ocs", "ocs_schedule"), {None, 0, 1})
+
+    def test_commit_without_stage_raises(self):
+        with self.assertRaises(ValueError):
+            self.net.commit_update()
+
+    def test_slice_count_must_match(self):
+        with self.assertRaises(ValueError):
+            self.net.stage_update([(0, 0, 1, 0, 0)])
+
+    def test_backend_without_versioned_tables_raises(self):
+        backend = FakeDeltaBackend(nb_node=4)
+        with patch("openoptics.Toolbox.create_backend", return_value=backend):
+            net = BaseNetwork(name="test_net", nb_node=4, use_webserver=False)
+        net.deploy_topo([(0, 0, 1, 0, 0)])
+        with self.assertRaises(NotImplementedError):
+            net.stage_update([(0, 0, 1, 0, 0)])
+
+
+class TestTrafficAwarePipeline(unittest.TestCase):
+    """Planner and deployer threads of start_traffic_aware."""
+
+    def setUp(self):
+        from openoptics import OpticalTopo
+        self.backend = FakeVersionedBackend(nb_node=4)
+        with patch("openoptics.Toolbox.create_backend", return_value=self.backend):
+            self.net = BaseNetwork(name="test_net", nb_node=4, use_webserver=False)
+        self.circuits = OpticalTopo.round_robin(nb_node=4)
+        self.net.deploy_topo(self.circuits)
+        self.net.device_manager = MagicMock()
+        self.net.device_manager.get_device_metric.return_value = {}
+        self.net._stage_timings = MagicMock()
+
+    def _run(self, topo_func, until, **kwargs):
+        import threading
+        stop_event = threading.Event()
+        threads = self.net._traffic_aware_pipeline(
+            topo_func, 0.01, stop_event, threading.Lock(), **kwargs
+        )
+        for thread in threads:
+            thread.start()
+        for _ in range(500):
+            if until():
+                break
+            stop_event.wait(0.01)
+        stop_event.set()
+        for thread in threads:
+            thread.join(timeout=5)
+            self.assertFalse(thread.is_alive())
+
+    def _stages(self):
+        return {c.args[0] for c in self.net._stage_timings.emit.call_args_list}
+
+    def test_changed_circuits_are_staged_and_committed(self):
+        shifted = [[(ts + 1) % 3, *rest] for ts, *rest in self.circuits]
+        self._run(lambda **_: shifted, until=lambda: self.backend.versions)
+        version, at_us = self.backend.versions[0]
+        self.assertEqual(version, 1)
+        # Tables and calendar queues switch at the same slice boundary.
+        (call,) = self.net.device_manager.set_active_queues.call_args_list
+        self.assertEqual(call.kwargs["at_us"], at_us)
+        ts, node1, node2, *_ = shifted[0]
+        self.assertTrue(self.net.get_topo(ts).has_edge(node1, node2))
+        self.assertEqual(self._stages(), {"poll", "compute", "stage", "commit"})
+
+    def test_planning_continues_while_deploy_runs(self):
+        polls = self.net.device_manager.get_device_metric
+        stage_update = self.net.stage_update
+        polls_during_stage = []
+
+        def slow_stage_update(circuits):
+            before = polls.call_count
+            time.sleep(0.2)
+            polls_during_stage.append(polls.call_count - before)
+            return stage_update(circuits)
+
+        self.net.stage_update = slow_stage_update
+        shifted = [[(ts + 1) % 3, *rest] for ts, *rest in self.circuits]
+        self._run(lambda **_: shifted, until=lambda: self.backend.versions)
+        self.assertGreaterEqual(polls_during_stage[0], 2)
+
+    def test_unchanged_circuits_are_not_deployed(self):
+        polls = self.net.device_manager.get_device_metric
+        self._run(lambda **_: [], until=lambda: polls.call_count >= 3)
+        self.assertEqual(self.backend.versions, [])
+        self.assertNotIn("commit", self._stages())
+
+    def test_estimator_and_policy_gate_reconfiguration(self):
+        from openoptics.TrafficEstimator import ReconfigPolicy
+        estimator = MagicMock()
+        estimator.update.return_value = {(0, 1): 5}
+        topos = iter([self.circuits, [[0, 0, 2, 0, 0]]])
+        polls = self.net.device_manager.get_device_metric
+        self._run(
+            lambda **_: next(topos, [[0, 0, 2, 0, 0]]),
+            until=lambda: polls.call_count >= 3,
+            estimator=estimator,
+            reconfig_policy=ReconfigPolicy(reconfig_cost=1),
+        )
+        estimator.update.assert_called_with({})
+        # The first topology is deployed; the one serving less traffic is not.
+        self.assertEqual([v for v, _ in self.backend.versions], [1])
+
+    def test_stage_over_deadline_is_reported(self):
+        with patch("builtins.print") as mock_print:
+            self.net._record_stage("compute", 0.5, {"compute": 0.1})
+            self.net._record_stage("poll", 0.5, {"compute": 0.1})
+        self.assertEqual(mock_print.call_count, 1)
+        self.assertIn("compute", mock_print.call_args.args[0])
+        self.net._stage_timings.emit.assert_any_call("poll", 0.5)
+
+
 # ---------------------------------------------------------------------------
 # BaseNetwork backend kwargs validation
 # ---------------------------------------------------------------------------
@@ -0,0 +1,136 @@
+# Copyright (c) Max-Planck-Gesellschaft zur Förderung der Wissenschaften e.V.
+# Developed at the Max Planck Institute for Informatics, Network and Cloud Systems Group
+#
+# This software is licensed for non-commercial scientific research purposes only.
+# License text: Creative Commons NC BY SA 4.0
+#
+# Tests for openoptics/Tracer.py
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from helpers import FakeBackend
+from openoptics import OpticalRouting, OpticalTopo
+from openoptics.Toolbox import BaseNetwork
+from openoptics.Tracer import Tracer, traced, tracer
+
+
+class TestTracer(unittest.TestCase):
+
+    def setUp(self):
+        self.tracer = Tracer()
+
+    def test_span_records_duration_and_args(self):
+        with self.tracer.span("phase", switch="tor0") as span:
+            span.args["entries"] = 3
+        (recorded,) = self.tracer.spans
+        self.assertIs(recorded, span)
+        self.assertEqual(recorded.args, {"switch": "tor0", "entries": 3})
+        self.assertGreaterEqual(recorded.duration_s, 0)
+        self.assertEqual(recorded.thread_id, threading.get_ident())
+
+    def test_annotate_reaches_innermost_span(self):
+        with self.tracer.span("outer") as outer:
+            with self.tracer.span("inner") as inner:
+                self.tracer.annotate(bytes=10)
+        self.tracer.annotate(bytes=20)  # no open span: ignored
+        self.assertEqual(inner.args, {"bytes": 10})
+        self.assertEqual(outer.args, {})
+        self.assertEqual([s.name for s in self.tracer.spans], ["inner", "outer"])
+
+    def test_span_recorded_when_body_raises(self):
+        with self.assertRaises(ValueError):
+            with self.tracer.span("failing"):
+                raise ValueError
+        self.assertEqual(len(self.tracer.spans), 1)
+
+    def test_listener_errors_are_swallowed(self):
+        seen = []
+
+        def broken(span):
+            raise RuntimeError
+
+        self.tracer.add_listener(broken)
+        self.tracer.add_listener(seen.append)
+        with self.tracer.span("phase"):
+            pass
+        self.assertEqual([s.name for s in seen], ["phase"])
+        self.tracer.remove_listener(seen.append)
+        with self.tracer.span("phase"):
+            pass
+        self.assertEqual(len(seen), 1)
+
+    def test_keeps_most_recent_spans(self):
+        small = Tracer(max_spans=2)
+        for name in ("a", "b", "c"):
+            with small.span(name):
+                pass
+        self.assertEqual([s.name for s in small.spans], ["b", "c"])
+
+    def test_chrome_trace_dump(self):
+        with self.tracer.span("phase", entries=2):
+            pass
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            self.tracer.dump_chrome_trace(path)
+            with open(path) as f:
+                trace = json.load(f)
+        (event,) = trace["traceEvents"]
+        self.assertEqual(event["name"], "phase")
+        self.assertEqual(event["ph"], "X")
+        self.assertEqual(event["args"], {"entries": 2})
+
+
+class TestTraced(unittest.TestCase):
+
+    def setUp(self):
+        tracer.clear()
+
+    def test_decorator_counts_entries(self):
+        @traced(name="gen", entries=len)
+        def gen(n):
+            return list(range(n))
+
+        self.assertEqual(gen(3), [0, 1, 2])
+        (span,) = tracer.spans
+        self.assertEqual(span.name, "gen")
+        self.assertEqual(span.args, {"entries": 3})
+
+    def test_backend_table_ops_are_traced(self):
+        backend = FakeBackend()
+        entries = [object(), object()]
+        backend.load_table("tor0", entries)
+        backend.clear_table(switch_name="tor1", table="per_hop_routing")
+        load, clear = tracer.spans
+        self.assertEqual(load.name, "FakeBackend.load_table")
+        self.assertEqual(load.args, {"switch": "tor0", "entries": 2})
+        self.assertEqual(clear.args, {"switch": "tor1", "table": "per_hop_routing"})
+
+    def test_deploy_records_phases(self):
+        backend = FakeBackend(nb_node=4)
+        with patch("openoptics.Toolbox.create_backend", return_value=backend):
+            net = BaseNetwork(name="test_net", nb_node=4, use_webserver=False)
+        net.deploy_topo(OpticalTopo.round_robin(nb_node=4))
+        net.deploy_routing(OpticalRouting.routing_direct(net.get_topo()))
+        names = {span.name for span in tracer.spans}
+        for name in (
+            "BaseNetwork.deploy_topo",
+            "BaseNetwork.deploy_routing",
+            "routing_direct",
+            "path2entries",
+            "FakeBackend.load_table",
+        ):
+            self.assertIn(name, names)
+        routing = next(s for s in tracer.spans if s.name == "routing_direct")
+        self.assertGreater(routing.args["entries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
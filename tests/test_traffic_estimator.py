@@ -0,0 +1,83 @@
+# Copyright (c) Max-Planck-Gesellschaft zur Förderung der Wissenschaften e.V.
+# Developed at the Max Planck Institute for Informatics, Network and Cloud Systems Group
+#
+# This software is licensed for non-commercial scientific research purposes only.
+# License text: Creative Commons NC BY SA 4.0
+#
+# Tests for openoptics/TrafficEstimator.py
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from openoptics.TrafficEstimator import (
+    EwmaEstimator,
+    ReconfigPolicy,
+    WindowEstimator,
+    served_traffic,
+)
+
+
+class TestEwmaEstimator(unittest.TestCase):
+
+    def test_first_reading_is_the_estimate(self):
+        est = EwmaEstimator(alpha=0.5)
+        self.assertEqual(est.update({(0, 1): 8}), {(0, 1): 8})
+
+    def test_readings_are_smoothed(self):
+        est = EwmaEstimator(alpha=0.5)
+        est.update({(0, 1): 8})
+        self.assertEqual(est.update({(2, 3): 4}), {(0, 1): 4.0, (2, 3): 2.0})
+
+    def test_invalid_alpha_raises(self):
+        with self.assertRaises(ValueError):
+            EwmaEstimator(alpha=0)
+
+
+class TestWindowEstimator(unittest.TestCase):
+
+    def test_mean_over_window(self):
+        est = WindowEstimator(window=2)
+        est.update({(0, 1): 9})
+        est.update({(0, 1): 2})
+        self.assertEqual(est.update({(0, 1): 4, (1, 0): 2}), {(0, 1): 3.0, (1, 0): 1.0})
+
+    def test_invalid_window_raises(self):
+        with self.assertRaises(ValueError):
+            WindowEstimator(window=0)
+
+
+class TestReconfigPolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.prev = [[0, 0, 1, 0, 0], [0, 2, 3, 0, 0]]
+        self.new = [[0, 0, 2, 0, 0], [0, 1, 3, 0, 0]]
+
+    def test_served_traffic_counts_both_directions(self):
+        tm = {(0, 1): 3, (1, 0): 2, (2, 3): 1, (0, 2): 7}
+        self.assertEqual(served_traffic(self.prev, tm), 6)
+
+    def test_served_traffic_averages_over_time_slices(self):
+        circuits = [[0, 0, 1, 0, 0], [1, 0, 2, 0, 0]]
+        self.assertEqual(served_traffic(circuits, {(0, 1): 4}), 2)
+
+    def test_small_gain_is_rejected(self):
+        tm = {(0, 1): 10, (0, 2): 12}
+        self.assertTrue(ReconfigPolicy().should_reconfigure(tm, self.prev, self.new))
+        self.assertFalse(
+            ReconfigPolicy(reconfig_cost=5).should_reconfigure(tm, self.prev, self.new)
+        )
+        self.assertFalse(
+            ReconfigPolicy(min_gain=0.5).should_reconfigure(tm, self.prev, self.new)
+        )
+
+    def test_first_topology_is_always_deployed(self):
+        policy = ReconfigPolicy(reconfig_cost=100)
+        self.assertTrue(policy.should_reconfigure({}, [], self.new))
+        self.assertFalse(policy.should_reconfigure({}, self.prev, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -38,6 +38,38 @@ def _simple_path(src=0, dst=1, arrival_ts=0, send_port=0, send_ts=0):
     return Path(src=src, arrival_ts=arrival_ts, dst=dst, steps=[step])
 
 
+# ---------------------------------------------------------------------------
+# table_entry_key / diff_table_entries
+# ---------------------------------------------------------------------------
+
+class TestDiffTableEntries(unittest.TestCase):
+
+    def _ocs(self, slice_id, ingress, egress):
+        return utils.gen_ocs_commands([(slice_id, ingress, egress)])[1]
+
+    def test_key_ignores_action_params(self):
+        self.assertEqual(utils.table_entry_key(self._ocs(0, 1, 2)),
+                         utils.table_entry_key(self._ocs(0, 1, 3)))
+
+    def test_default_action_key(self):
+        default = utils.gen_ocs_commands([])[0]
+        self.assertEqual(utils.table_entry_key(default), ("ocs_schedule", None))
+
+    def test_identical_entries_give_empty_delta(self):
+        entries = utils.gen_ocs_commands([(0, 1, 2), (0, 2, 1)])
+        delta = utils.diff_table_entries(entries, list(entries))
+        self.assertTrue(delta.is_empty())
+        self.assertEqual(len(delta), 0)
+
+    def test_add_modify_delete(self):
+        old = [self._ocs(0, 1, 2), self._ocs(0, 2, 1)]
+        new = [self._ocs(0, 1, 3), self._ocs(1, 2, 1)]
+        delta = utils.diff_table_entries(old, new)
+        self.assertEqual(delta.adds, [self._ocs(1, 2, 1)])
+        self.assertEqual(delta.modifies, [self._ocs(0, 1, 3)])
+        self.assertEqual(delta.deletes, [self._ocs(0, 2, 1)])
+
+
 # ---------------------------------------------------------------------------
 # gen_ocs_commands
 # ---------------------------------------------------------------------------
@@ -183,6 +215,99 @@ class TestTorTableRoutingPerHop(unittest.TestCase):
             self.assertEqual(e.action_params["send_ts"], i)
 
 
+class TestTorTableRoutingPerHopBatch(unittest.TestCase):
+
+    def test_matches_entry_per_row(self):
+        entries = [
+            TimeFlowEntry(dst=1, arrival_ts=2, hops=TimeFlowHop(cur_node=0, send_port=1, send_ts=2)),
+            TimeFlowEntry(dst=2, arrival_ts=None, hops=TimeFlowHop(cur_node=0, send_port=3, send_ts=0)),
+        ]
+        expected = []
+        for entry in entries:
+            expected += utils.tor_table_routing_per_hop(entry, nb_time_slices=3)
+        batch = utils.tor_table_routing_per_hop_batch(entries, nb_time_slices=3)
+        self.assertEqual(len(batch), 4)
+        self.assertEqual(list(batch), expected)
+
+    def test_empty(self):
+        batch = utils.tor_table_routing_per_hop_batch([])
+        self.assertEqual(len(batch), 0)
+        self.assertEqual(list(batch), [])
+
+
+
+class TestCompressTableEntries(unittest.TestCase):
+
+    def _route(self, dst, arrival_ts, send_ts, send_port=0):
+        return TableEntry(
+            table="per_hop_routing",
+            action="write_time_flow_entry",
+            match_keys={"dst": dst, "arrival_ts": arrival_ts},
+            action_params={"cur_node": 0, "send_ts": send_ts, "send_port": send_port},
+        )
+
+    def test_merges_consecutive_slices_with_same_action(self):
+        entries = [self._route(1, ts, send_ts=2) for ts in (2, 0, 1)] + [self._route(1, 3, send_ts=0)]
+        self.assertEqual(utils.compress_table_entries(entries), [
+            self._route(1, (0, 2), send_ts=2),
+            self._route(1, (3, 3), send_ts=0),
+        ])
+
+    def test_keeps_gaps_and_destinations_apart(self):
+        entries = [self._route(1, 0, 2), self._route(1, 2, 2), self._route(2, 1, 2)]
+        self.assertEqual(utils.compress_table_entries(entries), [
+            self._route(1, (0, 0), 2),
+            self._route(1, (2, 2), 2),
+            self._route(2, (1, 1), 2),
+        ])
+
+    def test_source_routing_and_other_tables(self):
+        hop = TimeFlowHop(cur_node=0, send_port=1, send_ts=2)
+        entries = utils.tor_table_routing_source(TimeFlowEntry(dst=1, arrival_ts=0, hops=hop))
+        entries += utils.tor_table_routing_source(TimeFlowEntry(dst=1, arrival_ts=1, hops=hop))
+        ip = utils.tor_table_ip_to_dst({"10.0.0.1": 0})[0]
+        (compressed_ip, route) = utils.compress_table_entries([ip] + entries)
+        self.assertEqual(compressed_ip, ip)
+        self.assertEqual(route.match_keys, {"dst": 1, "arrival_ts": (0, 1)})
+
+    def test_batch_matches_entries(self):
+        entries = [
+            TimeFlowEntry(dst=1, arrival_ts=ts, hops=TimeFlowHop(cur_node=0, send_port=1, send_ts=2))
+            for ts in range(3)
+        ]
+        entries.append(TimeFlowEntry(dst=2, arrival_ts=None, hops=TimeFlowHop(cur_node=0, send_port=3, send_ts=0)))
+        rows = []
+        for entry in entries:
+            rows += utils.tor_table_routing_per_hop(entry, nb_time_slices=3)
+        batch = utils.compress_table_batch(utils.tor_table_routing_per_hop_batch(entries, nb_time_slices=3))
+        self.assertEqual(len(batch), 4)
+        self.assertEqual(list(batch), utils.compress_table_entries(rows))
+
+    def test_find_range_overlap(self):
+        installed = [self._route(1, (0, 2), 2), self._route(2, (0, 2), 2)]
+        self.assertEqual(
+            utils.find_range_overlap(installed, [self._route(1, (1, 1), 0)]),
+            (installed[0], self._route(1, (1, 1), 0)),
+        )
+        self.assertIsNone(utils.find_range_overlap(installed, [self._route(1, (3, 3), 0)]))
+        self.assertIsNone(utils.find_range_overlap(installed, [self._route(3, (1, 1), 0)]))
+        # Added entries must not overlap each other either.
+        added = [self._route(3, (0, 1), 2), self._route(3, (1, 1), 0)]
+        self.assertEqual(utils.find_range_overlap([], added), tuple(added))
+
+    def test_versioned_ranges(self):
+        (entry,) = utils.version_table_entries([self._route(1, (0, 2), 2)], 1)
+        offset = utils.VERSION_SLICE_OFFSET
+        self.assertEqual(entry.match_keys["arrival_ts"], (offset, offset + 2))
+        self.assertEqual(utils.table_entry_version(entry), 1)
+
+        entries = [TimeFlowEntry(dst=1, arrival_ts=ts, hops=TimeFlowHop(cur_node=0, send_port=1, send_ts=2)) for ts in range(2)]
+        batch = utils.compress_table_batch(utils.tor_table_routing_per_hop_batch(entries))
+        (row,) = utils.version_table_entries(batch, 1)
+        self.assertEqual(row.match_keys["arrival_ts"], (offset, offset + 1))
+
+
+
 # ---------------------------------------------------------------------------
 # tor_table_routing_source
 # ---------------------------------------------------------------------------
@@ -286,6 +411,70 @@ class TestPath2Entries(unittest.TestCase):
             utils.path2entries([path], routing_mode="Source", arch_mode="TA")
 
 
+# ---------------------------------------------------------------------------
+# topo_signature
+# ---------------------------------------------------------------------------
+
+class TestTopoSignature(unittest.TestCase):
+
+    def _topo(self, port=0):
+        g = nx.DiGraph()
+        g.add_nodes_from(range(3))
+        g.add_edge(0, 1, port1=port, port2=port)
+        return {0: g}
+
+    def test_equal_topologies_match(self):
+        self.assertEqual(utils.topo_signature(self._topo()), utils.topo_signature(self._topo()))
+
+    def test_port_change_differs(self):
+        self.assertNotEqual(
+            utils.topo_signature(self._topo(port=0)), utils.topo_signature(self._topo(port=1))
+        )
+
+    def test_hashable(self):
+        hash(utils.topo_signature(self._topo()))
+
+
+class TestVersionTableEntries(unittest.TestCase):
+
+    def _route(self, arrival_ts):
+        return TableEntry(
+            table="per_hop_routing",
+            action="write_time_flow_entry",
+            match_keys={"dst": 1, "arrival_ts": arrival_ts},
+            action_params={"cur_node": 0, "send_ts": arrival_ts, "send_port": 0},
+        )
+
+    def test_offsets_slice_key(self):
+        (entry,) = utils.version_table_entries([self._route(2)], 1)
+        self.assertEqual(entry.match_keys, {"dst": 1, "arrival_ts": 2 + utils.VERSION_SLICE_OFFSET})
+        self.assertEqual(entry.action_params["send_ts"], 2)
+        self.assertEqual(utils.table_entry_version(entry), 1)
+
+    def test_rekeying_to_version_zero_restores(self):
+        entries = utils.version_table_entries([self._route(2)], 1)
+        self.assertEqual(utils.version_table_entries(entries, 0), [self._route(2)])
+
+    def test_ocs_schedule_uses_slice_id(self):
+        entries = utils.version_table_entries(utils.gen_ocs_commands([(1, 0, 2)]), 1)
+        self.assertEqual(entries[1].match_keys["slice_id"], 1 + utils.VERSION_SLICE_OFFSET)
+
+    def test_batch_matches_entries(self):
+        entries = [TimeFlowEntry(dst=1, arrival_ts=2, hops=TimeFlowHop(cur_node=0, send_port=0, send_ts=2))]
+        batch = utils.tor_table_routing_per_hop_batch(entries)
+        versioned = utils.version_table_entries(batch, 1)
+        self.assertEqual(list(versioned), utils.version_table_entries([self._route(2)], 1))
+        # The input batch is left as it is.
+        self.assertEqual(list(batch), [self._route(2)])
+
+    def test_shared_entries_unchanged(self):
+        default = utils.gen_ocs_commands([])[0]
+        ip = utils.tor_table_ip_to_dst({"10.0.0.1": 0})[0]
+        self.assertEqual(utils.version_table_entries([default, ip], 1), [default, ip])
+        self.assertIsNone(utils.table_entry_version(default))
+        self.assertIsNone(utils.table_entry_version(ip))
+
+
 # ---------------------------------------------------------------------------
 # metric_to_matrix
 # ---------------------------------------------------------------------------
@@ -307,6 +496,12 @@ class TestMetricToMatrix(unittest.TestCase):
         self.assertEqual(result[(0, 2)], 5)
         self.assertEqual(result[(1, 0)], 20)
 
+    def test_multiple_ports_add_up(self):
+        metric = {"tor0": {"pq_depth": {(0, 1): 10, (1, 1): 7, (1, 2): 3}}}
+        result = utils.metric_to_matrix(metric)
+        self.assertEqual(result[(0, 1)], 17)
+        self.assertEqual(result[(0, 2)], 3)
+
     def test_empty_metric(self):
         self.assertEqual(utils.metric_to_matrix({}), {})
 